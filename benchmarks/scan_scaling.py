@@ -0,0 +1,152 @@
+"""
+多进程扫描/回溯扩展性基准测试
+
+在临时数据库中生成合成的股票池，分别用 1..N 个进程运行 scan 和 backfill，
+报告耗时、加速比和并行效率。每个进程数先预热一次，进程池启动的开销不计入。
+
+用法:
+    python benchmarks/scan_scaling.py                          # 1..CPU核数个进程
+    python benchmarks/scan_scaling.py --stocks 1000 --days 1500 --max-processes 8
+    python benchmarks/scan_scaling.py --output benchmarks/results/scan_scaling.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.data.data_manager import DataManager  # noqa: E402
+from src.data.db_handler import DatabaseHandler  # noqa: E402
+from src.strategies.strategy_engine import StrategyEngine  # noqa: E402
+
+STRATEGIES_CONFIG = {
+    "strategy_1a_daily_bollinger_dividend": {"enabled": True, "bollinger_flat_check_days": 60},
+    "strategy_1b_weekly_bollinger_dividend": {"enabled": True, "bollinger_flat_check_days": 20},
+    "strategy_2a_daily_macd_bollinger_breakthrough": {"enabled": True},
+}
+
+
+def build_database(path: str, stocks: int, days: int) -> List[str]:
+    """
+    生成合成的K线和分红数据
+
+    Args:
+        path: 数据库文件路径
+        stocks: 股票数量
+        days: 每只股票的交易日数
+
+    Returns:
+        List[str]: 股票代码列表
+    """
+    db = DatabaseHandler({"database_path": path})
+    db.initialize_tables()
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end=datetime.now(), periods=days).strftime('%Y-%m-%d')
+    stock_codes = [f"SH{600000 + i}" for i in range(stocks)]
+    for stock_code in stock_codes:
+        closes = 10 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+        db.insert_dataframe('daily_kline', pd.DataFrame({
+            'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes * 1.01,
+            'low': closes * 0.99, 'close': closes, 'volume': 1000, 'amount': closes * 1000, 'adj_factor': None
+        }))
+        db.insert_dataframe('dividend_data', pd.DataFrame({
+            'stock_code': stock_code,
+            'report_date': dates[::250],
+            'ex_dividend_date': dates[::250],
+            'dividend_per_share_pre_tax': 0.4,
+            'dividend_yield': None
+        }))
+    db.close()
+    return stock_codes
+
+
+def run_scaling(path: str, stock_codes: List[str], max_processes: int) -> Dict[str, List[Dict[str, float]]]:
+    """
+    用 1..max_processes 个进程分别运行 scan 和 backfill
+
+    Args:
+        path: 数据库文件路径
+        stock_codes: 股票代码列表
+        max_processes: 最大进程数
+
+    Returns:
+        Dict[str, List[Dict[str, float]]]: 操作名称 -> 每个进程数的耗时、加速比和并行效率
+    """
+    db = DatabaseHandler({"database_path": path, "strategies": STRATEGIES_CONFIG})
+    engine = StrategyEngine(DataManager(db))
+    # 输入数据在父进程中只读取一次，计时只反映评估和写入
+    engine.enable_cache()
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - pd.Timedelta(days=365)).strftime('%Y-%m-%d')
+    engine.scan(stock_codes, end_date)
+
+    operations = {
+        "scan": lambda processes: engine.scan(stock_codes, end_date, processes=processes),
+        "backfill": lambda processes: engine.backfill_many(stock_codes, start_date, end_date, processes=processes),
+    }
+    results = {}
+    for name, operation in operations.items():
+        rows = []
+        for processes in range(1, max_processes + 1):
+            # 预热一次，进程池启动的开销不计入
+            operation(processes)
+            start = time.perf_counter()
+            operation(processes)
+            seconds = time.perf_counter() - start
+            baseline = rows[0]["seconds"] if rows else seconds
+            rows.append({
+                "processes": processes,
+                "seconds": round(seconds, 3),
+                "speedup": round(baseline / seconds, 2),
+                "efficiency": round(baseline / seconds / processes, 2),
+            })
+        results[name] = rows
+    db.close()
+    return results
+
+
+def main() -> int:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="多进程扫描/回溯扩展性基准测试")
+    parser.add_argument("--stocks", type=int, default=300, help="股票数量")
+    parser.add_argument("--days", type=int, default=1000, help="每只股票的交易日数")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1, help="最大进程数")
+    parser.add_argument("--output", help="把结果追加到 JSON lines 文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        path = os.path.join(workspace, "benchmark.db")
+        stock_codes = build_database(path, args.stocks, args.days)
+        results = run_scaling(path, stock_codes, args.max_processes)
+
+    print(f"{args.stocks} 只股票 x {args.days} 个交易日")
+    print(f"{'操作':<10}{'进程数':>8}{'耗时(s)':>10}{'加速比':>8}{'效率':>8}")
+    for name, rows in results.items():
+        for row in rows:
+            print(f"{name:<10}{row['processes']:>8}{row['seconds']:>10}{row['speedup']:>8}{row['efficiency']:>8}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "stocks": args.stocks,
+            "days": args.days,
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
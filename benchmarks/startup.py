@@ -0,0 +1,197 @@
+"""
+命令行启动时间基准测试
+
+在临时工作目录中以独立进程多次运行各个子命令，记录耗时的中位数和最小值，
+并用 -X importtime 统计每个命令导入 pandas/akshare 等重依赖的耗时。
+
+用法:
+    python benchmarks/startup.py                       # 打印结果
+    python benchmarks/startup.py --repeat 10 --output benchmarks/results/startup.jsonl
+    python benchmarks/startup.py --baseline benchmarks/results/startup.jsonl --threshold 20
+
+--output 把本次结果追加为一行 JSON，用于跟踪启动时间的变化；
+--baseline 与文件中最后一次结果比较，任何命令变慢超过 --threshold 百分比时返回非零退出码。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+# 重依赖，统计它们的累计导入耗时
+HEAVY_MODULES = ("akshare", "pandas", "numpy")
+
+# 基准名称 -> 命令行参数，均可在没有网络和数据的临时目录中运行
+CASES = {
+    "help": ["--help"],
+    "init-config": ["init-config"],
+    "update-data --queue": ["update-data", "--stock", "SH600036", "--queue", "queue.db"],
+    "scan": ["scan", "--pool", "empty_pool"],
+    "backtest": ["backtest", "--strategy", "strategy_1a_daily_bollinger_dividend"],
+}
+
+
+def prepare_workspace(path: str) -> None:
+    """
+    准备临时工作目录：默认配置和一个空股票池
+
+    Args:
+        path: 工作目录
+    """
+    subprocess.run([sys.executable, MAIN, "init-config"], cwd=path, check=True, capture_output=True)
+    with open(os.path.join(path, "stock_pool.json"), "w", encoding="utf-8") as f:
+        json.dump({"default_pool": [], "empty_pool": []}, f)
+
+
+def run_once(argv: List[str], cwd: str) -> float:
+    """
+    运行一次命令
+
+    Args:
+        argv: 命令行参数
+        cwd: 工作目录
+
+    Returns:
+        float: 耗时（毫秒）
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, MAIN, *argv], cwd=cwd, check=True, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def heavy_import_times(argv: List[str], cwd: str) -> Dict[str, float]:
+    """
+    统计命令导入重依赖的累计耗时
+
+    Args:
+        argv: 命令行参数
+        cwd: 工作目录
+
+    Returns:
+        Dict[str, float]: 模块名 -> 累计导入耗时（毫秒），没有导入的模块不出现
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN, *argv],
+        cwd=cwd, check=True, capture_output=True, text=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) != 3:
+            continue
+        module = parts[2].strip()
+        if module in HEAVY_MODULES:
+            times[module] = round(int(parts[1].strip()) / 1000, 1)
+    return times
+
+
+def run_benchmarks(repeat: int) -> Dict[str, Dict[str, object]]:
+    """
+    运行所有基准
+
+    Args:
+        repeat: 每个命令的运行次数
+
+    Returns:
+        Dict[str, Dict[str, object]]: 基准名称 -> 结果
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        prepare_workspace(workspace)
+        for name, argv in CASES.items():
+            # 先运行一次预热文件系统缓存
+            run_once(argv, workspace)
+            timings = [run_once(argv, workspace) for _ in range(repeat)]
+            results[name] = {
+                "median_ms": round(statistics.median(timings), 1),
+                "min_ms": round(min(timings), 1),
+                "heavy_imports_ms": heavy_import_times(argv, workspace),
+            }
+    return results
+
+
+def git_commit() -> Optional[str]:
+    """
+    获取当前提交
+
+    Returns:
+        Optional[str]: 提交哈希，不在 git 仓库中时为 None
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Dict[str, object]], baseline_path: str, threshold: float) -> List[str]:
+    """
+    与基准文件中最后一次结果比较
+
+    Args:
+        results: 本次结果
+        baseline_path: 基准文件路径
+        threshold: 允许变慢的百分比
+
+    Returns:
+        List[str]: 变慢超过阈值的说明
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        return []
+    baseline = records[-1]["results"]
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median_ms"], result["median_ms"]
+        if after > before * (1 + threshold / 100):
+            regressions.append(f"{name}: {before}ms -> {after}ms")
+    return regressions
+
+
+def main() -> int:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="命令行启动时间基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每个命令的运行次数")
+    parser.add_argument("--output", help="把结果追加到 JSON lines 文件")
+    parser.add_argument("--baseline", help="与 JSON lines 文件中最后一次结果比较")
+    parser.add_argument("--threshold", type=float, default=20.0, help="允许变慢的百分比")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat)
+    print(f"{'命令':<22}{'中位数(ms)':>12}{'最小值(ms)':>12}  重依赖导入(ms)")
+    for name, result in results.items():
+        heavy = ", ".join(f"{m} {t}" for m, t in result["heavy_imports_ms"].items()) or "-"
+        print(f"{name:<22}{result['median_ms']:>12}{result['min_ms']:>12}  {heavy}")
+
+    regressions = compare(results, args.baseline, args.threshold) if args.baseline else []
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "results": results,
+        }
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    for regression in regressions:
+        print(f"启动变慢: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+回测模块
+"""
+
+from .engine import BacktestEngine
+
+__all__ = ['BacktestEngine']
@@ -0,0 +1,415 @@
+"""
+回测引擎模块 - 将 historical_signals 中的策略信号转换为收益并生成绩效报告
+
+所有交易按数组整体计算（每个信号一行，持有期一列），不对单笔交易做Python循环。
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..data.adjustment import apply_adjust_factors
+from ..data.db_handler import DatabaseHandler
+from ..data.signal_store import SignalStore
+from ..utils.logger import setup_logger
+
+TRADING_DAYS_PER_YEAR = 252
+
+# 单次查询中 IN 子句允许的最大股票数量，避免超过SQLite参数上限
+_QUERY_CHUNK_SIZE = 500
+
+DEFAULT_BACKTEST_PARAMS: Dict[str, Any] = {
+    "holding_days": 20,
+    "entry_price": "next_open",
+    "stop_loss_percentage": None,
+    "take_profit_percentage": None,
+    "commission_rate": 0.0003,
+    "risk_free_rate": 0.0,
+    "signal_types": ["buy", "potential_buy"],
+}
+
+
+class BacktestEngine:
+    """回测引擎类，基于历史信号和日K线数据模拟买入、持有和卖出"""
+
+    def __init__(self, db: DatabaseHandler, params: Optional[Dict[str, Any]] = None):
+        """
+        初始化回测引擎
+
+        Args:
+            db: DatabaseHandler实例
+            params: 回测参数，覆盖配置文件中 backtest 部分和默认值
+        """
+        self.db = db
+        self.params = {
+            **DEFAULT_BACKTEST_PARAMS,
+            **db.config.get("backtest", {}),
+            **(params or {}),
+        }
+        self.logger = setup_logger(__name__)
+
+    def load_signals(self,
+                     strategy_name: str,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     signal_types: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        从 historical_signals 表加载指定策略的信号
+
+        Args:
+            strategy_name: 策略名称
+            start_date: 信号起始日期（可选）
+            end_date: 信号结束日期（可选）
+            signal_types: 参与回测的信号类型，默认取回测参数中的 signal_types
+
+        Returns:
+            pd.DataFrame: 包含 stock_code, date 的信号数据
+        """
+        signal_types = signal_types or self.params["signal_types"]
+        return SignalStore(self.db).query(
+            strategies=[strategy_name], start_date=start_date, end_date=end_date,
+            signal_types=signal_types, columns="stock_code, date", order_by="date, stock_code",
+        )
+
+    def load_price_panel(self,
+                         stock_codes: List[str],
+                         start_date: str,
+                         end_date: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        加载后复权日K线并整理为 日期 x 股票 的二维价格矩阵
+
+        停牌等缺失的收盘价按前值填充；缺失的开盘价以填充后的收盘价代替。
+
+        Args:
+            stock_codes: 股票代码列表
+            start_date: 开始日期
+            end_date: 结束日期（可选，默认为最新数据）
+
+        Returns:
+            Dict[str, np.ndarray]: 包含 dates, codes, open, close 的字典
+        """
+        legacy = self.db.legacy_qfq_stocks(stock_codes)
+        if legacy:
+            raise ValueError(f"{len(legacy)}只股票的日K线仍为前复权价格（如{legacy[0]}），"
+                             f"不能应用复权因子，请先运行 repair-data 重新获取")
+        frames, factor_frames = [], []
+        for i in range(0, len(stock_codes), _QUERY_CHUNK_SIZE):
+            chunk = stock_codes[i:i + _QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            where = f"stock_code IN ({placeholders}) AND date >= ?"
+            params: List[Any] = [*chunk, start_date]
+            if end_date:
+                where += " AND date <= ?"
+                params.append(end_date)
+            frames.append(self.db.query_kline('daily_kline', where, tuple(params), start_date, end_date,
+                                              columns="stock_code, date, open, close"))
+            factor_frames.append(self.db.execute_query(f"""
+                SELECT stock_code, date, hfq_factor FROM adjust_factors
+                WHERE stock_code IN ({placeholders})
+            """, tuple(chunk)))
+        kline = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        # 使用后复权价格，保证跨越除权除息日的收益计算正确
+        if not kline.empty:
+            kline = apply_adjust_factors(kline, pd.concat(factor_frames, ignore_index=True), "hfq")
+
+        codes = np.asarray(sorted(stock_codes), dtype=object)
+        if kline.empty:
+            empty = np.empty((0, len(codes)))
+            return {"dates": np.asarray([], dtype=object), "codes": codes,
+                    "open": empty, "close": empty}
+
+        dates = np.unique(kline["date"].to_numpy(dtype=object))
+        row = np.searchsorted(dates, kline["date"].to_numpy(dtype=object))
+        col = np.searchsorted(codes, kline["stock_code"].to_numpy(dtype=object))
+
+        open_ = np.full((len(dates), len(codes)), np.nan)
+        close = np.full((len(dates), len(codes)), np.nan)
+        open_[row, col] = kline["open"].to_numpy(dtype=float)
+        close[row, col] = kline["close"].to_numpy(dtype=float)
+
+        close = pd.DataFrame(close).ffill().to_numpy()
+        open_ = np.where(np.isnan(open_), close, open_)
+        return {"dates": dates, "codes": codes, "open": open_, "close": close}
+
+    def run(self,
+            strategy_name: str,
+            start_date: Optional[str] = None,
+            end_date: Optional[str] = None,
+            **overrides: Any) -> Dict[str, Any]:
+        """
+        对指定策略的历史信号执行回测
+
+        Args:
+            strategy_name: 策略名称
+            start_date: 信号起始日期（可选）
+            end_date: 信号结束日期（可选）
+            **overrides: 临时覆盖的回测参数，如 holding_days, stop_loss_percentage
+
+        Returns:
+            Dict[str, Any]: 包含 metrics（绩效指标）、trades（逐笔交易）、
+            equity_curve（组合净值曲线）的字典
+        """
+        params = {**self.params, **overrides}
+        signals = self.load_signals(strategy_name, start_date, end_date, params["signal_types"])
+        if signals is None or signals.empty:
+            self.logger.warning(f"策略{strategy_name}在指定区间内没有可回测的信号")
+            return self._empty_result(strategy_name)
+
+        panel = self.load_price_panel(
+            signals["stock_code"].unique().tolist(),
+            signals["date"].min(),
+        )
+        result = self.simulate(signals, panel, params)
+        result["trades"] = self.attach_financials(result["trades"])
+        result["metrics"]["strategy_name"] = strategy_name
+        self.logger.info(
+            f"策略{strategy_name}回测完成: 交易{result['metrics']['total_trades']}笔, "
+            f"年化收益{result['metrics']['annualized_return']:.2%}, "
+            f"最大回撤{result['metrics']['max_drawdown']:.2%}"
+        )
+        return result
+
+    def attach_financials(self, trades: pd.DataFrame) -> pd.DataFrame:
+        """
+        为每笔交易附加信号日当天或之前最新的 PE/PB，不使用信号日之后才有的数据
+
+        Args:
+            trades: simulate 返回的逐笔交易
+
+        Returns:
+            pd.DataFrame: 增加 signal_pe_ttm, signal_pb_mrq 列的交易
+        """
+        trades = trades.copy()
+        if trades.empty:
+            trades["signal_pe_ttm"], trades["signal_pb_mrq"] = [], []
+            return trades
+        keys = pd.DataFrame({"stock_code": trades["stock_code"], "date": trades["signal_date"]})
+        financials = self.db.join_asof("financial_summary", keys, ["pe_ttm", "pb_mrq"])
+        trades["signal_pe_ttm"] = financials["pe_ttm"].to_numpy(dtype=float)
+        trades["signal_pb_mrq"] = financials["pb_mrq"].to_numpy(dtype=float)
+        return trades
+
+    def simulate(self,
+                 signals: pd.DataFrame,
+                 panel: Dict[str, np.ndarray],
+                 params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        在价格矩阵上模拟全部信号对应的交易
+
+        每笔交易在信号日收盘或次日开盘买入，在止损/止盈首次触发日或持有期满日收盘卖出；
+        组合每日收益为当日所有持仓收益的等权平均。
+
+        Args:
+            signals: 包含 stock_code, date 的信号数据
+            panel: load_price_panel 返回的价格矩阵
+            params: 回测参数
+
+        Returns:
+            Dict[str, Any]: 包含 metrics, trades, equity_curve 的字典
+        """
+        dates, codes = panel["dates"], panel["codes"]
+        open_, close = panel["open"], panel["close"]
+        n_dates = len(dates)
+        holding_days = int(params["holding_days"])
+        if holding_days < 1:
+            raise ValueError(f"持有天数必须大于0: {holding_days}")
+
+        # 定位信号所在的行（信号日当天或之前最近的交易日）和列
+        signal_dates = signals["date"].to_numpy(dtype=object)
+        signal_codes = signals["stock_code"].to_numpy(dtype=object)
+        signal_row = np.searchsorted(dates, signal_dates, side="right") - 1
+        col = np.searchsorted(codes, signal_codes)
+
+        if params["entry_price"] == "next_open":
+            entry_row = signal_row + 1
+            first_mark = entry_row
+            entry_source = open_
+        elif params["entry_price"] == "close":
+            entry_row = signal_row
+            first_mark = entry_row + 1
+            entry_source = close
+        else:
+            raise ValueError(f"未知的买入价格类型: {params['entry_price']}")
+
+        keep = (signal_row >= 0) & (first_mark < n_dates)
+        if not keep.all():
+            self.logger.warning(f"{int((~keep).sum())}个信号缺少后续行情数据，已忽略")
+        signal_row, entry_row, first_mark, col = (
+            signal_row[keep], entry_row[keep], first_mark[keep], col[keep])
+        signal_dates, signal_codes = signal_dates[keep], signal_codes[keep]
+        if len(col) == 0:
+            return self._empty_result(None)
+
+        entry_price = entry_source[entry_row, col]
+        valid_entry = np.isfinite(entry_price) & (entry_price > 0)
+        signal_row, entry_row, first_mark, col = (
+            signal_row[valid_entry], entry_row[valid_entry], first_mark[valid_entry], col[valid_entry])
+        signal_dates, signal_codes = signal_dates[valid_entry], signal_codes[valid_entry]
+        entry_price = entry_price[valid_entry]
+        n_trades = len(col)
+        if n_trades == 0:
+            return self._empty_result(None)
+
+        # 持有期内每日收盘价矩阵：n_trades x holding_days
+        mark_row = first_mark[:, None] + np.arange(holding_days)
+        in_range = mark_row < n_dates
+        mark_row = np.minimum(mark_row, n_dates - 1)
+        marks = close[mark_row, col[:, None]]
+        path_return = marks / entry_price[:, None] - 1
+
+        stop_loss = params.get("stop_loss_percentage")
+        take_profit = params.get("take_profit_percentage")
+        stop_hit = np.zeros_like(in_range)
+        profit_hit = np.zeros_like(in_range)
+        if stop_loss is not None:
+            stop_hit = (path_return <= -stop_loss / 100) & in_range
+        if take_profit is not None:
+            profit_hit = (path_return >= take_profit / 100) & in_range
+        hit = stop_hit | profit_hit
+
+        last_valid = in_range.sum(axis=1) - 1
+        any_hit = hit.any(axis=1)
+        exit_k = np.where(any_hit, hit.argmax(axis=1), last_valid)
+        trade_idx = np.arange(n_trades)
+        exit_price = marks[trade_idx, exit_k]
+        exit_row = mark_row[trade_idx, exit_k]
+
+        exit_reason = np.full(n_trades, "holding_period", dtype=object)
+        exit_reason[last_valid < holding_days - 1] = "end_of_data"
+        exit_reason[any_hit & profit_hit[trade_idx, exit_k]] = "take_profit"
+        exit_reason[any_hit & stop_hit[trade_idx, exit_k]] = "stop_loss"
+
+        # 逐日收益，买入手续费计入首日，卖出手续费计入卖出日
+        fee = float(params["commission_rate"])
+        prev = np.concatenate([entry_price[:, None], marks[:, :-1]], axis=1)
+        daily_growth = marks / prev
+        daily_growth[:, 0] /= (1 + fee)
+        daily_growth[trade_idx, exit_k] *= (1 - fee)
+        active = np.arange(holding_days) <= exit_k[:, None]
+        daily_return = np.where(active, daily_growth - 1, 0.0)
+        trade_return = np.prod(np.where(active, daily_growth, 1.0), axis=1) - 1
+
+        trades = pd.DataFrame({
+            "stock_code": signal_codes,
+            "signal_date": signal_dates,
+            "entry_date": dates[entry_row],
+            "exit_date": dates[exit_row],
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "return": trade_return,
+            "holding_days": exit_k + 1,
+            "exit_reason": exit_reason,
+        })
+
+        # 组合层面：按日期聚合所有持仓的收益
+        active_rows = mark_row[active]
+        day_sum = np.bincount(active_rows, weights=daily_return[active], minlength=n_dates)
+        positions = np.bincount(active_rows, minlength=n_dates)
+        entries = np.bincount(first_mark, minlength=n_dates)
+        exits = np.bincount(exit_row, minlength=n_dates)
+
+        first_day, last_day = first_mark.min(), exit_row.max()
+        window = slice(first_day, last_day + 1)
+        positions = positions[window]
+        portfolio_return = np.divide(
+            day_sum[window], positions,
+            out=np.zeros(len(positions)), where=positions > 0,
+        )
+        equity = np.cumprod(1 + portfolio_return)
+        daily_turnover = np.divide(
+            entries[window] + exits[window], 2 * positions,
+            out=np.zeros(len(positions)), where=positions > 0,
+        )
+
+        equity_curve = pd.DataFrame({
+            "date": dates[window],
+            "daily_return": portfolio_return,
+            "equity": equity,
+            "positions": positions,
+        })
+        metrics = self._calculate_metrics(
+            portfolio_return, equity, trade_return, daily_turnover, positions,
+            float(params["risk_free_rate"]),
+        )
+        metrics["average_holding_days"] = float(np.mean(exit_k + 1))
+        return {"metrics": metrics, "trades": trades, "equity_curve": equity_curve}
+
+    def _calculate_metrics(self,
+                           portfolio_return: np.ndarray,
+                           equity: np.ndarray,
+                           trade_return: np.ndarray,
+                           daily_turnover: np.ndarray,
+                           positions: np.ndarray,
+                           risk_free_rate: float) -> Dict[str, Any]:
+        """
+        计算绩效指标
+
+        Args:
+            portfolio_return: 组合日收益序列
+            equity: 组合净值序列
+            trade_return: 逐笔交易收益
+            daily_turnover: 组合日换手率序列
+            positions: 每日持仓数量
+            risk_free_rate: 年化无风险利率
+
+        Returns:
+            Dict[str, Any]: 绩效指标字典
+        """
+        n_days = len(portfolio_return)
+        total_return = float(equity[-1] - 1)
+        annualized_return = float(equity[-1] ** (TRADING_DAYS_PER_YEAR / n_days) - 1)
+
+        running_max = np.maximum.accumulate(equity)
+        max_drawdown = float(np.min(equity / running_max - 1))
+
+        excess = portfolio_return - risk_free_rate / TRADING_DAYS_PER_YEAR
+        std = portfolio_return.std(ddof=1) if n_days > 1 else 0.0
+        sharpe = float(excess.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)) if std > 0 else 0.0
+
+        held = positions > 0
+        turnover = float(daily_turnover[held].mean() * TRADING_DAYS_PER_YEAR) if held.any() else 0.0
+
+        return {
+            "total_trades": int(len(trade_return)),
+            "total_return": total_return,
+            "annualized_return": annualized_return,
+            "max_drawdown": max_drawdown,
+            "sharpe_ratio": sharpe,
+            "win_rate": float(np.mean(trade_return > 0)),
+            "average_trade_return": float(np.mean(trade_return)),
+            "turnover": turnover,
+            "trading_days": int(n_days),
+        }
+
+    def _empty_result(self, strategy_name: Optional[str]) -> Dict[str, Any]:
+        """
+        生成没有交易时的空回测结果
+
+        Args:
+            strategy_name: 策略名称
+
+        Returns:
+            Dict[str, Any]: 指标全部为0的回测结果
+        """
+        metrics: Dict[str, Any] = {
+            "total_trades": 0,
+            "total_return": 0.0,
+            "annualized_return": 0.0,
+            "max_drawdown": 0.0,
+            "sharpe_ratio": 0.0,
+            "win_rate": 0.0,
+            "average_trade_return": 0.0,
+            "turnover": 0.0,
+            "trading_days": 0,
+            "average_holding_days": 0.0,
+        }
+        if strategy_name:
+            metrics["strategy_name"] = strategy_name
+        return {
+            "metrics": metrics,
+            "trades": pd.DataFrame(columns=[
+                "stock_code", "signal_date", "entry_date", "exit_date", "entry_price",
+                "exit_price", "return", "holding_days", "exit_reason", "signal_pe_ttm", "signal_pb_mrq",
+            ]),
+            "equity_curve": pd.DataFrame(columns=["date", "daily_return", "equity", "positions"]),
+        }
@@ -0,0 +1,7 @@
+"""
+命令行模块
+"""
+
+from .registry import COMMANDS, build_parser, load_command, main
+
+__all__ = ['COMMANDS', 'build_parser', 'load_command', 'main']
@@ -0,0 +1,50 @@
+"""
+回测命令
+"""
+import json
+import os
+from datetime import datetime
+from src.backtest.engine import BacktestEngine
+from src.data.db_handler import DatabaseHandler
+from src.utils.logger import setup_logger
+
+logger = setup_logger("main")
+
+def backtest(args):
+    """对历史信号执行回测并输出绩效报告"""
+    db = DatabaseHandler("config.json")
+    db.initialize_tables()
+    engine = BacktestEngine(db)
+
+    overrides = {}
+    if args.holding_days is not None:
+        overrides["holding_days"] = args.holding_days
+    if args.stop_loss is not None:
+        overrides["stop_loss_percentage"] = args.stop_loss
+    if args.take_profit is not None:
+        overrides["take_profit_percentage"] = args.take_profit
+    if args.entry_price:
+        overrides["entry_price"] = args.entry_price
+
+    result = engine.run(args.strategy, args.start_date, args.end_date, **overrides)
+    metrics = result["metrics"]
+    for key, value in metrics.items():
+        logger.info(f"{key}: {value}")
+
+    # 保存回测报告
+    output_dir = db.config.get("scan_output_dir", "scan_results")
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(
+            output_dir,
+            f"{datetime.now().strftime('%Y-%m-%d')}_{args.strategy}_backtest.json"
+        )
+        report = {
+            "metrics": metrics,
+            "trades": result["trades"].to_dict(orient="records"),
+        }
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False, default=str)
+        logger.info(f"回测报告已保存到 {report_path}")
+    except Exception as e:
+        logger.error(f"保存回测报告失败: {str(e)}")
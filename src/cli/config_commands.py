@@ -0,0 +1,131 @@
+"""
+配置相关命令 - 只依赖标准库
+"""
+import json
+import os
+from src.utils.logger import setup_logger
+
+logger = setup_logger("main")
+
+def load_stock_pool(pool_name: str = "default_pool") -> list:
+    """
+    加载股票池
+    
+    Args:
+        pool_name: 股票池名称，默认为 default_pool
+        
+    Returns:
+        list: 股票代码列表
+    """
+    try:
+        with open("stock_pool.json", "r", encoding="utf-8") as f:
+            pools = json.load(f)
+            return pools.get(pool_name, [])
+    except Exception as e:
+        logger.error(f"加载股票池失败: {str(e)}")
+        return []
+
+def init_config(args=None):
+    """初始化配置文件"""
+    # 创建默认的 config.json
+    default_config = {
+        "data_source": {
+            "akshare_max_retries": 3,
+            "akshare_retry_delay_seconds": 10,
+            "akshare_max_retry_delay_seconds": 60,
+            "circuit_failure_threshold": 5,
+            "circuit_reset_seconds": 300,
+            "error_budget": 50,
+            "proxies": None,
+            "http_pool_size": 10,
+            "connect_timeout_seconds": 5,
+            "read_timeout_seconds": 30,
+            "fetch_processes": 0,
+            "fetch_call_timeout_seconds": 120
+        },
+        "database_path": "stock_data.db",
+        "negative_cache_ttl_hours": {
+            "dividend": 168,
+            "financial": 24,
+            "adjust_factors": 24
+        },
+        "freshness": {
+            "enabled": True,
+            "kline": {"after_trading_day": True, "idle_days": 10, "idle_interval_hours": 72},
+            "adjust_factors": {"min_interval_hours": 720, "on_ex_dividend": True},
+            "financial": {
+                "after_trading_day": True,
+                "min_interval_hours": 168,
+                "seasons": [["03-15", "04-30"], ["08-01", "08-31"], ["10-15", "10-31"]],
+                "season_interval_hours": 24
+            },
+            "dividend": {
+                "min_interval_hours": 720,
+                "seasons": [["03-15", "08-31"]],
+                "season_interval_hours": 72,
+                "idle_days": 400,
+                "idle_interval_hours": 2160
+            }
+        },
+        "compact_schema": False,
+        "partition_dir": "partitions",
+        "max_attached_partitions": 8,
+        "log_level": "INFO",
+        "log_file_path": "app.log",
+        "scan_output_dir": "scan_results",
+        "strategies": {
+            "strategy_1a_daily_bollinger_dividend": {
+                "enabled": True,
+                "bollinger_period": 20,
+                "bollinger_std_dev": 2.0,
+                "bollinger_flat_check_days": 60,
+                "bollinger_flat_threshold_percentage": 5.0,
+                "lower_band_tolerance_percentage": 1.0,
+                "min_dynamic_dividend_yield": 3.0
+            }
+        },
+        "safety_score_weights": {
+            "pe_percentile": 0.4,
+            "pb_percentile": 0.4,
+            "dividend_yield_percentile": 0.2
+        },
+        "backtest": {
+            "holding_days": 20,
+            "entry_price": "next_open",
+            "stop_loss_percentage": None,
+            "take_profit_percentage": None,
+            "commission_rate": 0.0003,
+            "risk_free_rate": 0.0
+        },
+        "export": {
+            "output_dir": "export",
+            "bars": 60,
+            "signal_limit": 10,
+            "history_years": 5
+        },
+        "service": {
+            "address": "127.0.0.1:8765",
+            "scheduled_update": True,
+            "post_close_update_time": "15:30",
+            "export_after_update": False
+        }
+    }
+    
+    # 创建默认的 stock_pool.json
+    default_pool = {
+        "default_pool": ["SZ000858"],
+        "my_watchlist": ["SZ000858"]
+    }
+    
+    try:
+        if not os.path.exists("config.json"):
+            with open("config.json", "w", encoding="utf-8") as f:
+                json.dump(default_config, f, indent=4, ensure_ascii=False)
+            logger.info("已创建默认配置文件 config.json")
+            
+        if not os.path.exists("stock_pool.json"):
+            with open("stock_pool.json", "w", encoding="utf-8") as f:
+                json.dump(default_pool, f, indent=4, ensure_ascii=False)
+            logger.info("已创建默认股票池文件 stock_pool.json")
+    except Exception as e:
+        logger.error(f"初始化配置文件失败: {str(e)}")
@@ -0,0 +1,207 @@
+"""
+数据更新和队列 worker 命令
+
+只把工作单元放入队列或转发给常驻服务时不需要 pandas/akshare，
+这些依赖在真正需要执行更新的函数内部导入。
+"""
+import json
+import multiprocessing
+from src.cli.config_commands import load_stock_pool
+from src.data.job_queue import JobQueue, QueueWorker, UnitDeferred
+from src.service.client import ServiceClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger("main")
+
+def update_data(args):
+    """更新数据"""
+    # 确定要更新的股票列表
+    if args.all_pools:
+        stock_codes = []
+        with open("stock_pool.json", "r", encoding="utf-8") as f:
+            pools = json.load(f)
+            for pool in pools.values():
+                stock_codes.extend(pool)
+        stock_codes = list(set(stock_codes))  # 去重
+    elif args.stock:
+        stock_codes = [args.stock]
+    else:
+        stock_codes = load_stock_pool()
+    
+    # 确定要更新的数据类型
+    data_types = args.type.split(',') if args.type else ['kline', 'financial', 'dividend']
+    
+    # 队列模式：只负责把工作单元放入共享队列，由 worker 进程执行
+    if args.queue:
+        queue = JobQueue(args.queue, max_attempts=args.max_attempts)
+        count = queue.enqueue(args.queue_name, "update", stock_codes, {"data_types": data_types, "force": args.force})
+        logger.info(f"已将 {count} 个更新单元放入队列 {args.queue_name}")
+        return
+    
+    # 瘦客户端模式：由常驻服务执行更新并刷新其缓存
+    if args.server:
+        client = ServiceClient(args.server)
+        result = client.call("update", stock_codes=stock_codes, data_types=data_types,
+                             max_attempts=args.max_attempts, force=args.force)
+        logger.info(f"常驻服务更新完成: {result}")
+        if args.export:
+            logger.info(f"快照导出完成: 版本 {client.call('export')['version']}")
+        return
+    
+    # 只有在当前进程中执行更新时才导入 pandas/akshare
+    from src.data.data_manager import DataManager
+    from src.data.db_handler import DatabaseHandler
+    from src.data.update_jobs import UpdateJobRunner
+    
+    # 初始化数据库处理器和数据管理器
+    db = DatabaseHandler("config.json")
+    db.initialize_tables()
+    if args.fetch_processes is not None:
+        db.config.setdefault("data_source", {})["fetch_processes"] = args.fetch_processes
+    dm = DataManager(db)
+    
+    # 按工作单元执行更新，中断后可通过 --resume 续传
+    runner = UpdateJobRunner(dm, max_attempts=args.max_attempts)
+    try:
+        runner.run(stock_codes, data_types, resume=args.resume, job_id=args.job_id, force=args.force)
+    finally:
+        dm.close_fetch_pool()
+    
+    # 增量更新全市场和各股票池的因子排名
+    from src.data.factor_ranks import MARKET_UNIVERSE
+    with open("stock_pool.json", "r", encoding="utf-8") as f:
+        pools = json.load(f)
+    db.factor_ranks.update({MARKET_UNIVERSE: None, **pools})
+    
+    # 更新后只发布内容变化的快照文件
+    if args.export:
+        from src.export.snapshots import SnapshotExporter
+        from src.strategies.strategy_engine import StrategyEngine
+        SnapshotExporter(StrategyEngine(dm)).export(pools)
+
+def build_queue_handlers(config_path: str) -> dict:
+    """
+    创建 worker 使用的工作单元处理函数
+    
+    Args:
+        config_path: 配置文件路径
+        
+    Returns:
+        dict: 单元类型 -> 处理函数
+    """
+    from src.data.data_manager import DataManager
+    from src.data.db_handler import DatabaseHandler
+    from src.strategies.strategy_engine import StrategyEngine
+    
+    db = DatabaseHandler(config_path)
+    db.initialize_tables()
+    dm = DataManager(db)
+    engine = StrategyEngine(dm)
+    
+    def handle_update(stock_code: str, payload: dict) -> None:
+        data_types = payload.get("data_types", ['kline', 'financial', 'dividend'])
+        if not payload.get("force"):
+            data_types = [data_type for _, data_type in dm.freshness.due_units([stock_code], data_types)]
+        if not data_types:
+            return
+        # worker 每次领取一个单元，按单元重置错误预算，否则常驻 worker 用完预算后之后的单元都不再重试
+        dm.retry.start_run()
+        results = dm.update_single_stock_data(stock_code, data_types)
+        failed = [data_type for data_type, ok in results.items() if ok is False]
+        if failed:
+            raise Exception(f"更新失败的数据类型: {', '.join(failed)}")
+        deferred = [data_type for data_type, ok in results.items() if ok is None]
+        if deferred:
+            # 接口熔断而推迟的单元放回队列且不消耗领取次数，已完成的类型下次被新鲜度策略跳过
+            retry_after = min(dm.retry.open_endpoints().values(), default=0.0)
+            raise UnitDeferred(f"接口熔断，推迟更新的数据类型: {', '.join(deferred)}", retry_after)
+    
+    def handle_backfill(stock_code: str, payload: dict) -> None:
+        engine.backfill(stock_code, payload["start_date"], payload["end_date"], payload.get("strategies"))
+    
+    return {"update": handle_update, "backfill": handle_backfill}
+
+def run_queue_worker(queue_path: str, queue_name: str, lease_seconds: float, max_attempts: int) -> dict:
+    """
+    在当前进程中运行一个队列 worker，直到队列处理完毕
+    
+    Args:
+        queue_path: 队列文件路径
+        queue_name: 队列名称
+        lease_seconds: 租约时长（秒）
+        max_attempts: 单个工作单元的最大领取次数
+        
+    Returns:
+        dict: 完成和失败的单元数量
+    """
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    return QueueWorker(queue, build_queue_handlers("config.json")).run(queue_name)
+
+def worker(args):
+    """启动队列 worker 进程"""
+    if args.processes <= 1:
+        run_queue_worker(args.queue, args.queue_name, args.lease_seconds, args.max_attempts)
+    else:
+        processes = [
+            multiprocessing.Process(
+                target=run_queue_worker,
+                args=(args.queue, args.queue_name, args.lease_seconds, args.max_attempts)
+            )
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    
+    stats = JobQueue(args.queue).stats(args.queue_name)
+    logger.info(f"队列 {args.queue_name} 状态: {stats}")
+
+def migrate_schema(args):
+    """在原始表结构和紧凑表结构之间迁移数据库"""
+    from src.data.compact_schema import migrate_schema as migrate
+    from src.data.db_handler import DatabaseHandler
+    
+    db = DatabaseHandler("config.json")
+    sizes = migrate(db, target=args.to, vacuum=not args.no_vacuum)
+    db.close()
+    logger.info(f"数据库文件大小: {sizes['size_before']} -> {sizes['size_after']} 字节")
+
+def freeze_partitions(args):
+    """把早于指定年份的K线冻结为按年分区的只读文件"""
+    from src.data.db_handler import DatabaseHandler
+    
+    db = DatabaseHandler("config.json")
+    db.initialize_tables()
+    moved = db.partitions.freeze(args.before_year, vacuum=not args.no_vacuum)
+    db.close()
+    for year, rows in moved.items():
+        logger.info(f"{year}年: {rows} 行")
+
+def repair_data(args):
+    """按交易日历检测日K线缺口，只重新获取缺失的区间"""
+    from datetime import datetime
+    from src.data.data_manager import DataManager
+    from src.data.db_handler import DatabaseHandler
+    
+    if args.stock:
+        stock_codes = [args.stock]
+    elif args.pool:
+        stock_codes = load_stock_pool(args.pool)
+    else:
+        stock_codes = None
+    db = DatabaseHandler("config.json")
+    db.initialize_tables()
+    summary = DataManager(db).repair_daily_kline(
+        stock_codes,
+        args.start_date,
+        args.end_date or datetime.now().strftime("%Y-%m-%d"),
+        max_bridge_days=args.max_bridge_days,
+        dry_run=args.dry_run
+    )
+    db.close()
+    if summary['legacy']:
+        logger.info(f"日K线为前复权价格的股票 {summary['legacy']} 只，已重新获取为不复权价格 {summary['migrated']} 只")
+    logger.info(f"缺失区间 {summary['missing']} 个，停牌区间 {summary['suspended']} 个，"
+                f"请求 {summary['requests']} 次，获取 {summary['rows']} 行，失败 {summary['failed']} 次，"
+                f"接口熔断推迟 {summary['deferred']} 次")
@@ -0,0 +1,201 @@
+"""
+命令注册模块 - 命令名称到处理函数的映射，处理函数所在模块在执行命令时才导入
+
+解析命令行只依赖 argparse，init-config 等轻量命令以及瘦客户端不会导入 pandas/akshare。
+"""
+import argparse
+import importlib
+from typing import Callable, List, Optional
+
+# 命令名称 -> "模块:函数"
+COMMANDS = {
+    "init-config": "src.cli.config_commands:init_config",
+    "update-data": "src.cli.data_commands:update_data",
+    "worker": "src.cli.data_commands:worker",
+    "migrate-schema": "src.cli.data_commands:migrate_schema",
+    "freeze-partitions": "src.cli.data_commands:freeze_partitions",
+    "repair-data": "src.cli.data_commands:repair_data",
+    "backfill": "src.cli.scan_commands:backfill",
+    "scan": "src.cli.scan_commands:scan",
+    "lookup": "src.cli.scan_commands:lookup",
+    "overview": "src.cli.scan_commands:overview",
+    "factor-ranks": "src.cli.scan_commands:factor_ranks",
+    "signals": "src.cli.scan_commands:signals",
+    "intraday": "src.cli.scan_commands:intraday",
+    "export": "src.cli.scan_commands:export",
+    "serve": "src.cli.scan_commands:serve",
+    "backtest": "src.cli.backtest_commands:backtest",
+}
+
+def load_command(name: str) -> Callable[[argparse.Namespace], None]:
+    """
+    导入并返回命令的处理函数
+    
+    Args:
+        name: 命令名称
+        
+    Returns:
+        Callable[[argparse.Namespace], None]: 处理函数
+    """
+    if name not in COMMANDS:
+        raise ValueError(f"未知的命令: {name}")
+    module_name, function_name = COMMANDS[name].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    创建命令行解析器，只依赖 argparse
+    
+    Returns:
+        argparse.ArgumentParser: 命令行解析器
+    """
+    parser = argparse.ArgumentParser(description="A股辅助决策工具")
+    subparsers = parser.add_subparsers(dest="command", help="可用命令")
+    
+    # init-config 命令
+    subparsers.add_parser("init-config", help="生成默认配置文件")
+    
+    # update-data 命令
+    update_parser = subparsers.add_parser("update-data", help="更新数据")
+    update_parser.add_argument("--stock", help="指定单个股票代码")
+    update_parser.add_argument("--all-pools", action="store_true", help="更新所有股票池中的股票")
+    update_parser.add_argument("--type", help="指定更新数据类型，用逗号分隔，如：kline,financial,dividend")
+    update_parser.add_argument("--start-date", help="指定历史数据更新的起始日期")
+    update_parser.add_argument("--resume", action="store_true", help="续传最近一次未完成的更新任务")
+    update_parser.add_argument("--job-id", help="指定要续传的更新任务ID")
+    update_parser.add_argument("--max-attempts", type=int, default=3, help="单个工作单元的最大尝试次数")
+    update_parser.add_argument("--force", action="store_true", help="忽略新鲜度策略，请求所有股票的全部数据类型")
+    update_parser.add_argument("--queue", help="队列文件路径，指定后只把工作单元放入队列，由 worker 执行")
+    update_parser.add_argument("--queue-name", default="default", help="队列名称")
+    update_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务执行更新")
+    update_parser.add_argument("--export", action="store_true", help="更新后导出快照，只发布内容变化的文件")
+    update_parser.add_argument("--fetch-processes", type=int,
+                               help="在指定数量的 worker 进程中调用 akshare，超时的调用被强制终止（覆盖 data_source.fetch_processes）")
+    
+    # backfill 命令
+    backfill_parser = subparsers.add_parser("backfill", help="对历史数据执行策略回溯")
+    backfill_target = backfill_parser.add_mutually_exclusive_group(required=True)
+    backfill_target.add_argument("--stock", help="指定单个股票代码")
+    backfill_target.add_argument("--pool", help="指定股票池")
+    backfill_parser.add_argument("--start-date", required=True, help="回溯开始日期")
+    backfill_parser.add_argument("--end-date", required=True, help="回溯结束日期")
+    backfill_parser.add_argument("--strategy", help="指定运行特定策略")
+    backfill_parser.add_argument("--queue", help="队列文件路径，指定后只把工作单元放入队列，由 worker 执行")
+    backfill_parser.add_argument("--queue-name", default="default", help="队列名称")
+    backfill_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务执行回溯")
+    backfill_parser.add_argument("--processes", type=int, default=1, help="按股票分片评估使用的进程数")
+    
+    # worker 命令
+    worker_parser = subparsers.add_parser("worker", help="从共享队列领取并执行工作单元")
+    worker_parser.add_argument("--queue", required=True, help="队列文件路径")
+    worker_parser.add_argument("--queue-name", default="default", help="队列名称")
+    worker_parser.add_argument("--processes", type=int, default=1, help="本机启动的 worker 进程数")
+    worker_parser.add_argument("--lease-seconds", type=float, default=300, help="工作单元的租约时长（秒）")
+    worker_parser.add_argument("--max-attempts", type=int, default=3, help="单个工作单元的最大领取次数")
+    
+    # migrate-schema 命令
+    migrate_parser = subparsers.add_parser("migrate-schema", help="在原始表结构和紧凑表结构之间迁移数据库")
+    migrate_parser.add_argument("--to", choices=["compact", "legacy"], default="compact", help="目标表结构")
+    migrate_parser.add_argument("--no-vacuum", action="store_true", help="迁移后不执行 VACUUM")
+    
+    # freeze-partitions 命令
+    freeze_parser = subparsers.add_parser("freeze-partitions", help="把早于指定年份的K线冻结为按年分区的只读文件")
+    freeze_parser.add_argument("--before-year", type=int, required=True, help="早于该年份的K线被冻结")
+    freeze_parser.add_argument("--no-vacuum", action="store_true", help="冻结后不 VACUUM 主库")
+    
+    # repair-data 命令
+    repair_parser = subparsers.add_parser("repair-data", help="按交易日历检测日K线缺口，只重新获取缺失的区间")
+    repair_target = repair_parser.add_mutually_exclusive_group()
+    repair_target.add_argument("--stock", help="指定单个股票代码")
+    repair_target.add_argument("--pool", help="指定股票池，默认检测数据库中的所有股票")
+    repair_parser.add_argument("--start-date", required=True, help="检测开始日期")
+    repair_parser.add_argument("--end-date", help="检测结束日期，默认为今天")
+    repair_parser.add_argument("--max-bridge-days", type=int, default=5, help="合并缺口时允许跨过的最大交易日数")
+    repair_parser.add_argument("--dry-run", action="store_true", help="只检测缺口，不获取数据")
+    
+    # scan 命令
+    scan_parser = subparsers.add_parser("scan", help="执行选股扫描")
+    scan_parser.add_argument("--pool", default="default_pool", help="指定要扫描的股票池")
+    scan_parser.add_argument("--date", help="指定扫描日期")
+    scan_parser.add_argument("--strategy", help="指定运行特定策略")
+    scan_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务执行扫描")
+    scan_parser.add_argument("--processes", type=int, default=1, help="按股票分片评估使用的进程数")
+    
+    # intraday 命令
+    intraday_parser = subparsers.add_parser("intraday", help="盘中实时扫描，只重新评估价格穿越触发价的股票")
+    intraday_parser.add_argument("--pool", default="default_pool", help="指定要扫描的股票池")
+    intraday_parser.add_argument("--strategy", help="指定运行特定策略")
+    intraday_parser.add_argument("--interval", type=float, default=60, help="行情快照的轮询间隔（秒）")
+    intraday_parser.add_argument("--date", help="交易日期，默认为今天")
+    
+    # lookup 命令
+    lookup_parser = subparsers.add_parser("lookup", help="查询单只股票的最新行情和历史信号")
+    lookup_parser.add_argument("--stock", required=True, help="股票代码")
+    lookup_parser.add_argument("--date", help="查询日期，默认为今天")
+    lookup_parser.add_argument("--limit", type=int, default=10, help="返回的历史信号数量")
+    lookup_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务查询")
+    
+    # overview 命令
+    overview_parser = subparsers.add_parser("overview", help="查询股票池中每只股票的最新收盘价、股息率、PE/PB和最新信号")
+    overview_target = overview_parser.add_mutually_exclusive_group()
+    overview_target.add_argument("--stock", help="指定单个股票代码")
+    overview_target.add_argument("--pool", default="default_pool", help="指定股票池")
+    overview_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务查询")
+    
+    # factor-ranks 命令
+    ranks_parser = subparsers.add_parser("factor-ranks", help="计算或查询股息率、PE、PB 在全市场或股票池内的每日百分位排名")
+    ranks_parser.add_argument("--universe", default="market", help="排名范围，market 为全市场，其他为股票池名称")
+    ranks_parser.add_argument("--date", help="查询日期，默认为已计算的最新日期")
+    ranks_parser.add_argument("--stock", help="只查询指定股票")
+    ranks_parser.add_argument("--update", action="store_true", help="计算排名，默认增量更新到最新的K线日期")
+    ranks_parser.add_argument("--start-date", help="与 --update 一起使用，重算从该日期开始的排名")
+    ranks_parser.add_argument("--end-date", help="与 --update 一起使用，重算的结束日期")
+    ranks_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务执行")
+    
+    # signals 命令
+    signals_parser = subparsers.add_parser("signals", help="按策略、日期区间和股票池查询历史信号")
+    signals_target = signals_parser.add_mutually_exclusive_group()
+    signals_target.add_argument("--stock", help="指定单个股票代码")
+    signals_target.add_argument("--pool", help="指定股票池")
+    signals_parser.add_argument("--strategy", action="append", help="指定策略，可重复指定")
+    signals_parser.add_argument("--start-date", help="信号起始日期")
+    signals_parser.add_argument("--end-date", help="信号结束日期")
+    signals_parser.add_argument("--latest", type=int, help="返回每只股票最近的N个信号")
+    signals_parser.add_argument("--limit", type=int, help="最多返回的信号数量")
+    signals_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务查询")
+    
+    # export 命令
+    export_parser = subparsers.add_parser("export", help="导出股票和股票池快照，只发布内容变化的文件")
+    export_parser.add_argument("--pool", help="只导出指定股票池，默认导出所有股票池")
+    export_parser.add_argument("--date", help="快照日期，默认为今天")
+    export_parser.add_argument("--server", help="常驻服务地址，指定后由常驻服务导出")
+    
+    # serve 命令
+    serve_parser = subparsers.add_parser("serve", help="启动常驻服务")
+    serve_parser.add_argument("--address", help="监听地址，如 127.0.0.1:8765 或 unix:/tmp/highgividend.sock，默认取配置")
+    
+    # backtest 命令
+    backtest_parser = subparsers.add_parser("backtest", help="对历史信号执行回测")
+    backtest_parser.add_argument("--strategy", required=True, help="指定回测的策略名称")
+    backtest_parser.add_argument("--start-date", help="信号起始日期")
+    backtest_parser.add_argument("--end-date", help="信号结束日期")
+    backtest_parser.add_argument("--holding-days", type=int, help="最长持有交易日数")
+    backtest_parser.add_argument("--stop-loss", type=float, help="止损百分比，如 8 表示亏损8%%卖出")
+    backtest_parser.add_argument("--take-profit", type=float, help="止盈百分比，如 20 表示盈利20%%卖出")
+    backtest_parser.add_argument("--entry-price", choices=["next_open", "close"], help="买入价格：次日开盘或信号日收盘")
+    
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    主函数
+    
+    Args:
+        argv: 命令行参数（可选），默认取 sys.argv
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in COMMANDS:
+        load_command(args.command)(args)
+    else:
+        parser.print_help()
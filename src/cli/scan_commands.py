@@ -0,0 +1,139 @@
+"""
+扫描、查询、回溯和常驻服务命令
+
+指定 --server 时作为瘦客户端只依赖标准库，在当前进程中执行时才导入 pandas。
+"""
+import json
+from src.cli.config_commands import load_stock_pool
+from src.data.job_queue import JobQueue
+from src.service.client import ServiceClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger("main")
+
+def get_service(args):
+    """
+    获取执行命令的服务：指定 --server 时作为瘦客户端连接常驻服务，否则在当前进程中执行
+    
+    Args:
+        args: 命令行参数
+        
+    Returns:
+        ServiceClient 或 ScanService: 提供 call(command, **params) 接口的对象
+    """
+    if getattr(args, "server", None):
+        return ServiceClient(args.server)
+    # 只有在当前进程中执行时才导入 pandas
+    from src.service.server import ScanService
+    return ScanService("config.json")
+
+def scan(args):
+    """执行选股扫描，结果打印到控制台并保存到 scan_output_dir"""
+    strategy_names = [args.strategy] if args.strategy else None
+    result = get_service(args).call("scan", pool=args.pool, date=args.date, strategies=strategy_names,
+                                    processes=args.processes)
+    signals = result["signals"]
+    if not signals:
+        logger.info(f"{result['date']} 没有股票触发信号")
+    for signal in signals:
+        logger.info(f"{signal['stock_code']} {signal['date']} {signal['strategy_name']} "
+                    f"价格 {signal['price']}: {signal['description']}")
+    if result.get("output_path"):
+        logger.info(f"扫描结果已保存到 {result['output_path']}")
+
+def lookup(args):
+    """查询单只股票的最新行情和最近的历史信号"""
+    result = get_service(args).call("lookup", stock_code=args.stock, date=args.date, signal_limit=args.limit)
+    print(json.dumps(result, indent=4, ensure_ascii=False, default=str))
+
+def overview(args):
+    """查询股票池中每只股票的当前状态"""
+    result = get_service(args).call("overview", pool=args.pool, stock_codes=[args.stock] if args.stock else None)
+    print(json.dumps(result, indent=4, ensure_ascii=False, default=str))
+
+def factor_ranks(args):
+    """计算或查询每日因子百分位排名"""
+    service = get_service(args)
+    if args.update:
+        result = service.call("rank_factors", start_date=args.start_date, end_date=args.end_date)
+        logger.info(f"因子排名写入行数: {result}")
+        return
+    result = service.call("factor_ranks", universe=args.universe, date=args.date,
+                          stock_codes=[args.stock] if args.stock else None)
+    print(json.dumps(result, indent=4, ensure_ascii=False, default=str))
+
+def signals(args):
+    """按策略、日期区间和股票池查询历史信号"""
+    result = get_service(args).call(
+        "signals",
+        strategies=args.strategy,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        stock_codes=[args.stock] if args.stock else None,
+        pool=args.pool,
+        latest=args.latest,
+        limit=args.limit
+    )
+    print(json.dumps(result, indent=4, ensure_ascii=False, default=str))
+
+def backfill(args):
+    """对历史数据执行策略回溯，结果存入 historical_signals 表"""
+    if args.pool:
+        stock_codes = load_stock_pool(args.pool)
+    else:
+        stock_codes = [args.stock]
+    strategy_names = [args.strategy] if args.strategy else None
+    
+    # 队列模式：只负责把工作单元放入共享队列，由 worker 进程执行
+    if args.queue:
+        queue = JobQueue(args.queue)
+        payload = {"start_date": args.start_date, "end_date": args.end_date, "strategies": strategy_names}
+        count = queue.enqueue(args.queue_name, "backfill", stock_codes, payload)
+        logger.info(f"已将 {count} 个回溯单元放入队列 {args.queue_name}")
+        return
+    
+    get_service(args).call(
+        "backfill",
+        stock_codes=stock_codes,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        strategies=strategy_names,
+        processes=args.processes
+    )
+
+def export(args):
+    """导出股票和股票池快照，只发布内容变化的文件"""
+    result = get_service(args).call("export", pool=args.pool, date=args.date)
+    logger.info(f"快照版本 {result['version']}：变化 {len(result['changed'])} 个文件，"
+                f"未变化 {result['unchanged']} 个，删除 {len(result['removed'])} 个")
+
+def serve(args):
+    """启动常驻服务"""
+    from src.service.server import ScanService
+    ScanService("config.json").serve_forever(args.address)
+
+def intraday(args):
+    """盘中实时扫描：收盘后的触发价 + 全市场行情快照，只重新评估穿越触发价的股票"""
+    import os
+    from src.data.data_manager import DataManager
+    from src.data.db_handler import DatabaseHandler
+    from src.strategies.intraday import IntradayScanner
+    from src.strategies.strategy_engine import StrategyEngine
+    
+    db = DatabaseHandler("config.json")
+    db.initialize_tables()
+    scanner = IntradayScanner(StrategyEngine(DataManager(db)), [args.strategy] if args.strategy else None)
+    scanner.prepare(load_stock_pool(args.pool), args.date)
+    output_dir = db.config.get("scan_output_dir", "scan_results")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{scanner.date}_intraday.jsonl")
+    
+    def report(signals):
+        with open(output_path, "a", encoding="utf-8") as f:
+            for signal in signals.to_dict(orient="records"):
+                logger.info(f"盘中信号 {signal['stock_code']} {signal['strategy_name']} "
+                            f"价格 {signal['price']}: {signal['description']}")
+                f.write(json.dumps(signal, ensure_ascii=False, default=str) + "\n")
+    
+    count = scanner.run(args.interval, on_signals=report)
+    logger.info(f"盘中扫描结束，共确认 {count} 个信号")
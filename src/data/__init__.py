@@ -1,8 +1,28 @@
 """
 数据管理模块
 """
+import importlib
 
-from .data_manager import DataManager
-from .db_handler import DatabaseHandler
+# 导出名称 -> 所在子模块。首次访问时才导入子模块，
+# 只用到队列等轻量子模块的命令不会因此导入 pandas
+_EXPORTS = {
+    'DataManager': '.data_manager',
+    'DatabaseHandler': '.db_handler',
+    'UpdateJobRunner': '.update_jobs',
+    'UpdateJobStore': '.update_jobs',
+    'migrate_schema': '.compact_schema',
+    'SignalStore': '.signal_store',
+    'ChangeJournal': '.change_journal',
+    'LatestSnapshot': '.latest_snapshot',
+    'FactorRanks': '.factor_ranks',
+    'FreshnessPolicy': '.freshness',
+}
 
-__all__ = ['DataManager', 'DatabaseHandler'] 
\ No newline at end of file
+__all__ = ['DataManager', 'DatabaseHandler', 'UpdateJobRunner', 'UpdateJobStore', 'migrate_schema', 'SignalStore',
+           'ChangeJournal', 'LatestSnapshot', 'FactorRanks', 'FreshnessPolicy']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,91 @@
+"""
+复权计算模块 - 由不复权价格和累计后复权因子在读取时计算前复权/后复权价格
+
+daily_kline 只保存不复权价格，adjust_factors 只保存后复权因子的变化点。
+发生除权除息时只需新增一条因子记录，不需要重写历史价格。
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .asof import asof_positions, composite_keys
+
+# 复权类型：qfq 前复权，hfq 后复权，"" 不复权
+ADJUST_TYPES = ("qfq", "hfq", "")
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+def factors_on_dates(kline: pd.DataFrame, factors: pd.DataFrame) -> np.ndarray:
+    """
+    查找每根K线当日生效的后复权因子
+
+    Args:
+        kline: 包含 stock_code, date 的K线数据（可以包含多只股票）
+        factors: 包含 stock_code, date, hfq_factor 的因子变化点
+
+    Returns:
+        np.ndarray: 与 kline 行一一对应的因子，没有因子记录的股票为1.0
+    """
+    result = np.ones(len(kline))
+    if kline.empty or factors is None or factors.empty:
+        return result
+
+    # 把 (股票, 日期) 编码为一个整数键，一次二分查找处理所有股票
+    codes = np.unique(np.concatenate([
+        kline['stock_code'].to_numpy(dtype=object),
+        factors['stock_code'].to_numpy(dtype=object),
+    ]))
+    factor_code = np.searchsorted(codes, factors['stock_code'].to_numpy(dtype=object))
+    factor_key = composite_keys(factor_code, factors['date'])
+    order = np.argsort(factor_key, kind='stable')
+    factor_code, factor_key = factor_code[order], factor_key[order]
+    values = factors['hfq_factor'].to_numpy(dtype=float)[order]
+
+    kline_code = np.searchsorted(codes, kline['stock_code'].to_numpy(dtype=object))
+    kline_key = composite_keys(kline_code, kline['date'])
+    pos, same_code = asof_positions(factor_key, kline_key)
+
+    # 落在该股票第一条因子之前的K线使用该股票最早的因子
+    first = np.searchsorted(factor_code, kline_code, side='left')
+    has_factor = first < len(factor_code)
+    has_factor[has_factor] = factor_code[first[has_factor]] == kline_code[has_factor]
+    pos = np.where(same_code, pos, first)
+    result[has_factor] = values[pos[has_factor]]
+    return result
+
+
+def apply_adjust_factors(kline: pd.DataFrame,
+                         factors: Optional[pd.DataFrame],
+                         adjust: str = "qfq") -> pd.DataFrame:
+    """
+    对不复权K线应用复权因子
+
+    后复权价格 = 不复权价格 x 当日因子；
+    前复权价格 = 不复权价格 x 当日因子 / 该股票最新因子。
+
+    Args:
+        kline: 不复权K线数据（可以包含多只股票）
+        factors: 包含 stock_code, date, hfq_factor 的因子变化点
+        adjust: 复权类型 (qfq: 前复权, hfq: 后复权, "": 不复权)
+
+    Returns:
+        pd.DataFrame: 复权后的K线数据，adj_factor 列为当日生效的后复权因子
+    """
+    if adjust not in ADJUST_TYPES:
+        raise ValueError(f"未知的复权类型: {adjust}")
+    kline = kline.copy()
+    factor = factors_on_dates(kline, factors)
+    kline['adj_factor'] = factor
+    if adjust == "" or kline.empty:
+        return kline
+
+    scale = factor
+    if adjust == "qfq" and factors is not None and not factors.empty:
+        latest = factors.sort_values('date').groupby('stock_code')['hfq_factor'].last()
+        latest_factor = kline['stock_code'].map(latest).fillna(1.0).to_numpy(dtype=float)
+        scale = factor / latest_factor
+    for column in PRICE_COLUMNS:
+        if column in kline.columns:
+            kline[column] = kline[column].astype(float) * scale
+    return kline
@@ -0,0 +1,86 @@
+"""
+as-of 查找模块 - 按 (股票, 日期) 整数键一次处理多只股票的 as-of 取值和近一年滚动求和
+
+把 (股票序号, 日期天数) 编码为一个整数键后，多只股票的数据可以一次排序、一次二分查找：
+as-of 取值找到每个键当天或之前同一只股票的最新一行，滚动求和用累计和之差求 (日期-N天, 日期] 的合计。
+因子排名、复权因子、最新快照和策略的动态股息率共用这里的键编码和近一年窗口定义。
+"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# 近一年分红的回看天数，窗口为 (日期 - TTM_WINDOW_DAYS 天, 日期]，不随闰年变化
+TTM_WINDOW_DAYS = 365
+
+# 合成整数键时股票序号的乘数，需大于任何日期的天数（2100年约为47000）
+KEY_STRIDE = 1 << 20
+
+
+def day_numbers(dates: pd.Series) -> np.ndarray:
+    """
+    将 'YYYY-MM-DD' 日期转换为自1970-01-01起的天数
+
+    Args:
+        dates: 日期序列
+
+    Returns:
+        np.ndarray: 天数数组
+    """
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def composite_keys(code_ids: np.ndarray, dates: pd.Series) -> np.ndarray:
+    """
+    把 (股票序号, 日期) 编码为整数键，按键排序即按股票、再按日期排序
+
+    Args:
+        code_ids: 每行的股票序号（非负整数）
+        dates: 每行的日期
+
+    Returns:
+        np.ndarray: int64 键数组
+    """
+    return np.asarray(code_ids, dtype=np.int64) * KEY_STRIDE + day_numbers(dates)
+
+
+def asof_positions(sorted_keys: np.ndarray, query_keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    为每个查询键找到同一只股票当天或之前的最新一行
+
+    Args:
+        sorted_keys: 升序排列的数据键
+        query_keys: 查询键
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (数据行位置, 是否找到)，没有找到的位置为0
+    """
+    query_keys = np.asarray(query_keys, dtype=np.int64)
+    if not len(sorted_keys):
+        return np.zeros(len(query_keys), dtype=np.int64), np.zeros(len(query_keys), dtype=bool)
+    index = np.maximum(np.searchsorted(sorted_keys, query_keys, side='right') - 1, 0)
+    matched = (sorted_keys[index] // KEY_STRIDE == query_keys // KEY_STRIDE) & (sorted_keys[index] <= query_keys)
+    return index, matched
+
+
+def trailing_sums(sorted_keys: np.ndarray,
+                  amounts: np.ndarray,
+                  query_keys: np.ndarray,
+                  window_days: int = TTM_WINDOW_DAYS) -> np.ndarray:
+    """
+    计算每个查询键 (日期 - window_days 天, 日期] 内同一只股票的合计，如近一年每股分红
+
+    Args:
+        sorted_keys: 升序排列的数据键（如除权除息日）
+        amounts: 与 sorted_keys 对应的数值，NaN 视为0
+        query_keys: 查询键
+        window_days: 回看天数
+
+    Returns:
+        np.ndarray: 与 query_keys 等长的合计
+    """
+    query_keys = np.asarray(query_keys, dtype=np.int64)
+    cumulative = np.r_[0.0, np.cumsum(np.nan_to_num(np.asarray(amounts, dtype=float)))]
+    upper = np.searchsorted(sorted_keys, query_keys, side='right')
+    lower = np.searchsorted(sorted_keys, query_keys - window_days, side='right')
+    return cumulative[upper] - cumulative[lower]
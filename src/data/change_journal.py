@@ -0,0 +1,157 @@
+"""
+变更日志模块 - 记录每次写入影响的 (表, 股票, 日期区间)，供下游只重算变化的股票
+
+DatabaseHandler 的写入（insert_dataframe / upsert_dataframe）和直接写表的模块在同一事务中
+向 change_journal 追加记录，每条记录有单调递增的版本号。下游（衍生K线、快照导出、常驻服务的缓存）
+记住自己处理到的版本号 V，之后用 dirty_since(V) 取出变化的股票和日期区间，只重算这些股票。
+每股一行的 latest_snapshot 表也在记录变更时同步更新。
+"""
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+# 按顺序查找的日期列，第一个存在的列决定变更区间
+JOURNAL_DATE_COLUMNS = ('date', 'ex_dividend_date', 'report_date')
+
+_DIRTY_COLUMNS = ['table_name', 'stock_code', 'min_date', 'max_date', 'version']
+
+
+def summarize_changes(df: pd.DataFrame,
+                      date_column: Optional[str] = None) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    按股票汇总写入数据的日期区间
+
+    Args:
+        df: 写入的数据，必须包含 stock_code 列
+        date_column: 日期列（可选），默认取 JOURNAL_DATE_COLUMNS 中第一个存在的列
+
+    Returns:
+        List[Tuple[str, Optional[str], Optional[str]]]: (股票代码, 最早日期, 最晚日期)，没有日期列时日期为 None
+    """
+    if df is None or df.empty or 'stock_code' not in df.columns:
+        return []
+    if date_column is None:
+        date_column = next((column for column in JOURNAL_DATE_COLUMNS if column in df.columns), None)
+    if date_column is None:
+        return [(code, None, None) for code in df['stock_code'].dropna().unique()]
+    grouped = df.groupby('stock_code', sort=True)[date_column]
+    lows, highs = grouped.min(), grouped.max()
+    return [(code, _date_text(lows[code]), _date_text(highs[code])) for code in lows.index]
+
+
+def _date_text(value) -> Optional[str]:
+    """日期转换为 'YYYY-MM-DD'，空值为 None"""
+    return None if pd.isna(value) else str(value)[:10]
+
+
+class ChangeJournal:
+    """变更日志类，负责记录写入和查询某个版本之后变化的股票"""
+
+    def __init__(self, db):
+        """
+        初始化变更日志
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+
+    def record_ranges(self, table_name: str, ranges: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> None:
+        """
+        追加变更记录并更新最新快照，不提交事务（与数据写入在同一事务中提交）
+
+        Args:
+            table_name: 被写入的表
+            ranges: (股票代码, 最早日期, 最晚日期) 列表
+        """
+        ranges = list(ranges)
+        rows = [(table_name, code, low, high) for code, low, high in ranges]
+        if rows:
+            self.db.conn.executemany(
+                "INSERT INTO change_journal (table_name, stock_code, min_date, max_date) VALUES (?, ?, ?, ?)", rows
+            )
+            self.db.latest_snapshot.apply(table_name, ranges)
+
+    def record(self, table_name: str, df: pd.DataFrame, date_column: Optional[str] = None) -> None:
+        """
+        按写入的数据追加变更记录，不提交事务
+
+        Args:
+            table_name: 被写入的表
+            df: 写入的数据
+            date_column: 日期列（可选）
+        """
+        self.record_ranges(table_name, summarize_changes(df, date_column))
+
+    def current_version(self) -> int:
+        """
+        获取最新的版本号
+
+        Returns:
+            int: 最新版本号，没有记录时为0
+        """
+        row = self.db.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").fetchone()
+        return int(row[0]) if row else 0
+
+    def dirty_since(self,
+                    version: int,
+                    tables: Optional[List[str]] = None,
+                    stock_codes: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        获取某个版本之后变化的股票和日期区间，同一 (表, 股票) 的多条记录合并
+
+        Args:
+            version: 下游已处理到的版本号
+            tables: 只看这些表（可选）
+            stock_codes: 只看这些股票（可选）
+
+        Returns:
+            pd.DataFrame: 包含 table_name, stock_code, min_date, max_date, version（最新一条记录的版本号）
+        """
+        conditions, params = ["version > ?"], [version]
+        if tables:
+            conditions.append(f"table_name IN ({','.join('?' * len(tables))})")
+            params.extend(tables)
+        if stock_codes:
+            conditions.append(f"stock_code IN ({','.join('?' * len(stock_codes))})")
+            params.extend(stock_codes)
+        df = self.db.execute_query(f"""
+            SELECT table_name, stock_code, MIN(min_date) AS min_date, MAX(max_date) AS max_date,
+                   MAX(version) AS version
+            FROM change_journal
+            WHERE {' AND '.join(conditions)}
+            GROUP BY table_name, stock_code
+            ORDER BY table_name, stock_code
+        """, tuple(params))
+        return df if df is not None else pd.DataFrame(columns=_DIRTY_COLUMNS)
+
+    def dirty_stocks(self, version: int, tables: Optional[List[str]] = None) -> List[str]:
+        """
+        获取某个版本之后有变化的股票
+
+        Args:
+            version: 下游已处理到的版本号
+            tables: 只看这些表（可选）
+
+        Returns:
+            List[str]: 排序后的股票代码
+        """
+        return sorted(self.dirty_since(version, tables)['stock_code'].unique())
+
+    def prune(self, before_version: int) -> int:
+        """
+        删除不晚于某个版本的记录（所有下游都已处理过）
+
+        Args:
+            before_version: 版本号
+
+        Returns:
+            int: 删除的记录数
+        """
+        try:
+            cursor = self.db.conn.execute("DELETE FROM change_journal WHERE version <= ?", (before_version,))
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"清理变更日志失败: {str(e)}")
+        return cursor.rowcount
@@ -0,0 +1,376 @@
+"""
+紧凑表结构模块 - 股票代码字典、整数日期和 WITHOUT ROWID 聚簇表
+
+紧凑表结构下，股票数据存放在 <表名>_compact 表中：
+    - stock_code 存为 stocks 字典表中的整数 stock_id
+    - 日期存为自1970-01-01起的天数
+    - 以 (stock_id, 日期) 为主键的表使用 WITHOUT ROWID，数据按主键聚簇存储
+原表名保留为视图，视图上的 INSTEAD OF 触发器把插入、更新和删除转换到存储表，
+因此现有的查询和写入代码不需要修改。表结构版本记录在 PRAGMA user_version 中。
+"""
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+from ..utils.logger import setup_logger
+from .signal_store import ensure_unique_key
+
+# 紧凑表结构的版本号（PRAGMA user_version），0 表示原始表结构
+COMPACT_SCHEMA_VERSION = 1
+
+# julianday('1970-01-01')，天数 = julianday(日期) - 该值
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+_KLINE_COLUMNS = [
+    ('stock_code', 'stock'), ('date', 'date'), ('open', 'REAL'), ('high', 'REAL'), ('low', 'REAL'),
+    ('close', 'REAL'), ('volume', 'INTEGER'), ('amount', 'REAL'), ('adj_factor', 'REAL'),
+]
+
+# 表名 -> 列定义和主键。列类型 stock 存为股票ID，date 存为天数，其余为 SQLite 类型
+COMPACT_TABLES: Dict[str, Dict] = {
+    'daily_kline': {'columns': _KLINE_COLUMNS, 'primary_key': ['stock_code', 'date']},
+    'weekly_kline': {'columns': _KLINE_COLUMNS, 'primary_key': ['stock_code', 'date']},
+    'monthly_kline': {'columns': _KLINE_COLUMNS, 'primary_key': ['stock_code', 'date']},
+    'adjust_factors': {
+        'columns': [('stock_code', 'stock'), ('date', 'date'), ('hfq_factor', 'REAL NOT NULL')],
+        'primary_key': ['stock_code', 'date'],
+    },
+    'dividend_data': {
+        'columns': [
+            ('stock_code', 'stock'), ('report_date', 'date'), ('ex_dividend_date', 'date'),
+            ('dividend_per_share_pre_tax', 'REAL'), ('dividend_yield', 'REAL'),
+        ],
+        'primary_key': ['stock_code', 'ex_dividend_date'],
+    },
+    'financial_summary': {
+        'columns': [
+            ('stock_code', 'stock'), ('date', 'date'), ('pe_ttm', 'REAL'), ('pb_mrq', 'REAL'),
+            ('market_cap', 'REAL'), ('circulating_market_cap', 'REAL'),
+        ],
+        'primary_key': ['stock_code', 'date'],
+    },
+    'historical_signals': {
+        'columns': [
+            ('id', 'INTEGER PRIMARY KEY AUTOINCREMENT'), ('stock_code', 'stock'), ('date', 'date'),
+            ('strategy_name', 'TEXT NOT NULL'), ('signal_type', 'TEXT NOT NULL'), ('price', 'REAL'),
+            ('description', 'TEXT'),
+        ],
+        'primary_key': ['id'],
+        'unique': ['stock_code', 'date', 'strategy_name'],
+        'indexes': {
+            'strategy_cover': ['strategy_name', 'date', 'stock_code', 'signal_type'],
+        },
+    },
+}
+
+# 被唯一键和覆盖索引取代的旧索引
+_SUPERSEDED_INDEXES = ['idx_historical_signals_compact_stock_date', 'idx_historical_signals_compact_strategy_date']
+
+logger = setup_logger(__name__)
+
+
+def _storage_name(table: str) -> str:
+    """存储表名"""
+    return f"{table}_compact"
+
+
+def _storage_column(column: str, column_type: str) -> str:
+    """存储表中的列名：股票代码列存为 stock_id"""
+    return 'stock_id' if column_type == 'stock' else column
+
+
+def _to_storage(column: str, column_type: str, row: str) -> str:
+    """
+    把视图行（NEW/OLD）中的值转换为存储值的 SQL 表达式
+
+    Args:
+        column: 列名
+        column_type: 列类型
+        row: NEW 或 OLD
+
+    Returns:
+        str: SQL 表达式
+    """
+    if column_type == 'stock':
+        return f"(SELECT stock_id FROM stocks WHERE stock_code = {row}.{column})"
+    if column_type == 'date':
+        return f"CAST(julianday({row}.{column}) - {_UNIX_EPOCH_JULIAN_DAY} AS INTEGER)"
+    return f"{row}.{column}"
+
+
+def _from_storage(column: str, column_type: str) -> str:
+    """
+    把存储值转换为原始表结构中的值的 SQL 表达式
+
+    Args:
+        column: 列名
+        column_type: 列类型
+
+    Returns:
+        str: SQL 表达式
+    """
+    if column_type == 'stock':
+        return "s.stock_code"
+    if column_type == 'date':
+        return f"date(t.{column} + {_UNIX_EPOCH_JULIAN_DAY})"
+    return f"t.{column}"
+
+
+def compact_schema_statements(table: str) -> List[str]:
+    """
+    生成单个表的紧凑存储表、索引、兼容视图和触发器的 SQL
+
+    Args:
+        table: 原始表名
+
+    Returns:
+        List[str]: SQL 语句列表
+    """
+    spec = COMPACT_TABLES[table]
+    columns = spec['columns']
+    types = dict(columns)
+    storage = _storage_name(table)
+    primary_key = spec['primary_key']
+    clustered = primary_key != ['id']
+
+    definitions = []
+    for column, column_type in columns:
+        if column_type == 'stock':
+            definitions.append("stock_id INTEGER NOT NULL")
+        elif column_type == 'date':
+            definitions.append(f"{column} INTEGER" + (" NOT NULL" if column in primary_key else ""))
+        else:
+            definitions.append(f"{column} {column_type}")
+    if clustered:
+        key = ", ".join(_storage_column(column, types[column]) for column in primary_key)
+        definitions.append(f"PRIMARY KEY ({key})")
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {storage} ({', '.join(definitions)})" + (" WITHOUT ROWID" if clustered else "")
+    ]
+    if 'unique' in spec:
+        key = ", ".join(_storage_column(column, types[column]) for column in spec['unique'])
+        statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{storage}_key ON {storage} ({key})")
+    for index_name, index_columns in spec.get('indexes', {}).items():
+        key = ", ".join(_storage_column(column, types[column]) for column in index_columns)
+        statements.append(f"CREATE INDEX IF NOT EXISTS idx_{storage}_{index_name} ON {storage} ({key})")
+
+    select = ", ".join(f"{_from_storage(column, column_type)} AS {column}" for column, column_type in columns)
+    statements.append(
+        f"CREATE VIEW IF NOT EXISTS {table} AS SELECT {select} "
+        f"FROM {storage} t JOIN stocks s ON s.stock_id = t.stock_id"
+    )
+
+    storage_columns = ", ".join(_storage_column(column, column_type) for column, column_type in columns)
+    new_values = ", ".join(_to_storage(column, column_type, "NEW") for column, column_type in columns)
+    match_old = " AND ".join(
+        f"{_storage_column(column, types[column])} = {_to_storage(column, types[column], 'OLD')}"
+        for column in primary_key
+    )
+    assignments = ", ".join(
+        f"{_storage_column(column, column_type)} = {_to_storage(column, column_type, 'NEW')}"
+        for column, column_type in columns
+    )
+    # 新股票先写入字典表；用 WHERE NOT EXISTS 而不是 INSERT OR IGNORE，
+    # 避免外层 INSERT OR REPLACE 的冲突策略替换已有的 stock_id
+    register_stock = (
+        "INSERT INTO stocks (stock_code) SELECT NEW.stock_code "
+        "WHERE NOT EXISTS (SELECT 1 FROM stocks WHERE stock_code = NEW.stock_code);"
+    )
+    statements.extend([
+        f"CREATE TRIGGER IF NOT EXISTS {table}_insert INSTEAD OF INSERT ON {table} BEGIN "
+        f"{register_stock} "
+        f"INSERT INTO {storage} ({storage_columns}) VALUES ({new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_update INSTEAD OF UPDATE ON {table} BEGIN "
+        f"{register_stock} "
+        f"UPDATE {storage} SET {assignments} WHERE {match_old}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_delete INSTEAD OF DELETE ON {table} BEGIN "
+        f"DELETE FROM {storage} WHERE {match_old}; END",
+    ])
+    return statements
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    获取表结构版本
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        int: PRAGMA user_version
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def get_object_type(conn: sqlite3.Connection, name: str) -> Optional[str]:
+    """
+    获取数据库对象的类型
+
+    Args:
+        conn: 数据库连接
+        name: 对象名称
+
+    Returns:
+        Optional[str]: table、view 等，不存在时为 None
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def create_compact_schema_dictionary(cursor: sqlite3.Cursor) -> None:
+    """
+    创建股票代码字典表
+
+    Args:
+        cursor: 数据库游标
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stocks (
+            stock_id INTEGER PRIMARY KEY,
+            stock_code TEXT NOT NULL UNIQUE
+        )
+    """)
+
+
+def create_compact_schema(cursor: sqlite3.Cursor) -> None:
+    """
+    创建紧凑表结构（已存在的对象保持不变）并记录版本号
+
+    Args:
+        cursor: 数据库游标
+    """
+    create_compact_schema_dictionary(cursor)
+    for index_name in _SUPERSEDED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    for table, spec in COMPACT_TABLES.items():
+        storage = _storage_name(table)
+        if 'unique' in spec and get_object_type(cursor.connection, storage) == "table":
+            # 唯一键之前写入的存储表可能有重复行，先去重再建唯一索引
+            types = dict(spec['columns'])
+            ensure_unique_key(cursor, storage, f"idx_{storage}_key",
+                              [_storage_column(column, types[column]) for column in spec['unique']])
+        for statement in compact_schema_statements(table):
+            cursor.execute(statement)
+    cursor.execute(f"PRAGMA user_version = {COMPACT_SCHEMA_VERSION}")
+
+
+def _convert_to_compact(cursor: sqlite3.Cursor, table: str) -> None:
+    """
+    把原始表的数据转换到紧凑存储表，完成后删除原始表
+
+    Args:
+        cursor: 数据库游标
+        table: 原始表名
+    """
+    legacy = f"{table}_legacy"
+    columns = COMPACT_TABLES[table]['columns']
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    for statement in compact_schema_statements(table):
+        cursor.execute(statement)
+    cursor.execute(f"""
+        INSERT INTO stocks (stock_code)
+        SELECT DISTINCT stock_code FROM {legacy}
+        WHERE stock_code NOT IN (SELECT stock_code FROM stocks)
+    """)
+    storage_columns = ", ".join(_storage_column(column, column_type) for column, column_type in columns)
+    values = ", ".join(
+        "s.stock_id" if column_type == 'stock' else _to_storage(column, column_type, "l")
+        for column, column_type in columns
+    )
+    # 原始表中同一天可能有带时间和不带时间的两种日期写法，转换后保留最后一条
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {_storage_name(table)} ({storage_columns})
+        SELECT {values} FROM {legacy} l JOIN stocks s ON s.stock_code = l.stock_code
+    """)
+    cursor.execute(f"DROP TABLE {legacy}")
+
+
+def _convert_to_legacy(cursor: sqlite3.Cursor, table: str, legacy_sql: Dict[str, List[str]]) -> None:
+    """
+    把紧凑存储表的数据转换回原始表，完成后删除视图、触发器和存储表
+
+    Args:
+        cursor: 数据库游标
+        table: 原始表名
+        legacy_sql: 原始表名 -> 建表和建索引语句
+    """
+    columns = ", ".join(column for column, _ in COMPACT_TABLES[table]['columns'])
+    cursor.execute(f"CREATE TEMP TABLE {table}_rows AS SELECT {columns} FROM {table}")
+    cursor.execute(f"DROP VIEW {table}")
+    cursor.execute(f"DROP TABLE {_storage_name(table)}")
+    for statement in legacy_sql[table]:
+        cursor.execute(statement)
+    cursor.execute(f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM temp.{table}_rows")
+    cursor.execute(f"DROP TABLE temp.{table}_rows")
+
+
+def legacy_table_sql() -> Dict[str, List[str]]:
+    """
+    获取原始表结构的建表和建索引语句
+
+    Returns:
+        Dict[str, List[str]]: 表名 -> SQL 语句列表
+    """
+    # 在内存数据库中按原始表结构初始化一次，直接读取建表语句，避免维护两份表结构
+    from .db_handler import DatabaseHandler
+    template = DatabaseHandler({"database_path": ":memory:"})
+    template.initialize_tables()
+    rows = template.conn.execute(
+        "SELECT tbl_name, sql FROM sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+        "ORDER BY type DESC"
+    ).fetchall()
+    template.close()
+    statements: Dict[str, List[str]] = {}
+    for table, sql in rows:
+        statements.setdefault(table, []).append(sql)
+    return statements
+
+
+def migrate_schema(db, target: str = "compact", vacuum: bool = True) -> Dict[str, int]:
+    """
+    在原始表结构和紧凑表结构之间迁移，整个迁移在一个事务中完成
+
+    Args:
+        db: DatabaseHandler实例
+        target: 目标表结构 (compact 或 legacy)
+        vacuum: 迁移后是否执行 VACUUM 回收空间
+
+    Returns:
+        Dict[str, int]: 迁移前后的数据库文件大小（字节），内存数据库为0
+    """
+    if target not in ("compact", "legacy"):
+        raise ValueError(f"未知的表结构: {target}")
+    db.initialize_tables()
+    conn = db.conn
+    path = db.config["database_path"]
+    size_before = os.path.getsize(path) if os.path.exists(path) else 0
+    current = "compact" if get_schema_version(conn) >= COMPACT_SCHEMA_VERSION else "legacy"
+    if current == target:
+        logger.info(f"数据库已经是{target}表结构，无需迁移")
+        return {"size_before": size_before, "size_after": size_before}
+
+    legacy_sql = legacy_table_sql() if target == "legacy" else {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        if target == "compact":
+            create_compact_schema_dictionary(cursor)
+            for table in COMPACT_TABLES:
+                _convert_to_compact(cursor, table)
+            cursor.execute(f"PRAGMA user_version = {COMPACT_SCHEMA_VERSION}")
+        else:
+            for table in COMPACT_TABLES:
+                _convert_to_legacy(cursor, table, legacy_sql)
+            cursor.execute("DROP TABLE stocks")
+            cursor.execute("PRAGMA user_version = 0")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"迁移到{target}表结构失败: {str(e)}")
+
+    if vacuum:
+        conn.execute("VACUUM")
+    size_after = os.path.getsize(path) if os.path.exists(path) else 0
+    logger.info(f"已迁移到{target}表结构，数据库大小 {size_before} -> {size_after} 字节")
+    return {"size_before": size_before, "size_after": size_after}
+
@@ -2,14 +2,32 @@
 数据管理模块 - 负责股票数据的获取、存储和更新
 """
 import logging
-import time
 from typing import List, Optional, Dict, Any, Union
 import pandas as pd
-import akshare as ak
 from datetime import datetime, timedelta
 
+from .adjustment import ADJUST_TYPES, apply_adjust_factors
+from .asof import TTM_WINDOW_DAYS
 from .db_handler import DatabaseHandler
+from .fetch_cache import NegativeCache, SingleFlight
+from .freshness import FreshnessPolicy
+from .resilience import CircuitOpenError, RetryController
+from .trading_calendar import DEFAULT_MAX_BRIDGE_DAYS, GAP_MISSING, GAP_SUSPENDED, TradingCalendar
 from ..utils.logger import setup_logger
+from ..utils.plugins import FETCHER_ENTRY_POINT_GROUP, load_plugins
+
+def _akshare():
+    """
+    延迟导入 akshare
+
+    akshare 的导入需要数秒，只有真正需要从网络获取数据时才导入，
+    只读取数据库的命令不必支付这部分开销。
+
+    Returns:
+        module: akshare 模块
+    """
+    import akshare
+    return akshare
 
 class DataManager:
     """数据管理类，负责处理所有数据相关的操作"""
@@ -25,127 +43,529 @@ class DataManager:
             self.db = config_or_db
         else:
             self.db = DatabaseHandler(config_or_db)
+        self.calendar = TradingCalendar(self.db)
+        # 数据源请求的退避重试、按接口熔断和错误预算
+        self.retry = RetryController.from_config(self.db.config.get("data_source", {}))
+        # data_source.fetch_processes > 0 时在 worker 进程中调用 akshare，首次调用时创建
+        self.fetch_pool = None
+        # 数据源返回空结果的股票在有效期内不再请求；相同的并发请求只发出一次
+        self.negative_cache = NegativeCache(self.db, self.db.config.get("negative_cache_ttl_hours"))
+        self.single_flight = SingleFlight()
+        # 按数据类型的新鲜度策略跳过不会有新数据的请求
+        self.freshness = FreshnessPolicy(self.db, self.db.config.get("freshness"), self.calendar)
+        # 成功完成的数据源请求次数，用于判断一次更新是否真的请求了数据源
+        self.fetch_count = 0
+        # 并发获取数据的 worker 数，决定HTTP连接池大小，为 None 时取 data_source.http_pool_size
+        self.http_workers: Optional[int] = None
         self.logger = setup_logger(__name__)
         
+    def _akshare(self):
+        """
+        获取 akshare 模块，首次调用时安装共享的HTTP连接池
+
+        连接池按 data_source 中的代理、超时和连接数配置，akshare 的请求在同一进程内复用连接。
+
+        Returns:
+            module: akshare 模块
+        """
+        # 在方法内导入，只读取数据库时不导入 requests
+        from .http_pool import install_session_pool
+        install_session_pool(self.db.config.get("data_source", {}), self.http_workers)
+        return _akshare()
+
     def initialize_database(self) -> None:
         """初始化数据库表结构"""
         self.db.initialize_tables()
         
-    def _fetch_from_akshare(self, func, *args, **kwargs) -> pd.DataFrame:
+    def _fetch_from_akshare(self, endpoint: str, *args, **kwargs) -> pd.DataFrame:
         """
-        从akshare获取数据，包含重试机制
+        从akshare获取数据，失败时指数退避重试，接口熔断时不发出请求
+
+        相同 (接口, 参数) 的并发请求合并为一次，共享结果的调用方各自得到一份副本。
         
         Args:
-            func: akshare函数
+            endpoint: akshare函数名，同时作为熔断器的接口名称
             *args: 函数参数
             **kwargs: 函数关键字参数
             
         Returns:
             DataFrame: 获取的数据
+
+        Raises:
+            CircuitOpenError: 接口已熔断
         """
-        max_retries = self.db.config.get("data_source", {}).get("akshare_max_retries", 3)
-        retry_delay = self.db.config.get("data_source", {}).get("akshare_retry_delay_seconds", 10)
-        
-        for attempt in range(max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    self.logger.error(f"从akshare获取数据失败: {str(e)}")
-                    raise
-                self.logger.warning(f"第{attempt + 1}次尝试失败，{retry_delay}秒后重试")
-                time.sleep(retry_delay)
-                
-    def get_stock_daily_kline(self, stock_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        key = (endpoint, args, tuple(sorted(kwargs.items())))
+        df, shared = self.single_flight.do(key, self.retry.call, endpoint, self._call_akshare,
+                                           endpoint, *args, **kwargs)
+        self.fetch_count += 1
+        return df.copy() if shared and isinstance(df, pd.DataFrame) else df
+
+    def _call_akshare(self, endpoint: str, *args, **kwargs) -> pd.DataFrame:
         """
-        获取股票日K线数据（使用 akshare_rules.md 推荐接口）
+        调用一次akshare函数：配置了 fetch_processes 时在 worker 进程中执行并强制超时，否则在当前进程中执行
+
+        Args:
+            endpoint: akshare函数名
+            *args: 函数参数
+            **kwargs: 函数关键字参数
+
+        Returns:
+            DataFrame: 获取的数据
         """
-        query = """
-            SELECT * FROM daily_kline 
-            WHERE stock_code = ? AND date BETWEEN ? AND ?
-            ORDER BY date
+        data_source = self.db.config.get("data_source", {})
+        if data_source.get("fetch_processes", 0) > 0:
+            if self.fetch_pool is None:
+                from .fetch_pool import ProcessFetchPool
+                self.fetch_pool = ProcessFetchPool.from_config(data_source)
+            return self.fetch_pool.call(endpoint, *args, **kwargs)
+        return getattr(self._akshare(), endpoint)(*args, **kwargs)
+
+    def close_fetch_pool(self) -> None:
+        """结束 worker 进程（如果有）"""
+        if self.fetch_pool is not None:
+            self.fetch_pool.close()
+            self.fetch_pool = None
+
+    def get_stock_daily_kline(self,
+                              stock_code: str,
+                              start_date: str,
+                              end_date: str,
+                              adjust: str = "qfq",
+                              raise_errors: bool = False) -> pd.DataFrame:
         """
-        df = self.db.execute_query(query, (stock_code, start_date, end_date))
+        获取股票日K线数据（使用 akshare_rules.md 推荐接口）
+
+        数据库中只保存不复权价格，复权价格在读取时由 adjust_factors 表中的后复权因子计算，
+        因此除权除息后只需要更新因子表，不必重新获取历史价格。
+        本地有交易日历时，数据库中缺失的交易日（非停牌）会先按区间补齐。
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            adjust: 复权类型 (qfq: 前复权, hfq: 后复权, "": 不复权)
+            raise_errors: 获取失败时是否抛出异常（默认记录日志并返回空DataFrame）
+        """
+        if adjust not in ADJUST_TYPES:
+            raise ValueError(f"未知的复权类型: {adjust}")
+        if self.db.legacy_qfq_stocks([stock_code]):
+            # 旧版本按前复权保存的K线再乘以复权因子会被复权两次，先重新获取为不复权价格
+            try:
+                self.migrate_qfq_kline([stock_code], raise_errors=True)
+            except Exception as e:
+                self.logger.error(f"{stock_code}的日K线仍为前复权价格且重新获取失败，不能读取: {str(e)}")
+                if raise_errors:
+                    raise
+                return pd.DataFrame()
+        df = self._query_daily_kline(stock_code, start_date, end_date)
         if df is not None and not df.empty:
             self.logger.info(f"从数据库获取到{stock_code}的日K线数据")
-            return df
+            gaps = self.find_kline_gaps([stock_code], start_date, end_date)
+            plan = self.calendar.plan_refetch(gaps)
+            if not plan.empty:
+                try:
+                    for row in plan.itertuples(index=False):
+                        self._refetch_daily_kline(stock_code, row.start_date, row.end_date)
+                except Exception as e:
+                    self.logger.error(f"补齐{stock_code}的日K线缺口失败: {str(e)}")
+                    if raise_errors:
+                        raise
+                df = self._query_daily_kline(stock_code, start_date, end_date)
+            return apply_adjust_factors(df, self.get_adjust_factors(stock_code), adjust)
         self.logger.info(f"从akshare获取{stock_code}的日K线数据")
         try:
-            # 去掉市场前缀
-            symbol = stock_code[2:]
-            # 确保日期格式正确
-            start_date = pd.to_datetime(start_date).strftime('%Y%m%d')
-            end_date = pd.to_datetime(end_date).strftime('%Y%m%d')
-            
-            df = ak.stock_zh_a_hist(
-                symbol=symbol,
-                period="daily",
-                start_date=start_date,
-                end_date=end_date,
-                adjust="qfq"
-            )
-            self.logger.info(f"akshare返回日K线数据行数: {len(df)}")
+            df = self._fetch_daily_kline(stock_code, start_date, end_date)
             if df.empty:
-                self.logger.warning(f"akshare返回的日K线数据为空")
                 return pd.DataFrame()
-                
-            # 重命名列
-            df = df.rename(columns={
-                '日期': 'date',
-                '开盘': 'open',
-                '最高': 'high',
-                '最低': 'low',
-                '收盘': 'close',
-                '成交量': 'volume',
-                '成交额': 'amount',
-            })
-            
-            # 确保日期格式统一
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-            df['stock_code'] = stock_code
-            df['adj_factor'] = 1.0
-            
-            # 只保留需要的字段
-            keep_cols = ['stock_code', 'date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'adj_factor']
-            df = df[[col for col in keep_cols if col in df.columns]]
-            
-            # 过滤主键为空的行
-            df = df[df['date'].notna()]
-            if df.empty:
-                self.logger.warning(f"过滤后的日K线数据为空，未插入数据库")
-                return pd.DataFrame()
-                
             self.db.insert_dataframe('daily_kline', df)
-            return df
+            factors = self.get_adjust_factors(stock_code)
+            if factors.empty and not self.negative_cache.is_fresh('adjust_factors', stock_code):
+                factors = self.refresh_adjust_factors(stock_code)
+            return apply_adjust_factors(df, factors, adjust)
         except Exception as e:
             self.logger.error(f"从akshare获取{stock_code}的日K线数据失败: {str(e)}")
+            if raise_errors:
+                raise
             return pd.DataFrame()
+
+    def _query_daily_kline(self, stock_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        从数据库读取不复权日K线
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            pd.DataFrame: 按日期升序的日K线
+        """
+        return self.db.query_kline(
+            'daily_kline', "stock_code = ? AND date BETWEEN ? AND ?", (stock_code, start_date, end_date),
+            start_date=start_date, end_date=end_date, order_by="date"
+        )
+
+    def _fetch_daily_kline(self, stock_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        从akshare获取不复权日K线（不写入数据库）
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            pd.DataFrame: 与 daily_kline 表列一致的日K线，数据源没有数据时为空
+        """
+        # 去掉市场前缀
+        symbol = stock_code[2:]
+        # 确保日期格式正确
+        start_date = pd.to_datetime(start_date).strftime('%Y%m%d')
+        end_date = pd.to_datetime(end_date).strftime('%Y%m%d')
+        
+        # 获取不复权价格，复权在读取时计算
+        df = self._fetch_from_akshare(
+            'stock_zh_a_hist',
+            symbol=symbol,
+            period="daily",
+            start_date=start_date,
+            end_date=end_date,
+            adjust=""
+        )
+        self.logger.info(f"akshare返回日K线数据行数: {len(df)}")
+        if df.empty:
+            self.logger.warning(f"akshare返回的日K线数据为空")
+            return pd.DataFrame()
+            
+        # 重命名列
+        df = df.rename(columns={
+            '日期': 'date',
+            '开盘': 'open',
+            '最高': 'high',
+            '最低': 'low',
+            '收盘': 'close',
+            '成交量': 'volume',
+            '成交额': 'amount',
+        })
+        
+        # 确保日期格式统一
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        df['stock_code'] = stock_code
+        df['adj_factor'] = None
+        
+        # 只保留需要的字段
+        keep_cols = ['stock_code', 'date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'adj_factor']
+        df = df[[col for col in keep_cols if col in df.columns]]
+        
+        # 过滤主键为空的行
+        df = df[df['date'].notna()]
+        if df.empty:
+            self.logger.warning(f"过滤后的日K线数据为空，未插入数据库")
+        return df
+
+    def _refetch_daily_kline(self, stock_code: str, start_date: str, end_date: str) -> int:
+        """
+        重新获取一个区间的日K线并覆盖写入，数据源仍然没有的交易日记录为已确认缺口
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            int: 获取到的K线数量
+        """
+        df = self._fetch_daily_kline(stock_code, start_date, end_date)
+        self.db.upsert_dataframe('daily_kline', df)
+        remaining = self.calendar.find_gaps(start_date, end_date, [stock_code])
+        remaining = remaining[remaining['status'] == GAP_MISSING]
+        if not remaining.empty:
+            self.calendar.confirm_empty(stock_code, zip(remaining['start_date'], remaining['end_date']))
+        return len(df)
+
+    def _refetch_kline_tail(self, stock_code: str, end_date: str) -> int:
+        """
+        本地交易日历没有覆盖到已收盘的日期时，获取最后一根K线之后的日K线
+
+        缺口检测只能看到交易日历中的日期，交易日历为空或过期时最新的交易日不会被检测为缺口。
+        区间内有工作日时才请求；数据源没有返回K线的区间（如停牌）记为已确认缺口，不再重复请求。
+
+        Args:
+            stock_code: 股票代码
+            end_date: 结束日期
+
+        Returns:
+            int: 获取到的K线数量
+        """
+        settled_end = self.calendar.settled_end_date(end_date)
+        calendar_end = self.calendar.last_date()
+        if calendar_end is not None and calendar_end >= settled_end:
+            return 0
+        last_stored = self.db.conn.execute(
+            "SELECT MAX(date) FROM daily_kline WHERE stock_code = ?", (stock_code,)
+        ).fetchone()[0]
+        if last_stored is None:
+            return 0
+        tail_start = (pd.Timestamp(last_stored[:10]) + timedelta(days=1)).strftime('%Y-%m-%d')
+        if tail_start > settled_end or pd.bdate_range(tail_start, settled_end).empty:
+            return 0
+        confirmed = self.db.conn.execute(
+            "SELECT 1 FROM confirmed_gaps WHERE stock_code = ? AND start_date <= ? AND end_date >= ?",
+            (stock_code, tail_start, settled_end)
+        ).fetchone()
+        if confirmed is not None:
+            return 0
+        self.logger.info(f"本地交易日历没有覆盖到{settled_end}，获取{stock_code}在{tail_start}之后的日K线")
+        df = self._fetch_daily_kline(stock_code, tail_start, settled_end)
+        if df.empty:
+            self.calendar.confirm_empty(stock_code, [(tail_start, settled_end)])
+            return 0
+        self.db.upsert_dataframe('daily_kline', df)
+        return len(df)
+
+    def migrate_qfq_kline(self,
+                          stock_codes: Optional[List[str]] = None,
+                          raise_errors: bool = False) -> Dict[str, int]:
+        """
+        把旧版本按前复权保存的日K线重新获取为不复权价格
+
+        每只股票按已存储的日期区间重新获取不复权K线并更新复权因子，在一个事务中替换该股票的日K线、
+        删除由旧价格计算的周/月K线，并移出待迁移列表。数据源没有返回K线时保留旧数据，股票仍待迁移。
+
+        Args:
+            stock_codes: 股票代码列表（可选），默认为所有待迁移的股票
+            raise_errors: 迁移失败时是否抛出异常（默认记录日志并继续下一只股票）
+
+        Returns:
+            Dict[str, int]: 迁移成功、失败和因接口熔断推迟的股票数
+        """
+        summary = {"migrated": 0, "failed": 0, "deferred": 0}
+        for stock_code in self.db.legacy_qfq_stocks(stock_codes):
+            try:
+                self._migrate_qfq_stock(stock_code)
+                summary["migrated"] += 1
+            except CircuitOpenError:
+                if raise_errors:
+                    raise
+                summary["deferred"] += 1
+            except Exception as e:
+                self.logger.error(f"迁移{stock_code}的前复权日K线失败: {str(e)}")
+                if raise_errors:
+                    raise
+                summary["failed"] += 1
+        return summary
+
+    def _migrate_qfq_stock(self, stock_code: str) -> int:
+        """
+        重新获取一只股票的不复权日K线并替换前复权价格
+
+        Args:
+            stock_code: 股票代码
+
+        Returns:
+            int: 写入的K线数量
+        """
+        start_date, end_date = self.db.conn.execute(
+            "SELECT MIN(date), MAX(date) FROM daily_kline WHERE stock_code = ?", (stock_code,)
+        ).fetchone()
+        df = pd.DataFrame()
+        if start_date is not None:
+            df = self._fetch_daily_kline(stock_code, start_date, end_date)
+            if df.empty:
+                raise Exception(f"数据源没有返回{start_date}至{end_date}的不复权K线，保留前复权数据")
+            self.refresh_adjust_factors(stock_code, raise_errors=True)
+        try:
+            for table in ('daily_kline', 'weekly_kline', 'monthly_kline'):
+                self.db.conn.execute(f"DELETE FROM {table} WHERE stock_code = ?", (stock_code,))
+            if not df.empty:
+                df.to_sql('daily_kline', self.db.conn, if_exists='append', index=False)
+                self.db.journal.record('daily_kline', df)
+            self.db.conn.execute("DELETE FROM legacy_qfq_kline WHERE stock_code = ?", (stock_code,))
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"替换{stock_code}的日K线失败: {str(e)}")
+        self.logger.info(f"{stock_code}的日K线已重新获取为不复权价格，共{len(df)}条")
+        return len(df)
+
+    def refresh_trading_calendar(self) -> int:
+        """
+        从akshare获取交易所交易日历并写入本地
+
+        Returns:
+            int: 交易日数量
+        """
+        df = self._fetch_from_akshare('tool_trade_date_hist_sina')
+        dates = pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')
+        count = self.calendar.store(dates)
+        self.logger.info(f"交易日历已更新，共{count}个交易日")
+        return count
+
+    def find_kline_gaps(self,
+                        stock_codes: Optional[List[str]],
+                        start_date: str,
+                        end_date: str) -> pd.DataFrame:
+        """
+        找出日K线相对交易日历的缺口，结束日期限制在已收盘的交易日
+
+        Args:
+            stock_codes: 股票代码列表，为 None 时检测表中的所有股票
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            pd.DataFrame: 包含 stock_code, start_date, end_date, trading_days, status 的缺口
+        """
+        return self.calendar.find_gaps(start_date, self.calendar.settled_end_date(end_date), stock_codes)
+
+    def repair_daily_kline(self,
+                           stock_codes: Optional[List[str]],
+                           start_date: str,
+                           end_date: str,
+                           max_bridge_days: int = DEFAULT_MAX_BRIDGE_DAYS,
+                           dry_run: bool = False) -> Dict[str, int]:
+        """
+        检测所有股票的日K线缺口，只重新获取缺失的区间
+
+        Args:
+            stock_codes: 股票代码列表，为 None 时修复表中的所有股票
+            start_date: 开始日期
+            end_date: 结束日期
+            max_bridge_days: 合并缺口时允许跨过的最大交易日数
+            dry_run: 只检测缺口，不获取数据
+
+        Returns:
+            Dict[str, int]: 缺失和停牌的缺口数、请求数、获取到的K线数、失败的请求数，
+                以及因接口熔断推迟的请求数（再次修复时重新检测）；legacy 为日K线仍按前复权保存的股票数，
+                修复时先重新获取这些股票，migrated 为迁移成功的股票数
+        """
+        settled_end = self.calendar.settled_end_date(end_date)
+        last_date = self.calendar.last_date()
+        if last_date is None or last_date < settled_end:
+            self.refresh_trading_calendar()
+        legacy = len(self.db.legacy_qfq_stocks(stock_codes))
+        migration = {"migrated": 0, "failed": 0, "deferred": 0}
+        if not dry_run:
+            self.retry.start_run()
+            # 先把前复权K线重新获取为不复权价格，缺口按替换后的数据检测
+            if legacy:
+                migration = self.migrate_qfq_kline(stock_codes)
+        gaps = self.find_kline_gaps(stock_codes, start_date, end_date)
+        plan = self.calendar.plan_refetch(gaps, max_bridge_days)
+        summary = {
+            "missing": int((gaps['status'] == GAP_MISSING).sum()),
+            "suspended": int((gaps['status'] == GAP_SUSPENDED).sum()),
+            "requests": len(plan),
+            "rows": 0,
+            "failed": migration["failed"],
+            "deferred": migration["deferred"],
+            "legacy": legacy,
+            "migrated": migration["migrated"],
+        }
+        self.logger.info(f"发现{summary['missing']}个缺失区间、{summary['suspended']}个停牌区间，"
+                         f"合并为{summary['requests']}个请求")
+        if dry_run:
+            return summary
+        for row in plan.itertuples(index=False):
+            try:
+                summary["rows"] += self._refetch_daily_kline(row.stock_code, row.start_date, row.end_date)
+            except CircuitOpenError:
+                summary["deferred"] += 1
+            except Exception as e:
+                summary["failed"] += 1
+                self.logger.error(f"重新获取{row.stock_code}在{row.start_date}至{row.end_date}的日K线失败: {str(e)}")
+        return summary
         
-    def get_stock_financial_summary(self, stock_code: str) -> pd.DataFrame:
+    def get_adjust_factors(self, stock_code: str) -> pd.DataFrame:
         """
-        获取股票财务摘要数据（使用 akshare_rules.md 推荐接口）
+        从数据库获取股票的后复权因子变化点
+
+        Args:
+            stock_code: 股票代码
+
+        Returns:
+            pd.DataFrame: 包含 stock_code, date, hfq_factor 的因子数据，按日期升序
         """
         query = """
-            SELECT * FROM financial_summary 
+            SELECT stock_code, date, hfq_factor FROM adjust_factors
             WHERE stock_code = ?
-            ORDER BY date DESC
-            LIMIT 1
+            ORDER BY date
         """
         df = self.db.execute_query(query, (stock_code,))
-        if df is not None and not df.empty:
+        return df if df is not None else pd.DataFrame()
+        
+    def refresh_adjust_factors(self, stock_code: str, raise_errors: bool = False) -> pd.DataFrame:
+        """
+        从akshare获取后复权因子并更新因子表
+
+        除权除息只会新增因子变化点，已有的不复权K线不需要重新获取。
+
+        Args:
+            stock_code: 股票代码
+            raise_errors: 获取失败时是否抛出异常（默认记录日志并返回数据库中已有的因子）
+
+        Returns:
+            pd.DataFrame: 更新后的因子数据
+        """
+        try:
+            df = self._fetch_from_akshare('stock_zh_a_daily', symbol=stock_code.lower(), adjust="hfq-factor")
+            if df is None or df.empty:
+                self.logger.warning(f"akshare返回的{stock_code}复权因子为空")
+                self.negative_cache.record('adjust_factors', stock_code)
+                return self.get_adjust_factors(stock_code)
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+            df['hfq_factor'] = df['hfq_factor'].astype(float)
+            rows = [(stock_code, date, factor) for date, factor in zip(df['date'], df['hfq_factor'])]
+            self.db.conn.executemany("""
+                INSERT OR REPLACE INTO adjust_factors (stock_code, date, hfq_factor)
+                VALUES (?, ?, ?)
+            """, rows)
+            self.db.journal.record('adjust_factors', df.assign(stock_code=stock_code))
+            self.db.conn.commit()
+            self.logger.info(f"更新{stock_code}的复权因子 {len(rows)} 条")
+        except Exception as e:
+            self.logger.warning(f"从akshare获取{stock_code}的复权因子失败: {str(e)}")
+            if raise_errors:
+                raise
+        return self.get_adjust_factors(stock_code)
+        
+    def get_stock_financial_summary(self,
+                                    stock_code: str,
+                                    raise_errors: bool = False,
+                                    refresh: bool = False) -> pd.DataFrame:
+        """
+        获取股票最新的财务摘要数据（使用 akshare_rules.md 推荐接口）
+
+        财务摘要按日期保存完整历史且只追加：已存储的日期不会被接口之后返回的修订值覆盖，
+        get_financial_asof 按历史日期取值时只能看到当时已有的数据。
+
+        Args:
+            stock_code: 股票代码
+            raise_errors: 获取失败时是否抛出异常（默认记录日志并返回数据库中已有的数据）
+            refresh: 是否增量更新：已存储的最新日期之后还有交易日时请求接口，只追加数据库中没有的日期
+
+        Returns:
+            pd.DataFrame: 最新一条财务摘要，没有数据时为空DataFrame
+        """
+        latest = self._latest_financial_summary(stock_code)
+        if not latest.empty and not (refresh and self._financial_summary_stale(latest.iloc[0]['date'])):
             self.logger.info(f"从数据库获取到{stock_code}的财务摘要数据")
-            return df
+            return latest
+        if self.negative_cache.is_fresh('financial', stock_code):
+            self.logger.info(f"{stock_code}最近确认没有财务摘要数据，跳过请求")
+            return latest
         self.logger.info(f"从akshare获取{stock_code}的财务摘要数据")
         try:
             # 去掉市场前缀
             symbol = stock_code[2:]
-            df = ak.stock_a_indicator_lg(symbol=symbol)
+            df = self._fetch_from_akshare('stock_a_indicator_lg', symbol=symbol)
             self.logger.info(f"akshare返回财务摘要数据行数: {len(df)}")
             self.logger.info(f"akshare返回财务摘要数据列名: {df.columns.tolist()}")
             
             if df.empty:
                 self.logger.warning(f"akshare返回的财务摘要数据为空")
-                return pd.DataFrame()
+                self.negative_cache.record('financial', stock_code)
+                return latest
             
             # 检查并打印数据结构
             self.logger.info(f"数据预览:\n{df.head()}")
@@ -168,7 +588,7 @@ class DataManager:
                 df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
             else:
                 self.logger.error(f"未找到日期列，当前列名: {df.columns.tolist()}")
-                return pd.DataFrame()
+                return latest
             
             df['stock_code'] = stock_code
             
@@ -177,7 +597,7 @@ class DataManager:
             available_cols = [col for col in keep_cols if col in df.columns]
             if len(available_cols) < 2:  # 至少需要 stock_code 和 date
                 self.logger.error(f"可用列数不足，当前可用列: {available_cols}")
-                return pd.DataFrame()
+                return latest
             
             df = df[available_cols]
             
@@ -185,33 +605,98 @@ class DataManager:
             df = df[df['date'].notna()]
             if df.empty:
                 self.logger.warning(f"过滤后的财务摘要数据为空，未插入数据库")
-                return pd.DataFrame()
+                self.negative_cache.record('financial', stock_code)
+                return latest
             
-            self.db.insert_dataframe('financial_summary', df)
-            return df
+            # 只追加数据库中没有的日期，已存储的历史保持不变
+            stored = self.db.execute_query("SELECT date FROM financial_summary WHERE stock_code = ?", (stock_code,))
+            df = df[~df['date'].isin(stored['date'])].drop_duplicates('date')
+            if not df.empty:
+                self.db.insert_dataframe('financial_summary', df)
+            self.logger.info(f"追加{stock_code}的财务摘要 {len(df)} 条")
+            return self._latest_financial_summary(stock_code)
         except Exception as e:
             self.logger.error(f"从akshare获取{stock_code}的财务摘要数据失败: {str(e)}")
             self.logger.error(f"错误详情: {type(e).__name__}")
-            return pd.DataFrame()
-        
-    def get_stock_dividend_data(self, stock_code: str) -> pd.DataFrame:
-        """
-        获取股票分红数据（使用 akshare_rules.md 推荐接口）
-        """
+            if raise_errors:
+                raise
+            return latest
+
+    def _latest_financial_summary(self, stock_code: str) -> pd.DataFrame:
+        """从数据库读取最新一条财务摘要"""
         query = """
-            SELECT * FROM dividend_data 
+            SELECT * FROM financial_summary 
             WHERE stock_code = ?
-            ORDER BY ex_dividend_date DESC
+            ORDER BY date DESC
+            LIMIT 1
         """
         df = self.db.execute_query(query, (stock_code,))
-        if df is not None and not df.empty:
+        return df if df is not None else pd.DataFrame()
+
+    def _financial_summary_stale(self, latest_date: str) -> bool:
+        """
+        判断已存储的财务摘要是否落后：最新日期之后、已收盘的日期之前还有交易日
+
+        Args:
+            latest_date: 已存储的最新日期
+
+        Returns:
+            bool: 是否需要请求接口
+        """
+        settled_end = self.calendar.settled_end_date(datetime.now().strftime("%Y-%m-%d"))
+        if latest_date >= settled_end:
+            return False
+        last_date = self.calendar.last_date()
+        if last_date is None or last_date < settled_end:
+            # 本地交易日历没有覆盖到已收盘的日期时按自然日判断
+            return True
+        return any(day > latest_date for day in self.calendar.trading_days(latest_date, settled_end))
+
+    def get_financial_asof(self, keys: pd.DataFrame) -> pd.DataFrame:
+        """
+        批量获取每个 (股票, 日期) 当天或之前最新的财务摘要，没有未来数据
+
+        Args:
+            keys: 包含 stock_code 和 date 的查询键，如回测的信号
+
+        Returns:
+            pd.DataFrame: 与 keys 逐行对应，包含 stock_code、date、财务数据日期 asof_date、
+                pe_ttm、pb_mrq、market_cap、circulating_market_cap
+        """
+        return self.db.join_asof('financial_summary', keys,
+                                 ['pe_ttm', 'pb_mrq', 'market_cap', 'circulating_market_cap'])
+        
+    def get_stock_dividend_data(self,
+                                stock_code: str,
+                                raise_errors: bool = False,
+                                refresh: bool = False) -> pd.DataFrame:
+        """
+        获取股票分红数据（使用 akshare_rules.md 推荐接口）
+
+        Args:
+            stock_code: 股票代码
+            raise_errors: 获取失败时是否抛出异常（默认记录日志并返回数据库中已有的数据）
+            refresh: 是否重新请求接口：数据库中已有分红时也请求，只写入新增或变化的记录（新鲜度策略判断到期时使用）
+
+        Returns:
+            pd.DataFrame: 按除权除息日降序的分红数据，没有数据时为空DataFrame
+        """
+        stored = self._stored_dividends(stock_code)
+        if not stored.empty and not refresh:
             self.logger.info(f"从数据库获取到{stock_code}的分红数据")
-            return df
+            return stored
+        if self.negative_cache.is_fresh('dividend', stock_code):
+            self.logger.info(f"{stock_code}最近确认没有分红数据，跳过请求")
+            return stored
         self.logger.info(f"从akshare获取{stock_code}的分红数据")
         try:
             symbol = stock_code[2:]
-            df = ak.stock_history_dividend_detail(symbol=symbol)
+            df = self._fetch_from_akshare('stock_history_dividend_detail', symbol=symbol)
             self.logger.info(f"akshare返回分红数据行数: {len(df)}")
+            if df.empty:
+                self.logger.warning(f"akshare返回的{stock_code}分红数据为空")
+                self.negative_cache.record('dividend', stock_code)
+                return stored
             df = df.rename(columns={
                 '公告日期': 'report_date',
                 '除权除息日': 'ex_dividend_date',
@@ -223,42 +708,146 @@ class DataManager:
                 df['dividend_yield'] = df['dividend_per_share_pre_tax'] / 100
                 keep_cols.append('dividend_yield')
             df = df[[col for col in keep_cols if col in df.columns]]
+            # 确保日期格式统一，与数据库中已有的记录比较
+            for column in ('report_date', 'ex_dividend_date'):
+                if column in df.columns:
+                    df[column] = pd.to_datetime(df[column], errors='coerce').dt.strftime('%Y-%m-%d')
             # 过滤主键为空的行
             df = df[df['ex_dividend_date'].notna()]
             if df.empty:
                 self.logger.warning(f"akshare返回的分红数据全部为空，未插入数据库")
-                return pd.DataFrame()
-            self.db.insert_dataframe('dividend_data', df)
-            return df
+                self.negative_cache.record('dividend', stock_code)
+                return stored
+            # 只写入新增或变化的记录，没有变化时不产生变更日志，新鲜度策略据此放宽请求间隔
+            changed = self._changed_rows(df.drop_duplicates('ex_dividend_date', keep='last'), stored,
+                                         ['ex_dividend_date'])
+            if not changed.empty:
+                self.db.upsert_dataframe('dividend_data', changed)
+            self.logger.info(f"写入{stock_code}新增或变化的分红 {len(changed)} 条")
+            return self._stored_dividends(stock_code)
         except Exception as e:
             self.logger.error(f"从akshare获取{stock_code}的分红数据失败: {str(e)}")
-            return pd.DataFrame()
+            if raise_errors:
+                raise
+            return stored
+
+    def _stored_dividends(self, stock_code: str) -> pd.DataFrame:
+        """从数据库读取股票的分红数据，按除权除息日降序"""
+        query = """
+            SELECT * FROM dividend_data 
+            WHERE stock_code = ?
+            ORDER BY ex_dividend_date DESC
+        """
+        df = self.db.execute_query(query, (stock_code,))
+        return df if df is not None else pd.DataFrame()
+
+    @staticmethod
+    def _changed_rows(fetched: pd.DataFrame, stored: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        """
+        找出获取到的数据中数据库没有或值不同的行
+
+        Args:
+            fetched: 获取到的数据
+            stored: 数据库中已有的数据
+            keys: 主键中除 stock_code 以外的列
+
+        Returns:
+            pd.DataFrame: 需要写入的行
+        """
+        if stored.empty:
+            return fetched
+        columns = [column for column in fetched.columns if column in stored.columns]
+        merged = fetched.merge(stored[columns], on=['stock_code', *keys], how='left',
+                               suffixes=('', '_stored'), indicator=True)
+        changed = merged['_merge'] == 'left_only'
+        for column in columns:
+            if column == 'stock_code' or column in keys:
+                continue
+            new, old = merged[column], merged[f'{column}_stored']
+            changed = changed | ~((new == old) | (new.isna() & old.isna()))
+        return fetched[changed.to_numpy()]
         
-    def update_single_stock_data(self, 
+    def get_spot_snapshot(self) -> pd.DataFrame:
+        """
+        获取全市场实时行情快照（一次请求返回所有A股）
+
+        Returns:
+            pd.DataFrame: 包含 stock_code, price, open, high, low, volume, amount，没有最新价的股票被过滤
+        """
+        df = self._fetch_from_akshare('stock_zh_a_spot_em')
+        df = df.rename(columns={
+            '代码': 'symbol',
+            '最新价': 'price',
+            '今开': 'open',
+            '最高': 'high',
+            '最低': 'low',
+            '成交量': 'volume',
+            '成交额': 'amount',
+        })
+        symbol = df['symbol'].astype(str).str.zfill(6)
+        # 6开头为上交所，4/8/9开头为北交所，其余为深交所
+        market = symbol.str[0].map({'6': 'SH', '4': 'BJ', '8': 'BJ', '9': 'BJ'}).fillna('SZ')
+        df['stock_code'] = market + symbol
+        df = df[df['price'].notna()]
+        keep_cols = ['stock_code', 'price', 'open', 'high', 'low', 'volume', 'amount']
+        return df[[col for col in keep_cols if col in df.columns]].reset_index(drop=True)
+
+    def update_single_stock_data(self,
                                 stock_code: str, 
-                                data_types: List[str] = ['kline', 'financial', 'dividend']) -> None:
+                                data_types: List[str] = ['kline', 'financial', 'dividend']) -> Dict[str, Optional[bool]]:
         """
         更新单只股票的指定类型数据
+
+        数据类型成功更新且确实请求了数据源时，记录到新鲜度策略的请求状态中；
+        只读取了数据库（如数据已是最新）的类型不记录，下次更新仍然到期。
         
         Args:
             stock_code: 股票代码
             data_types: 要更新的数据类型列表
+            
+        Returns:
+            Dict[str, Optional[bool]]: 每种数据类型是否更新成功，None 表示接口已熔断、推迟到之后更新
         """
         end_date = datetime.now().strftime("%Y-%m-%d")
         start_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
         
+        results = {}
         for data_type in data_types:
+            fetch_count, version = self.fetch_count, self.db.journal.current_version()
             try:
                 if data_type == 'kline':
-                    self.get_stock_daily_kline(stock_code, start_date, end_date)
+                    self.get_stock_daily_kline(stock_code, start_date, end_date, raise_errors=True)
+                    self._refetch_kline_tail(stock_code, end_date)
+                    fetched = self.fetch_count > fetch_count
+                    # 复权因子只在经过除权除息日或间隔到期时重新获取
+                    if self.freshness.is_due(stock_code, 'adjust_factors'):
+                        factor_version = self.db.journal.current_version()
+                        self.refresh_adjust_factors(stock_code, raise_errors=True)
+                        self.freshness.record_results(stock_code, {'adjust_factors': True}, factor_version)
                 elif data_type == 'financial':
-                    self.get_stock_financial_summary(stock_code)
+                    self.get_stock_financial_summary(stock_code, raise_errors=True, refresh=True)
+                    fetched = self.fetch_count > fetch_count
                 elif data_type == 'dividend':
-                    self.get_stock_dividend_data(stock_code)
+                    self.get_stock_dividend_data(stock_code, raise_errors=True, refresh=True)
+                    fetched = self.fetch_count > fetch_count
+                elif data_type in load_plugins(FETCHER_ENTRY_POINT_GROUP):
+                    # 插件提供的数据类型：插件负责获取并存储数据，失败时抛出异常
+                    load_plugins(FETCHER_ENTRY_POINT_GROUP)[data_type](self, stock_code)
+                    fetched = True
                 else:
                     self.logger.warning(f"未知的数据类型: {data_type}")
+                    results[data_type] = False
+                    continue
+                results[data_type] = True
+                if fetched:
+                    self.freshness.record_results(stock_code, {data_type: True}, version)
+            except CircuitOpenError as e:
+                self.logger.warning(f"推迟更新{stock_code}的{data_type}数据: {str(e)}")
+                results[data_type] = None
             except Exception as e:
                 self.logger.error(f"更新{stock_code}的{data_type}数据失败: {str(e)}")
+                results[data_type] = False
+        return results
                 
     def batch_update_stock_data(self, 
                                stock_codes: List[str], 
@@ -283,56 +872,27 @@ class DataManager:
             stock_code: 股票代码
             period: 周期类型 ('weekly' 或 'monthly')
         """
-        # 获取日K线数据
+        if self.db.legacy_qfq_stocks([stock_code]):
+            # 前复权价格与不复权价格混在一个周期中会得到错误的K线，先重新获取为不复权价格
+            self.migrate_qfq_kline([stock_code])
+            if self.db.legacy_qfq_stocks([stock_code]):
+                self.logger.warning(f"无法计算{stock_code}的{period}K线：日K线仍为前复权价格")
+                return
         end_date = datetime.now().strftime("%Y-%m-%d")
         start_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
-        daily_df = self.get_stock_daily_kline(stock_code, start_date, end_date)
-        
-        if daily_df is None or daily_df.empty:
+        # 聚合在 SQLite 中完成，只有周/月K线进入 Python；数据库中没有日K线时先获取
+        resampled = self.db.aggregate_kline(stock_code, period, start_date, end_date)
+        if resampled.empty:
+            daily_df = self.get_stock_daily_kline(stock_code, start_date, end_date)
+            if daily_df is not None and not daily_df.empty:
+                resampled = self.db.aggregate_kline(stock_code, period, start_date, end_date)
+        if resampled.empty:
             self.logger.warning(f"无法计算{stock_code}的{period}K线：没有日K线数据")
             return
             
-        # 转换日期列为datetime类型
-        daily_df['date'] = pd.to_datetime(daily_df['date'])
-        
-        # 设置日期为索引
-        daily_df.set_index('date', inplace=True)
-        
-        # 根据周期重采样
-        if period == 'weekly':
-            resampled = daily_df.resample('W').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum',
-                'amount': 'sum',
-                'adj_factor': 'last'
-            })
-            target_table = 'weekly_kline'
-        else:  # monthly
-            resampled = daily_df.resample('M').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum',
-                'amount': 'sum',
-                'adj_factor': 'last'
-            })
-            target_table = 'monthly_kline'
-            
-        # 重置索引，将日期变回列
-        resampled.reset_index(inplace=True)
-        
-        # 添加股票代码列
-        resampled['stock_code'] = stock_code
-        
-        # 将日期格式化为字符串
-        resampled['date'] = resampled['date'].dt.strftime('%Y-%m-%d')
-        
-        # 存储到数据库
-        self.db.insert_dataframe(target_table, resampled)
+        target_table = 'weekly_kline' if period == 'weekly' else 'monthly_kline'
+        # 当前周期的K线在后续交易日会变化，按主键覆盖
+        self.db.upsert_dataframe(target_table, resampled)
         
         # 记录更新日志
         self.record_data_update_log(target_table, stock_code, end_date)
@@ -352,29 +912,24 @@ class DataManager:
         Returns:
             float: 动态股息率
         """
-        # 获取分红数据
-        dividend_df = self.get_stock_dividend_data(stock_code)
-        
-        if dividend_df is None or dividend_df.empty:
-            self.logger.warning(f"无法计算{stock_code}的动态股息率：没有分红数据")
-            return 0.0
+        # 数据库中没有分红数据时先获取（有空结果缓存时不会重复请求）
+        stored = self.db.conn.execute(
+            "SELECT 1 FROM dividend_data WHERE stock_code = ? LIMIT 1", (stock_code,)
+        ).fetchone()
+        if stored is None:
+            dividend_df = self.get_stock_dividend_data(stock_code)
+            if dividend_df is None or dividend_df.empty:
+                self.logger.warning(f"无法计算{stock_code}的动态股息率：没有分红数据")
+                return 0.0
             
-        # 过滤出指定日期之前的分红数据
-        dividend_df['ex_dividend_date'] = pd.to_datetime(dividend_df['ex_dividend_date'])
+        # 近一年 (日期-TTM_WINDOW_DAYS天, 日期] 的分红总额在 SQLite 中按主键区间求和，窗口与因子排名、最新快照一致
         date_for_dividend_history = pd.to_datetime(date_for_dividend_history)
-        recent_dividends = dividend_df[dividend_df['ex_dividend_date'] <= date_for_dividend_history]
-        
-        if recent_dividends.empty:
-            return 0.0
-            
-        # 计算近12个月的分红总额
-        one_year_ago = date_for_dividend_history - pd.DateOffset(years=1)
-        yearly_dividends = recent_dividends[recent_dividends['ex_dividend_date'] > one_year_ago]
-        
-        if yearly_dividends.empty:
-            return 0.0
-            
-        total_dividend = yearly_dividends['dividend_per_share_pre_tax'].sum()
+        window_start = date_for_dividend_history - timedelta(days=TTM_WINDOW_DAYS)
+        total_dividend = self.db.range_sum(
+            'dividend_data', 'dividend_per_share_pre_tax', stock_code,
+            window_start.strftime('%Y-%m-%d'), date_for_dividend_history.strftime('%Y-%m-%d'),
+            date_column='ex_dividend_date',
+        )
         
         # 计算动态股息率
         dividend_yield = (total_dividend / current_price) * 100
@@ -7,6 +7,24 @@ import pandas as pd
 from typing import Optional, List, Dict, Any, Union
 from pathlib import Path
 
+from .change_journal import ChangeJournal
+from .compact_schema import COMPACT_SCHEMA_VERSION, create_compact_schema, get_object_type, get_schema_version
+from .factor_ranks import FactorRanks
+from .latest_snapshot import LatestSnapshot
+from .partitions import PARTITIONED_TABLES, PartitionManager
+from .signal_store import SUPERSEDED_SIGNAL_INDEXES, ensure_unique_key
+
+# 派生K线周期 -> 分组日期表达式，与 pandas resample 的 'W'（周日）和 'ME'（月末）标签一致
+PERIOD_BUCKETS = {
+    'weekly': "date(date, 'weekday 0')",
+    'monthly': "date(date, 'start of month', '+1 month', '-1 day')",
+}
+
+# join_asof 每批的查询键数量，每个键3个参数，不超过 SQLite 旧版本的参数上限 999
+ASOF_CHUNK_SIZE = 300
+
+DERIVED_KLINE_COLUMNS = ['stock_code', 'date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'adj_factor']
+
 class DatabaseHandler:
     """数据库处理类，负责处理所有数据库相关的操作"""
     
@@ -20,6 +38,10 @@ class DatabaseHandler:
         self.config = self._load_config(config)
         self.conn = None
         self.connect()
+        self.partitions = PartitionManager(self)
+        self.journal = ChangeJournal(self)
+        self.latest_snapshot = LatestSnapshot(self)
+        self.factor_ranks = FactorRanks(self)
         
     def _load_config(self, config: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -48,7 +70,14 @@ class DatabaseHandler:
     def connect(self) -> None:
         """连接到数据库"""
         try:
-            self.conn = sqlite3.connect(self.config["database_path"])
+            # 多个 worker 进程可能同时写入，等待锁释放而不是立即报错；
+            # 常驻服务在多个线程中共用同一连接，由服务加锁串行访问
+            self.conn = sqlite3.connect(
+                self.config["database_path"],
+                timeout=self.config.get("database_timeout_seconds", 30),
+                check_same_thread=False,
+                uri=True
+            )
             self.conn.row_factory = sqlite3.Row
         except Exception as e:
             raise Exception(f"数据库连接失败: {str(e)}")
@@ -62,6 +91,10 @@ class DatabaseHandler:
         """初始化数据库表结构"""
         self.connect()
         cursor = self.conn.cursor()
+        # 紧凑表结构：股票数据表以同名视图的形式存在，下面的 CREATE TABLE IF NOT EXISTS 不再生效
+        if (get_schema_version(self.conn) >= COMPACT_SCHEMA_VERSION
+                or (self.config.get("compact_schema") and get_object_type(self.conn, "daily_kline") is None)):
+            create_compact_schema(cursor)
         # 日K线表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS daily_kline (
@@ -108,6 +141,25 @@ class DatabaseHandler:
             )
         ''')
         
+        # 创建复权因子表（只记录后复权因子的变化点，K线表保存不复权价格）
+        factors_created = get_object_type(self.conn, "adjust_factors") is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS adjust_factors (
+                stock_code TEXT NOT NULL,
+                date TEXT NOT NULL,
+                hfq_factor REAL NOT NULL,
+                PRIMARY KEY (stock_code, date)
+            )
+        """)
+        # 创建待迁移股票表：没有复权因子表的旧版本按前复权保存日K线，这些股票的K线重新获取为不复权价格之前不能应用复权因子
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS legacy_qfq_kline (
+                stock_code TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+        """)
+        if factors_created:
+            cursor.execute("INSERT OR IGNORE INTO legacy_qfq_kline SELECT DISTINCT stock_code FROM daily_kline")
+        
         # 创建分红数据表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS dividend_data (
@@ -145,6 +197,14 @@ class DatabaseHandler:
                 description TEXT
             )
         """)
+        if get_object_type(self.conn, "historical_signals") == "table":
+            # (stock_code, date, strategy_name) 唯一键，旧数据库中的重复信号在建索引前去重
+            ensure_unique_key(cursor, "historical_signals", "idx_historical_signals_key",
+                              ["stock_code", "date", "strategy_name"])
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_historical_signals_strategy_cover "
+                           "ON historical_signals (strategy_name, date, stock_code, signal_type)")
+            for index_name in SUPERSEDED_SIGNAL_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
         
         # 创建数据更新日志表
         cursor.execute("""
@@ -157,8 +217,122 @@ class DatabaseHandler:
             )
         """)
         
+        # 创建更新任务表（记录每个 股票 x 数据类型 工作单元的状态，用于断点续传）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS update_jobs (
+                job_id TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                data_type TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (job_id, stock_code, data_type)
+            )
+        """)
+        
+        # 创建交易日历表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS trading_calendar (
+                date TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+        """)
+        
+        # 创建已确认缺口表（数据源确认没有K线的区间：停牌或上市前）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS confirmed_gaps (
+                stock_code TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                PRIMARY KEY (stock_code, start_date)
+            )
+        """)
+        
+        # 创建空结果缓存表（数据源返回空结果的 数据类型 x 股票，有效期内不再请求）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS negative_cache (
+                data_type TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                checked_at TEXT NOT NULL,
+                PRIMARY KEY (data_type, stock_code)
+            ) WITHOUT ROWID
+        """)
+        
+        # 创建变更日志表（每次写入影响的 表 x 股票 x 日期区间，version 单调递增，供下游增量重算）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_journal (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                min_date TEXT,
+                max_date TEXT
+            )
+        """)
+        
+        # 创建最新快照表（每只股票一行的当前状态，由写入路径在同一事务中维护）
+        snapshot_created = get_object_type(self.conn, "latest_snapshot") is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS latest_snapshot (
+                stock_code TEXT PRIMARY KEY,
+                date TEXT,
+                close REAL,
+                ttm_dividend REAL,
+                dividend_yield REAL,
+                financial_date TEXT,
+                pe_ttm REAL,
+                pb_mrq REAL,
+                signal_date TEXT,
+                signal_strategy TEXT,
+                signal_price REAL
+            ) WITHOUT ROWID
+        """)
+        
+        # 创建请求状态表（每个 数据类型 x 股票 上次成功请求和上次数据变化的时间，供新鲜度策略跳过不会有新数据的请求）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fetch_state (
+                data_type TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                checked_at TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                PRIMARY KEY (data_type, stock_code)
+            ) WITHOUT ROWID
+        """)
+        
+        # 创建因子排名表（每个交易日的横截面百分位，按 范围 x 日期 聚集存储）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS factor_ranks (
+                universe TEXT NOT NULL,
+                date TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                dividend_yield_pct REAL,
+                pe_ttm_pct REAL,
+                pb_mrq_pct REAL,
+                PRIMARY KEY (universe, date, stock_code)
+            ) WITHOUT ROWID
+        """)
+        
         self.conn.commit()
+        if snapshot_created:
+            # 已有数据库首次创建快照表时从数据表重建
+            self.latest_snapshot.rebuild()
             
+    def legacy_qfq_stocks(self, stock_codes: Optional[List[str]] = None) -> List[str]:
+        """
+        获取日K线仍为旧版本前复权价格、需要重新获取的股票
+
+        Args:
+            stock_codes: 股票代码列表（可选），默认为所有待迁移的股票
+
+        Returns:
+            List[str]: 待迁移的股票代码，按代码排序
+        """
+        rows = self.conn.execute("SELECT stock_code FROM legacy_qfq_kline ORDER BY stock_code").fetchall()
+        legacy = [row[0] for row in rows]
+        if stock_codes is not None:
+            wanted = set(stock_codes)
+            legacy = [stock_code for stock_code in legacy if stock_code in wanted]
+        return legacy
+
     def execute_query(self, query: str, params: tuple = None) -> Optional[pd.DataFrame]:
         """
         执行查询
@@ -196,9 +370,39 @@ class DatabaseHandler:
             self.conn.rollback()
             raise Exception(f"执行更新失败: {str(e)}")
             
+    def query_kline(self,
+                    table: str,
+                    where: str = "1 = 1",
+                    params: tuple = (),
+                    start_date: Optional[str] = None,
+                    end_date: Optional[str] = None,
+                    columns: str = "*",
+                    order_by: Optional[str] = None) -> pd.DataFrame:
+        """
+        查询K线表，包含日期区间涉及的已冻结年份分区
+        
+        Args:
+            table: 表名 (daily_kline, weekly_kline 或 monthly_kline)
+            where: WHERE 条件，应包含日期过滤
+            params: WHERE 条件的参数
+            start_date: 开始日期（可选），用于选择分区
+            end_date: 结束日期（可选），用于选择分区
+            columns: 查询的列
+            order_by: 排序的列（可选）
+            
+        Returns:
+            pd.DataFrame: 查询结果
+        """
+        try:
+            return self.partitions.query(table, where, params, start_date, end_date, columns, order_by)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"查询K线失败: {str(e)}")
+            
     def insert_dataframe(self, table_name: str, df: pd.DataFrame) -> None:
         """
-        将DataFrame数据插入到指定表
+        将DataFrame数据插入到指定表，并记录变更日志
         
         Args:
             table_name: 表名
@@ -206,5 +410,246 @@ class DatabaseHandler:
         """
         try:
             df.to_sql(table_name, self.conn, if_exists='append', index=False)
+            self.journal.record(table_name, df)
+            self.conn.commit()
         except Exception as e:
-            raise Exception(f"插入数据失败: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"插入数据失败: {str(e)}")
+
+    def upsert_dataframe(self, table_name: str, df: pd.DataFrame) -> None:
+        """
+        将DataFrame数据写入到指定表，主键相同的行被覆盖，变更日志在同一事务中记录
+        
+        Args:
+            table_name: 表名
+            df: 要写入的数据
+        """
+        if df.empty:
+            return
+        columns = list(df.columns)
+        frame = df.astype(object).where(df.notna(), None)
+        try:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {table_name} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                list(frame.itertuples(index=False, name=None))
+            )
+            self.journal.record(table_name, df)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise Exception(f"写入数据失败: {str(e)}")
+
+    def _kline_source(self,
+                      table: str,
+                      columns: List[str],
+                      start_date: Optional[str] = None,
+                      end_date: Optional[str] = None) -> str:
+        """
+        生成K线表的数据来源，日期区间涉及已冻结的分区时为主库和分区的 UNION ALL 子查询
+        
+        Args:
+            table: K线表名
+            columns: 需要的列（分区和主库的列顺序可能不同，按列名选择）
+            start_date: 开始日期（可选）
+            end_date: 结束日期（可选）
+            
+        Returns:
+            str: 可以放在 FROM 之后的表名或子查询
+        """
+        years = self.partitions.years_for_range(start_date, end_date) if table in PARTITIONED_TABLES else []
+        if not years:
+            return table
+        if len(years) > self.partitions.max_attached:
+            raise ValueError(f"日期区间涉及 {len(years)} 个分区，超过同时 ATTACH 的上限")
+        schemas = [self.partitions.attach(year) for year in years] + ["main"]
+        selects = " UNION ALL ".join(f"SELECT {', '.join(columns)} FROM {schema}.{table}" for schema in schemas)
+        return f"({selects})"
+            
+    def query_asof(self,
+                   table: str,
+                   stock_codes: List[str],
+                   date: str,
+                   columns: Optional[List[str]] = None,
+                   date_column: str = "date") -> pd.DataFrame:
+        """
+        查询每只股票在指定日期当天或之前的最新一行（as-of 查询）
+        
+        用窗口函数在 SQLite 中为每只股票取最新一行，只有结果行进入 Python。
+        K线表先查主库，主库中没有的股票再按年份从新到旧查已冻结的分区。
+        
+        Args:
+            table: 表名
+            stock_codes: 股票代码列表
+            date: 日期
+            columns: 返回的列（可选），默认为除股票代码和日期以外的全部列
+            date_column: 日期列
+            
+        Returns:
+            pd.DataFrame: 每只股票最多一行，包含 stock_code、日期列和 columns，按股票代码排序
+        """
+        if columns is None:
+            names = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            columns = [name for name in names if name not in ("stock_code", date_column)]
+        selected = ["stock_code", date_column] + list(columns)
+        # None 表示主库，之后是从新到旧的分区年份
+        years: List[Optional[int]] = [None]
+        if table in PARTITIONED_TABLES:
+            years += list(reversed(self.partitions.years_for_range(None, date)))
+        frames = []
+        remaining = list(stock_codes)
+        for year in years:
+            if not remaining:
+                break
+            schema = "main" if year is None else self.partitions.attach(year)
+            frame = self.execute_query(f"""
+                SELECT {', '.join(selected)} FROM (
+                    SELECT {', '.join(selected)},
+                           ROW_NUMBER() OVER (PARTITION BY stock_code ORDER BY {date_column} DESC) AS row_number
+                    FROM {schema}.{table}
+                    WHERE stock_code IN ({','.join('?' * len(remaining))}) AND {date_column} <= ?
+                ) WHERE row_number = 1
+            """, (*remaining, date))
+            frames.append(frame)
+            found = set(frame["stock_code"])
+            remaining = [code for code in remaining if code not in found]
+        if not frames:
+            return pd.DataFrame(columns=selected)
+        result = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return result.sort_values("stock_code").reset_index(drop=True)
+            
+    def join_asof(self,
+                  table: str,
+                  keys: pd.DataFrame,
+                  columns: List[str],
+                  date_column: str = "date") -> pd.DataFrame:
+        """
+        为每个 (股票, 日期) 关联该股票在当天或之前的最新一行（as-of join），不会取到之后的数据
+        
+        每个键通过 (stock_code, 日期列) 主键索引上的 MAX 子查询定位一次，适合回测中许多股票在各自日期上的取值。
+        
+        Args:
+            table: 表名，需要 (stock_code, 日期列) 索引；按年分区的K线表使用 query_asof
+            keys: 包含 stock_code 和 date 的查询键
+            columns: 返回的列
+            date_column: 表中的日期列
+            
+        Returns:
+            pd.DataFrame: 与 keys 逐行对应，包含 stock_code、date、匹配行的日期 asof_date 和 columns，没有匹配时为空值
+        """
+        if table in PARTITIONED_TABLES:
+            raise ValueError(f"表 {table} 按年分区，请使用 query_asof")
+        result_columns = ["stock_code", "date", "asof_date"] + list(columns)
+        if keys.empty:
+            return pd.DataFrame(columns=result_columns)
+        rows = list(zip(keys["stock_code"], keys["date"].astype(str).str[:10]))
+        selected = ", ".join(f"t.{column}" for column in columns)
+        frames = []
+        try:
+            for i in range(0, len(rows), ASOF_CHUNK_SIZE):
+                chunk = rows[i:i + ASOF_CHUNK_SIZE]
+                values = ", ".join("(?, ?, ?)" for _ in chunk)
+                params = tuple(value for position, (code, date) in enumerate(chunk, i)
+                               for value in (position, code, date))
+                frames.append(self.execute_query(f"""
+                    WITH asof_keys (position, stock_code, date) AS (VALUES {values})
+                    SELECT k.stock_code, k.date, t.{date_column} AS asof_date, {selected}
+                    FROM asof_keys k
+                    LEFT JOIN {table} t ON t.stock_code = k.stock_code AND t.{date_column} = (
+                        SELECT MAX({date_column}) FROM {table}
+                        WHERE stock_code = k.stock_code AND {date_column} <= k.date
+                    )
+                    ORDER BY k.position
+                """, params))
+        except Exception as e:
+            raise Exception(f"as-of 关联{table}失败: {str(e)}")
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            
+    def range_sum(self,
+                  table: str,
+                  value_column: str,
+                  stock_code: str,
+                  after_date: Optional[str],
+                  through_date: str,
+                  date_column: str = "date") -> float:
+        """
+        在 SQLite 中按主键区间求和，如某个日期之前一年的每股分红总额
+        
+        Args:
+            table: 表名
+            value_column: 求和的列
+            stock_code: 股票代码
+            after_date: 区间起点（不含，可选），为 None 时不限制
+            through_date: 区间终点（含）
+            date_column: 日期列
+            
+        Returns:
+            float: 区间内的总和，没有数据时为0
+        """
+        conditions, params = ["stock_code = ?", f"{date_column} <= ?"], [stock_code, through_date]
+        if after_date is not None:
+            conditions.append(f"{date_column} > ?")
+            params.append(after_date)
+        row = self.conn.execute(
+            f"SELECT COALESCE(SUM({value_column}), 0) FROM {table} WHERE {' AND '.join(conditions)}", params
+        ).fetchone()
+        return float(row[0])
+            
+    def aggregate_kline(self,
+                        stock_code: str,
+                        period: str,
+                        start_date: str,
+                        end_date: str) -> pd.DataFrame:
+        """
+        在 SQLite 中把日K线聚合为周/月K线
+        
+        每根日K线先按 adjust_factors 中当日生效的后复权因子换算到该周期最后一根K线的价格基准，
+        周期内发生除权除息时开盘价、最高/最低价与收盘价才可比。窗口函数标记每个周期的第一根和最后一根K线，
+        开盘价取第一根、收盘价取最后一根，最高/最低价和成交量/额按周期聚合，adj_factor 为最后一根K线的后复权因子，
+        因此周/月K线与日K线一样保存不复权价格和因子，读取时可以用 apply_adjust_factors 复权。
+        周K线日期为周日，月K线日期为月末，没有K线的周期不返回。
+        
+        Args:
+            stock_code: 股票代码
+            period: 周期类型 ('weekly' 或 'monthly')
+            start_date: 开始日期
+            end_date: 结束日期
+            
+        Returns:
+            pd.DataFrame: 列为 DERIVED_KLINE_COLUMNS，按日期升序
+        """
+        if period not in PERIOD_BUCKETS:
+            raise ValueError(f"不支持的K线周期: {period}")
+        columns = ["stock_code", "date", "open", "high", "low", "close", "volume", "amount"]
+        source = self._kline_source("daily_kline", columns, start_date, end_date)
+        # 与 factors_on_dates 一致：取当天或之前最新的因子，早于第一条因子的K线用最早的因子，没有因子时为1.0
+        return self.execute_query(f"""
+            WITH adjusted AS (
+                SELECT k.*, {PERIOD_BUCKETS[period]} AS bucket,
+                       COALESCE(
+                           (SELECT hfq_factor FROM adjust_factors f
+                            WHERE f.stock_code = k.stock_code AND f.date <= k.date ORDER BY f.date DESC LIMIT 1),
+                           (SELECT hfq_factor FROM adjust_factors f
+                            WHERE f.stock_code = k.stock_code ORDER BY f.date LIMIT 1),
+                           1.0
+                       ) AS factor
+                FROM {source} AS k
+                WHERE k.stock_code = ? AND k.date BETWEEN ? AND ?
+            ), ranked AS (
+                SELECT *,
+                       factor / FIRST_VALUE(factor) OVER (PARTITION BY bucket ORDER BY date DESC) AS scale,
+                       ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY date) AS first_rank,
+                       ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY date DESC) AS last_rank
+                FROM adjusted
+            )
+            SELECT stock_code, bucket AS date,
+                   MAX(CASE WHEN first_rank = 1 THEN open * scale END) AS open,
+                   MAX(high * scale) AS high,
+                   MIN(low * scale) AS low,
+                   MAX(CASE WHEN last_rank = 1 THEN close END) AS close,
+                   SUM(volume) AS volume,
+                   SUM(amount) AS amount,
+                   MAX(CASE WHEN last_rank = 1 THEN factor END) AS adj_factor
+            FROM ranked
+            GROUP BY stock_code, bucket
+            ORDER BY bucket
+        """, (stock_code, start_date, end_date))
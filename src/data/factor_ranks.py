@@ -0,0 +1,251 @@
+"""
+横截面因子排名模块 - 每个交易日把股息率、PE、PB 在全市场或股票池内排成百分位
+
+按需计算横截面排名需要读取所有股票在每个日期的数据。每日任务一次读取日期区间内全部股票的
+收盘价、近一年分红和 as-of 财务数据组成面板，用按日期分组的 NumPy 排序计算百分位，
+结果存入以 (universe, date, stock_code) 为主键的 factor_ranks 表，扫描可以直接按日期和股票关联。
+增量更新只重算每个范围已存储的最新日期之后的日期。
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import setup_logger
+from .asof import TTM_WINDOW_DAYS, asof_positions, composite_keys, trailing_sums
+
+# 全市场排名的范围名称（数据库中有日K线的全部股票）
+MARKET_UNIVERSE = 'market'
+
+# 参与排名的因子；PE/PB 只对正值排名，亏损或净资产为负的股票没有排名
+RANK_FACTORS = ('dividend_yield', 'pe_ttm', 'pb_mrq')
+
+FACTOR_RANK_COLUMNS = ['universe', 'date', 'stock_code'] + [f'{factor}_pct' for factor in RANK_FACTORS]
+
+
+def grouped_percentile_rank(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    按组计算百分位排名，与 pandas 的 groupby(...).rank(pct=True) 一致
+
+    一次 lexsort 把所有组排好序，组内相同的值取平均名次，百分位为 平均名次 / 组内有效值个数。
+
+    Args:
+        groups: 每个值所属的组（可排序的数组，如日期序号）
+        values: 待排名的值，NaN 不参与排名
+
+    Returns:
+        np.ndarray: (0, 1] 之间的百分位，值越大排名越高，NaN 的位置为 NaN
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid):
+        return result
+    order = np.lexsort((values[valid], np.asarray(groups)[valid]))
+    group, value = np.asarray(groups)[valid][order], values[valid][order]
+    n = len(value)
+
+    group_start = np.r_[True, group[1:] != group[:-1]]
+    starts = np.flatnonzero(group_start)
+    counts = np.diff(np.r_[starts, n])
+    group_id = np.cumsum(group_start) - 1
+    position = np.arange(n) - starts[group_id]
+
+    # 组内相同值的连续段取平均名次
+    tie_start = group_start | np.r_[True, value[1:] != value[:-1]]
+    ties = np.flatnonzero(tie_start)
+    tie_len = np.diff(np.r_[ties, n])
+    tie_id = np.cumsum(tie_start) - 1
+    average_rank = position[ties][tie_id] + 1 + (tie_len[tie_id] - 1) / 2
+
+    result[valid[order]] = average_rank / counts[group_id]
+    return result
+
+
+class FactorRanks:
+    """因子排名类，负责构建横截面面板、计算百分位排名和读取排名"""
+
+    def __init__(self, db):
+        """
+        初始化因子排名
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+        self.logger = setup_logger(__name__)
+
+    def build_panel(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        构建日期区间内全部股票的因子面板
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            pd.DataFrame: 每个 (日期, 股票) 一行，包含 date, stock_code, close 和 RANK_FACTORS，按日期和股票排序
+        """
+        panel = self.db.query_kline(
+            'daily_kline', "date BETWEEN ? AND ?", (start_date, end_date), start_date, end_date,
+            columns="substr(date, 1, 10) AS date, stock_code, close"
+        )
+        if panel.empty:
+            return pd.DataFrame(columns=['date', 'stock_code', 'close', *RANK_FACTORS])
+        panel = panel.sort_values(['date', 'stock_code'], kind='mergesort').reset_index(drop=True)
+
+        dividends = self.db.execute_query(f"""
+            SELECT stock_code, substr(ex_dividend_date, 1, 10) AS date, dividend_per_share_pre_tax AS amount
+            FROM dividend_data
+            WHERE substr(ex_dividend_date, 1, 10) > date(?, '-{TTM_WINDOW_DAYS} days')
+              AND substr(ex_dividend_date, 1, 10) <= ? AND dividend_per_share_pre_tax IS NOT NULL
+        """, (start_date, end_date))
+        # 区间内的财务数据加上每只股票在开始日期之前的最后一条，用于 as-of 关联
+        financials = self.db.execute_query("""
+            SELECT stock_code, date, pe_ttm, pb_mrq FROM (
+                SELECT stock_code, substr(date, 1, 10) AS date, pe_ttm, pb_mrq,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY stock_code, substr(date, 1, 10) >= ? ORDER BY date DESC
+                       ) AS row_number
+                FROM financial_summary WHERE substr(date, 1, 10) <= ?
+            ) WHERE date >= ? OR row_number = 1
+        """, (start_date, end_date, start_date))
+
+        codes = pd.Index(pd.unique(pd.concat([panel['stock_code'], dividends['stock_code'],
+                                              financials['stock_code']], ignore_index=True)))
+
+        def keys(frame: pd.DataFrame) -> np.ndarray:
+            return composite_keys(codes.get_indexer(frame['stock_code']), frame['date'])
+
+        panel_keys = keys(panel)
+
+        # 近一年分红：按 (股票, 除息日) 排序后的累计和之差
+        dividends = dividends.assign(key=keys(dividends)).sort_values('key', kind='mergesort')
+        ttm_dividend = trailing_sums(dividends['key'].to_numpy(), dividends['amount'].to_numpy(), panel_keys)
+        close = panel['close'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            panel['dividend_yield'] = np.where(close > 0, ttm_dividend / close * 100, np.nan)
+
+        # 财务数据取每只股票在当天或之前的最新一条
+        financials = financials.assign(key=keys(financials)).sort_values('key', kind='mergesort')
+        index, matched = asof_positions(financials['key'].to_numpy(), panel_keys)
+        for column in ('pe_ttm', 'pb_mrq'):
+            panel[column] = np.nan
+            if len(financials):
+                picked = financials[column].to_numpy(dtype=float)[index]
+                panel[column] = np.where(matched & (picked > 0), picked, np.nan)
+        return panel
+
+    def rank_panel(self, panel: pd.DataFrame, universe: str) -> pd.DataFrame:
+        """
+        在面板的每个日期内计算百分位排名
+
+        Args:
+            panel: build_panel 返回的面板（已按范围过滤股票）
+            universe: 范围名称
+
+        Returns:
+            pd.DataFrame: 列为 FACTOR_RANK_COLUMNS
+        """
+        result = pd.DataFrame({'universe': universe, 'date': panel['date'], 'stock_code': panel['stock_code']})
+        groups = panel['date'].to_numpy()
+        for factor in RANK_FACTORS:
+            result[f'{factor}_pct'] = grouped_percentile_rank(groups, panel[factor].to_numpy(dtype=float))
+        return result[FACTOR_RANK_COLUMNS].reset_index(drop=True)
+
+    def compute(self,
+                universes: Dict[str, Optional[List[str]]],
+                start_date: str,
+                end_date: str,
+                panel: Optional[pd.DataFrame] = None) -> Dict[str, int]:
+        """
+        计算并保存日期区间内各范围的排名，区间内已有的排名被替换
+
+        Args:
+            universes: 范围名称 -> 股票代码列表，为 None 时为全市场
+            start_date: 开始日期
+            end_date: 结束日期
+            panel: 已构建的面板（可选），需覆盖日期区间
+
+        Returns:
+            Dict[str, int]: 范围名称 -> 写入的行数
+        """
+        if panel is None:
+            panel = self.build_panel(start_date, end_date)
+        in_range = panel[(panel['date'] >= start_date) & (panel['date'] <= end_date)]
+        written = {}
+        try:
+            for universe, stock_codes in universes.items():
+                members = in_range if stock_codes is None else in_range[in_range['stock_code'].isin(stock_codes)]
+                ranks = self.rank_panel(members, universe)
+                self.db.conn.execute("DELETE FROM factor_ranks WHERE universe = ? AND date BETWEEN ? AND ?",
+                                     (universe, start_date, end_date))
+                frame = ranks.astype(object).where(ranks.notna(), None)
+                self.db.conn.executemany(
+                    f"INSERT INTO factor_ranks ({', '.join(FACTOR_RANK_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(FACTOR_RANK_COLUMNS))})",
+                    list(frame.itertuples(index=False, name=None))
+                )
+                written[universe] = len(ranks)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"计算因子排名失败: {str(e)}")
+        return written
+
+    def update(self, universes: Dict[str, Optional[List[str]]], end_date: Optional[str] = None) -> Dict[str, int]:
+        """
+        增量更新排名：每个范围从已存储的最新日期（可能又写入了股票）重算到最新的K线日期，
+        没有排名的范围只计算最新日期
+
+        Args:
+            universes: 范围名称 -> 股票代码列表，为 None 时为全市场
+            end_date: 结束日期（可选），默认为日K线的最新日期
+
+        Returns:
+            Dict[str, int]: 范围名称 -> 写入的行数
+        """
+        if end_date is None:
+            end_date = self.db.conn.execute("SELECT MAX(substr(date, 1, 10)) FROM daily_kline").fetchone()[0]
+        if end_date is None:
+            return {}
+        starts = {}
+        for universe in universes:
+            last = self.db.conn.execute("SELECT MAX(date) FROM factor_ranks WHERE universe = ? AND date <= ?",
+                                        (universe, end_date)).fetchone()[0]
+            starts[universe] = last or end_date
+        panel = self.build_panel(min(starts.values()), end_date)
+        written = {}
+        for universe, stock_codes in universes.items():
+            written.update(self.compute({universe: stock_codes}, starts[universe], end_date, panel))
+        self.logger.info(f"因子排名更新到 {end_date}: {written}")
+        return written
+
+    def query(self,
+              universe: str = MARKET_UNIVERSE,
+              date: Optional[str] = None,
+              stock_codes: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        读取某个日期的排名
+
+        Args:
+            universe: 范围名称
+            date: 日期（可选），默认为该范围已存储的最新日期
+            stock_codes: 股票代码列表（可选）
+
+        Returns:
+            pd.DataFrame: 列为 FACTOR_RANK_COLUMNS，按股票代码排序
+        """
+        if date is None:
+            date = self.db.conn.execute("SELECT MAX(date) FROM factor_ranks WHERE universe = ?",
+                                        (universe,)).fetchone()[0]
+        if date is None:
+            return pd.DataFrame(columns=FACTOR_RANK_COLUMNS)
+        where, params = "universe = ? AND date = ?", [universe, date]
+        if stock_codes:
+            where += f" AND stock_code IN ({','.join('?' * len(stock_codes))})"
+            params.extend(stock_codes)
+        return self.db.execute_query(
+            f"SELECT {', '.join(FACTOR_RANK_COLUMNS)} FROM factor_ranks WHERE {where} ORDER BY stock_code",
+            tuple(params)
+        )
@@ -0,0 +1,168 @@
+"""
+请求去重模块 - 持久化的空结果缓存和并发请求合并
+
+两类浪费的请求：
+    - 负缓存：从未分红的股票、数据源返回空结果的股票，数据库里没有数据，每次读取都会重新请求。
+      空结果记录在 negative_cache 表中，按数据类型配置有效期（小时），有效期内直接返回空结果。
+    - 并发合并（single-flight）：多个线程同时请求同一个 (接口, 参数) 时，只有第一个发出请求，
+      其余等待并共享它的结果或异常。
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 各数据类型空结果的默认有效期（小时），未列出的数据类型不缓存空结果
+DEFAULT_NEGATIVE_CACHE_TTL_HOURS = {
+    "dividend": 168,
+    "financial": 24,
+    "adjust_factors": 24,
+}
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class NegativeCache:
+    """空结果缓存，记录数据源确认没有数据的 (数据类型, 股票)"""
+
+    def __init__(self, db, ttl_hours: Optional[Dict[str, float]] = None):
+        """
+        初始化空结果缓存
+
+        Args:
+            db: DatabaseHandler实例
+            ttl_hours: 数据类型 -> 有效期（小时），默认为 DEFAULT_NEGATIVE_CACHE_TTL_HOURS
+        """
+        self.db = db
+        self.ttl_hours = dict(DEFAULT_NEGATIVE_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours)
+
+    def is_fresh(self, data_type: str, stock_code: str, now: Optional[datetime] = None) -> bool:
+        """
+        判断是否有未过期的空结果记录
+
+        Args:
+            data_type: 数据类型
+            stock_code: 股票代码
+            now: 当前时间（可选），默认为现在
+
+        Returns:
+            bool: 有效期内确认过没有数据时为 True
+        """
+        ttl = self.ttl_hours.get(data_type, 0)
+        if ttl <= 0:
+            return False
+        row = self.db.conn.execute(
+            "SELECT checked_at FROM negative_cache WHERE data_type = ? AND stock_code = ?", (data_type, stock_code)
+        ).fetchone()
+        if row is None:
+            return False
+        expires_at = datetime.strptime(row[0], _TIME_FORMAT) + timedelta(hours=ttl)
+        return (now or datetime.now()) < expires_at
+
+    def record(self, data_type: str, stock_code: str, now: Optional[datetime] = None) -> None:
+        """
+        记录数据源返回了空结果
+
+        Args:
+            data_type: 数据类型
+            stock_code: 股票代码
+            now: 当前时间（可选），默认为现在
+        """
+        if self.ttl_hours.get(data_type, 0) <= 0:
+            return
+        checked_at = (now or datetime.now()).strftime(_TIME_FORMAT)
+        try:
+            self.db.conn.execute(
+                "INSERT OR REPLACE INTO negative_cache (data_type, stock_code, checked_at) VALUES (?, ?, ?)",
+                (data_type, stock_code, checked_at)
+            )
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"记录{stock_code}的{data_type}空结果失败: {str(e)}")
+
+    def clear(self, data_type: Optional[str] = None, stock_code: Optional[str] = None) -> int:
+        """
+        删除空结果记录
+
+        Args:
+            data_type: 数据类型（可选），默认为全部
+            stock_code: 股票代码（可选），默认为全部
+
+        Returns:
+            int: 删除的记录数
+        """
+        conditions, params = [], []
+        if data_type is not None:
+            conditions.append("data_type = ?")
+            params.append(data_type)
+        if stock_code is not None:
+            conditions.append("stock_code = ?")
+            params.append(stock_code)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            cursor = self.db.conn.execute(f"DELETE FROM negative_cache{where}", params)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"删除空结果记录失败: {str(e)}")
+        return cursor.rowcount
+
+
+class _Call:
+    """一次进行中的请求"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并相同键的并发请求，同一时刻每个键只执行一次"""
+
+    def __init__(self):
+        """初始化"""
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable, *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """
+        执行函数；已有相同键的请求在进行时等待它完成并共享结果
+
+        Args:
+            key: 请求的键，如 (接口, 参数)
+            func: 要执行的函数
+            *args: 函数参数
+            **kwargs: 函数关键字参数
+
+        Returns:
+            Tuple[Any, bool]: (结果, 结果是否被多个调用方共享)。共享的结果不应原地修改
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+        return call.result, shared
@@ -0,0 +1,297 @@
+"""
+进程隔离的数据获取模块 - 在 worker 进程中调用 akshare，强制每次调用的超时
+
+akshare 的调用可能因为卡住的连接或缓慢的解析而无限期挂起。ProcessFetchPool 在独立进程中执行调用：
+    - 每次调用有墙钟截止时间，超时的 worker 进程被杀掉并在下次使用时重新创建
+    - worker 数决定可同时进行的调用数，多个线程共用一个池
+    - 结果按列以 NumPy 缓冲区传回，不 pickle DataFrame：数值和日期列直接传原始字节，
+      字符串列按 Arrow 的 offsets + UTF-8 数据布局编码
+"""
+import importlib
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import setup_logger
+
+DEFAULT_CALL_TIMEOUT_SECONDS = 120.0
+DEFAULT_STARTUP_TIMEOUT_SECONDS = 120.0
+
+# 列的编码方式
+COLUMN_NUMERIC = "numeric"
+COLUMN_STRING = "string"
+
+# 可以按数值传输的 infer_dtype 结果
+_NUMERIC_INFERRED = ("integer", "floating", "mixed-integer-float", "decimal")
+_DATE_INFERRED = ("date", "datetime", "datetime64")
+
+logger = setup_logger(__name__)
+
+
+class FetchTimeoutError(Exception):
+    """调用超过截止时间，worker 进程已被终止"""
+
+
+def encode_frame(df: pd.DataFrame) -> Tuple[Dict[str, Any], List[bytes]]:
+    """
+    把 DataFrame 编码为列描述和缓冲区列表
+
+    数值、布尔和日期列传原始字节；只含数字或日期对象的 object 列先转换为数值或日期；
+    其余列转为字符串，编码为 int64 偏移、UTF-8 数据和有效位三个缓冲区。
+
+    Args:
+        df: 要编码的数据
+
+    Returns:
+        Tuple[Dict[str, Any], List[bytes]]: (列描述, 缓冲区)
+    """
+    columns = []
+    buffers: List[bytes] = []
+    for name in df.columns:
+        series = df[name]
+        values = series.to_numpy()
+        if values.dtype.kind not in "biufcmM":
+            inferred = pd.api.types.infer_dtype(series, skipna=True)
+            if inferred in _NUMERIC_INFERRED:
+                values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+            elif inferred in _DATE_INFERRED:
+                values = pd.to_datetime(series, errors="coerce").to_numpy(dtype="datetime64[ns]")
+        if values.dtype.kind in "biufcmM":
+            columns.append({"name": name, "kind": COLUMN_NUMERIC, "dtype": values.dtype.str})
+            buffers.append(np.ascontiguousarray(values).tobytes())
+            continue
+        valid = ~pd.isna(series).to_numpy(dtype=bool)
+        encoded = [str(value).encode("utf-8") if ok else b"" for value, ok in zip(values, valid)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded], dtype=np.int64)
+        columns.append({"name": name, "kind": COLUMN_STRING})
+        buffers.extend([offsets.tobytes(), b"".join(encoded), valid.tobytes()])
+    return {"columns": columns, "rows": len(df)}, buffers
+
+
+def decode_frame(header: Dict[str, Any], buffers: List[bytes]) -> pd.DataFrame:
+    """
+    从列描述和缓冲区还原 DataFrame
+
+    Args:
+        header: encode_frame 返回的列描述
+        buffers: encode_frame 返回的缓冲区
+
+    Returns:
+        pd.DataFrame: 还原的数据
+    """
+    data = {}
+    position = 0
+    for column in header["columns"]:
+        if column["kind"] == COLUMN_NUMERIC:
+            data[column["name"]] = np.frombuffer(buffers[position], dtype=np.dtype(column["dtype"]))
+            position += 1
+            continue
+        offsets = np.frombuffer(buffers[position], dtype=np.int64)
+        raw = buffers[position + 1]
+        valid = np.frombuffer(buffers[position + 2], dtype=bool)
+        position += 3
+        values = np.empty(header["rows"], dtype=object)
+        for i in range(header["rows"]):
+            values[i] = raw[offsets[i]:offsets[i + 1]].decode("utf-8") if valid[i] else None
+        data[column["name"]] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(header["rows"]))
+
+
+def _worker_main(conn, module_name: str, data_source: Dict[str, Any]) -> None:
+    """
+    worker 进程入口：导入数据源模块后循环执行调用请求
+
+    Args:
+        conn: 与主进程通信的管道
+        module_name: 数据源模块名（默认为 akshare）
+        data_source: 配置文件中的 data_source 部分，用于安装HTTP连接池
+    """
+    from .http_pool import install_session_pool
+    install_session_pool(data_source, 1)
+    module = importlib.import_module(module_name)
+    conn.send({"ready": True})
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        endpoint, args, kwargs = request
+        try:
+            result = getattr(module, endpoint)(*args, **kwargs)
+            if result is None:
+                result = pd.DataFrame()
+            if not isinstance(result, pd.DataFrame):
+                raise TypeError(f"返回类型不是 DataFrame: {type(result).__name__}")
+            header, buffers = encode_frame(result)
+        except Exception as e:
+            conn.send({"error": f"{type(e).__name__}: {str(e)}"})
+            continue
+        conn.send(header)
+        for buffer in buffers:
+            conn.send_bytes(buffer)
+
+
+class _Worker:
+    """一个 worker 进程及其管道"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def kill(self) -> None:
+        """终止进程并关闭管道"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ProcessFetchPool:
+    """在 worker 进程中执行数据源调用的进程池，每次调用有截止时间"""
+
+    def __init__(self,
+                 processes: int = 2,
+                 call_timeout: float = DEFAULT_CALL_TIMEOUT_SECONDS,
+                 module_name: str = "akshare",
+                 data_source: Optional[Dict[str, Any]] = None,
+                 startup_timeout: float = DEFAULT_STARTUP_TIMEOUT_SECONDS):
+        """
+        初始化进程池，worker 进程在首次使用时创建
+
+        Args:
+            processes: worker 进程数，即可同时进行的调用数
+            call_timeout: 单次调用的截止时间（秒）
+            module_name: 数据源模块名
+            data_source: 配置文件中的 data_source 部分，传给 worker 安装HTTP连接池
+            startup_timeout: 等待 worker 导入数据源模块的时间（秒），不计入调用的截止时间
+        """
+        if processes < 1:
+            raise ValueError(f"worker 进程数必须为正数: {processes}")
+        self.processes = processes
+        self.call_timeout = call_timeout
+        self.module_name = module_name
+        self.data_source = data_source or {}
+        self.startup_timeout = startup_timeout
+        # spawn 启动的进程不继承父进程的线程和数据库连接
+        self._context = multiprocessing.get_context("spawn")
+        # 空闲的 worker，None 表示尚未创建或已被终止的位置
+        self._idle: queue.Queue = queue.Queue()
+        for _ in range(processes):
+            self._idle.put(None)
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, data_source: Dict[str, Any]) -> 'ProcessFetchPool':
+        """
+        按 data_source 配置创建进程池
+
+        Args:
+            data_source: 配置文件中的 data_source 部分
+
+        Returns:
+            ProcessFetchPool: 进程池
+        """
+        return cls(
+            processes=data_source.get("fetch_processes", 2),
+            call_timeout=data_source.get("fetch_call_timeout_seconds", DEFAULT_CALL_TIMEOUT_SECONDS),
+            data_source=data_source,
+        )
+
+    def _spawn(self) -> _Worker:
+        """
+        创建 worker 进程并等待它导入数据源模块
+
+        Returns:
+            _Worker: 就绪的 worker
+        """
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.module_name, self.data_source), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        try:
+            if not parent_conn.poll(self.startup_timeout):
+                raise FetchTimeoutError(f"worker 进程启动超过{self.startup_timeout}秒")
+            parent_conn.recv()
+        except (EOFError, OSError, FetchTimeoutError) as e:
+            worker.kill()
+            raise Exception(f"启动数据获取进程失败: {str(e)}")
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _discard(self, worker: _Worker) -> None:
+        """终止并移除 worker"""
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def _receive(self, conn, deadline: float, endpoint: str, bytes_message: bool = False) -> Any:
+        """在截止时间前接收一条消息"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not conn.poll(remaining):
+            raise FetchTimeoutError(f"调用 {endpoint} 超过{self.call_timeout}秒，已终止 worker 进程")
+        return conn.recv_bytes() if bytes_message else conn.recv()
+
+    def call(self, endpoint: str, *args: Any, **kwargs: Any) -> pd.DataFrame:
+        """
+        在 worker 进程中调用数据源函数
+
+        Args:
+            endpoint: 数据源模块中的函数名
+            *args: 函数参数
+            **kwargs: 函数关键字参数
+
+        Returns:
+            pd.DataFrame: 函数返回的数据
+
+        Raises:
+            FetchTimeoutError: 调用超过截止时间
+        """
+        worker = self._idle.get()
+        try:
+            if worker is None:
+                worker = self._spawn()
+            deadline = time.monotonic() + self.call_timeout
+            worker.conn.send((endpoint, args, kwargs))
+            header = self._receive(worker.conn, deadline, endpoint)
+            if "error" in header:
+                raise Exception(f"调用 {endpoint} 失败: {header['error']}")
+            buffer_count = sum(3 if column["kind"] == COLUMN_STRING else 1 for column in header["columns"])
+            buffers = [self._receive(worker.conn, deadline, endpoint, bytes_message=True)
+                       for _ in range(buffer_count)]
+            return decode_frame(header, buffers)
+        except (FetchTimeoutError, EOFError, OSError) as e:
+            if worker is not None:
+                self._discard(worker)
+                worker = None
+            if isinstance(e, FetchTimeoutError):
+                logger.warning(str(e))
+                raise
+            raise Exception(f"数据获取进程异常退出: {str(e)}")
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """通知所有 worker 退出并等待结束"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            worker.kill()
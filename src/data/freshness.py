@@ -0,0 +1,264 @@
+"""
+数据新鲜度模块 - 按数据类型的策略判断每个 (股票, 数据类型) 是否需要请求数据源
+
+每次更新都请求所有股票的全部数据类型，而大多数请求拿不到新数据：分红和财务只在公告、
+报告季前后变化，停牌的股票没有新K线，非交易日所有K线都不会变化。fetch_state 表记录每个
+(数据类型, 股票) 上次成功请求的时间 checked_at 和上次请求带来变化的时间 changed_at（由变更日志判断），
+策略结合这两个时间、报告季窗口和交易日历决定请求是否到期：
+
+    - after_trading_day: 上次请求之后没有新收盘的交易日时不请求
+    - min_interval_hours: 两次请求的最小间隔
+    - seasons / season_interval_hours: 处于 ["MM-DD", "MM-DD"] 窗口内时使用较短的间隔
+    - idle_days / idle_interval_hours: 数据超过 idle_days 天没有变化时（停牌、从不分红）放宽到较长的间隔
+    - on_ex_dividend: 上次请求之后经过了已知的除权除息日时立即请求（复权因子）
+
+策略在 config.json 的 freshness 部分按数据类型配置，未配置策略的数据类型（如插件）总是请求。
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .trading_calendar import TradingCalendar
+
+# A股定期报告的披露窗口：年报和一季报（4月底前）、半年报（8月底前）、三季报（10月底前）
+REPORT_SEASONS = [["03-15", "04-30"], ["08-01", "08-31"], ["10-15", "10-31"]]
+
+# 各数据类型的默认策略
+DEFAULT_FRESHNESS_POLICIES: Dict[str, Dict[str, Any]] = {
+    "kline": {
+        "after_trading_day": True,
+        "idle_days": 10,
+        "idle_interval_hours": 72,
+    },
+    "adjust_factors": {
+        "min_interval_hours": 720,
+        "on_ex_dividend": True,
+    },
+    "financial": {
+        "after_trading_day": True,
+        "min_interval_hours": 168,
+        "seasons": REPORT_SEASONS,
+        "season_interval_hours": 24,
+    },
+    "dividend": {
+        "min_interval_hours": 720,
+        "seasons": [["03-15", "08-31"]],
+        "season_interval_hours": 72,
+        "idle_days": 400,
+        "idle_interval_hours": 2160,
+    },
+}
+
+# 数据类型 -> 请求写入的表，用变更日志判断请求是否带来了变化
+DATA_TYPE_TABLES = {
+    "kline": ["daily_kline"],
+    "adjust_factors": ["adjust_factors"],
+    "financial": ["financial_summary"],
+    "dividend": ["dividend_data"],
+}
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def in_season(day: datetime, seasons: Iterable[List[str]]) -> bool:
+    """
+    判断日期是否处于某个 ["MM-DD", "MM-DD"] 窗口内（含两端，开始晚于结束时跨年）
+
+    Args:
+        day: 日期
+        seasons: 窗口列表
+
+    Returns:
+        bool: 是否处于窗口内
+    """
+    month_day = day.strftime("%m-%d")
+    for start, end in seasons:
+        if (start <= month_day <= end) if start <= end else (month_day >= start or month_day <= end):
+            return True
+    return False
+
+
+class FreshnessPolicy:
+    """新鲜度策略类，负责判断请求是否到期和记录请求结果"""
+
+    def __init__(self,
+                 db,
+                 config: Optional[Dict[str, Any]] = None,
+                 calendar: Optional[TradingCalendar] = None):
+        """
+        初始化新鲜度策略
+
+        Args:
+            db: DatabaseHandler实例
+            config: config.json 中的 freshness 部分（可选），enabled 为 false 时所有请求都到期，
+                其余键为数据类型，覆盖 DEFAULT_FRESHNESS_POLICIES 中的同名字段
+            calendar: 交易日历（可选）
+        """
+        config = dict(config or {})
+        self.db = db
+        self.enabled = config.pop("enabled", True)
+        self.policies = {data_type: dict(policy) for data_type, policy in DEFAULT_FRESHNESS_POLICIES.items()}
+        for data_type, policy in config.items():
+            self.policies.setdefault(data_type, {}).update(policy)
+        self.calendar = calendar or TradingCalendar(db)
+
+    def due_units(self,
+                  stock_codes: List[str],
+                  data_types: List[str],
+                  now: Optional[datetime] = None) -> List[Tuple[str, str]]:
+        """
+        筛选需要请求的 (股票, 数据类型)
+
+        Args:
+            stock_codes: 股票代码列表
+            data_types: 数据类型列表
+            now: 当前时间（可选），默认为现在
+
+        Returns:
+            List[Tuple[str, str]]: 到期的 (股票代码, 数据类型)，顺序与输入一致
+        """
+        units = [(stock_code, data_type) for stock_code in stock_codes for data_type in data_types]
+        if not self.enabled or not units:
+            return units
+        now = now or datetime.now()
+        states = self._load_states([data_type for data_type in data_types if data_type in self.policies])
+        ex_dates = self._latest_ex_dividend_dates(now) if any(
+            self.policies.get(data_type, {}).get("on_ex_dividend") for data_type in data_types) else {}
+        # 同一次筛选中交易日的判断只依赖上次请求时间，按时间缓存
+        traded: Dict[str, bool] = {}
+        due = []
+        for stock_code, data_type in units:
+            policy = self.policies.get(data_type)
+            state = states.get((data_type, stock_code))
+            if policy is None or state is None or self._is_due(policy, state, ex_dates.get(stock_code), now, traded):
+                due.append((stock_code, data_type))
+        return due
+
+    def is_due(self, stock_code: str, data_type: str, now: Optional[datetime] = None) -> bool:
+        """
+        判断单个 (股票, 数据类型) 是否需要请求
+
+        Args:
+            stock_code: 股票代码
+            data_type: 数据类型
+            now: 当前时间（可选），默认为现在
+
+        Returns:
+            bool: 是否需要请求
+        """
+        return bool(self.due_units([stock_code], [data_type], now))
+
+    def _is_due(self,
+                policy: Dict[str, Any],
+                state: Tuple[str, str],
+                latest_ex_date: Optional[str],
+                now: datetime,
+                traded: Dict[str, bool]) -> bool:
+        """
+        按策略判断已有请求记录的单元是否到期
+
+        Args:
+            policy: 数据类型的策略
+            state: (checked_at, changed_at)
+            latest_ex_date: 股票在今天或之前的最近一个除权除息日（可选）
+            now: 当前时间
+            traded: 上次请求时间 -> 之后是否有新收盘的交易日
+
+        Returns:
+            bool: 是否到期
+        """
+        checked_at = datetime.strptime(state[0], _TIME_FORMAT)
+        if policy.get("on_ex_dividend") and latest_ex_date and latest_ex_date > state[0][:10]:
+            return True
+        if policy.get("after_trading_day"):
+            if state[0] not in traded:
+                traded[state[0]] = self._trading_day_closed_since(checked_at, now)
+            if not traded[state[0]]:
+                return False
+        interval = policy.get("min_interval_hours", 0)
+        if policy.get("season_interval_hours") is not None and in_season(now, policy.get("seasons", [])):
+            interval = min(interval, policy["season_interval_hours"])
+        if policy.get("idle_days") is not None:
+            changed_at = datetime.strptime(state[1], _TIME_FORMAT)
+            if now - changed_at >= timedelta(days=policy["idle_days"]):
+                interval = max(interval, policy.get("idle_interval_hours", 0))
+        return now - checked_at >= timedelta(hours=interval)
+
+    def _trading_day_closed_since(self, checked_at: datetime, now: datetime) -> bool:
+        """
+        判断上次请求之后是否有新收盘的交易日
+
+        Args:
+            checked_at: 上次请求时间
+            now: 当前时间
+
+        Returns:
+            bool: 是否有新收盘的交易日；本地交易日历没有覆盖时按工作日判断
+        """
+        checked_settled = self.calendar.settled_end_date(checked_at.strftime("%Y-%m-%d"), checked_at)
+        settled = self.calendar.settled_end_date(now.strftime("%Y-%m-%d"), now)
+        if settled <= checked_settled:
+            return False
+        last_date = self.calendar.last_date()
+        if last_date is not None and last_date >= settled:
+            return any(day > checked_settled for day in self.calendar.trading_days(checked_settled, settled))
+        return any(day.weekday() < 5 for day in pd.date_range(checked_settled, settled)[1:])
+
+    def _load_states(self, data_types: List[str]) -> Dict[Tuple[str, str], Tuple[str, str]]:
+        """读取数据类型的请求记录：(数据类型, 股票) -> (checked_at, changed_at)"""
+        if not data_types:
+            return {}
+        rows = self.db.conn.execute(f"""
+            SELECT data_type, stock_code, checked_at, changed_at FROM fetch_state
+            WHERE data_type IN ({','.join('?' * len(data_types))})
+        """, tuple(data_types)).fetchall()
+        return {(data_type, stock_code): (checked_at, changed_at)
+                for data_type, stock_code, checked_at, changed_at in rows}
+
+    def _latest_ex_dividend_dates(self, now: datetime) -> Dict[str, str]:
+        """读取每只股票在今天或之前的最近一个除权除息日"""
+        rows = self.db.conn.execute("""
+            SELECT stock_code, MAX(substr(ex_dividend_date, 1, 10)) FROM dividend_data
+            WHERE substr(ex_dividend_date, 1, 10) <= ? GROUP BY stock_code
+        """, (now.strftime("%Y-%m-%d"),)).fetchall()
+        return dict(rows)
+
+    def record_results(self,
+                       stock_code: str,
+                       results: Dict[str, Optional[bool]],
+                       since_version: int,
+                       now: Optional[datetime] = None) -> None:
+        """
+        记录一只股票成功请求的数据类型，请求写入了数据时同时更新 changed_at
+
+        Args:
+            stock_code: 股票代码
+            results: 数据类型 -> 是否成功，只记录成功的类型
+            since_version: 请求前的变更日志版本号
+            now: 当前时间（可选），默认为现在
+        """
+        succeeded = [data_type for data_type, ok in results.items() if ok]
+        if not succeeded:
+            return
+        timestamp = (now or datetime.now()).strftime(_TIME_FORMAT)
+        dirty = self.db.journal.dirty_since(since_version, stock_codes=[stock_code])
+        changed_tables = set(dirty["table_name"]) if dirty is not None else set()
+        rows = []
+        for data_type in succeeded:
+            # 不知道写入哪些表的数据类型视为每次都有变化
+            tables = DATA_TYPE_TABLES.get(data_type)
+            changed = tables is None or bool(changed_tables.intersection(tables))
+            rows.append((data_type, stock_code, timestamp, timestamp, changed))
+        try:
+            # 首次记录时 changed_at 为本次请求时间，没有变化的数据从首次请求起计算空闲天数
+            self.db.conn.executemany("""
+                INSERT INTO fetch_state (data_type, stock_code, checked_at, changed_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (data_type, stock_code) DO UPDATE SET
+                    checked_at = excluded.checked_at,
+                    changed_at = CASE WHEN ? THEN excluded.changed_at ELSE fetch_state.changed_at END
+            """, rows)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"记录请求状态失败: {str(e)}")
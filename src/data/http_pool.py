@@ -0,0 +1,207 @@
+"""
+HTTP连接池模块 - 为 akshare 的 HTTP 请求提供共享的长连接、代理和超时
+
+akshare 的接口直接调用 requests.get/requests.post，每次请求都新建会话、重新建立连接和 TLS 握手。
+安装连接池后，requests 的模块级请求函数改为通过共享的 HTTPAdapter 发送：
+    - 连接在请求之间保持，连接池大小与并发获取数据的 worker 数一致
+    - 每个线程使用自己的 Session（Session 不保证线程安全），所有 Session 共用同一个连接池
+    - 按 data_source.proxies 设置代理，配置多个代理时按请求轮换
+    - 调用方没有指定超时时使用配置的连接/读取超时
+"""
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+import requests
+import requests.api
+from requests.adapters import HTTPAdapter
+
+from ..utils.logger import setup_logger
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 5.0
+DEFAULT_READ_TIMEOUT_SECONDS = 30.0
+
+logger = setup_logger(__name__)
+
+# 当前进程中已安装的连接池
+_installed: Optional['HttpSessionPool'] = None
+_original_request = requests.api.request
+
+
+def _normalize_proxies(proxies: Union[None, str, Dict[str, str], List[Any]]) -> List[Dict[str, str]]:
+    """
+    把代理配置统一为 requests 的 proxies 字典列表
+
+    Args:
+        proxies: 代理地址字符串、{"http": ..., "https": ...} 字典，或它们的列表
+
+    Returns:
+        List[Dict[str, str]]: 代理字典列表，没有配置代理时为空
+    """
+    if not proxies:
+        return []
+    if isinstance(proxies, (str, dict)):
+        proxies = [proxies]
+    normalized = []
+    for proxy in proxies:
+        if isinstance(proxy, str):
+            normalized.append({"http": proxy, "https": proxy})
+        elif isinstance(proxy, dict):
+            normalized.append(dict(proxy))
+        else:
+            raise ValueError(f"无效的代理配置: {proxy}")
+    return normalized
+
+
+class HttpSessionPool:
+    """共享的 HTTP 长连接池，负责代理轮换和默认超时"""
+
+    def __init__(self,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 proxies: Union[None, str, Dict[str, str], List[Any]] = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT_SECONDS):
+        """
+        初始化连接池
+
+        Args:
+            pool_size: 每个主机保持的最大连接数，应与并发 worker 数一致
+            proxies: 代理配置，多个代理时按请求轮换
+            connect_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒）
+        """
+        if pool_size < 1:
+            raise ValueError(f"连接池大小必须为正数: {pool_size}")
+        self.pool_size = pool_size
+        self.proxies = _normalize_proxies(proxies)
+        self.timeout = (connect_timeout, read_timeout)
+        # 连接池满时等待空闲连接，而不是新建用完即丢的连接
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self._proxy_cycle = itertools.cycle(self.proxies) if self.proxies else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+
+    @classmethod
+    def from_config(cls, data_source: Dict[str, Any], workers: Optional[int] = None) -> 'HttpSessionPool':
+        """
+        按 data_source 配置创建连接池
+
+        Args:
+            data_source: 配置文件中的 data_source 部分
+            workers: 并发获取数据的 worker 数（可选），默认取 http_pool_size
+
+        Returns:
+            HttpSessionPool: 连接池
+        """
+        return cls(
+            pool_size=workers or data_source.get("http_pool_size") or DEFAULT_POOL_SIZE,
+            proxies=data_source.get("proxies"),
+            connect_timeout=data_source.get("connect_timeout_seconds", DEFAULT_CONNECT_TIMEOUT_SECONDS),
+            read_timeout=data_source.get("read_timeout_seconds", DEFAULT_READ_TIMEOUT_SECONDS),
+        )
+
+    def settings(self) -> tuple:
+        """连接池的配置，用于判断是否需要重新安装"""
+        return self.pool_size, self.proxies, self.timeout
+
+    def session(self) -> requests.Session:
+        """
+        获取当前线程的 Session，首次调用时创建并挂载共享的 HTTPAdapter
+
+        Returns:
+            requests.Session: 当前线程的 Session
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def next_proxies(self) -> Optional[Dict[str, str]]:
+        """
+        获取下一次请求使用的代理
+
+        Returns:
+            Optional[Dict[str, str]]: 代理字典，没有配置代理时为 None
+        """
+        if self._proxy_cycle is None:
+            return None
+        with self._lock:
+            return next(self._proxy_cycle)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        通过连接池发送请求，签名与 requests.request 一致
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            **kwargs: requests.request 的其余参数
+
+        Returns:
+            requests.Response: 响应
+        """
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if kwargs.get("proxies") is None:
+            proxies = self.next_proxies()
+            if proxies is not None:
+                kwargs["proxies"] = proxies
+        return self.session().request(method=method, url=url, **kwargs)
+
+    def close(self) -> None:
+        """关闭所有 Session 和连接"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self.adapter.close()
+
+
+def install_session_pool(data_source: Dict[str, Any], workers: Optional[int] = None) -> HttpSessionPool:
+    """
+    安装进程内共享的连接池，requests.get/post 等模块级函数改为通过连接池发送
+
+    配置没有变化时复用已安装的连接池，保留已建立的连接。
+
+    Args:
+        data_source: 配置文件中的 data_source 部分
+        workers: 并发获取数据的 worker 数（可选）
+
+    Returns:
+        HttpSessionPool: 已安装的连接池
+    """
+    global _installed
+    pool = HttpSessionPool.from_config(data_source, workers)
+    if _installed is not None and _installed.settings() == pool.settings():
+        return _installed
+    uninstall_session_pool()
+    requests.api.request = pool.request
+    _installed = pool
+    logger.info(f"HTTP连接池已安装，连接数 {pool.pool_size}，代理 {len(pool.proxies)} 个")
+    return pool
+
+
+def uninstall_session_pool() -> None:
+    """恢复 requests 的默认行为并关闭已安装的连接池"""
+    global _installed
+    requests.api.request = _original_request
+    if _installed is not None:
+        _installed.close()
+        _installed = None
+
+
+def get_session_pool() -> Optional[HttpSessionPool]:
+    """
+    获取当前进程中已安装的连接池
+
+    Returns:
+        Optional[HttpSessionPool]: 连接池，未安装时为 None
+    """
+    return _installed
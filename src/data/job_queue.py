@@ -0,0 +1,475 @@
+"""
+工作队列模块 - 基于共享SQLite文件的多进程/多主机任务队列
+
+协调者把按股票拆分的工作单元写入队列文件，任意数量的 worker 进程（可以在共享同一存储的
+不同主机上）以限时租约的方式领取单元、定期续约，租约过期的单元会被重新放回队列。
+
+注意：
+    - 队列文件使用默认的回滚日志模式而不是WAL，WAL依赖共享内存，不能跨主机使用。
+    - 租约时间基于各主机的系统时钟，主机之间的时钟偏差应远小于租约时长。
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ..utils.logger import setup_logger
+
+STATUS_PENDING = 'pending'
+STATUS_LEASED = 'leased'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class UnitDeferred(Exception):
+    """处理函数抛出表示单元暂时无法执行（如接口熔断），单元放回队列且不消耗领取次数"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        """
+        初始化异常
+
+        Args:
+            message: 推迟原因
+            retry_after: 建议的等待秒数，worker 在领取下一批单元前等待
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def default_worker_id() -> str:
+    """
+    生成在多主机环境下唯一的 worker 标识
+
+    Returns:
+        str: 主机名-进程号-随机后缀
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """任务队列类，负责工作单元的入队、租约领取、续约、完成和失败处理"""
+
+    def __init__(self,
+                 path: str,
+                 lease_seconds: float = 300.0,
+                 max_attempts: int = 3,
+                 busy_timeout_seconds: float = 30.0):
+        """
+        初始化任务队列
+
+        Args:
+            path: 队列数据库文件路径（多主机使用时应位于共享存储上）
+            lease_seconds: 每次领取或续约的租约时长（秒）
+            max_attempts: 单个工作单元的最大领取次数，超过后标记为失败
+            busy_timeout_seconds: 等待其他进程释放数据库锁的超时时间（秒）
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self.initialize()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        打开一个立即获取写锁的事务，保证领取等操作在多进程间是原子的
+
+        每次操作使用独立连接，因此同一个 JobQueue 可以在心跳线程中安全使用。
+
+        Yields:
+            sqlite3.Connection: 处于事务中的连接
+        """
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def initialize(self) -> None:
+        """初始化队列表结构"""
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue_units (
+                    unit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    queue_name TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    stock_code TEXT NOT NULL,
+                    payload TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    updated_at REAL,
+                    UNIQUE (queue_name, kind, stock_code)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_queue_units_status
+                ON queue_units (queue_name, status, unit_id)
+            """)
+
+    def enqueue(self,
+                queue_name: str,
+                kind: str,
+                stock_codes: List[str],
+                payload: Optional[Dict[str, Any]] = None) -> int:
+        """
+        将一批股票的工作单元放入队列
+
+        同一队列中已存在的相同 (kind, stock_code) 单元如果已经结束（完成或失败），
+        会以新的参数重新置为待处理；正在被领取的单元保持不变。
+
+        Args:
+            queue_name: 队列名称
+            kind: 工作单元类型，如 'update' 或 'backfill'
+            stock_codes: 股票代码列表
+            payload: 工作单元参数（所有股票共用）
+
+        Returns:
+            int: 新入队或被重置的单元数量
+        """
+        payload_text = json.dumps(payload or {}, ensure_ascii=False)
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT INTO queue_units (queue_name, kind, stock_code, payload, status, updated_at)
+                VALUES (?, ?, ?, ?, 'pending', ?)
+                ON CONFLICT (queue_name, kind, stock_code) DO UPDATE SET
+                    payload = excluded.payload,
+                    status = 'pending',
+                    owner = NULL,
+                    lease_expires = NULL,
+                    attempts = 0,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE queue_units.status IN ('done', 'failed')
+            """, [(queue_name, kind, code, payload_text, now) for code in stock_codes])
+            return conn.total_changes - before
+
+    def _requeue_expired(self, conn: sqlite3.Connection, queue_name: str, now: float) -> int:
+        """
+        将租约已过期的单元放回队列，已达到最大领取次数的标记为失败
+
+        Args:
+            conn: 处于事务中的连接
+            queue_name: 队列名称
+            now: 当前时间戳
+
+        Returns:
+            int: 处理的过期单元数量
+        """
+        cursor = conn.execute("""
+            UPDATE queue_units
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                last_error = '租约过期', owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE queue_name = ? AND status = 'leased' AND lease_expires < ?
+        """, (self.max_attempts, now, queue_name, now))
+        return cursor.rowcount
+
+    def requeue_expired(self, queue_name: str) -> int:
+        """
+        回收租约已过期的单元
+
+        Args:
+            queue_name: 队列名称
+
+        Returns:
+            int: 被回收的单元数量
+        """
+        with self._transaction() as conn:
+            return self._requeue_expired(conn, queue_name, time.time())
+
+    def claim(self,
+              queue_name: str,
+              worker_id: str,
+              limit: int = 1,
+              kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        以租约方式领取待处理的工作单元
+
+        Args:
+            queue_name: 队列名称
+            worker_id: worker 标识
+            limit: 最多领取的单元数量
+            kinds: 只领取指定类型的单元（可选）
+
+        Returns:
+            List[Dict[str, Any]]: 领取到的单元，包含 unit_id, kind, stock_code, payload, attempts
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, queue_name, now)
+            query = "SELECT unit_id FROM queue_units WHERE queue_name = ? AND status = 'pending'"
+            params: List[Any] = [queue_name]
+            if kinds:
+                query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                params.extend(kinds)
+            query += " ORDER BY unit_id LIMIT ?"
+            params.append(limit)
+            unit_ids = [row['unit_id'] for row in conn.execute(query, params)]
+            if not unit_ids:
+                return []
+
+            placeholders = ','.join('?' * len(unit_ids))
+            conn.execute(f"""
+                UPDATE queue_units
+                SET status = 'leased', owner = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE unit_id IN ({placeholders})
+            """, (worker_id, now + self.lease_seconds, now, *unit_ids))
+            rows = conn.execute(f"""
+                SELECT unit_id, kind, stock_code, payload, attempts FROM queue_units
+                WHERE unit_id IN ({placeholders}) ORDER BY unit_id
+            """, unit_ids).fetchall()
+        return [
+            {
+                'unit_id': row['unit_id'],
+                'kind': row['kind'],
+                'stock_code': row['stock_code'],
+                'payload': json.loads(row['payload'] or '{}'),
+                'attempts': row['attempts'],
+            }
+            for row in rows
+        ]
+
+    def heartbeat(self, worker_id: str, unit_ids: List[int]) -> int:
+        """
+        为仍由该 worker 持有的单元续约
+
+        Args:
+            worker_id: worker 标识
+            unit_ids: 单元ID列表
+
+        Returns:
+            int: 成功续约的单元数量（租约已被回收的单元不会续约）
+        """
+        if not unit_ids:
+            return 0
+        now = time.time()
+        placeholders = ','.join('?' * len(unit_ids))
+        with self._transaction() as conn:
+            cursor = conn.execute(f"""
+                UPDATE queue_units SET lease_expires = ?, updated_at = ?
+                WHERE unit_id IN ({placeholders}) AND owner = ? AND status = 'leased'
+            """, (now + self.lease_seconds, now, *unit_ids, worker_id))
+            return cursor.rowcount
+
+    def complete(self, worker_id: str, unit_id: int) -> bool:
+        """
+        将单元标记为完成
+
+        Args:
+            worker_id: worker 标识
+            unit_id: 单元ID
+
+        Returns:
+            bool: 是否成功（租约已丢失时返回False）
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE queue_units
+                SET status = 'done', owner = NULL, lease_expires = NULL, last_error = NULL, updated_at = ?
+                WHERE unit_id = ? AND owner = ? AND status = 'leased'
+            """, (time.time(), unit_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, worker_id: str, unit_id: int, error: str) -> Optional[str]:
+        """
+        记录单元执行失败，未达到最大领取次数的单元放回队列
+
+        Args:
+            worker_id: worker 标识
+            unit_id: 单元ID
+            error: 失败原因
+
+        Returns:
+            Optional[str]: 单元的新状态，放回队列时为 pending，达到最大领取次数时为 failed，
+                租约已丢失时为None
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE queue_units
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ?
+                WHERE unit_id = ? AND owner = ? AND status = 'leased'
+            """, (self.max_attempts, error, time.time(), unit_id, worker_id))
+            if cursor.rowcount != 1:
+                return None
+            return conn.execute("SELECT status FROM queue_units WHERE unit_id = ?", (unit_id,)).fetchone()['status']
+
+    def release(self, worker_id: str, unit_id: int, reason: str) -> bool:
+        """
+        把暂时无法执行的单元放回队列，撤销本次领取计入的次数
+
+        Args:
+            worker_id: worker 标识
+            unit_id: 单元ID
+            reason: 推迟原因
+
+        Returns:
+            bool: 是否成功（租约已丢失时返回False）
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE queue_units
+                SET status = 'pending', attempts = MAX(attempts - 1, 0),
+                    owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ?
+                WHERE unit_id = ? AND owner = ? AND status = 'leased'
+            """, (reason, time.time(), unit_id, worker_id))
+            return cursor.rowcount == 1
+
+    def stats(self, queue_name: str) -> Dict[str, int]:
+        """
+        统计队列中各状态的单元数量
+
+        Args:
+            queue_name: 队列名称
+
+        Returns:
+            Dict[str, int]: 状态 -> 数量
+        """
+        summary = {status: 0 for status in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)}
+        with self._transaction() as conn:
+            for row in conn.execute("""
+                SELECT status, COUNT(*) AS n FROM queue_units WHERE queue_name = ? GROUP BY status
+            """, (queue_name,)):
+                summary[row['status']] = row['n']
+        return summary
+
+
+class QueueWorker:
+    """队列 worker 类，循环领取工作单元并调用对应类型的处理函数，执行期间后台线程负责续约"""
+
+    def __init__(self,
+                 queue: JobQueue,
+                 handlers: Dict[str, Callable[[str, Dict[str, Any]], None]],
+                 worker_id: Optional[str] = None,
+                 heartbeat_interval_seconds: Optional[float] = None):
+        """
+        初始化队列 worker
+
+        Args:
+            queue: JobQueue实例
+            handlers: 单元类型 -> 处理函数(stock_code, payload)，处理函数抛出异常视为失败，
+                抛出 UnitDeferred 时单元放回队列且不消耗领取次数
+            worker_id: worker 标识（可选，默认按主机名和进程号生成）
+            heartbeat_interval_seconds: 续约间隔（可选，默认为租约时长的三分之一）
+        """
+        self.queue = queue
+        self.handlers = handlers
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_interval_seconds = heartbeat_interval_seconds or queue.lease_seconds / 3
+        self.logger = setup_logger(__name__)
+        self._current: List[int] = []
+        self._lock = threading.Lock()
+
+    def _heartbeat_loop(self, stop: threading.Event) -> None:
+        """
+        后台续约循环
+
+        Args:
+            stop: 停止信号
+        """
+        while not stop.wait(self.heartbeat_interval_seconds):
+            with self._lock:
+                unit_ids = list(self._current)
+            try:
+                self.queue.heartbeat(self.worker_id, unit_ids)
+            except Exception as e:
+                self.logger.warning(f"worker {self.worker_id} 续约失败: {str(e)}")
+
+    def run(self,
+            queue_name: str,
+            poll_interval_seconds: float = 5.0,
+            exit_when_idle: bool = True,
+            max_units: Optional[int] = None) -> Dict[str, int]:
+        """
+        循环处理队列中的工作单元
+
+        Args:
+            queue_name: 队列名称
+            poll_interval_seconds: 队列暂时为空时的轮询间隔（秒）
+            exit_when_idle: 队列中没有待处理和执行中的单元时是否退出
+            max_units: 最多处理的单元数量（可选）
+
+        Returns:
+            Dict[str, int]: 本 worker 完成(done)、失败后放回队列重试(retried)、
+                达到最大领取次数而最终失败(failed)和推迟(deferred)的单元数量
+        """
+        counts = {'done': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(stop,), daemon=True)
+        heartbeat.start()
+        self.logger.info(f"worker {self.worker_id} 开始处理队列 {queue_name}")
+        try:
+            while max_units is None or counts['done'] + counts['failed'] < max_units:
+                units = self.queue.claim(queue_name, self.worker_id, kinds=list(self.handlers))
+                if not units:
+                    stats = self.queue.stats(queue_name)
+                    if exit_when_idle and stats[STATUS_PENDING] == 0 and stats[STATUS_LEASED] == 0:
+                        break
+                    time.sleep(poll_interval_seconds)
+                    continue
+                retry_after = [self._process(unit, counts) for unit in units]
+                deferred = [delay for delay in retry_after if delay is not None]
+                if deferred:
+                    # 推迟的单元已放回队列，等待后再领取，避免立即重新领取同一单元
+                    time.sleep(max(poll_interval_seconds, min(deferred)))
+        finally:
+            stop.set()
+            heartbeat.join()
+        self.logger.info(f"worker {self.worker_id} 结束: 完成 {counts['done']} 个, 重试 {counts['retried']} 个, "
+                         f"失败 {counts['failed']} 个, 推迟 {counts['deferred']} 次")
+        return counts
+
+    def _process(self, unit: Dict[str, Any], counts: Dict[str, int]) -> Optional[float]:
+        """
+        执行单个工作单元
+
+        Args:
+            unit: 领取到的工作单元
+            counts: 各结果的计数
+
+        Returns:
+            Optional[float]: 单元被推迟时建议的等待秒数，否则为None
+        """
+        with self._lock:
+            self._current.append(unit['unit_id'])
+        try:
+            self.handlers[unit['kind']](unit['stock_code'], unit['payload'])
+        except UnitDeferred as e:
+            self.logger.warning(f"推迟 {unit['kind']} {unit['stock_code']}: {str(e)}")
+            self.queue.release(self.worker_id, unit['unit_id'], str(e))
+            counts['deferred'] += 1
+            return e.retry_after
+        except Exception as e:
+            self.logger.error(f"处理 {unit['kind']} {unit['stock_code']} 失败: {str(e)}")
+            status = self.queue.fail(self.worker_id, unit['unit_id'], str(e))
+            if status == STATUS_PENDING:
+                counts['retried'] += 1
+            elif status == STATUS_FAILED:
+                counts['failed'] += 1
+            else:
+                self.logger.warning(f"{unit['stock_code']} 的租约已过期，失败结果未记录")
+        else:
+            if not self.queue.complete(self.worker_id, unit['unit_id']):
+                self.logger.warning(f"{unit['stock_code']} 的租约已过期，结果可能被其他 worker 重复处理")
+            counts['done'] += 1
+        finally:
+            with self._lock:
+                self._current.remove(unit['unit_id'])
+        return None
@@ -0,0 +1,302 @@
+"""
+K线序列模块 - 策略热路径使用的紧凑数组容器
+
+KlineSeries 用连续的 NumPy 数组保存一只股票的K线：日期为自1970-01-01起的天数 (int64)，
+价格和成交额为 float64，成交量为 int64。按日期切片和从批量数组中取单只股票都返回视图，不复制数据；
+只在与数据库、接口和插件交互的边界上与 DataFrame 互相转换。
+"""
+from typing import Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# 价格类字段（float64），raw_close 为不复权收盘价，用于计算股息率
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'raw_close', 'amount')
+
+# KlineSeries 的全部数组字段
+ARRAY_FIELDS = ('dates',) + PRICE_FIELDS + ('volume',)
+
+# 1970-01-01 是星期四，(天数 - 2) // 7 在每个周六加一，对应以周五结束的周
+_WEEK_OFFSET = 2
+
+
+def day_numbers(dates: Union[pd.Series, np.ndarray, Sequence[str]]) -> np.ndarray:
+    """
+    将日期转换为自1970-01-01起的天数
+
+    Args:
+        dates: 日期序列（字符串或 datetime）
+
+    Returns:
+        np.ndarray: int64 天数数组
+    """
+    return pd.to_datetime(dates).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def day_strings(days: np.ndarray) -> np.ndarray:
+    """
+    将天数转换为 'YYYY-MM-DD' 字符串
+
+    Args:
+        days: 天数数组
+
+    Returns:
+        np.ndarray: 日期字符串数组
+    """
+    return np.datetime_as_string(np.asarray(days).astype('datetime64[D]'), unit='D').astype(object)
+
+
+def _day_number(date: str) -> int:
+    """单个 'YYYY-MM-DD' 日期的天数"""
+    return int(np.datetime64(date, 'D').astype(np.int64))
+
+
+class KlineSeries:
+    """单只股票按日期升序排列的K线数组"""
+
+    __slots__ = ('stock_code', 'dates', 'open', 'high', 'low', 'close', 'raw_close', 'amount', 'volume',
+                 '_date_strings')
+
+    def __init__(self,
+                 stock_code: Optional[str],
+                 dates: np.ndarray,
+                 open: np.ndarray,
+                 high: np.ndarray,
+                 low: np.ndarray,
+                 close: np.ndarray,
+                 volume: np.ndarray,
+                 amount: Optional[np.ndarray] = None,
+                 raw_close: Optional[np.ndarray] = None):
+        """
+        初始化K线序列，数组只做类型检查，类型一致时不复制
+
+        Args:
+            stock_code: 股票代码（可选）
+            dates: 天数数组
+            open: 开盘价
+            high: 最高价
+            low: 最低价
+            close: 收盘价（复权后）
+            volume: 成交量
+            amount: 成交额（可选），默认为 NaN
+            raw_close: 不复权收盘价（可选），默认与 close 相同
+        """
+        self.stock_code = stock_code
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+        self.amount = (np.asarray(amount, dtype=np.float64) if amount is not None
+                       else np.full(len(self.dates), np.nan))
+        self.raw_close = np.asarray(raw_close, dtype=np.float64) if raw_close is not None else self.close
+        self._date_strings: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, stock_code: Optional[str] = None) -> 'KlineSeries':
+        """
+        从K线 DataFrame 创建
+
+        Args:
+            frame: 按日期升序排列、包含 date, open, high, low, close 列的K线
+            stock_code: 股票代码（可选），默认取 stock_code 列的第一个值
+
+        Returns:
+            KlineSeries: K线序列
+        """
+        if stock_code is None and 'stock_code' in frame.columns and not frame.empty:
+            stock_code = frame['stock_code'].iloc[0]
+
+        def column(name: str, dtype) -> Optional[np.ndarray]:
+            if name not in frame.columns:
+                return None
+            values = pd.to_numeric(frame[name], errors='coerce')
+            if dtype is np.int64:
+                values = values.fillna(0)
+            return values.to_numpy(dtype=dtype)
+
+        volume = column('volume', np.int64)
+        return cls(
+            stock_code,
+            day_numbers(frame['date']) if not frame.empty else np.empty(0, dtype=np.int64),
+            column('open', np.float64), column('high', np.float64), column('low', np.float64),
+            column('close', np.float64),
+            volume if volume is not None else np.zeros(len(frame), dtype=np.int64),
+            amount=column('amount', np.float64),
+            raw_close=column('raw_close', np.float64),
+        )
+
+    @classmethod
+    def empty(cls, stock_code: Optional[str] = None) -> 'KlineSeries':
+        """
+        创建空的K线序列
+
+        Args:
+            stock_code: 股票代码（可选）
+
+        Returns:
+            KlineSeries: 长度为0的K线序列
+        """
+        prices = np.empty(0, dtype=np.float64)
+        return cls(stock_code, np.empty(0, dtype=np.int64), prices, prices, prices, prices,
+                   np.empty(0, dtype=np.int64), amount=prices)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转换为K线 DataFrame（日期为 'YYYY-MM-DD' 字符串）
+
+        Returns:
+            pd.DataFrame: 包含 stock_code（有股票代码时）, date, open, high, low, close, volume, amount, raw_close 列
+        """
+        frame = pd.DataFrame({
+            'date': self.date_strings(),
+            'open': self.open, 'high': self.high, 'low': self.low, 'close': self.close,
+            'volume': self.volume, 'amount': self.amount, 'raw_close': self.raw_close,
+        })
+        if self.stock_code is not None:
+            frame.insert(0, 'stock_code', self.stock_code)
+        return frame
+
+    def date_strings(self) -> np.ndarray:
+        """
+        获取 'YYYY-MM-DD' 格式的日期，首次调用时转换并缓存
+
+        Returns:
+            np.ndarray: 日期字符串数组
+        """
+        if self._date_strings is None:
+            self._date_strings = day_strings(self.dates)
+        return self._date_strings
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, index: slice) -> 'KlineSeries':
+        """
+        按位置切片，返回共享数组的视图
+
+        Args:
+            index: 切片
+
+        Returns:
+            KlineSeries: 切片后的K线序列
+        """
+        if not isinstance(index, slice):
+            raise TypeError("KlineSeries 只支持切片")
+        raw_close = None if self.raw_close is self.close else self.raw_close[index]
+        return KlineSeries(self.stock_code, self.dates[index], self.open[index], self.high[index],
+                           self.low[index], self.close[index], self.volume[index],
+                           amount=self.amount[index], raw_close=raw_close)
+
+    def slice_dates(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> 'KlineSeries':
+        """
+        按日期区间切片（含两端），二分查找定位，返回视图
+
+        Args:
+            start_date: 开始日期（可选）
+            end_date: 结束日期（可选）
+
+        Returns:
+            KlineSeries: 区间内的K线序列
+        """
+        start = np.searchsorted(self.dates, _day_number(start_date), side='left') if start_date else 0
+        end = np.searchsorted(self.dates, _day_number(end_date), side='right') if end_date else len(self)
+        return self[start:end]
+
+    def resample_weekly(self) -> 'KlineSeries':
+        """
+        合成为周K线，日期取每周最后一个交易日
+
+        Returns:
+            KlineSeries: 周K线序列
+        """
+        if len(self) == 0:
+            return self
+        week = (self.dates - _WEEK_OFFSET) // 7
+        # 日期升序，每周的第一行和最后一行就是周的边界
+        starts = np.flatnonzero(np.concatenate([[True], week[1:] != week[:-1]]))
+        ends = np.concatenate([starts[1:], [len(self)]]) - 1
+        raw_close = None if self.raw_close is self.close else self.raw_close[ends]
+        return KlineSeries(
+            self.stock_code, self.dates[ends], self.open[starts],
+            np.maximum.reduceat(self.high, starts), np.minimum.reduceat(self.low, starts),
+            self.close[ends], np.add.reduceat(self.volume, starts),
+            amount=np.add.reduceat(self.amount, starts), raw_close=raw_close,
+        )
+
+
+class KlineBatch:
+    """多只股票首尾相接的K线数组，offsets 划分每只股票的行"""
+
+    __slots__ = ('stock_codes', 'offsets', 'series')
+
+    def __init__(self, stock_codes: List[str], offsets: np.ndarray, series: KlineSeries):
+        """
+        初始化批量K线
+
+        Args:
+            stock_codes: 股票代码列表
+            offsets: 长度为股票数+1的行偏移
+            series: 所有股票拼接后的K线数组
+        """
+        self.stock_codes = stock_codes
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.series = series
+
+    @classmethod
+    def concat(cls, items: Sequence[KlineSeries]) -> 'KlineBatch':
+        """
+        把多只股票的K线序列拼接为批量数组
+
+        Args:
+            items: K线序列列表
+
+        Returns:
+            KlineBatch: 批量K线
+        """
+        offsets = np.concatenate([[0], np.cumsum([len(item) for item in items])]).astype(np.int64)
+
+        def stack(field: str, dtype) -> np.ndarray:
+            if not items:
+                return np.empty(0, dtype=dtype)
+            return np.concatenate([getattr(item, field) for item in items]).astype(dtype, copy=False)
+
+        series = KlineSeries(None, stack('dates', np.int64), stack('open', np.float64), stack('high', np.float64),
+                             stack('low', np.float64), stack('close', np.float64), stack('volume', np.int64),
+                             amount=stack('amount', np.float64), raw_close=stack('raw_close', np.float64))
+        return cls([item.stock_code for item in items], offsets, series)
+
+    def __len__(self) -> int:
+        return len(self.stock_codes)
+
+    def __getitem__(self, index: int) -> KlineSeries:
+        """
+        取单只股票的K线序列（视图，不复制）
+
+        Args:
+            index: 股票序号
+
+        Returns:
+            KlineSeries: 单只股票的K线序列
+        """
+        item = self.series[int(self.offsets[index]):int(self.offsets[index + 1])]
+        item.stock_code = self.stock_codes[index]
+        return item
+
+    def __iter__(self) -> Iterator[KlineSeries]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+def as_kline_series(kline: Union[KlineSeries, pd.DataFrame]) -> KlineSeries:
+    """
+    把 DataFrame 输入转换为 KlineSeries，已是 KlineSeries 时原样返回
+
+    Args:
+        kline: K线序列或K线 DataFrame
+
+    Returns:
+        KlineSeries: K线序列
+    """
+    return kline if isinstance(kline, KlineSeries) else KlineSeries.from_frame(kline)
@@ -0,0 +1,206 @@
+"""
+最新快照模块 - 每只股票一行的当前状态（最新收盘价、近一年分红、股息率、最新PE/PB、最新信号）
+
+写入路径在记录变更日志的同一事务中更新 latest_snapshot 表，只重算受影响的部分：
+新K线移动了最新日期时重算收盘价和近一年分红，分红变化时重算分红，
+财务和信号只在写入的日期不早于快照中的日期时重算。扫描、报告和导出读取整个股票池的
+当前状态时只需要顺序扫描这张小表，不必逐只股票查询K线、分红和财务表。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .asof import TTM_WINDOW_DAYS
+
+# 影响快照的表
+LATEST_SNAPSHOT_SOURCE_TABLES = ('daily_kline', 'dividend_data', 'financial_summary', 'historical_signals')
+
+LATEST_SNAPSHOT_COLUMNS = ['stock_code', 'date', 'close', 'ttm_dividend', 'dividend_yield', 'financial_date',
+                           'pe_ttm', 'pb_mrq', 'signal_date', 'signal_strategy', 'signal_price']
+
+
+class LatestSnapshot:
+    """最新快照类，负责在写入时增量维护和批量读取每只股票的当前状态"""
+
+    def __init__(self, db):
+        """
+        初始化最新快照
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+
+    def apply(self, table_name: str, ranges: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> None:
+        """
+        按写入的 (股票, 日期区间) 更新快照，不提交事务（与数据写入在同一事务中提交）
+
+        Args:
+            table_name: 被写入的表
+            ranges: (股票代码, 最早日期, 最晚日期) 列表
+        """
+        if table_name not in LATEST_SNAPSHOT_SOURCE_TABLES:
+            return
+        rows = []
+        for stock_code, _, max_date in ranges:
+            current = self._current(stock_code)
+            row = self._refresh(stock_code, current, table_name, max_date)
+            if row != current:
+                rows.append(tuple(row[column] for column in LATEST_SNAPSHOT_COLUMNS))
+        if rows:
+            self.db.conn.executemany(
+                f"INSERT OR REPLACE INTO latest_snapshot ({', '.join(LATEST_SNAPSHOT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(LATEST_SNAPSHOT_COLUMNS))})", rows
+            )
+
+    def _current(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """读取快照中的一行"""
+        row = self.db.conn.execute(
+            f"SELECT {', '.join(LATEST_SNAPSHOT_COLUMNS)} FROM latest_snapshot WHERE stock_code = ?", (stock_code,)
+        ).fetchone()
+        return dict(zip(LATEST_SNAPSHOT_COLUMNS, row)) if row is not None else None
+
+    def _refresh(self,
+                 stock_code: str,
+                 current: Optional[Dict[str, Any]],
+                 table_name: Optional[str],
+                 max_date: Optional[str],
+                 bar: Optional[Tuple[str, float]] = None) -> Dict[str, Any]:
+        """
+        重算受写入影响的字段
+
+        Args:
+            stock_code: 股票代码
+            current: 快照中的当前行（可选）
+            table_name: 被写入的表，为 None 时重算全部字段
+            max_date: 写入的最晚日期（可选），为 None 时视为影响最新数据
+            bar: 预先查好的最新K线 (日期, 收盘价)（可选），空元组表示没有K线，默认按需查询
+
+        Returns:
+            Dict[str, Any]: 新的快照行
+        """
+        row = dict(current) if current is not None else dict.fromkeys(LATEST_SNAPSHOT_COLUMNS)
+        row['stock_code'] = stock_code
+
+        def affects(date_column: str) -> bool:
+            return current is None or max_date is None or row[date_column] is None or max_date >= row[date_column]
+
+        conn = self.db.conn
+        kline_changed = table_name is None or (table_name == 'daily_kline' and affects('date'))
+        if kline_changed:
+            if bar is None:
+                bar = self._latest_bar(stock_code)
+            row['date'], row['close'] = bar or (None, None)
+        if kline_changed or table_name == 'dividend_data':
+            row['ttm_dividend'] = None
+            if row['date'] is not None:
+                row['ttm_dividend'] = conn.execute(f"""
+                    SELECT COALESCE(SUM(dividend_per_share_pre_tax), 0) FROM dividend_data
+                    WHERE stock_code = ? AND substr(ex_dividend_date, 1, 10) > date(?, '-{TTM_WINDOW_DAYS} days')
+                      AND substr(ex_dividend_date, 1, 10) <= ?
+                """, (stock_code, row['date'], row['date'])).fetchone()[0]
+            row['dividend_yield'] = (row['ttm_dividend'] / row['close'] * 100
+                                     if row['ttm_dividend'] is not None and row['close'] else None)
+        if table_name is None or (table_name == 'financial_summary' and affects('financial_date')):
+            financial = conn.execute("""
+                SELECT substr(date, 1, 10), pe_ttm, pb_mrq FROM financial_summary
+                WHERE stock_code = ? ORDER BY date DESC LIMIT 1
+            """, (stock_code,)).fetchone()
+            row['financial_date'], row['pe_ttm'], row['pb_mrq'] = \
+                tuple(financial) if financial is not None else (None, None, None)
+        if table_name is None or (table_name == 'historical_signals' and affects('signal_date')):
+            # 替换信号时可能删除了最新信号，从表中重新取
+            signal = conn.execute("""
+                SELECT date, strategy_name, price FROM historical_signals
+                WHERE stock_code = ? ORDER BY date DESC, strategy_name LIMIT 1
+            """, (stock_code,)).fetchone()
+            row['signal_date'], row['signal_strategy'], row['signal_price'] = \
+                tuple(signal) if signal is not None else (None, None, None)
+        return row
+
+    def _latest_bar(self, stock_code: str) -> Optional[Tuple[str, float]]:
+        """
+        读取一只股票的最新K线，主库中没有时再查已冻结的分区
+
+        写入路径中新K线总在主库，只有K线全部冻结的股票才会 ATTACH 分区。
+
+        Args:
+            stock_code: 股票代码
+
+        Returns:
+            Optional[Tuple[str, float]]: (日期, 收盘价)，没有K线时为 None
+        """
+        bar = self.db.conn.execute("""
+            SELECT substr(date, 1, 10), close FROM daily_kline
+            WHERE stock_code = ? ORDER BY date DESC LIMIT 1
+        """, (stock_code,)).fetchone()
+        if bar is not None or not self.db.partitions.available_years():
+            return tuple(bar) if bar is not None else None
+        return self._latest_bars([stock_code]).get(stock_code)
+
+    def _latest_bars(self, stock_codes: List[str]) -> Dict[str, Tuple[str, float]]:
+        """
+        批量读取股票的最新K线，包括K线已全部冻结到年份分区的股票
+
+        Args:
+            stock_codes: 股票代码列表
+
+        Returns:
+            Dict[str, Tuple[str, float]]: 股票代码 -> (日期, 收盘价)
+        """
+        if not stock_codes:
+            return {}
+        bars = self.db.query_asof('daily_kline', stock_codes, '9999-12-31', ['close'])
+        return {code: (str(date)[:10], close) for code, date, close in bars.itertuples(index=False)}
+
+    def rebuild(self, stock_codes: Optional[List[str]] = None) -> int:
+        """
+        从数据表重建快照，用于已有数据库首次创建快照表
+
+        Args:
+            stock_codes: 股票代码列表（可选），默认为K线（含已冻结的分区）、分红、财务和信号表中的全部股票
+
+        Returns:
+            int: 重建的股票数
+        """
+        if stock_codes is None:
+            union = " UNION ".join(f"SELECT DISTINCT stock_code FROM {table}" for table in LATEST_SNAPSHOT_SOURCE_TABLES)
+            codes = {row[0] for row in self.db.conn.execute(union)}
+            for year in self.db.partitions.available_years():
+                schema = self.db.partitions.attach(year)
+                codes.update(row[0] for row in self.db.conn.execute(f"SELECT DISTINCT stock_code FROM {schema}.daily_kline"))
+            stock_codes = sorted(codes)
+        # 写入前一次查好最新K线，ATTACH 分区不能发生在重建的事务中
+        bars = self._latest_bars(list(stock_codes))
+        try:
+            for stock_code in stock_codes:
+                row = self._refresh(stock_code, None, None, None, bars.get(stock_code, ()))
+                self.db.conn.execute(
+                    f"INSERT OR REPLACE INTO latest_snapshot ({', '.join(LATEST_SNAPSHOT_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(LATEST_SNAPSHOT_COLUMNS))})",
+                    tuple(row[column] for column in LATEST_SNAPSHOT_COLUMNS)
+                )
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"重建最新快照失败: {str(e)}")
+        return len(stock_codes)
+
+    def query(self, stock_codes: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        读取股票的当前状态
+
+        Args:
+            stock_codes: 股票代码列表（可选），默认为全部股票
+
+        Returns:
+            pd.DataFrame: 每只股票一行，列为 LATEST_SNAPSHOT_COLUMNS，按股票代码排序
+        """
+        where, params = "", ()
+        if stock_codes:
+            where = f" WHERE stock_code IN ({','.join('?' * len(stock_codes))})"
+            params = tuple(stock_codes)
+        df = self.db.execute_query(
+            f"SELECT {', '.join(LATEST_SNAPSHOT_COLUMNS)} FROM latest_snapshot{where} ORDER BY stock_code", params
+        )
+        return df if df is not None else pd.DataFrame(columns=LATEST_SNAPSHOT_COLUMNS)
@@ -0,0 +1,278 @@
+"""
+按年分区模块 - 把K线表的冷数据按年份拆分到独立的数据库文件，查询时按需 ATTACH
+
+主库只保存近期数据，早于冻结年份的K线存放在 partition_dir 下的 kline_<年份>.db 中，
+每个分区文件包含日/周/月K线三张表。冻结后的分区经过 VACUUM 并设为只读，
+以只读、immutable 方式 ATTACH，备份和 VACUUM 主库时不必处理全部历史数据。
+"""
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ..utils.logger import setup_logger
+from .compact_schema import COMPACT_TABLES, legacy_table_sql
+
+# 按年分区的表
+PARTITIONED_TABLES = ('daily_kline', 'weekly_kline', 'monthly_kline')
+
+# SQLite 默认最多 ATTACH 10 个数据库，留出余量
+DEFAULT_MAX_ATTACHED = 8
+
+_PARTITION_FILE = re.compile(r'^kline_(\d{4})\.db$')
+
+
+class PartitionManager:
+    """分区管理类，负责分区文件的发现、按需 ATTACH、跨分区查询和冻结"""
+
+    def __init__(self, db):
+        """
+        初始化分区管理器
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+        self.directory: Optional[str] = db.config.get("partition_dir")
+        self.max_attached = db.config.get("max_attached_partitions", DEFAULT_MAX_ATTACHED)
+        if self.max_attached < 1:
+            raise ValueError(f"max_attached_partitions 必须大于0: {self.max_attached}")
+        self.logger = setup_logger(__name__)
+        # 年份 -> 模式名，按最近使用排序
+        self._attached: "OrderedDict[int, str]" = OrderedDict()
+        self._conn = None
+
+    def partition_path(self, year: int) -> str:
+        """
+        获取分区文件路径
+
+        Args:
+            year: 年份
+
+        Returns:
+            str: 分区文件路径
+        """
+        if not self.directory:
+            raise ValueError("未配置 partition_dir，无法使用按年分区")
+        return os.path.join(self.directory, f"kline_{year}.db")
+
+    def available_years(self) -> List[int]:
+        """
+        获取已冻结的分区年份
+
+        Returns:
+            List[int]: 年份列表（升序）
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        years = []
+        for name in os.listdir(self.directory):
+            match = _PARTITION_FILE.match(name)
+            if match:
+                years.append(int(match.group(1)))
+        return sorted(years)
+
+    def years_for_range(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[int]:
+        """
+        获取日期区间涉及的分区年份
+
+        Args:
+            start_date: 开始日期（可选）
+            end_date: 结束日期（可选）
+
+        Returns:
+            List[int]: 年份列表（升序）
+        """
+        first = int(str(start_date)[:4]) if start_date else None
+        last = int(str(end_date)[:4]) if end_date else None
+        return [
+            year for year in self.available_years()
+            if (first is None or year >= first) and (last is None or year <= last)
+        ]
+
+    def _reset_if_reconnected(self) -> None:
+        """数据库重新连接后，之前的 ATTACH 已失效"""
+        if self._conn is not self.db.conn:
+            self._attached.clear()
+            self._conn = self.db.conn
+
+    def _detach(self, year: int) -> None:
+        """
+        DETACH 指定年份的分区
+
+        Args:
+            year: 年份
+        """
+        self._reset_if_reconnected()
+        schema = self._attached.pop(year, None)
+        if schema:
+            self.db.conn.commit()
+            self.db.conn.execute(f"DETACH DATABASE {schema}")
+
+    def attach(self, year: int) -> str:
+        """
+        以只读方式 ATTACH 分区，超过上限时 DETACH 最久未使用的分区
+
+        Args:
+            year: 年份
+
+        Returns:
+            str: 分区的模式名
+        """
+        self._reset_if_reconnected()
+        if year in self._attached:
+            self._attached.move_to_end(year)
+            return self._attached[year]
+        while len(self._attached) >= self.max_attached:
+            self._detach(next(iter(self._attached)))
+        schema = f"p{year}"
+        uri = Path(self.partition_path(year)).resolve().as_uri() + "?mode=ro&immutable=1"
+        self.db.conn.commit()
+        self.db.conn.execute("ATTACH DATABASE ? AS " + schema, (uri,))
+        self._attached[year] = schema
+        return schema
+
+    def query(self,
+              table: str,
+              where: str = "1 = 1",
+              params: Tuple[Any, ...] = (),
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              columns: str = "*",
+              order_by: Optional[str] = None) -> pd.DataFrame:
+        """
+        查询K线表，只 ATTACH 日期区间涉及的分区
+
+        分区数超过 ATTACH 上限时分批查询后合并。
+
+        Args:
+            table: 表名
+            where: WHERE 条件，应包含日期过滤
+            params: WHERE 条件的参数
+            start_date: 开始日期（可选），用于选择分区
+            end_date: 结束日期（可选），用于选择分区
+            columns: 查询的列
+            order_by: 排序的列，用逗号分隔（可选）
+
+        Returns:
+            pd.DataFrame: 查询结果
+        """
+        if table not in PARTITIONED_TABLES:
+            raise ValueError(f"表 {table} 不按年分区")
+        order = f" ORDER BY {order_by}" if order_by else ""
+        years = self.years_for_range(start_date, end_date)
+        if not years:
+            return self.db.execute_query(f"SELECT {columns} FROM {table} WHERE {where}{order}", params)
+
+        # 主库保存最新的数据，排在最后
+        batches: List[List[Optional[int]]] = [
+            years[i:i + self.max_attached] for i in range(0, len(years), self.max_attached)
+        ]
+        batches[-1] = batches[-1] + [None]
+        frames = []
+        for batch in batches:
+            schemas = [self.attach(year) if year is not None else "main" for year in batch]
+            sql = " UNION ALL ".join(f"SELECT {columns} FROM {schema}.{table} WHERE {where}" for schema in schemas)
+            frames.append(self.db.execute_query(sql + order, tuple(params) * len(schemas)))
+        if len(frames) == 1:
+            return frames[0]
+        result = pd.concat(frames, ignore_index=True)
+        if order_by:
+            keys = [key.strip() for key in order_by.split(",")]
+            result = result.sort_values(keys, kind="mergesort").reset_index(drop=True)
+        return result
+
+    def freeze(self, before_year: int, vacuum: bool = True) -> Dict[int, int]:
+        """
+        把早于指定年份的K线从主库移动到按年分区的只读文件
+
+        已存在的分区会先恢复可写，新数据以 INSERT OR REPLACE 合并后重新冻结。
+
+        Args:
+            before_year: 早于该年份的数据被冻结
+            vacuum: 冻结后是否 VACUUM 主库
+
+        Returns:
+            Dict[int, int]: 年份 -> 移动的行数
+        """
+        if self.db.legacy_qfq_stocks():
+            raise ValueError("日K线中还有前复权价格，冻结前请先运行 repair-data 重新获取为不复权价格")
+        cutoff = f"{before_year:04d}-01-01"
+        years = set()
+        for table in PARTITIONED_TABLES:
+            rows = self.db.conn.execute(
+                f"SELECT DISTINCT substr(date, 1, 4) FROM {table} WHERE date < ?", (cutoff,)
+            ).fetchall()
+            years.update(int(row[0]) for row in rows)
+        if not years:
+            self.logger.info(f"主库中没有早于{before_year}年的K线数据")
+            return {}
+
+        if not self.directory:
+            raise ValueError("未配置 partition_dir，无法使用按年分区")
+        os.makedirs(self.directory, exist_ok=True)
+        ddl = legacy_table_sql()
+        moved = {}
+        for year in sorted(years):
+            moved[year] = self._freeze_year(year, ddl)
+        if vacuum:
+            self.db.conn.execute("VACUUM")
+        self.logger.info(f"已冻结 {len(moved)} 个年份分区，共移动 {sum(moved.values())} 行")
+        return moved
+
+    def _freeze_year(self, year: int, ddl: Dict[str, List[str]]) -> int:
+        """
+        冻结单个年份：合并到分区文件、从主库删除，然后 VACUUM 分区并设为只读
+
+        Args:
+            year: 年份
+            ddl: 原始表结构的建表语句
+
+        Returns:
+            int: 移动的行数
+        """
+        path = self.partition_path(year)
+        self._detach(year)
+        if os.path.exists(path):
+            os.chmod(path, 0o644)
+        else:
+            partition = sqlite3.connect(path)
+            for table in PARTITIONED_TABLES:
+                for statement in ddl[table]:
+                    partition.execute(statement)
+            partition.commit()
+            partition.close()
+
+        conn = self.db.conn
+        schema = "freeze_target"
+        start, end = f"{year:04d}-01-01", f"{year:04d}-12-31"
+        moved = 0
+        conn.commit()
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in PARTITIONED_TABLES:
+                columns = ", ".join(column for column, _ in COMPACT_TABLES[table]['columns'])
+                cursor = conn.execute(f"""
+                    INSERT OR REPLACE INTO {schema}.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE date BETWEEN ? AND ?
+                """, (start, end))
+                moved += cursor.rowcount
+                conn.execute(f"DELETE FROM main.{table} WHERE date BETWEEN ? AND ?", (start, end))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"冻结{year}年分区失败: {str(e)}")
+        finally:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+        partition = sqlite3.connect(path)
+        partition.execute("VACUUM")
+        partition.close()
+        os.chmod(path, 0o444)
+        self.logger.info(f"已冻结{year}年分区 {path}，移动 {moved} 行")
+        return moved
@@ -0,0 +1,306 @@
+"""
+容错模块 - 数据源请求的指数退避重试、按接口熔断和每次运行的错误预算
+
+数据源故障时，逐只股票按固定间隔重试会让全市场更新停滞很久。这里的策略是快速失败、推迟剩余工作：
+    - 重试间隔按指数增长并加入随机抖动（full jitter），避免多个 worker 同时重试
+    - 每个接口（akshare 函数名）一个熔断器：连续失败达到阈值后打开，直接拒绝请求；
+      冷却时间过后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开
+    - 每次运行有错误预算：失败的请求次数用完预算后不再重试，每个请求只尝试一次
+熔断器打开时请求抛出 CircuitOpenError，调用方把对应的工作推迟到后续轮次或续传。
+"""
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.logger import setup_logger
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+DEFAULT_MAX_RETRY_DELAY_SECONDS = 60.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 300.0
+DEFAULT_ERROR_BUDGET = 50
+
+
+class CircuitOpenError(Exception):
+    """接口的熔断器处于打开状态，请求没有发出"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        """
+        初始化异常
+
+        Args:
+            endpoint: 接口名称
+            retry_after: 距离允许试探请求的秒数
+        """
+        super().__init__(f"接口 {endpoint} 已熔断，{retry_after:.0f}秒后重试")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """单个接口的熔断器"""
+
+    def __init__(self,
+                 endpoint: str,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_seconds: float = DEFAULT_RESET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化熔断器
+
+        Args:
+            endpoint: 接口名称
+            failure_threshold: 打开熔断器的连续失败次数
+            reset_seconds: 打开后进入半开状态的冷却时间（秒）
+            clock: 单调时钟，测试时可替换
+        """
+        if failure_threshold < 1:
+            raise ValueError(f"熔断阈值必须为正数: {failure_threshold}")
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """熔断器当前状态"""
+        if self.opened_at is None:
+            return CIRCUIT_CLOSED
+        if self.clock() - self.opened_at >= self.reset_seconds:
+            return CIRCUIT_HALF_OPEN
+        return CIRCUIT_OPEN
+
+    def retry_after(self) -> float:
+        """
+        距离允许试探请求的秒数
+
+        Returns:
+            float: 秒数，已允许请求时为0
+        """
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - self.clock())
+
+    def acquire(self) -> bool:
+        """
+        请求发出前检查熔断器，半开状态下只放行一个试探请求
+
+        Returns:
+            bool: 本次请求是否为半开状态下的试探请求
+
+        Raises:
+            CircuitOpenError: 熔断器打开或半开状态下已有试探请求
+        """
+        with self._lock:
+            state = self.state
+            if state == CIRCUIT_CLOSED:
+                return False
+            if state == CIRCUIT_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise CircuitOpenError(self.endpoint, self.retry_after())
+
+    def release_trial(self) -> None:
+        """试探请求没有记录结果就结束时（如被中断）放弃试探，允许之后的请求重新试探"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """记录成功的请求，关闭熔断器"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """记录失败的请求，连续失败达到阈值或试探请求失败时打开熔断器"""
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+
+class ErrorBudget:
+    """每次运行允许的失败请求次数，用完后不再重试"""
+
+    def __init__(self, limit: int = DEFAULT_ERROR_BUDGET):
+        """
+        初始化错误预算
+
+        Args:
+            limit: 一次运行中允许的失败请求次数
+        """
+        self.limit = limit
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def spend(self) -> None:
+        """记录一次失败的请求"""
+        with self._lock:
+            self.spent += 1
+
+    @property
+    def exhausted(self) -> bool:
+        """预算是否已用完"""
+        return self.spent >= self.limit
+
+    def reset(self) -> None:
+        """开始新的运行时清零"""
+        with self._lock:
+            self.spent = 0
+
+
+class RetryController:
+    """按接口熔断、带错误预算的指数退避重试"""
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 10.0,
+                 max_delay: float = DEFAULT_MAX_RETRY_DELAY_SECONDS,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_seconds: float = DEFAULT_RESET_SECONDS,
+                 error_budget: int = DEFAULT_ERROR_BUDGET,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        初始化重试控制器
+
+        Args:
+            max_attempts: 单个请求的最大尝试次数
+            base_delay: 第一次重试的最大等待时间（秒），之后每次翻倍
+            max_delay: 单次等待时间的上限（秒）
+            failure_threshold: 打开熔断器的连续失败次数
+            reset_seconds: 熔断器的冷却时间（秒）
+            error_budget: 一次运行中允许的失败请求次数
+            clock: 单调时钟，测试时可替换
+            sleep: 等待函数，测试时可替换
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.budget = ErrorBudget(error_budget)
+        self.clock = clock
+        self.sleep = sleep
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.logger = setup_logger(__name__)
+
+    @classmethod
+    def from_config(cls, data_source: Dict[str, Any]) -> 'RetryController':
+        """
+        按 data_source 配置创建重试控制器
+
+        Args:
+            data_source: 配置文件中的 data_source 部分
+
+        Returns:
+            RetryController: 重试控制器
+        """
+        return cls(
+            max_attempts=data_source.get("akshare_max_retries", 3),
+            base_delay=data_source.get("akshare_retry_delay_seconds", 10),
+            max_delay=data_source.get("akshare_max_retry_delay_seconds", DEFAULT_MAX_RETRY_DELAY_SECONDS),
+            failure_threshold=data_source.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+            reset_seconds=data_source.get("circuit_reset_seconds", DEFAULT_RESET_SECONDS),
+            error_budget=data_source.get("error_budget", DEFAULT_ERROR_BUDGET),
+        )
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """
+        获取接口的熔断器，首次使用时创建
+
+        Args:
+            endpoint: 接口名称
+
+        Returns:
+            CircuitBreaker: 熔断器
+        """
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(
+                    endpoint, self.failure_threshold, self.reset_seconds, self.clock
+                )
+            return self.breakers[endpoint]
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        第 attempt 次失败后的等待时间：在 [0, min(上限, 基础间隔 x 2^attempt)] 中均匀抽样
+
+        Args:
+            attempt: 已失败的次数减一（从0开始）
+
+        Returns:
+            float: 等待秒数
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def start_run(self) -> None:
+        """开始新的运行：清零错误预算，熔断器状态保留"""
+        self.budget.reset()
+
+    def open_endpoints(self) -> Dict[str, float]:
+        """
+        获取处于打开状态的接口
+
+        Returns:
+            Dict[str, float]: 接口名称 -> 距离允许试探请求的秒数
+        """
+        with self._lock:
+            breakers = list(self.breakers.values())
+        return {breaker.endpoint: breaker.retry_after() for breaker in breakers
+                if breaker.state != CIRCUIT_CLOSED}
+
+    def call(self, endpoint: str, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        通过熔断器调用接口，失败时按指数退避重试
+
+        Args:
+            endpoint: 接口名称
+            func: 要调用的函数
+            *args: 函数参数
+            **kwargs: 函数关键字参数
+
+        Returns:
+            Any: 函数返回值
+
+        Raises:
+            CircuitOpenError: 熔断器打开，请求没有发出
+        """
+        breaker = self.breaker(endpoint)
+        attempt = 0
+        while True:
+            trial = breaker.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                breaker.record_failure()
+                self.budget.spend()
+                attempt += 1
+                if attempt >= self.max_attempts or self.budget.exhausted or breaker.state != CIRCUIT_CLOSED:
+                    if self.budget.exhausted:
+                        self.logger.warning(f"本次运行的错误预算已用完 ({self.budget.spent}次失败)，不再重试")
+                    self.logger.error(f"调用接口 {endpoint} 失败: {str(e)}")
+                    raise
+                delay = self.backoff_delay(attempt - 1)
+                self.logger.warning(f"接口 {endpoint} 第{attempt}次尝试失败，{delay:.1f}秒后重试")
+                self.sleep(delay)
+                continue
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                # KeyboardInterrupt、worker 进程退出等 BaseException 不经过上面的分支，
+                # 不释放试探会让熔断器永远拒绝该接口；试探请求失败时直接抛出，不会在等待后才释放
+                if trial:
+                    breaker.release_trial()
@@ -0,0 +1,244 @@
+"""
+信号存储模块 - historical_signals 表的幂等写入和查询接口
+
+(stock_code, date, strategy_name) 是信号的自然键，表上有唯一索引，
+重复写入同一信号会覆盖原有记录而不是产生重复行。查询按索引设计：
+    - 按股票查询使用唯一索引 (stock_code, date, strategy_name)
+    - 按策略和日期区间查询使用覆盖索引 (strategy_name, date, stock_code, signal_type)，回测只读索引
+"""
+import sqlite3
+from typing import Any, List, Optional, Sequence
+
+import pandas as pd
+
+from ..utils.logger import setup_logger
+
+# 写入的列，与 SIGNAL_COLUMNS 一致
+_WRITE_COLUMNS = ('stock_code', 'date', 'strategy_name', 'signal_type', 'price', 'description')
+
+# 单次查询中 IN 子句或 UNION ALL 子查询允许的最大股票数量
+_QUERY_CHUNK_SIZE = 500
+
+# 被唯一索引和覆盖索引取代的旧索引
+SUPERSEDED_SIGNAL_INDEXES = ('idx_historical_signals_stock_date', 'idx_historical_signals_strategy_date')
+
+
+def ensure_unique_key(cursor: sqlite3.Cursor, table: str, index_name: str, columns: Sequence[str]) -> None:
+    """
+    创建唯一索引；索引不存在时先删除重复行（保留 id 最大的一条）
+
+    Args:
+        cursor: 数据库游标
+        table: 表名
+        index_name: 唯一索引名称
+        columns: 唯一键的列
+    """
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                            (index_name,)).fetchone()
+    if exists:
+        return
+    key = ", ".join(columns)
+    cursor.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key})")
+    cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table} ({key})")
+
+
+class SignalStore:
+    """信号存储类，负责 historical_signals 表的幂等写入和查询"""
+
+    def __init__(self, db):
+        """
+        初始化信号存储
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+        self.logger = setup_logger(__name__)
+
+    def _rows(self, signals: pd.DataFrame) -> List[tuple]:
+        """
+        把信号数据转换为写入参数
+
+        Args:
+            signals: 信号数据
+
+        Returns:
+            List[tuple]: 每个信号一行
+        """
+        frame = signals.reindex(columns=list(_WRITE_COLUMNS)).astype(object)
+        frame = frame.where(frame.notna(), None)
+        return list(frame.itertuples(index=False, name=None))
+
+    def upsert(self, signals: pd.DataFrame) -> int:
+        """
+        批量写入信号，同一 (股票, 日期, 策略) 的已有信号被覆盖
+
+        Args:
+            signals: 信号数据
+
+        Returns:
+            int: 写入的信号数量
+        """
+        if signals is None or signals.empty:
+            return 0
+        rows = self._rows(signals)
+        try:
+            self.db.conn.executemany(f"""
+                INSERT OR REPLACE INTO historical_signals ({", ".join(_WRITE_COLUMNS)})
+                VALUES ({", ".join("?" * len(_WRITE_COLUMNS))})
+            """, rows)
+            self.db.journal.record('historical_signals', signals)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"写入信号失败: {str(e)}")
+        return len(rows)
+
+    def replace(self,
+                stock_code: str,
+                start_date: str,
+                end_date: str,
+                strategies: List[str],
+                signals: pd.DataFrame) -> int:
+        """
+        在一个事务中替换单只股票在区间内的信号：删除区间内不再触发的信号，写入新信号
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            strategies: 策略名称列表
+            signals: 新的信号数据
+
+        Returns:
+            int: 写入的信号数量
+        """
+        if not strategies:
+            return 0
+        placeholders = ",".join("?" * len(strategies))
+        rows = self._rows(signals) if signals is not None and not signals.empty else []
+        conn = self.db.conn
+        try:
+            conn.execute(f"""
+                DELETE FROM historical_signals
+                WHERE stock_code = ? AND date BETWEEN ? AND ? AND strategy_name IN ({placeholders})
+            """, (stock_code, start_date, end_date, *strategies))
+            if rows:
+                conn.executemany(f"""
+                    INSERT OR REPLACE INTO historical_signals ({", ".join(_WRITE_COLUMNS)})
+                    VALUES ({", ".join("?" * len(_WRITE_COLUMNS))})
+                """, rows)
+            # 删除也算变更，记录整个替换区间
+            self.db.journal.record_ranges('historical_signals', [(stock_code, start_date, end_date)])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"替换{stock_code}的信号失败: {str(e)}")
+        return len(rows)
+
+    def query(self,
+              strategies: Optional[List[str]] = None,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              stock_codes: Optional[List[str]] = None,
+              signal_types: Optional[List[str]] = None,
+              columns: str = "*",
+              order_by: str = "date, stock_code, strategy_name",
+              limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        按策略、日期区间和股票（如股票池）查询信号
+
+        Args:
+            strategies: 策略名称列表（可选）
+            start_date: 开始日期（可选）
+            end_date: 结束日期（可选）
+            stock_codes: 股票代码列表（可选），股票较多时分批查询
+            signal_types: 信号类型列表（可选）
+            columns: 查询的列
+            order_by: 排序的列
+            limit: 最多返回的行数（可选）
+
+        Returns:
+            pd.DataFrame: 信号数据
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        for column, values in (("strategy_name", strategies), ("signal_type", signal_types)):
+            if values:
+                conditions.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if start_date:
+            conditions.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("date <= ?")
+            params.append(end_date)
+
+        chunks: List[Optional[List[str]]] = [None]
+        if stock_codes is not None:
+            chunks = [stock_codes[i:i + _QUERY_CHUNK_SIZE] for i in range(0, len(stock_codes), _QUERY_CHUNK_SIZE)]
+            if not chunks:
+                return self.db.execute_query(f"SELECT {columns} FROM historical_signals WHERE 0")
+        frames = []
+        for chunk in chunks:
+            where = list(conditions)
+            chunk_params = list(params)
+            if chunk is not None:
+                where.append(f"stock_code IN ({','.join('?' * len(chunk))})")
+                chunk_params.extend(chunk)
+            query = f"SELECT {columns} FROM historical_signals"
+            if where:
+                query += " WHERE " + " AND ".join(where)
+            query += f" ORDER BY {order_by}"
+            if limit is not None:
+                query += " LIMIT ?"
+                chunk_params.append(limit)
+            frames.append(self.db.execute_query(query, tuple(chunk_params)))
+        if len(frames) == 1:
+            return frames[0]
+        result = pd.concat(frames, ignore_index=True)
+        keys = [key.strip() for key in order_by.split(",")]
+        if all(key in result.columns for key in keys):
+            result = result.sort_values(keys, kind="mergesort").reset_index(drop=True)
+        return result.head(limit) if limit is not None else result
+
+    def latest(self,
+               stock_codes: List[str],
+               limit: int = 1,
+               end_date: Optional[str] = None,
+               strategies: Optional[List[str]] = None,
+               columns: str = "*") -> pd.DataFrame:
+        """
+        查询每只股票最近的 limit 个信号
+
+        每只股票是一个按唯一索引倒序读取的子查询，耗时只与股票数量和 limit 有关，与表的总行数无关。
+
+        Args:
+            stock_codes: 股票代码列表
+            limit: 每只股票返回的信号数量
+            end_date: 截止日期（可选）
+            strategies: 策略名称列表（可选）
+            columns: 查询的列
+
+        Returns:
+            pd.DataFrame: 按股票代码列表的顺序，每只股票的信号按日期倒序
+        """
+        conditions = ["stock_code = ?"]
+        params: List[Any] = []
+        if end_date:
+            conditions.append("date <= ?")
+            params.append(end_date)
+        if strategies:
+            conditions.append(f"strategy_name IN ({','.join('?' * len(strategies))})")
+            params.extend(strategies)
+        subquery = (f"SELECT * FROM (SELECT {columns} FROM historical_signals WHERE {' AND '.join(conditions)} "
+                    f"ORDER BY date DESC, strategy_name LIMIT ?)")
+        frames = []
+        for i in range(0, len(stock_codes), _QUERY_CHUNK_SIZE):
+            chunk = stock_codes[i:i + _QUERY_CHUNK_SIZE]
+            query = " UNION ALL ".join([subquery] * len(chunk))
+            chunk_params = [value for code in chunk for value in (code, *params, limit)]
+            frames.append(self.db.execute_query(query, tuple(chunk_params)))
+        if not frames:
+            return self.db.execute_query(f"SELECT {columns} FROM historical_signals WHERE 0")
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
@@ -0,0 +1,273 @@
+"""
+交易日历模块 - 本地缓存的交易所交易日历和K线缺口检测
+
+缺口检测把所有股票已存储的日期与交易日历对齐成 股票 x 交易日 的布尔矩阵，一次计算出所有缺口：
+    - missing: 数据库中缺少、需要重新获取的交易日（如过去某次更新失败）
+    - suspended: 数据源已确认没有K线的交易日（停牌或上市前），记录在 confirmed_gaps 表中，不再重复获取
+重新获取时，同一股票间隔不超过 max_bridge_days 个交易日的缺口合并为一个请求，减少请求次数。
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import setup_logger
+
+# 收盘时间，收盘后当天的K线才视为应当存在
+MARKET_CLOSE_TIME = "15:00"
+
+# 合并缺口时允许跨过的最大交易日数
+DEFAULT_MAX_BRIDGE_DAYS = 5
+
+GAP_MISSING = "missing"
+GAP_SUSPENDED = "suspended"
+
+# 每批检测的股票数量，限制 股票 x 交易日 矩阵的内存
+_GAP_CHUNK_SIZE = 500
+
+_GAP_COLUMNS = ['stock_code', 'start_date', 'end_date', 'trading_days', 'status']
+
+
+def _runs(mask: np.ndarray) -> tuple:
+    """
+    找出布尔矩阵每行中连续为 True 的区间
+
+    Args:
+        mask: 股票 x 交易日 的布尔矩阵
+
+    Returns:
+        tuple: (行号, 起始列, 结束列)，按行、列排序，结束列包含在区间内
+    """
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    return starts[:, 0], starts[:, 1], ends[:, 1] - 1
+
+
+class TradingCalendar:
+    """交易日历类，负责交易日历和已确认缺口的存储，以及K线缺口检测"""
+
+    def __init__(self, db):
+        """
+        初始化交易日历
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+        self.logger = setup_logger(__name__)
+
+    def store(self, dates: Iterable[str]) -> int:
+        """
+        写入交易日
+
+        Args:
+            dates: 交易日列表（YYYY-MM-DD）
+
+        Returns:
+            int: 写入的交易日数量
+        """
+        rows = [(date,) for date in dates]
+        try:
+            self.db.conn.executemany("INSERT OR IGNORE INTO trading_calendar (date) VALUES (?)", rows)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"写入交易日历失败: {str(e)}")
+        return len(rows)
+
+    def last_date(self) -> Optional[str]:
+        """
+        获取本地交易日历的最后一天
+
+        Returns:
+            Optional[str]: 最后一个交易日，没有交易日历时为 None
+        """
+        return self.db.conn.execute("SELECT MAX(date) FROM trading_calendar").fetchone()[0]
+
+    def is_trading_day(self, date: str) -> Optional[bool]:
+        """
+        判断日期是否为交易日
+
+        Args:
+            date: 日期（YYYY-MM-DD）
+
+        Returns:
+            Optional[bool]: 是否为交易日，本地交易日历没有覆盖该日期时为 None
+        """
+        last_date = self.last_date()
+        if last_date is None or date > last_date:
+            return None
+        return len(self.trading_days(date, date)) > 0
+
+    def trading_days(self, start_date: str, end_date: str) -> np.ndarray:
+        """
+        获取区间内的交易日
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            np.ndarray: 升序排列的交易日字符串数组
+        """
+        rows = self.db.conn.execute(
+            "SELECT date FROM trading_calendar WHERE date BETWEEN ? AND ? ORDER BY date", (start_date, end_date)
+        ).fetchall()
+        return np.array([row[0] for row in rows], dtype=object)
+
+    def settled_end_date(self, end_date: str, now: Optional[datetime] = None) -> str:
+        """
+        把结束日期限制在K线应当已经存在的日期：收盘前不包括当天
+
+        Args:
+            end_date: 结束日期
+            now: 当前时间（可选），默认为现在
+
+        Returns:
+            str: 限制后的结束日期
+        """
+        now = now or datetime.now()
+        settled = now if now.strftime('%H:%M') >= MARKET_CLOSE_TIME else now - timedelta(days=1)
+        return min(end_date, settled.strftime('%Y-%m-%d'))
+
+    def confirm_empty(self, stock_code: str, ranges: Iterable[tuple]) -> int:
+        """
+        记录数据源已确认没有K线的区间（停牌或上市前）
+
+        Args:
+            stock_code: 股票代码
+            ranges: (开始日期, 结束日期) 列表
+
+        Returns:
+            int: 记录的区间数量
+        """
+        rows = [(stock_code, start, end) for start, end in ranges]
+        try:
+            self.db.conn.executemany(
+                "INSERT OR REPLACE INTO confirmed_gaps (stock_code, start_date, end_date) VALUES (?, ?, ?)", rows
+            )
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"记录{stock_code}的停牌区间失败: {str(e)}")
+        return len(rows)
+
+    def find_gaps(self,
+                  start_date: str,
+                  end_date: str,
+                  stock_codes: Optional[List[str]] = None,
+                  table: str = 'daily_kline') -> pd.DataFrame:
+        """
+        对比已存储的日期和交易日历，找出所有股票的K线缺口
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            stock_codes: 股票代码列表（可选），默认为表中的所有股票
+            table: K线表名
+
+        Returns:
+            pd.DataFrame: 包含 stock_code, start_date, end_date, trading_days, status 的缺口，
+                按股票代码和开始日期排序
+        """
+        days = self.trading_days(start_date, end_date)
+        if len(days) == 0:
+            return pd.DataFrame(columns=_GAP_COLUMNS)
+        if stock_codes is None:
+            stored = self.db.query_kline(table, "date BETWEEN ? AND ?", (start_date, end_date),
+                                         start_date=start_date, end_date=end_date, columns="DISTINCT stock_code")
+            stock_codes = sorted(stored['stock_code'].drop_duplicates())
+
+        frames = []
+        for i in range(0, len(stock_codes), _GAP_CHUNK_SIZE):
+            frames.append(self._find_chunk_gaps(list(stock_codes[i:i + _GAP_CHUNK_SIZE]), days, table))
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=_GAP_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def _find_chunk_gaps(self, stock_codes: List[str], days: np.ndarray, table: str) -> pd.DataFrame:
+        """
+        检测一批股票的K线缺口
+
+        Args:
+            stock_codes: 股票代码列表
+            days: 交易日数组
+            table: K线表名
+
+        Returns:
+            pd.DataFrame: 缺口数据
+        """
+        start_date, end_date = days[0], days[-1]
+        placeholders = ",".join("?" * len(stock_codes))
+        stored = self.db.query_kline(
+            table, f"stock_code IN ({placeholders}) AND date BETWEEN ? AND ?",
+            (*stock_codes, start_date, end_date), start_date=start_date, end_date=end_date,
+            columns="stock_code, date"
+        )
+        codes = pd.Index(stock_codes)
+        present = np.zeros((len(codes), len(days)), dtype=bool)
+        if not stored.empty:
+            rows = codes.get_indexer(stored['stock_code'])
+            positions = np.searchsorted(days, stored['date'].to_numpy(dtype=object))
+            valid = (rows >= 0) & (positions < len(days))
+            valid[valid] &= days[positions[valid]] == stored['date'].to_numpy(dtype=object)[valid]
+            present[rows[valid], positions[valid]] = True
+
+        confirmed_rows = self.db.execute_query(f"""
+            SELECT stock_code, start_date, end_date FROM confirmed_gaps
+            WHERE stock_code IN ({placeholders}) AND end_date >= ? AND start_date <= ?
+        """, (*stock_codes, start_date, end_date))
+        coverage = np.zeros((len(codes), len(days) + 1), dtype=np.int16)
+        if confirmed_rows is not None and not confirmed_rows.empty:
+            rows = codes.get_indexer(confirmed_rows['stock_code'])
+            first = np.searchsorted(days, confirmed_rows['start_date'].to_numpy(dtype=object), side='left')
+            last = np.searchsorted(days, confirmed_rows['end_date'].to_numpy(dtype=object), side='right')
+            np.add.at(coverage, (rows, first), 1)
+            np.add.at(coverage, (rows, last), -1)
+        confirmed = np.cumsum(coverage[:, :-1], axis=1) > 0
+
+        frames = []
+        for status, mask in ((GAP_MISSING, ~present & ~confirmed), (GAP_SUSPENDED, ~present & confirmed)):
+            rows, first, last = _runs(mask)
+            frames.append(pd.DataFrame({
+                'stock_code': codes[rows], 'start_date': days[first], 'end_date': days[last],
+                'trading_days': last - first + 1, 'status': status,
+            }))
+        gaps = pd.concat(frames, ignore_index=True)
+        return gaps.sort_values(['stock_code', 'start_date'], kind='mergesort').reset_index(drop=True)
+
+    def plan_refetch(self, gaps: pd.DataFrame, max_bridge_days: int = DEFAULT_MAX_BRIDGE_DAYS) -> pd.DataFrame:
+        """
+        把缺失的缺口合并为最少的重新获取区间
+
+        同一股票相邻两个缺口之间的交易日不超过 max_bridge_days 时合并为一个区间，
+        多获取少量已有数据，换取更少的请求次数。
+
+        Args:
+            gaps: find_gaps 返回的缺口
+            max_bridge_days: 合并时允许跨过的最大交易日数
+
+        Returns:
+            pd.DataFrame: 包含 stock_code, start_date, end_date 的重新获取区间
+        """
+        missing = gaps[gaps['status'] == GAP_MISSING]
+        if missing.empty:
+            return pd.DataFrame(columns=['stock_code', 'start_date', 'end_date'])
+        missing = missing.sort_values(['stock_code', 'start_date'], kind='mergesort')
+        days = self.trading_days(missing['start_date'].min(), missing['end_date'].max())
+        first = np.searchsorted(days, missing['start_date'].to_numpy(dtype=object))
+        last = np.searchsorted(days, missing['end_date'].to_numpy(dtype=object))
+        codes = missing['stock_code'].to_numpy(dtype=object)
+        new_range = np.ones(len(missing), dtype=bool)
+        new_range[1:] = (codes[1:] != codes[:-1]) | (first[1:] - last[:-1] - 1 > max_bridge_days)
+        group = np.cumsum(new_range)
+        plan = pd.DataFrame({'group': group, 'stock_code': codes,
+                             'start_date': missing['start_date'].to_numpy(), 'end_date': missing['end_date'].to_numpy()})
+        return plan.groupby('group', sort=True).agg(
+            stock_code=('stock_code', 'first'), start_date=('start_date', 'min'), end_date=('end_date', 'max')
+        ).reset_index(drop=True)
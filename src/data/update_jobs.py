@@ -0,0 +1,376 @@
+"""
+更新任务模块 - 将批量数据更新拆分为可持久化的工作单元，支持断点续传、失败重试和进度估算
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .data_manager import DataManager
+from .db_handler import DatabaseHandler
+from ..utils.logger import setup_logger
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 推迟执行的单元记录的原因
+DEFERRED_ERROR = '接口熔断，推迟执行'
+
+
+class UpdateJobStore:
+    """更新任务存储类，负责 update_jobs 表中工作单元状态的读写"""
+
+    def __init__(self, db: DatabaseHandler):
+        """
+        初始化更新任务存储
+
+        Args:
+            db: DatabaseHandler实例
+        """
+        self.db = db
+
+    def create_job(self, stock_codes: List[str], data_types: List[str]) -> str:
+        """
+        创建新的更新任务，每个 (股票, 数据类型) 组合对应一个待处理的工作单元
+
+        Args:
+            stock_codes: 股票代码列表
+            data_types: 数据类型列表
+
+        Returns:
+            str: 任务ID
+        """
+        return self.create_job_for_units(
+            [(stock_code, data_type) for stock_code in stock_codes for data_type in data_types]
+        )
+
+    def create_job_for_units(self, units: List[Tuple[str, str]]) -> str:
+        """
+        创建只包含指定工作单元的更新任务
+
+        Args:
+            units: (股票代码, 数据类型) 列表
+
+        Returns:
+            str: 任务ID
+        """
+        job_id = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(job_id, stock_code, data_type, STATUS_PENDING, now) for stock_code, data_type in units]
+        try:
+            self.db.conn.executemany("""
+                INSERT OR IGNORE INTO update_jobs (job_id, stock_code, data_type, status, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"创建更新任务失败: {str(e)}")
+        return job_id
+
+    def find_resumable_job(self, max_attempts: int) -> Optional[str]:
+        """
+        查找最近一个仍有未完成工作单元的任务
+
+        Args:
+            max_attempts: 单个工作单元的最大尝试次数
+
+        Returns:
+            Optional[str]: 任务ID，没有可续传的任务时返回None
+        """
+        df = self.db.execute_query("""
+            SELECT job_id FROM update_jobs
+            WHERE status IN (?, ?) OR (status = ? AND attempts < ?)
+            ORDER BY job_id DESC
+            LIMIT 1
+        """, (STATUS_PENDING, STATUS_RUNNING, STATUS_FAILED, max_attempts))
+        if df is None or df.empty:
+            return None
+        return df.iloc[0]['job_id']
+
+    def get_pending_units(self, job_id: str, max_attempts: int) -> List[Tuple[str, str]]:
+        """
+        获取任务中需要执行的工作单元
+
+        已完成的单元被跳过；中断时处于 running 状态的单元视为待处理；
+        失败的单元在未达到最大尝试次数前会被重试。
+
+        Args:
+            job_id: 任务ID
+            max_attempts: 单个工作单元的最大尝试次数
+
+        Returns:
+            List[Tuple[str, str]]: (股票代码, 数据类型) 列表
+        """
+        df = self.db.execute_query("""
+            SELECT stock_code, data_type FROM update_jobs
+            WHERE job_id = ?
+              AND (status IN (?, ?) OR (status = ? AND attempts < ?))
+            ORDER BY stock_code, data_type
+        """, (job_id, STATUS_PENDING, STATUS_RUNNING, STATUS_FAILED, max_attempts))
+        if df is None or df.empty:
+            return []
+        return list(df.itertuples(index=False, name=None))
+
+    def mark_units(self,
+                   job_id: str,
+                   stock_code: str,
+                   results: Dict[str, Optional[bool]],
+                   error: Optional[str] = None) -> None:
+        """
+        记录一只股票各数据类型工作单元的执行结果
+
+        推迟的单元（结果为 None）恢复为待处理，不计入尝试次数。
+
+        Args:
+            job_id: 任务ID
+            stock_code: 股票代码
+            results: 每种数据类型是否成功，None 表示接口熔断、推迟执行
+            error: 失败原因（可选）
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = []
+        for data_type, ok in results.items():
+            if ok is None:
+                rows.append((STATUS_PENDING, 0, DEFERRED_ERROR, now, job_id, stock_code, data_type))
+            else:
+                rows.append((STATUS_DONE if ok else STATUS_FAILED, 1, None if ok else error, now,
+                             job_id, stock_code, data_type))
+        try:
+            self.db.conn.executemany("""
+                UPDATE update_jobs
+                SET status = ?, attempts = attempts + ?, last_error = ?, updated_at = ?
+                WHERE job_id = ? AND stock_code = ? AND data_type = ?
+            """, rows)
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"记录工作单元状态失败: {str(e)}")
+
+    def mark_running(self, job_id: str, stock_code: str, data_types: List[str]) -> None:
+        """
+        将工作单元标记为执行中
+
+        Args:
+            job_id: 任务ID
+            stock_code: 股票代码
+            data_types: 数据类型列表
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self.db.conn.executemany("""
+                UPDATE update_jobs SET status = ?, updated_at = ?
+                WHERE job_id = ? AND stock_code = ? AND data_type = ?
+            """, [(STATUS_RUNNING, now, job_id, stock_code, data_type) for data_type in data_types])
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            raise Exception(f"记录工作单元状态失败: {str(e)}")
+
+    def get_job_summary(self, job_id: str) -> Dict[str, int]:
+        """
+        统计任务中各状态的工作单元数量
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Dict[str, int]: 状态 -> 数量
+        """
+        df = self.db.execute_query("""
+            SELECT status, COUNT(*) AS n FROM update_jobs
+            WHERE job_id = ?
+            GROUP BY status
+        """, (job_id,))
+        summary = {status: 0 for status in (STATUS_PENDING, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)}
+        if df is not None:
+            summary.update({row.status: int(row.n) for row in df.itertuples(index=False)})
+        return summary
+
+
+class ProgressTracker:
+    """进度跟踪类，根据实测吞吐量估算剩余时间"""
+
+    def __init__(self, total: int, logger, report_interval_seconds: float = 30.0):
+        """
+        初始化进度跟踪器
+
+        Args:
+            total: 工作单元总数
+            logger: 日志记录器
+            report_interval_seconds: 两次进度日志之间的最小间隔（秒）
+        """
+        self.total = total
+        self.completed = 0
+        self.logger = logger
+        self.report_interval_seconds = report_interval_seconds
+        self.started_at = time.monotonic()
+        self._last_report = self.started_at
+
+    def throughput(self) -> float:
+        """
+        计算实测吞吐量
+
+        Returns:
+            float: 每秒完成的工作单元数
+        """
+        elapsed = time.monotonic() - self.started_at
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        估算剩余时间
+
+        Returns:
+            Optional[float]: 剩余秒数，尚无吞吐量数据时返回None
+        """
+        rate = self.throughput()
+        if rate <= 0:
+            return None
+        return (self.total - self.completed) / rate
+
+    def update(self, n: int = 1) -> None:
+        """
+        记录完成的工作单元，并按间隔输出进度日志
+
+        Args:
+            n: 本次完成的工作单元数
+        """
+        self.completed += n
+        now = time.monotonic()
+        if self.completed >= self.total or now - self._last_report >= self.report_interval_seconds:
+            self._last_report = now
+            self.logger.info(self.format_progress())
+
+    def format_progress(self) -> str:
+        """
+        生成进度描述
+
+        Returns:
+            str: 进度描述文本
+        """
+        percent = self.completed / self.total * 100 if self.total else 100.0
+        eta = self.eta_seconds()
+        eta_text = "未知" if eta is None else f"{int(eta // 60)}分{int(eta % 60)}秒"
+        return (f"进度 {self.completed}/{self.total} ({percent:.1f}%), "
+                f"速度 {self.throughput():.2f} 单元/秒, 预计剩余 {eta_text}")
+
+
+class UpdateJobRunner:
+    """更新任务执行类，按工作单元执行数据更新并持久化每个单元的状态"""
+
+    def __init__(self,
+                 dm: DataManager,
+                 max_attempts: int = 3,
+                 report_interval_seconds: float = 30.0):
+        """
+        初始化更新任务执行器
+
+        Args:
+            dm: DataManager实例
+            max_attempts: 单个工作单元的最大尝试次数
+            report_interval_seconds: 进度日志的输出间隔（秒）
+        """
+        self.dm = dm
+        self.store = UpdateJobStore(dm.db)
+        self.max_attempts = max_attempts
+        self.report_interval_seconds = report_interval_seconds
+        self.sleep = time.sleep
+        self.logger = setup_logger(__name__)
+
+    def run(self,
+            stock_codes: List[str],
+            data_types: List[str],
+            resume: bool = False,
+            job_id: Optional[str] = None,
+            force: bool = False) -> Dict[str, Any]:
+        """
+        执行更新任务，新鲜度策略认为不会有新数据的 (股票, 数据类型) 不创建工作单元
+
+        Args:
+            stock_codes: 股票代码列表（续传时忽略，使用原任务的工作单元）
+            data_types: 数据类型列表（续传时忽略）
+            resume: 是否续传最近一个未完成的任务
+            job_id: 指定要续传的任务ID（可选）
+            force: 是否忽略新鲜度策略，请求全部工作单元
+
+        Returns:
+            Dict[str, Any]: 任务ID（job_id）、任务结束时各状态的工作单元数量和跳过的单元数量（skipped）
+        """
+        skipped = 0
+        if resume or job_id:
+            job_id = job_id or self.store.find_resumable_job(self.max_attempts)
+            if job_id is None:
+                self.logger.info("没有可续传的更新任务")
+                return {}
+            self.logger.info(f"续传更新任务 {job_id}")
+        else:
+            total = len(stock_codes) * len(data_types)
+            if force:
+                units = [(stock_code, data_type) for stock_code in stock_codes for data_type in data_types]
+            else:
+                units = self.dm.freshness.due_units(stock_codes, data_types)
+            skipped = total - len(units)
+            job_id = self.store.create_job_for_units(units)
+            self.logger.info(f"创建更新任务 {job_id}，共 {len(units)} 个工作单元，"
+                             f"新鲜度策略跳过 {skipped} 个")
+
+        # 每一轮处理所有未完成的单元，失败的单元留到下一轮重试，直到达到最大尝试次数；
+        # 接口熔断而推迟的单元也留到下一轮，下一轮开始前等待熔断器允许试探请求
+        self.dm.retry.start_run()
+        for attempt in range(self.max_attempts):
+            units = self.store.get_pending_units(job_id, self.max_attempts)
+            if not units:
+                break
+            if attempt > 0:
+                self._wait_for_circuits()
+                self.logger.info(f"第{attempt + 1}轮：重试 {len(units)} 个未完成的工作单元")
+            self._run_units(job_id, units)
+
+        summary = self.store.get_job_summary(job_id)
+        message = f"更新任务 {job_id} 结束: 完成 {summary[STATUS_DONE]} 个, 失败 {summary[STATUS_FAILED]} 个"
+        if summary[STATUS_PENDING]:
+            message += f", 推迟 {summary[STATUS_PENDING]} 个（可用 --resume 续传）"
+        self.logger.info(message)
+        return {"job_id": job_id, **summary, "skipped": skipped}
+
+    def _wait_for_circuits(self) -> None:
+        """有接口熔断时，等待到最早一个熔断器进入半开状态"""
+        open_endpoints = self.dm.retry.open_endpoints()
+        if not open_endpoints:
+            return
+        delay = min(open_endpoints.values())
+        if delay > 0:
+            self.logger.info(f"接口 {', '.join(sorted(open_endpoints))} 已熔断，{delay:.0f}秒后开始下一轮")
+            self.sleep(delay)
+
+    def _run_units(self, job_id: str, units: List[Tuple[str, str]]) -> None:
+        """
+        执行一批工作单元，同一只股票的数据类型合并为一次更新调用
+
+        Args:
+            job_id: 任务ID
+            units: (股票代码, 数据类型) 列表
+        """
+        by_stock: Dict[str, List[str]] = {}
+        for stock_code, data_type in units:
+            by_stock.setdefault(stock_code, []).append(data_type)
+
+        progress = ProgressTracker(len(units), self.logger, self.report_interval_seconds)
+        for stock_code, data_types in by_stock.items():
+            self.store.mark_running(job_id, stock_code, data_types)
+            error = None
+            try:
+                returned = self.dm.update_single_stock_data(stock_code, data_types) or {}
+            except Exception as e:
+                error = str(e)
+                returned = {}
+            results = {}
+            for data_type in data_types:
+                ok = returned.get(data_type, False)
+                results[data_type] = None if ok is None else bool(ok)
+            if error is None and False in results.values():
+                error = "数据更新失败，详见日志"
+            self.store.mark_units(job_id, stock_code, results, error)
+            progress.update(len(data_types))
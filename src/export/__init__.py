@@ -0,0 +1,7 @@
+"""
+快照导出模块
+"""
+
+from .snapshots import SnapshotExporter, decode_snapshot, safety_score
+
+__all__ = ['SnapshotExporter', 'decode_snapshot', 'safety_score']
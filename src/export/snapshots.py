@@ -0,0 +1,415 @@
+"""
+快照导出模块 - 为前端预先生成每只股票和每个股票池的只读快照文件，增量发布
+
+快照是 gzip 压缩的 JSON（键排序、浮点数四舍五入、gzip 头不含时间），相同内容总是生成相同的字节，
+因此可以用内容哈希判断文件是否变化。manifest.json 记录每个文件的 sha256、大小和最后变化的版本号，
+客户端只需要下载版本号大于本地版本的文件。
+
+manifest 同时记录导出时的变更日志版本号 (journal_version)。快照日期和导出配置不变时，
+下一次导出只重新生成变更日志中数据有变化的股票，其余股票沿用已发布的文件。
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..data.signal_store import SignalStore
+from ..strategies.indicators import bollinger_bands, macd, trailing_dividend_per_share
+from ..strategies.strategy_engine import StrategyEngine
+from ..utils.logger import setup_logger
+
+# 快照格式版本，格式不兼容时递增
+EXPORT_FORMAT_VERSION = 1
+
+DEFAULT_EXPORT_CONFIG = {
+    "output_dir": "export",
+    "bars": 60,
+    "signal_limit": 10,
+    "history_years": 5,
+}
+
+DEFAULT_SAFETY_SCORE_WEIGHTS = {
+    "pe_percentile": 0.4,
+    "pb_percentile": 0.4,
+    "dividend_yield_percentile": 0.2,
+}
+
+MANIFEST_NAME = "manifest.json"
+
+# 快照的数据来源表，变更日志中这些表有变化的股票才重新生成快照
+SNAPSHOT_SOURCE_TABLES = ['daily_kline', 'adjust_factors', 'dividend_data', 'financial_summary', 'historical_signals']
+
+
+def _percentile_of_latest(values: pd.Series) -> Optional[float]:
+    """
+    计算最新值在历史数据中的分位（不高于最新值的比例）
+
+    Args:
+        values: 按日期升序排列的数值
+
+    Returns:
+        Optional[float]: 0~1 之间的分位，没有数据时为 None
+    """
+    values = pd.to_numeric(values, errors='coerce').dropna()
+    if values.empty:
+        return None
+    return float((values <= values.iloc[-1]).mean())
+
+
+def safety_score(financials: pd.DataFrame,
+                 dividend_yields: pd.Series,
+                 weights: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """
+    计算安全分：估值越低、股息率越高越安全，满分100
+
+    PE、PB 使用 1 - 当前值在自身历史中的分位，股息率直接使用分位；
+    缺少某项数据时按剩余项的权重归一化。
+
+    Args:
+        financials: 按日期升序排列的财务摘要（pe_ttm, pb_mrq）
+        dividend_yields: 按日期升序排列的动态股息率
+        weights: 各项权重
+
+    Returns:
+        Dict[str, Optional[float]]: score 和各项分位
+    """
+    def positive(column: str) -> pd.Series:
+        if financials.empty or column not in financials.columns:
+            return pd.Series(dtype=float)
+        values = pd.to_numeric(financials[column], errors='coerce')
+        return values[values > 0]
+
+    pe = _percentile_of_latest(positive('pe_ttm'))
+    pb = _percentile_of_latest(positive('pb_mrq'))
+    components = {
+        "pe_percentile": pe,
+        "pb_percentile": pb,
+        "dividend_yield_percentile": _percentile_of_latest(dividend_yields),
+    }
+    scores = {
+        "pe_percentile": None if pe is None else 1 - pe,
+        "pb_percentile": None if pb is None else 1 - pb,
+        "dividend_yield_percentile": components["dividend_yield_percentile"],
+    }
+    available = {name: weights.get(name, 0) for name, value in scores.items() if value is not None}
+    total = sum(available.values())
+    score = sum(scores[name] * weight for name, weight in available.items()) / total * 100 if total > 0 else None
+    return {"score": score, **components}
+
+
+def _clean(value: Any) -> Any:
+    """
+    把数据转换为可稳定序列化的 JSON 值：浮点数保留4位小数，NaN 转为 None
+
+    Args:
+        value: 任意值
+
+    Returns:
+        Any: 可序列化的值
+    """
+    if isinstance(value, dict):
+        return {str(key): _clean(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return [_clean(item) for item in value.tolist()]
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) or math.isinf(value) else round(float(value), 4)
+    if value is None or isinstance(value, (str, int, bool)):
+        return value
+    if value is pd.NaT or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+def encode_snapshot(data: Dict[str, Any]) -> bytes:
+    """
+    把快照编码为确定性的 gzip 压缩 JSON
+
+    Args:
+        data: 快照数据
+
+    Returns:
+        bytes: 压缩后的内容，相同数据总是得到相同的字节
+    """
+    text = json.dumps(_clean(data), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return gzip.compress(text.encode("utf-8"), mtime=0)
+
+
+def decode_snapshot(content: bytes) -> Dict[str, Any]:
+    """
+    解码快照
+
+    Args:
+        content: encode_snapshot 生成的内容
+
+    Returns:
+        Dict[str, Any]: 快照数据
+    """
+    return json.loads(gzip.decompress(content).decode("utf-8"))
+
+
+class SnapshotExporter:
+    """快照导出类，生成股票和股票池快照并只发布内容变化的文件"""
+
+    def __init__(self, engine: StrategyEngine, export_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化快照导出器
+
+        Args:
+            engine: 策略引擎，用于加载前复权K线和分红数据
+            export_config: 导出配置，默认取配置文件中的 export 部分
+        """
+        self.engine = engine
+        self.db = engine.dm.db
+        config = export_config if export_config is not None else self.db.config.get("export", {})
+        self.config = {**DEFAULT_EXPORT_CONFIG, **config}
+        self.output_dir = self.config["output_dir"]
+        self.weights = self.db.config.get("safety_score_weights", DEFAULT_SAFETY_SCORE_WEIGHTS)
+        self.logger = setup_logger(__name__)
+
+    def build_stock_snapshot(self, stock_code: str, date: str) -> Optional[Dict[str, Any]]:
+        """
+        生成单只股票的快照
+
+        Args:
+            stock_code: 股票代码
+            date: 快照日期
+
+        Returns:
+            Optional[Dict[str, Any]]: 最新K线、指标、股息率、安全分和最近信号，没有K线时为 None
+        """
+        start_date = (datetime.strptime(date, '%Y-%m-%d')
+                      - timedelta(days=365 * self.config["history_years"])).strftime('%Y-%m-%d')
+        daily, dividends = self.engine.load_inputs(stock_code, start_date, date)
+        if daily.empty:
+            return None
+
+        params = self.engine.strategies_config.get('strategy_1a_daily_bollinger_dividend', {})
+        close = daily['close'].astype(float)
+        mid, upper, lower = bollinger_bands(close, params.get('bollinger_period', 20),
+                                            params.get('bollinger_std_dev', 2.0))
+        dif, dea, histogram = macd(close)
+        ttm_dividend = trailing_dividend_per_share(
+            pd.to_datetime(daily['date']).to_numpy(),
+            pd.to_datetime(dividends['ex_dividend_date']).to_numpy() if not dividends.empty else np.array([]),
+            dividends['dividend_per_share_pre_tax'].to_numpy() if not dividends.empty else np.array([]),
+        )
+        raw_close = daily['raw_close'] if 'raw_close' in daily.columns else close
+        dividend_yield = pd.Series(ttm_dividend / raw_close.astype(float).to_numpy() * 100)
+
+        financials = self.db.execute_query("""
+            SELECT date, pe_ttm, pb_mrq FROM financial_summary
+            WHERE stock_code = ? AND date <= ?
+            ORDER BY date
+        """, (stock_code, date))
+        signals = SignalStore(self.db).latest(
+            [stock_code], self.config["signal_limit"], end_date=date,
+            columns="date, strategy_name, signal_type, price, description",
+        )
+
+        bars = daily.tail(self.config["bars"])
+        latest = daily.iloc[-1]
+        previous_close = close.iloc[-2] if len(close) > 1 else np.nan
+        return {
+            "format_version": EXPORT_FORMAT_VERSION,
+            "stock_code": stock_code,
+            "date": latest['date'],
+            "close": latest['close'],
+            "change_percentage": (latest['close'] / previous_close - 1) * 100,
+            "bars": {column: bars[column].to_numpy() for column in
+                     ['date', 'open', 'high', 'low', 'close', 'volume']},
+            "indicators": {
+                "bollinger_mid": mid.iloc[-1],
+                "bollinger_upper": upper.iloc[-1],
+                "bollinger_lower": lower.iloc[-1],
+                "macd_dif": dif.iloc[-1],
+                "macd_dea": dea.iloc[-1],
+                "macd_histogram": histogram.iloc[-1],
+            },
+            "dividend": {
+                "ttm_dividend_per_share": ttm_dividend[-1],
+                "dynamic_dividend_yield": dividend_yield.iloc[-1],
+            },
+            "safety": safety_score(financials, dividend_yield, self.weights),
+            "signals": signals.to_dict(orient="records"),
+        }
+
+    @staticmethod
+    def build_pool_snapshot(pool_name: str, stocks: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        由股票快照生成股票池快照
+
+        Args:
+            pool_name: 股票池名称
+            stocks: 股票代码 -> 股票快照
+
+        Returns:
+            Dict[str, Any]: 股票池中每只股票的摘要
+        """
+        rows = []
+        for stock_code, snapshot in stocks.items():
+            latest_signal = snapshot["signals"][0] if snapshot["signals"] else None
+            rows.append({
+                "stock_code": stock_code,
+                "date": snapshot["date"],
+                "close": snapshot["close"],
+                "change_percentage": snapshot["change_percentage"],
+                "dynamic_dividend_yield": snapshot["dividend"]["dynamic_dividend_yield"],
+                "safety_score": snapshot["safety"]["score"],
+                "latest_signal": latest_signal,
+            })
+        return {"format_version": EXPORT_FORMAT_VERSION, "pool": pool_name, "stocks": rows}
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """
+        读取已发布的 manifest
+
+        Returns:
+            Dict[str, Any]: manifest，不存在时为空的 manifest
+        """
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {"format_version": EXPORT_FORMAT_VERSION, "version": 0, "files": {}}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def config_digest(self) -> str:
+        """
+        导出配置的摘要，配置变化时所有快照都需要重新生成
+
+        Returns:
+            str: 导出配置、安全分权重和策略参数的 sha256
+        """
+        params = self.engine.strategies_config.get('strategy_1a_daily_bollinger_dividend', {})
+        text = json.dumps([EXPORT_FORMAT_VERSION, self.config, self.weights, params], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _reusable_stocks(self, manifest: Dict[str, Any], date: str, stock_codes: List[str]) -> Dict[str, bytes]:
+        """
+        找出可以沿用已发布快照的股票：快照日期和配置不变，且变更日志中数据没有变化
+
+        Args:
+            manifest: 已发布的 manifest
+            date: 快照日期
+            stock_codes: 要导出的股票代码
+
+        Returns:
+            Dict[str, bytes]: 股票代码 -> 已发布的快照文件内容
+        """
+        if manifest.get("date") != date or manifest.get("config_digest") != self.config_digest() \
+                or "journal_version" not in manifest:
+            return {}
+        dirty = set(self.db.journal.dirty_stocks(manifest["journal_version"], SNAPSHOT_SOURCE_TABLES))
+        reusable = {}
+        for stock_code in stock_codes:
+            relative_path = f"stocks/{stock_code}.json.gz"
+            path = os.path.join(self.output_dir, relative_path)
+            if stock_code in dirty or relative_path not in manifest.get("files", {}) or not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                reusable[stock_code] = f.read()
+        return reusable
+
+    def _write(self, relative_path: str, content: bytes) -> None:
+        """
+        原子写入文件：先写临时文件再替换，客户端不会读到写了一半的文件
+
+        Args:
+            relative_path: 相对导出目录的路径
+            content: 文件内容
+        """
+        path = os.path.join(self.output_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+    def export(self, pools: Dict[str, List[str]], date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成所有快照，只写入内容变化的文件，最后发布 manifest
+
+        Args:
+            pools: 股票池名称 -> 股票代码列表
+            date: 快照日期（可选），默认为今天
+
+        Returns:
+            Dict[str, Any]: 新版本号，以及变化、未变化和删除的文件
+        """
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        # 先取版本号再读数据，导出期间的写入留到下一次导出
+        journal_version = self.db.journal.current_version()
+        manifest = self.load_manifest()
+        stock_codes = sorted({code for codes in pools.values() for code in codes})
+        reused = self._reusable_stocks(manifest, date, stock_codes)
+        stocks: Dict[str, Dict[str, Any]] = {code: decode_snapshot(content) for code, content in reused.items()}
+        for stock_code in stock_codes:
+            if stock_code in reused:
+                continue
+            try:
+                snapshot = self.build_stock_snapshot(stock_code, date)
+            except Exception as e:
+                self.logger.error(f"生成{stock_code}的快照失败: {str(e)}")
+                continue
+            if snapshot is not None:
+                stocks[stock_code] = snapshot
+
+        contents = {f"stocks/{code}.json.gz": reused[code] if code in reused else encode_snapshot(snapshot)
+                    for code, snapshot in stocks.items()}
+        for pool_name, codes in pools.items():
+            pool_stocks = {code: stocks[code] for code in codes if code in stocks}
+            contents[f"pools/{pool_name}.json.gz"] = encode_snapshot(self.build_pool_snapshot(pool_name, pool_stocks))
+
+        previous = manifest.get("files", {})
+        version = manifest.get("version", 0) + 1
+        files, changed = {}, []
+        for relative_path, content in sorted(contents.items()):
+            digest = hashlib.sha256(content).hexdigest()
+            entry = previous.get(relative_path)
+            if entry and entry["sha256"] == digest \
+                    and os.path.exists(os.path.join(self.output_dir, relative_path)):
+                files[relative_path] = entry
+                continue
+            self._write(relative_path, content)
+            files[relative_path] = {"sha256": digest, "size": len(content), "version": version}
+            changed.append(relative_path)
+        removed = sorted(set(previous) - set(files))
+        for relative_path in removed:
+            path = os.path.join(self.output_dir, relative_path)
+            if os.path.exists(path):
+                os.remove(path)
+
+        published = changed or removed or not os.path.exists(os.path.join(self.output_dir, MANIFEST_NAME))
+        if not published:
+            version -= 1
+        # 文件没有变化时版本号不变，但仍然记录处理到的变更日志版本
+        if published or manifest.get("journal_version") != journal_version or manifest.get("date") != date \
+                or manifest.get("config_digest") != self.config_digest():
+            manifest = {
+                "format_version": EXPORT_FORMAT_VERSION,
+                "version": version,
+                "date": date,
+                "generated_at": datetime.now().isoformat(timespec="seconds") if published
+                else manifest.get("generated_at"),
+                "journal_version": journal_version,
+                "config_digest": self.config_digest(),
+                "files": files,
+                "removed": removed if published else manifest.get("removed", []),
+            }
+            self._write(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True)
+                        .encode("utf-8"))
+        self.logger.info(f"快照导出完成，版本 {version}，变化 {len(changed)} 个，"
+                         f"未变化 {len(files) - len(changed)} 个，删除 {len(removed)} 个，"
+                         f"沿用已发布快照的股票 {len(reused)} 只")
+        return {"version": version, "changed": changed, "unchanged": len(files) - len(changed), "removed": removed}
@@ -0,0 +1,20 @@
+"""
+常驻服务模块
+"""
+import importlib
+
+# 导出名称 -> 所在子模块。首次访问时才导入子模块，
+# 瘦客户端只导入标准库实现的 client，不会因此导入 pandas
+_EXPORTS = {
+    'ScanService': '.server',
+    'ServiceClient': '.client',
+    'parse_address': '.client',
+}
+
+__all__ = ['ScanService', 'ServiceClient', 'parse_address']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,93 @@
+"""
+常驻服务客户端 - 只依赖标准库，命令行以瘦客户端方式把请求转发给常驻服务
+
+协议：每个请求和响应都是一行 JSON。
+    请求: {"command": "scan", "params": {...}}
+    响应: {"ok": true, "result": ...} 或 {"ok": false, "error": "..."}
+"""
+import json
+import socket
+from typing import Any, Optional, Tuple, Union
+
+# 单次读取的缓冲区大小
+_BUFFER_SIZE = 65536
+
+
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """
+    解析服务地址
+
+    Args:
+        address: "unix:/path/to/socket" 形式的 Unix 套接字，或 "host:port" 形式的 TCP 地址
+
+    Returns:
+        Tuple[int, Union[str, Tuple[str, int]]]: (套接字地址族, 套接字地址)
+    """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"无效的服务地址: {address}")
+    return socket.AF_INET, (host, int(port))
+
+
+class ServiceClient:
+    """常驻服务客户端类"""
+
+    def __init__(self, address: str, timeout: Optional[float] = 600):
+        """
+        初始化客户端
+
+        Args:
+            address: 服务地址
+            timeout: 等待响应的超时时间（秒），更新数据等请求可能耗时较长
+        """
+        self.address = address
+        self.timeout = timeout
+        self.family, self.target = parse_address(address)
+
+    def call(self, command: str, **params: Any) -> Any:
+        """
+        发送一个请求并等待结果
+
+        Args:
+            command: 命令名称
+            **params: 命令参数
+
+        Returns:
+            Any: 命令结果
+        """
+        try:
+            with socket.socket(self.family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.target)
+                request = json.dumps({"command": command, "params": params}, ensure_ascii=False)
+                sock.sendall(request.encode("utf-8") + b"\n")
+                data = b""
+                while not data.endswith(b"\n"):
+                    chunk = sock.recv(_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    data += chunk
+        except OSError as e:
+            raise Exception(f"连接常驻服务 {self.address} 失败: {str(e)}")
+
+        if not data:
+            raise Exception(f"常驻服务 {self.address} 没有返回结果")
+        response = json.loads(data.decode("utf-8"))
+        if not response.get("ok"):
+            raise Exception(f"常驻服务执行{command}失败: {response.get('error')}")
+        return response.get("result")
+
+    def is_available(self) -> bool:
+        """
+        检查服务是否可用
+
+        Returns:
+            bool: 服务是否响应 ping
+        """
+        try:
+            self.call("ping")
+            return True
+        except Exception:
+            return False
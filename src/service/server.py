@@ -0,0 +1,538 @@
+"""
+常驻服务模块 - 保持数据库连接、K线和指标输入常驻内存，通过本地套接字响应扫描、查询和回溯请求
+
+每次命令行调用都要支付 Python 启动、导入 akshare/pandas、打开数据库和重新加载K线的开销，
+常驻服务只支付一次，之后的请求在毫秒级完成。服务还会在每个交易日收盘后自动更新数据。
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from ..data.data_manager import DataManager
+from ..data.db_handler import DatabaseHandler
+from ..data.factor_ranks import MARKET_UNIVERSE
+from ..data.update_jobs import UpdateJobRunner
+from ..export.snapshots import SnapshotExporter
+from ..strategies.strategy_engine import LOOKBACK_DAYS, StrategyEngine
+from ..utils.logger import setup_logger
+from .client import parse_address
+
+DEFAULT_SERVICE_CONFIG = {
+    "address": "127.0.0.1:8765",
+    "scheduled_update": True,
+    "post_close_update_time": "15:30",
+    "update_data_types": ["kline", "financial", "dividend"],
+    "export_after_update": False,
+}
+
+# 缓存的策略输入来自这些表，变更日志中这些表有变化的股票缓存失效
+CACHE_SOURCE_TABLES = ['daily_kline', 'adjust_factors', 'dividend_data']
+
+# 在独立数据库连接上执行、不占用请求锁的命令：收盘后更新可能持续数小时，期间其他请求照常响应
+UNLOCKED_COMMANDS = {"update"}
+
+
+class ScanService:
+    """常驻服务类，请求在同一个数据库连接上串行执行，数据更新在独立的连接上执行"""
+
+    def __init__(self,
+                 config: Union[str, Dict[str, Any]] = "config.json",
+                 stock_pool_path: str = "stock_pool.json"):
+        """
+        初始化服务
+
+        Args:
+            config: 配置文件路径或配置字典
+            stock_pool_path: 股票池文件路径
+        """
+        db = DatabaseHandler(config)
+        db.initialize_tables()
+        self.dm = DataManager(db)
+        self.engine = StrategyEngine(self.dm)
+        self.engine.enable_cache()
+        # 已处理到的变更日志版本，其他进程（队列 worker、命令行更新）写入的股票在下一个请求前失效
+        self._journal_version = db.journal.current_version()
+        self.stock_pool_path = stock_pool_path
+        self.service_config = {**DEFAULT_SERVICE_CONFIG, **db.config.get("service", {})}
+        self.logger = setup_logger(__name__)
+        self.started_at = time.time()
+        # 数据库连接和缓存不是线程安全的，请求之间串行执行
+        self._lock = threading.RLock()
+        # 数据更新使用的数据管理器（独立的数据库连接，首次更新时创建），更新之间串行执行
+        self._update_dm: Optional[DataManager] = None
+        self._update_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._server: Optional[socketserver.BaseServer] = None
+        self.commands: Dict[str, Callable[..., Any]] = {
+            "ping": self.ping,
+            "scan": self.scan,
+            "lookup": self.lookup,
+            "overview": self.overview,
+            "factor_ranks": self.factor_ranks,
+            "rank_factors": self.rank_factors,
+            "signals": self.signals,
+            "backfill": self.backfill,
+            "update": self.update,
+            "export": self.export,
+        }
+
+    def call(self, command: str, **params: Any) -> Any:
+        """
+        在当前进程中执行命令，与 ServiceClient.call 接口一致
+
+        Args:
+            command: 命令名称
+            **params: 命令参数
+
+        Returns:
+            Any: 命令结果
+        """
+        if command not in self.commands:
+            raise ValueError(f"未知的命令: {command}")
+        if command in UNLOCKED_COMMANDS:
+            return self.commands[command](**params)
+        with self._lock:
+            self.sync_changes()
+            return self.commands[command](**params)
+
+    def sync_changes(self) -> List[str]:
+        """
+        按变更日志使数据有变化的股票的缓存失效
+
+        Returns:
+            List[str]: 缓存失效的股票代码
+        """
+        journal = self.dm.db.journal
+        version = journal.current_version()
+        if version == self._journal_version:
+            return []
+        stock_codes = journal.dirty_stocks(self._journal_version, CACHE_SOURCE_TABLES)
+        self._journal_version = version
+        if stock_codes:
+            self.engine.invalidate(stock_codes)
+        return stock_codes
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理一个请求，异常转换为错误响应
+
+        Args:
+            request: 请求字典，包含 command 和 params
+
+        Returns:
+            Dict[str, Any]: 响应字典
+        """
+        try:
+            result = self.call(request.get("command", ""), **request.get("params", {}))
+            return {"ok": True, "result": result}
+        except Exception as e:
+            self.logger.error(f"处理请求{request.get('command')}失败: {str(e)}")
+            return {"ok": False, "error": str(e)}
+
+    def load_stock_pools(self) -> Dict[str, List[str]]:
+        """
+        加载所有股票池，每次重新读取文件以便修改后立即生效
+
+        Returns:
+            Dict[str, List[str]]: 股票池名称 -> 股票代码列表
+        """
+        try:
+            with open(self.stock_pool_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            raise Exception(f"加载股票池失败: {str(e)}")
+
+    def load_stock_pool(self, pool_name: str = "default_pool") -> List[str]:
+        """
+        加载股票池
+
+        Args:
+            pool_name: 股票池名称，为 None 时返回所有股票池中的股票
+
+        Returns:
+            List[str]: 股票代码列表
+        """
+        pools = self.load_stock_pools()
+        if pool_name is None:
+            return sorted({code for pool in pools.values() for code in pool})
+        return pools.get(pool_name, [])
+
+    def ping(self) -> Dict[str, Any]:
+        """
+        检查服务状态
+
+        Returns:
+            Dict[str, Any]: 运行时长和缓存的股票数量
+        """
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "cached_stocks": len(self.engine._cache or {}),
+        }
+
+    def scan(self,
+             pool: str = "default_pool",
+             stock_codes: Optional[List[str]] = None,
+             date: Optional[str] = None,
+             strategies: Optional[List[str]] = None,
+             save: bool = True,
+             processes: int = 1) -> Dict[str, Any]:
+        """
+        选股扫描
+
+        Args:
+            pool: 股票池名称
+            stock_codes: 股票代码列表（可选），指定后忽略 pool
+            date: 扫描日期（可选），默认为最新数据日期
+            strategies: 指定的策略名称（可选）
+            save: 是否把结果保存到 scan_output_dir
+            processes: 评估使用的进程数
+
+        Returns:
+            Dict[str, Any]: 扫描日期、信号列表和结果文件路径
+        """
+        codes = stock_codes if stock_codes else self.load_stock_pool(pool)
+        signals = self.engine.scan(codes, date, strategies, processes)
+        scan_date = date or datetime.now().strftime('%Y-%m-%d')
+        records = signals.to_dict(orient="records")
+        output_path = self._save_scan_summary(scan_date, records) if save else None
+        self.logger.info(f"扫描完成，{len(codes)} 只股票中 {signals['stock_code'].nunique()} 只触发信号")
+        return {"date": scan_date, "signals": records, "output_path": output_path}
+
+    def _save_scan_summary(self, scan_date: str, records: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        保存扫描结果到 scan_results/YYYY-MM-DD_scan_summary.json
+
+        Args:
+            scan_date: 扫描日期
+            records: 信号列表
+
+        Returns:
+            Optional[str]: 结果文件路径，保存失败时为 None
+        """
+        output_dir = self.dm.db.config.get("scan_output_dir", "scan_results")
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, f"{scan_date}_scan_summary.json")
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump({"date": scan_date, "signals": records}, f, indent=4, ensure_ascii=False, default=str)
+            return output_path
+        except Exception as e:
+            self.logger.error(f"保存扫描结果失败: {str(e)}")
+            return None
+
+    def lookup(self, stock_code: str, date: Optional[str] = None, signal_limit: int = 10) -> Dict[str, Any]:
+        """
+        查询单只股票的最新行情和最近的历史信号
+
+        Args:
+            stock_code: 股票代码
+            date: 查询日期（可选），默认为今天
+            signal_limit: 返回的历史信号数量
+
+        Returns:
+            Dict[str, Any]: 查询日期之前最新一根前复权K线和最近的信号
+        """
+        end_date = date or datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        daily, _ = self.engine.load_inputs(stock_code, start_date, end_date)
+        latest = daily.iloc[-1].to_dict() if not daily.empty else None
+        signals = self.engine.signal_store.latest([stock_code], signal_limit, end_date=end_date)
+        return {
+            "stock_code": stock_code,
+            "latest": latest,
+            "signals": signals.to_dict(orient="records"),
+        }
+
+    def overview(self, pool: str = "default_pool", stock_codes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        读取股票池中每只股票的当前状态（最新收盘价、近一年分红、股息率、最新PE/PB和最新信号）
+
+        Args:
+            pool: 股票池名称
+            stock_codes: 股票代码列表（可选），指定后忽略 pool
+
+        Returns:
+            List[Dict[str, Any]]: 每只股票一条记录，没有数据的股票不返回
+        """
+        codes = stock_codes if stock_codes else self.load_stock_pool(pool)
+        snapshot = self.dm.db.latest_snapshot.query(codes)
+        return snapshot.astype(object).where(snapshot.notna(), None).to_dict(orient="records")
+
+    def factor_ranks(self,
+                     universe: str = MARKET_UNIVERSE,
+                     date: Optional[str] = None,
+                     pool: Optional[str] = None,
+                     stock_codes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        读取某个交易日股息率、PE、PB 在全市场或股票池内的百分位排名
+
+        Args:
+            universe: 排名范围，market 为全市场，其他为股票池名称
+            date: 日期（可选），默认为已计算的最新日期
+            pool: 股票池名称（可选），只返回其中的股票
+            stock_codes: 股票代码列表（可选），指定后忽略 pool
+
+        Returns:
+            List[Dict[str, Any]]: 每只股票一条记录，没有排名的因子为 None
+        """
+        codes = stock_codes if stock_codes else (self.load_stock_pool(pool) if pool else None)
+        ranks = self.dm.db.factor_ranks.query(universe, date, codes)
+        return ranks.astype(object).where(ranks.notna(), None).to_dict(orient="records")
+
+    def rank_factors(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, int]:
+        """
+        计算全市场和每个股票池的因子排名；未指定开始日期时增量更新到最新的K线日期
+
+        Args:
+            start_date: 开始日期（可选），指定后重算整个区间
+            end_date: 结束日期（可选），默认为日K线的最新日期
+
+        Returns:
+            Dict[str, int]: 排名范围 -> 写入的行数
+        """
+        universes = {MARKET_UNIVERSE: None, **self.load_stock_pools()}
+        ranks = self.dm.db.factor_ranks
+        if start_date is None:
+            return ranks.update(universes, end_date)
+        return ranks.compute(universes, start_date, end_date or datetime.now().strftime("%Y-%m-%d"))
+
+    def signals(self,
+                strategies: Optional[List[str]] = None,
+                start_date: Optional[str] = None,
+                end_date: Optional[str] = None,
+                stock_codes: Optional[List[str]] = None,
+                pool: Optional[str] = None,
+                latest: Optional[int] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        查询历史信号
+
+        Args:
+            strategies: 策略名称列表（可选）
+            start_date: 开始日期（可选）
+            end_date: 结束日期（可选）
+            stock_codes: 股票代码列表（可选）
+            pool: 股票池名称（可选），未指定股票代码时使用
+            latest: 指定后返回每只股票最近的 latest 个信号，忽略开始日期
+            limit: 最多返回的信号数量（可选）
+
+        Returns:
+            List[Dict[str, Any]]: 信号记录
+        """
+        codes = stock_codes if stock_codes else (self.load_stock_pool(pool) if pool else None)
+        store = self.engine.signal_store
+        if latest:
+            if codes is None:
+                raise ValueError("查询最近信号需要指定股票代码或股票池")
+            result = store.latest(codes, latest, end_date=end_date, strategies=strategies)
+            if limit is not None:
+                result = result.head(limit)
+        else:
+            result = store.query(strategies=strategies, start_date=start_date, end_date=end_date,
+                                 stock_codes=codes, limit=limit)
+        return result.to_dict(orient="records")
+
+    def backfill(self,
+                 stock_codes: List[str],
+                 start_date: str,
+                 end_date: str,
+                 strategies: Optional[List[str]] = None,
+                 processes: int = 1) -> Dict[str, int]:
+        """
+        对历史数据执行策略回溯
+
+        Args:
+            stock_codes: 股票代码列表
+            start_date: 回溯开始日期
+            end_date: 回溯结束日期
+            strategies: 指定的策略名称（可选）
+            processes: 评估使用的进程数
+
+        Returns:
+            Dict[str, int]: 股票代码 -> 写入的信号数量
+        """
+        return self.engine.backfill_many(stock_codes, start_date, end_date, strategies, processes)
+
+    def update(self,
+               stock_codes: Optional[List[str]] = None,
+               data_types: Optional[List[str]] = None,
+               max_attempts: int = 3,
+               force: bool = False) -> Dict[str, Any]:
+        """
+        更新数据，完成后增量更新因子排名并按变更日志使数据有变化的股票的缓存失效
+
+        更新在独立的数据库连接上执行，不占用请求锁；内存数据库无法被第二个连接共享，
+        此时在请求锁内使用服务的连接执行。
+
+        Args:
+            stock_codes: 股票代码列表（可选），默认为所有股票池中的股票
+            data_types: 数据类型列表（可选）
+            max_attempts: 单个工作单元的最大尝试次数
+            force: 是否忽略新鲜度策略，请求全部数据
+
+        Returns:
+            Dict[str, Any]: 更新任务ID、各状态和跳过的单元数量以及因子排名写入的行数
+        """
+        codes = stock_codes if stock_codes else self.load_stock_pool(None)
+        types = data_types if data_types else self.service_config["update_data_types"]
+        universes = {MARKET_UNIVERSE: None, **self.load_stock_pools()}
+        with self._update_lock:
+            if self._is_memory_database():
+                with self._lock:
+                    result = UpdateJobRunner(self.dm, max_attempts=max_attempts).run(codes, types, force=force)
+                    result["factor_ranks"] = self.dm.db.factor_ranks.update(universes)
+            else:
+                dm = self._get_update_manager()
+                result = UpdateJobRunner(dm, max_attempts=max_attempts).run(codes, types, force=force)
+                result["factor_ranks"] = dm.db.factor_ranks.update(universes)
+        with self._lock:
+            self.sync_changes()
+            if self.service_config["export_after_update"]:
+                self.export()
+        return result
+
+    def _is_memory_database(self) -> bool:
+        """服务是否使用内存数据库"""
+        path = str(self.dm.db.config.get("database_path", ""))
+        return path == ":memory:" or path.startswith("file::memory:") or "mode=memory" in path
+
+    def _get_update_manager(self) -> DataManager:
+        """
+        获取数据更新使用的数据管理器，首次调用时打开独立的数据库连接
+
+        Returns:
+            DataManager: 数据管理器，熔断器、空结果缓存等状态在多次更新之间保留
+        """
+        if self._update_dm is None:
+            db = DatabaseHandler(self.dm.db.config)
+            db.initialize_tables()
+            self._update_dm = DataManager(db)
+            # 更新期间请求也可能获取数据（如补齐K线缺口），两个数据管理器合并相同的并发请求
+            self._update_dm.single_flight = self.dm.single_flight
+        return self._update_dm
+
+    def export(self, pool: Optional[str] = None, date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        导出股票和股票池快照，只发布内容变化的文件
+
+        Args:
+            pool: 股票池名称（可选），默认导出所有股票池
+            date: 快照日期（可选），默认为今天
+
+        Returns:
+            Dict[str, Any]: 新版本号，以及变化、未变化和删除的文件
+        """
+        pools = self.load_stock_pools()
+        if pool is not None:
+            pools = {pool: pools.get(pool, [])}
+        return SnapshotExporter(self.engine).export(pools, date)
+
+    def next_update_time(self, now: datetime) -> datetime:
+        """
+        计算下一次收盘后更新的时间：跳过本地交易日历中的非交易日，日历没有覆盖的日期跳过周末
+
+        Args:
+            now: 当前时间
+
+        Returns:
+            datetime: 下一次更新时间
+        """
+        hour, minute = (int(part) for part in self.service_config["post_close_update_time"].split(":"))
+        candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= now:
+            candidate += timedelta(days=1)
+        while True:
+            is_trading_day = self.dm.calendar.is_trading_day(candidate.strftime('%Y-%m-%d'))
+            if is_trading_day or (is_trading_day is None and candidate.weekday() < 5):
+                return candidate
+            candidate += timedelta(days=1)
+
+    def _run_scheduler(self) -> None:
+        """在后台线程中按计划执行收盘后更新"""
+        while not self._stop_event.is_set():
+            with self._lock:
+                next_run = self.next_update_time(datetime.now())
+            self.logger.info(f"下一次收盘后更新时间: {next_run.strftime('%Y-%m-%d %H:%M')}")
+            if self._stop_event.wait((next_run - datetime.now()).total_seconds()):
+                return
+            try:
+                self.call("update")
+            except Exception as e:
+                self.logger.error(f"收盘后更新失败: {str(e)}")
+
+    def serve_forever(self, address: Optional[str] = None) -> None:
+        """
+        启动服务并阻塞，直到调用 shutdown
+
+        Args:
+            address: 服务地址（可选），默认取配置中的 service.address
+        """
+        address = address or self.service_config["address"]
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(target):
+                os.remove(target)
+            server = socketserver.ThreadingUnixStreamServer(target, _RequestHandler)
+        else:
+            server = socketserver.ThreadingTCPServer(target, _RequestHandler, bind_and_activate=False)
+            server.allow_reuse_address = True
+            server.server_bind()
+            server.server_activate()
+        server.daemon_threads = True
+        server.service = self
+        self._server = server
+
+        if self.service_config["scheduled_update"]:
+            threading.Thread(target=self._run_scheduler, daemon=True).start()
+        self.logger.info(f"常驻服务已启动: {address}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if family == socket.AF_UNIX and os.path.exists(target):
+                os.remove(target)
+            self.logger.info("常驻服务已停止")
+
+    def shutdown(self) -> None:
+        """停止服务和计划任务"""
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """逐行读取 JSON 请求并返回 JSON 响应"""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode("utf-8"))
+            except ValueError as e:
+                response = {"ok": False, "error": f"无效的请求: {str(e)}"}
+            else:
+                response = self.server.service.handle_request(request)
+            self.wfile.write(json.dumps(response, ensure_ascii=False, default=_json_default).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def _json_default(value: Any) -> Any:
+    """
+    把 numpy/pandas 标量转换为可序列化的值
+
+    Args:
+        value: 无法直接序列化的值
+
+    Returns:
+        Any: 可序列化的值
+    """
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
@@ -0,0 +1,7 @@
+"""
+策略模块
+"""
+
+from .strategy_engine import STRATEGY_EVALUATORS, StrategyEngine, get_strategy_evaluators
+
+__all__ = ['STRATEGY_EVALUATORS', 'StrategyEngine', 'get_strategy_evaluators']
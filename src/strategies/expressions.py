@@ -0,0 +1,448 @@
+"""
+策略表达式模块 - 把配置中用条件表达式定义的策略编译为共享的向量化表达式图
+
+策略定义示例（config.json 的 strategies 部分）：
+
+    "strategy_ma_volume_breakout": {
+        "enabled": true,
+        "period": "daily",
+        "fast": 5,
+        "slow": 20,
+        "conditions": [
+            "cross_above(sma(close, fast), sma(close, slow))",
+            "volume >= sma(volume, slow) * 1.5"
+        ],
+        "values": {"volume_ratio": "volume / sma(volume, slow)"},
+        "description": "均线金叉, 量比{volume_ratio}"
+    }
+
+表达式是 Python 语法的子集：K线字段（open, high, low, close, raw_close, volume, amount）、
+数字常量、策略参数名、算术和比较运算、and/or/not 以及 FUNCTIONS 中的指标函数。
+参数名在编译时替换为常量，相同的子表达式得到相同的节点，同一根K线上的所有策略共用
+一个 memo：每个唯一的 (指标, 参数, K线周期) 在一次评估中只计算一次。
+"""
+import ast
+import string
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..data.asof import TTM_WINDOW_DAYS
+from ..data.kline_series import KlineSeries, as_kline_series
+from .indicators import band_range_percentage, bollinger_bands, macd, trailing_dividend_per_share
+
+# 表达式中可以直接引用的K线字段
+SERIES_FIELDS = ('open', 'high', 'low', 'close', 'raw_close', 'volume', 'amount')
+
+# 节点是可哈希的元组：('const', 值)、('series', 字段)、('call', 函数名, 参数节点)、('op', 运算符, 操作数节点...)
+Node = Tuple[Any, ...]
+
+
+class _Context(NamedTuple):
+    """一次评估的输入和已计算节点"""
+
+    kline: KlineSeries
+    dividends: pd.DataFrame
+    memo: Dict[Node, Any]
+
+
+def _rolling(x: np.ndarray, window: float) -> pd.core.window.Rolling:
+    """按完整窗口滚动"""
+    return pd.Series(x).rolling(window=int(window), min_periods=int(window))
+
+
+def _shift(x: np.ndarray, periods: float = 1) -> np.ndarray:
+    """序列后移，空出的位置为 NaN"""
+    return pd.Series(x).shift(int(periods)).to_numpy(dtype=np.float64)
+
+
+def _sma(ctx: _Context, x: np.ndarray, window: float) -> np.ndarray:
+    return _rolling(x, window).mean().to_numpy()
+
+
+def _ema(ctx: _Context, x: np.ndarray, span: float) -> np.ndarray:
+    return pd.Series(x).ewm(span=int(span), adjust=False).mean().to_numpy()
+
+
+def _rolling_max(ctx: _Context, x: np.ndarray, window: float) -> np.ndarray:
+    return _rolling(x, window).max().to_numpy()
+
+
+def _rolling_min(ctx: _Context, x: np.ndarray, window: float) -> np.ndarray:
+    return _rolling(x, window).min().to_numpy()
+
+
+def _band_range(ctx: _Context, x: np.ndarray, window: float) -> np.ndarray:
+    return band_range_percentage(pd.Series(x), int(window)).to_numpy()
+
+
+def _shift_function(ctx: _Context, x: np.ndarray, periods: float = 1) -> np.ndarray:
+    return _shift(x, periods)
+
+
+def _rising(ctx: _Context, x: np.ndarray) -> np.ndarray:
+    return x > _shift(x)
+
+
+def _falling(ctx: _Context, x: np.ndarray) -> np.ndarray:
+    return x < _shift(x)
+
+
+def _cross_above(ctx: _Context, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a > b) & (_shift(a) <= _shift(b))
+
+
+def _cross_below(ctx: _Context, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a < b) & (_shift(a) >= _shift(b))
+
+
+def _bollinger(ctx: _Context, period: float = 20, std_dev: float = 2.0) -> Tuple[np.ndarray, ...]:
+    bands = bollinger_bands(pd.Series(ctx.kline.close), int(period), std_dev)
+    return tuple(band.to_numpy() for band in bands)
+
+
+def _macd(ctx: _Context, fast: float = 12, slow: float = 26, signal: float = 9) -> Tuple[np.ndarray, ...]:
+    lines = macd(pd.Series(ctx.kline.close), int(fast), int(slow), int(signal))
+    return tuple(line.to_numpy() for line in lines)
+
+
+def _dividend_yield(ctx: _Context, window_days: float = TTM_WINDOW_DAYS) -> np.ndarray:
+    dividends = ctx.dividends
+    ttm_dividend = trailing_dividend_per_share(
+        ctx.kline.dates.astype('datetime64[D]'),
+        pd.to_datetime(dividends['ex_dividend_date']).to_numpy() if not dividends.empty else np.array([]),
+        dividends['dividend_per_share_pre_tax'].to_numpy() if not dividends.empty else np.array([]),
+        int(window_days),
+    )
+    return ttm_dividend / ctx.kline.raw_close * 100
+
+
+class Function(NamedTuple):
+    """表达式函数：series_args 个序列参数在前，其余为常数参数"""
+
+    compute: Callable[..., Any]
+    series_args: int
+    const_defaults: Tuple[Optional[float], ...]
+    # 多输出指标（如布林带三条轨道）返回元组，output 为取用的序号；同一次计算由各输出共享
+    output: Optional[int] = None
+
+
+# 函数名 -> 定义；const_defaults 中为 None 的常数参数必须给出
+FUNCTIONS: Dict[str, Function] = {
+    'sma': Function(_sma, 1, (None,)),
+    'ema': Function(_ema, 1, (None,)),
+    'rolling_max': Function(_rolling_max, 1, (None,)),
+    'rolling_min': Function(_rolling_min, 1, (None,)),
+    'band_range': Function(_band_range, 1, (None,)),
+    'shift': Function(_shift_function, 1, (1,)),
+    'rising': Function(_rising, 1, ()),
+    'falling': Function(_falling, 1, ()),
+    'cross_above': Function(_cross_above, 2, ()),
+    'cross_below': Function(_cross_below, 2, ()),
+    'boll_mid': Function(_bollinger, 0, (20, 2.0), 0),
+    'boll_upper': Function(_bollinger, 0, (20, 2.0), 1),
+    'boll_lower': Function(_bollinger, 0, (20, 2.0), 2),
+    'macd_dif': Function(_macd, 0, (12, 26, 9), 0),
+    'macd_dea': Function(_macd, 0, (12, 26, 9), 1),
+    'macd_hist': Function(_macd, 0, (12, 26, 9), 2),
+    'dividend_yield': Function(_dividend_yield, 0, (TTM_WINDOW_DAYS,)),
+}
+
+_OPERATORS: Dict[str, Callable[..., Any]] = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal,
+    'and': np.logical_and, 'or': np.logical_or, 'not': np.logical_not, 'neg': np.negative,
+}
+
+_AST_OPERATORS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.BitAnd: 'and', ast.BitOr: 'or',
+    ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '==', ast.NotEq: '!=',
+    ast.And: 'and', ast.Or: 'or', ast.Not: 'not', ast.Invert: 'not', ast.USub: 'neg',
+}
+
+
+def parse_expression(source: str) -> ast.expr:
+    """
+    解析表达式，只做语法检查
+
+    Args:
+        source: 表达式
+
+    Returns:
+        ast.expr: 语法树
+
+    Raises:
+        ValueError: 表达式语法错误
+    """
+    try:
+        return ast.parse(source.strip(), mode='eval').body
+    except SyntaxError as e:
+        raise ValueError(f"表达式语法错误: {source}: {e.msg}")
+
+
+def compile_expression(tree: Union[str, ast.expr], params: Optional[Dict[str, Any]] = None) -> Node:
+    """
+    把表达式编译为节点，参数名替换为常量，常量子表达式在编译时求值
+
+    Args:
+        tree: 表达式或 parse_expression 返回的语法树
+        params: 策略参数（可选）
+
+    Returns:
+        Node: 可哈希的表达式节点，相同的子表达式得到相等的节点
+
+    Raises:
+        ValueError: 表达式包含不支持的语法、未知的名称或函数
+    """
+    if isinstance(tree, str):
+        tree = parse_expression(tree)
+    return _Compiler(params or {}).visit(tree)
+
+
+class _Compiler:
+    """语法树到表达式节点的转换"""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+
+    def visit(self, tree: ast.expr) -> Node:
+        if isinstance(tree, ast.Constant):
+            if isinstance(tree.value, (bool, int, float)):
+                return ('const', tree.value)
+            raise ValueError(f"不支持的常量: {tree.value!r}")
+        if isinstance(tree, ast.Name):
+            return self._name(tree.id)
+        if isinstance(tree, ast.BinOp):
+            return self._op(self._operator(tree.op), self.visit(tree.left), self.visit(tree.right))
+        if isinstance(tree, ast.UnaryOp):
+            return self._op(self._operator(tree.op), self.visit(tree.operand))
+        if isinstance(tree, ast.BoolOp):
+            node = self.visit(tree.values[0])
+            for value in tree.values[1:]:
+                node = self._op(self._operator(tree.op), node, self.visit(value))
+            return node
+        if isinstance(tree, ast.Compare):
+            # a < b < c 展开为 (a < b) and (b < c)
+            operands = [self.visit(tree.left)] + [self.visit(item) for item in tree.comparators]
+            node = None
+            for op, left, right in zip(tree.ops, operands, operands[1:]):
+                comparison = self._op(self._operator(op), left, right)
+                node = comparison if node is None else self._op('and', node, comparison)
+            return node
+        if isinstance(tree, ast.Call):
+            return self._call(tree)
+        raise ValueError(f"不支持的表达式: {ast.unparse(tree)}")
+
+    @staticmethod
+    def _operator(op: ast.AST) -> str:
+        name = _AST_OPERATORS.get(type(op))
+        if name is None:
+            raise ValueError(f"不支持的运算符: {type(op).__name__}")
+        return name
+
+    def _name(self, name: str) -> Node:
+        if name in SERIES_FIELDS:
+            return ('series', name)
+        if name not in self.params:
+            raise ValueError(f"未知的名称: {name}")
+        value = self.params[name]
+        if not isinstance(value, (bool, int, float)):
+            raise ValueError(f"参数{name}不是数值: {value!r}")
+        return ('const', value)
+
+    @staticmethod
+    def _op(name: str, *operands: Node) -> Node:
+        if all(operand[0] == 'const' for operand in operands):
+            return ('const', _OPERATORS[name](*(operand[1] for operand in operands)).item())
+        return ('op', name) + operands
+
+    def _call(self, tree: ast.Call) -> Node:
+        name = tree.func.id if isinstance(tree.func, ast.Name) else ast.unparse(tree.func)
+        function = FUNCTIONS.get(name)
+        if function is None:
+            raise ValueError(f"未知的函数: {name}")
+        if tree.keywords:
+            raise ValueError(f"函数{name}只支持按位置传参")
+        args = [self.visit(arg) for arg in tree.args]
+        max_args = function.series_args + len(function.const_defaults)
+        if not function.series_args <= len(args) <= max_args:
+            raise ValueError(f"函数{name}的参数个数错误: {len(args)}")
+        consts = list(args[function.series_args:])
+        for default in function.const_defaults[len(consts):]:
+            if default is None:
+                raise ValueError(f"函数{name}缺少参数")
+            consts.append(('const', default))
+        if any(arg[0] != 'const' for arg in consts):
+            raise ValueError(f"函数{name}的第{function.series_args + 1}个及之后的参数必须是常数")
+        return ('call', name, tuple(args[:function.series_args]) + tuple(consts))
+
+
+def evaluate_node(node: Node, kline: KlineSeries, dividends: pd.DataFrame, memo: Dict[Node, Any]) -> Any:
+    """
+    在K线上求值表达式节点，已在 memo 中的节点直接复用
+
+    Args:
+        node: 表达式节点
+        kline: K线序列
+        dividends: 分红数据
+        memo: 同一根K线上已计算的节点
+
+    Returns:
+        Any: 与K线等长的数组，常量节点为标量
+    """
+    return _evaluate(node, _Context(kline, dividends, memo))
+
+
+def _evaluate(node: Node, ctx: _Context) -> Any:
+    kind = node[0]
+    if kind == 'const':
+        return node[1]
+    if node in ctx.memo:
+        return ctx.memo[node]
+    if kind == 'series':
+        value = np.asarray(getattr(ctx.kline, node[1]), dtype=np.float64)
+    elif kind == 'call':
+        function = FUNCTIONS[node[1]]
+        args = [_evaluate(arg, ctx) for arg in node[2]]
+        if function.output is None:
+            value = function.compute(ctx, *args)
+        else:
+            # 多输出指标按 (计算函数, 参数) 缓存，各输出共用一次计算
+            shared = ('compute', function.compute.__name__, node[2])
+            if shared not in ctx.memo:
+                ctx.memo[shared] = function.compute(ctx, *args)
+            value = ctx.memo[shared][function.output]
+    else:
+        value = _OPERATORS[node[1]](*(_evaluate(operand, ctx) for operand in node[2:]))
+    ctx.memo[node] = value
+    return value
+
+
+class ExpressionStrategy:
+    """用条件表达式定义的策略，可以作为 STRATEGY_EVALUATORS 中的评估函数使用"""
+
+    # 直接接收 KlineSeries；evaluate_signals 为同一周期的策略传入共享的 memo
+    kline_series = True
+    shares_indicators = True
+
+    def __init__(self,
+                 name: str,
+                 conditions: List[str],
+                 description: Optional[str] = None,
+                 values: Optional[Dict[str, str]] = None,
+                 defaults: Optional[Dict[str, Any]] = None,
+                 period: str = 'daily'):
+        """
+        初始化策略并检查表达式语法
+
+        Args:
+            name: 策略名称
+            conditions: 条件表达式列表，全部满足时触发
+            description: 信号描述模板（可选），{名称} 替换为 values 中表达式保留两位小数的值，
+                默认为条件表达式本身
+            values: 描述中使用的值，名称 -> 表达式（可选）
+            defaults: 参数默认值（可选），被评估时传入的策略参数覆盖
+            period: K线周期，daily 或 weekly
+
+        Raises:
+            ValueError: 没有条件、周期无效或表达式语法错误
+        """
+        if not conditions:
+            raise ValueError(f"策略{name}没有定义条件")
+        if period not in ('daily', 'weekly'):
+            raise ValueError(f"策略{name}的K线周期{period}无效")
+        self.__name__ = name
+        self.period = period
+        self.conditions = [parse_expression(condition) for condition in conditions]
+        self.values = {key: parse_expression(source) for key, source in (values or {}).items()}
+        self.description = description if description is not None else ", ".join(conditions)
+        fields = [field for _, field, _, _ in string.Formatter().parse(self.description) if field is not None]
+        unknown = [field for field in fields if field not in self.values]
+        if unknown:
+            raise ValueError(f"策略{name}的描述引用了未定义的值: {', '.join(unknown)}")
+        self.defaults = dict(defaults or {})
+        # 参数 -> (条件节点, 值节点)
+        self._compiled: Dict[Tuple, Tuple[List[Node], Dict[str, Node]]] = {}
+
+    @classmethod
+    def from_config(cls, name: str, definition: Dict[str, Any]) -> 'ExpressionStrategy':
+        """
+        按配置文件中的策略定义创建，定义中的其他数值项作为参数默认值
+
+        Args:
+            name: 策略名称
+            definition: 策略配置，包含 conditions，可选 period、values、description
+
+        Returns:
+            ExpressionStrategy: 策略
+        """
+        conditions = definition.get('conditions')
+        if isinstance(conditions, str):
+            conditions = [conditions]
+        return cls(name, conditions or [], definition.get('description'), definition.get('values'),
+                   defaults=definition, period=definition.get('period', 'daily'))
+
+    def compile(self, params: Optional[Dict[str, Any]] = None) -> Tuple[List[Node], Dict[str, Node]]:
+        """
+        按参数编译条件和描述值，结果按参数缓存
+
+        Args:
+            params: 策略参数（可选）
+
+        Returns:
+            Tuple[List[Node], Dict[str, Node]]: (条件节点, 描述值节点)
+        """
+        merged = {**self.defaults, **(params or {})}
+        key = tuple(sorted((k, v) for k, v in merged.items() if isinstance(v, (bool, int, float, str))))
+        if key not in self._compiled:
+            self._compiled[key] = (
+                [compile_expression(tree, merged) for tree in self.conditions],
+                {name: compile_expression(tree, merged) for name, tree in self.values.items()},
+            )
+        return self._compiled[key]
+
+    def __call__(self,
+                 kline: Union[KlineSeries, pd.DataFrame],
+                 dividends: pd.DataFrame,
+                 params: Dict[str, Any],
+                 memo: Optional[Dict[Node, Any]] = None) -> pd.DataFrame:
+        """
+        评估策略
+
+        Args:
+            kline: 按日期升序排列的K线数据
+            dividends: 分红数据
+            params: 策略参数
+            memo: 同一根K线上共享的已计算节点（可选）
+
+        Returns:
+            pd.DataFrame: 每个周期一行，包含 date, close, triggered, description（只有触发的周期有描述）
+        """
+        kline = as_kline_series(kline)
+        conditions, values = self.compile(params)
+        ctx = _Context(kline, dividends, {} if memo is None else memo)
+        triggered = np.ones(len(kline), dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for condition in conditions:
+                triggered &= np.broadcast_to(np.asarray(_evaluate(condition, ctx), dtype=bool), len(kline))
+            hits = np.flatnonzero(triggered)
+            description = np.full(len(kline), "", dtype=object)
+            description[hits] = self._describe(values, ctx, hits)
+        return pd.DataFrame({
+            'date': kline.date_strings(),
+            'close': kline.close,
+            'triggered': triggered,
+            'description': description,
+        })
+
+    def _describe(self, values: Dict[str, Node], ctx: _Context, hits: np.ndarray) -> np.ndarray:
+        """只为触发的周期按模板生成描述"""
+        text = np.full(len(hits), "", dtype=object)
+        for literal, field, _, _ in string.Formatter().parse(self.description):
+            text = text + literal
+            if field is not None:
+                value = np.broadcast_to(np.asarray(_evaluate(values[field], ctx), dtype=np.float64), len(ctx.kline))
+                text = text + pd.Series(value[hits]).round(2).astype(str).to_numpy(dtype=object)
+        return text
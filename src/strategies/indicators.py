@@ -0,0 +1,93 @@
+"""
+技术指标模块 - 布林带、MACD、通道走平程度和滚动股息等向量化指标计算
+"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..data.asof import TTM_WINDOW_DAYS, trailing_sums
+
+
+def bollinger_bands(close: pd.Series,
+                    period: int = 20,
+                    std_dev: float = 2.0) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """
+    计算布林带
+
+    Args:
+        close: 收盘价序列
+        period: 均线周期
+        std_dev: 标准差倍数
+
+    Returns:
+        Tuple[pd.Series, pd.Series, pd.Series]: (中轨, 上轨, 下轨)
+    """
+    mid = close.rolling(window=period, min_periods=period).mean()
+    std = close.rolling(window=period, min_periods=period).std(ddof=0)
+    return mid, mid + std_dev * std, mid - std_dev * std
+
+
+def macd(close: pd.Series,
+         fast_period: int = 12,
+         slow_period: int = 26,
+         signal_period: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """
+    计算MACD指标
+
+    Args:
+        close: 收盘价序列
+        fast_period: 快线EMA周期
+        slow_period: 慢线EMA周期
+        signal_period: DEA的EMA周期
+
+    Returns:
+        Tuple[pd.Series, pd.Series, pd.Series]: (DIF, DEA, MACD柱)
+    """
+    ema_fast = close.ewm(span=fast_period, adjust=False).mean()
+    ema_slow = close.ewm(span=slow_period, adjust=False).mean()
+    dif = ema_fast - ema_slow
+    dea = dif.ewm(span=signal_period, adjust=False).mean()
+    return dif, dea, 2 * (dif - dea)
+
+
+def band_range_percentage(band: pd.Series, window: int) -> pd.Series:
+    """
+    计算通道在过去 window 个周期内的波动幅度，用于判断布林带是否走平
+
+    Args:
+        band: 通道序列（如布林下轨）
+        window: 观察周期数
+
+    Returns:
+        pd.Series: (最高值 - 最低值) / 最低值 * 100
+    """
+    rolling_max = band.rolling(window=window, min_periods=window).max()
+    rolling_min = band.rolling(window=window, min_periods=window).min()
+    return (rolling_max - rolling_min) / rolling_min * 100
+
+
+def trailing_dividend_per_share(dates: np.ndarray,
+                                ex_dividend_dates: np.ndarray,
+                                dividends: np.ndarray,
+                                window_days: int = TTM_WINDOW_DAYS) -> np.ndarray:
+    """
+    计算每个日期近 window_days 天内（不含起点、含当日）的每股分红总额
+
+    单只股票的 trailing_sums：与因子排名、最新快照和动态股息率使用同一窗口定义。
+
+    Args:
+        dates: 需要计算的日期数组（datetime64）
+        ex_dividend_dates: 除权除息日数组（datetime64）
+        dividends: 每股分红数组
+        window_days: 回看天数
+
+    Returns:
+        np.ndarray: 与 dates 等长的滚动分红总额
+    """
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    if len(ex_dividend_dates) == 0:
+        return np.zeros(len(days))
+    ex_days = np.asarray(ex_dividend_dates, dtype='datetime64[D]').astype(np.int64)
+    order = np.argsort(ex_days, kind='stable')
+    return trailing_sums(ex_days[order], np.asarray(dividends, dtype=float)[order], days, window_days)
@@ -0,0 +1,365 @@
+"""
+盘中实时扫描模块 - 收盘后预先计算每只股票的触发价格，盘中只重新评估价格穿越触发价的股票
+
+Strategy 1A 在价格不高于触发价时可能触发：触发价取"当日收盘价恰好落在布林下轨容差内"的价格
+和"动态股息率恰好等于 min_dynamic_dividend_yield"的价格中较低的一个；布林下轨的走平条件
+在前一日已经不满足时不会再满足，这样的股票不生成触发价。
+Strategy 2A 在价格不低于触发价时可能触发：触发价为当日 DIF 恰好上穿 DEA 的价格
+（EMA 对当日价格是线性的，可以直接求解）。
+
+触发价只是过滤条件，价格进入触发区间的股票会用完整的策略评估确认，因此结果与收盘后扫描一致。
+"""
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import setup_logger
+from .indicators import band_range_percentage, bollinger_bands, trailing_dividend_per_share
+from .strategy_engine import LOOKBACK_DAYS, SIGNAL_COLUMNS, StrategyEngine, evaluate_signals
+
+# 触发方向：价格不高于触发价 / 不低于触发价
+BELOW = 'below'
+ABOVE = 'above'
+
+# 交易时段（本地时间）
+TRADING_SESSIONS = (("09:30", "11:30"), ("13:00", "15:00"))
+
+# 二分求解触发价的迭代次数，价格区间缩小到约 1e-12 倍
+_BISECTION_ITERATIONS = 40
+
+
+def bollinger_dividend_trigger_price(daily: pd.DataFrame,
+                                     dividends: pd.DataFrame,
+                                     params: Dict[str, Any],
+                                     date: str) -> Optional[float]:
+    """
+    计算 Strategy 1A 的触发价：当日价格不高于该价格时才可能触发
+
+    Args:
+        daily: 截至前一交易日的日K线（前复权，含 raw_close）
+        dividends: 分红数据
+        params: 策略参数
+        date: 当日日期
+
+    Returns:
+        Optional[float]: 触发价，当日不可能触发时为 None
+    """
+    period = params.get('bollinger_period', 20)
+    std_dev = params.get('bollinger_std_dev', 2.0)
+    flat_days = params.get('bollinger_flat_check_days', 60)
+    tolerance = params.get('lower_band_tolerance_percentage', 1.0)
+    close = daily['close'].astype(float).reset_index(drop=True)
+    if len(close) < max(period, flat_days):
+        return None
+
+    # 走平判断的窗口包含当日下轨，前 flat_days - 1 个下轨的波动已经超过阈值时不可能触发
+    _, _, lower = bollinger_bands(close, period, std_dev)
+    previous = lower.iloc[len(lower) - flat_days + 1:] if flat_days > 1 else lower.iloc[0:0]
+    if not previous.empty:
+        previous_range = band_range_percentage(previous, len(previous)).iloc[-1]
+        if previous_range > params.get('bollinger_flat_threshold_percentage', 5.0):
+            return None
+
+    # 股息率条件：不复权价格不高于 近一年每股分红 / 最低股息率
+    ttm_dividend = trailing_dividend_per_share(
+        np.array([date], dtype='datetime64[D]'),
+        pd.to_datetime(dividends['ex_dividend_date']).to_numpy() if not dividends.empty else np.array([]),
+        dividends['dividend_per_share_pre_tax'].to_numpy() if not dividends.empty else np.array([]),
+    )[0]
+    min_yield = params.get('min_dynamic_dividend_yield', 3.0)
+    if min_yield > 0 and ttm_dividend <= 0:
+        return None
+    dividend_ceiling = ttm_dividend / (min_yield / 100) if min_yield > 0 else np.inf
+
+    # 布林下轨条件：price <= (1 + 容差) * 下轨(price)，下轨随当日价格变化，二分求解边界
+    window = close.iloc[-(period - 1):].to_numpy() if period > 1 else np.array([])
+    factor = 1 + tolerance / 100
+
+    def margin(price: float) -> float:
+        values = np.append(window, price)
+        return price - factor * (values.mean() - std_dev * values.std())
+
+    low, high = 0.0, float(max(window.max() if len(window) else 0.0, close.iloc[-1])) * 2
+    if margin(high) <= 0:
+        band_ceiling = high
+    elif margin(low) > 0:
+        return None
+    else:
+        for _ in range(_BISECTION_ITERATIONS):
+            middle = (low + high) / 2
+            if margin(middle) <= 0:
+                low = middle
+            else:
+                high = middle
+        band_ceiling = low
+    return float(min(band_ceiling, dividend_ceiling))
+
+
+def macd_cross_trigger_price(daily: pd.DataFrame,
+                             dividends: pd.DataFrame,
+                             params: Dict[str, Any],
+                             date: str) -> Optional[float]:
+    """
+    计算 Strategy 2A 的触发价：当日价格不低于该价格时 DIF 上穿 DEA
+
+    Args:
+        daily: 截至前一交易日的日K线（前复权）
+        dividends: 分红数据（本策略不使用）
+        params: 策略参数
+        date: 当日日期
+
+    Returns:
+        Optional[float]: 触发价，前一日 DIF 已经在 DEA 之上时为 None
+    """
+    close = daily['close'].astype(float).reset_index(drop=True)
+    if len(close) < 2:
+        return None
+    alpha_fast = 2 / (params.get('macd_fast_period', 12) + 1)
+    alpha_slow = 2 / (params.get('macd_slow_period', 26) + 1)
+    ema_fast = close.ewm(alpha=alpha_fast, adjust=False).mean()
+    ema_slow = close.ewm(alpha=alpha_slow, adjust=False).mean()
+    dif = ema_fast - ema_slow
+    dea = dif.ewm(span=params.get('macd_signal_period', 9), adjust=False).mean().iloc[-1]
+    if dif.iloc[-1] > dea or alpha_fast <= alpha_slow:
+        return None
+    # 当日 DIF(price) = (a_fast - a_slow) * price + (1 - a_fast) * EMA_fast - (1 - a_slow) * EMA_slow，
+    # DEA 是 DIF 的 EMA，DIF > DEA 等价于 DIF(price) > 前一日 DEA
+    offset = (1 - alpha_fast) * ema_fast.iloc[-1] - (1 - alpha_slow) * ema_slow.iloc[-1]
+    return float((dea - offset) / (alpha_fast - alpha_slow))
+
+
+# 策略名称 -> (触发方向, 触发价计算函数)
+TRIGGER_PRICE_FUNCTIONS: Dict[str, Tuple[str, Callable[..., Optional[float]]]] = {
+    'strategy_1a_daily_bollinger_dividend': (BELOW, bollinger_dividend_trigger_price),
+    'strategy_2a_daily_macd_bollinger_breakthrough': (ABOVE, macd_cross_trigger_price),
+}
+
+
+class TriggerBands:
+    """按触发价排序的触发区间索引，每行对应一个 (股票, 策略)"""
+
+    def __init__(self, bands: pd.DataFrame):
+        """
+        初始化触发区间索引
+
+        Args:
+            bands: 包含 stock_code, strategy_name, direction, trigger_price 的数据
+        """
+        self.bands = bands.sort_values('trigger_price', kind='mergesort').reset_index(drop=True)
+        self.stock_codes = self.bands['stock_code'].to_numpy(dtype=object)
+        self.trigger_prices = self.bands['trigger_price'].to_numpy(dtype=float)
+        self.below = (self.bands['direction'] == BELOW).to_numpy()
+        # 上一次快照时每个区间是否已经处于触发区间内
+        self.inside = np.zeros(len(self.bands), dtype=bool)
+        # 上一次重新评估时的价格
+        self.evaluated_prices = np.full(len(self.bands), np.nan)
+
+    def __len__(self) -> int:
+        return len(self.bands)
+
+    def crossed(self, prices: pd.Series) -> pd.DataFrame:
+        """
+        用一次向量化比较找出需要重新评估的 (股票, 策略)
+
+        包括本次进入触发区间的，以及已在触发区间内且价格发生变化的（其余条件可能随价格变化而满足）。
+
+        Args:
+            prices: 股票代码 -> 最新价
+
+        Returns:
+            pd.DataFrame: 需要重新评估的行
+        """
+        live = prices.reindex(self.stock_codes).to_numpy(dtype=float)
+        quoted = ~np.isnan(live)
+        inside = np.where(self.below, live <= self.trigger_prices, live >= self.trigger_prices) & quoted
+        changed = inside & (~self.inside | (live != self.evaluated_prices))
+        # 没有报价的股票保持原状态
+        self.inside = np.where(quoted, inside, self.inside)
+        self.evaluated_prices = np.where(changed, live, self.evaluated_prices)
+        return self.bands[changed]
+
+    def nearest(self, prices: pd.Series, limit: int = 10) -> pd.DataFrame:
+        """
+        距离触发价最近的 (股票, 策略)
+
+        Args:
+            prices: 股票代码 -> 最新价
+            limit: 返回数量
+
+        Returns:
+            pd.DataFrame: 增加 price 和 distance_percentage（距离触发价的百分比，负数表示已进入触发区间）
+        """
+        live = prices.reindex(self.stock_codes).to_numpy(dtype=float)
+        distance = np.where(self.below, live / self.trigger_prices - 1, 1 - live / self.trigger_prices) * 100
+        result = self.bands.assign(price=live, distance_percentage=distance).dropna(subset=['price'])
+        return result.nsmallest(limit, 'distance_percentage').reset_index(drop=True)
+
+
+class IntradayScanner:
+    """盘中扫描类，收盘后计算触发区间，盘中按行情快照只重新评估穿越触发价的股票"""
+
+    def __init__(self,
+                 engine: StrategyEngine,
+                 strategy_names: Optional[List[str]] = None,
+                 snapshot_source: Optional[Callable[[], pd.DataFrame]] = None):
+        """
+        初始化盘中扫描器
+
+        Args:
+            engine: 策略引擎（会开启输入数据缓存）
+            strategy_names: 策略名称列表（可选），默认为所有启用且支持盘中扫描的策略
+            snapshot_source: 返回全市场行情快照的函数，默认使用 DataManager.get_spot_snapshot
+        """
+        self.engine = engine
+        self.engine.enable_cache()
+        self.logger = setup_logger(__name__)
+        strategies = engine.get_enabled_strategies(strategy_names)
+        unsupported = [name for name in strategies if name not in TRIGGER_PRICE_FUNCTIONS]
+        if unsupported:
+            self.logger.warning(f"以下策略不支持盘中扫描，已忽略: {', '.join(unsupported)}")
+        self.strategies = [name for name in strategies if name in TRIGGER_PRICE_FUNCTIONS]
+        self.snapshot_source = snapshot_source or engine.dm.get_spot_snapshot
+        self.date: Optional[str] = None
+        self.bands = TriggerBands(pd.DataFrame(columns=['stock_code', 'strategy_name', 'direction', 'trigger_price']))
+        # 当日已经确认的 (股票, 策略)，同一信号只发出一次
+        self._emitted: set = set()
+
+    def _history(self, stock_code: str, date: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        加载当日之前的日K线和分红数据
+
+        Args:
+            stock_code: 股票代码
+            date: 当日日期
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: (日K线, 分红数据)
+        """
+        start_date = (pd.Timestamp(date) - pd.Timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        daily, dividends = self.engine.load_inputs(stock_code, start_date, date)
+        if not daily.empty:
+            daily = daily[daily['date'] < date].reset_index(drop=True)
+        return daily, dividends
+
+    def prepare(self, stock_codes: List[str], date: Optional[str] = None) -> int:
+        """
+        计算当日每只股票每个策略的触发价
+
+        Args:
+            stock_codes: 股票代码列表
+            date: 当日日期（可选），默认为今天
+
+        Returns:
+            int: 触发区间数量
+        """
+        self.date = date or datetime.now().strftime('%Y-%m-%d')
+        self._emitted = set()
+        rows = []
+        for stock_code in stock_codes:
+            try:
+                daily, dividends = self._history(stock_code, self.date)
+                if daily.empty:
+                    continue
+                for name in self.strategies:
+                    direction, trigger_price = TRIGGER_PRICE_FUNCTIONS[name]
+                    price = trigger_price(daily, dividends, self.engine.strategies_config.get(name, {}), self.date)
+                    if price is not None and np.isfinite(price) and price > 0:
+                        rows.append((stock_code, name, direction, price))
+            except Exception as e:
+                self.logger.error(f"计算{stock_code}的触发价失败: {str(e)}")
+        self.bands = TriggerBands(pd.DataFrame(rows, columns=['stock_code', 'strategy_name', 'direction',
+                                                              'trigger_price']))
+        self.logger.info(f"{self.date} 共 {len(stock_codes)} 只股票，生成 {len(self.bands)} 个触发区间")
+        return len(self.bands)
+
+    def tick(self, snapshot: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        处理一次行情快照，只重新评估进入触发区间或在区间内价格变化的股票
+
+        Args:
+            snapshot: 行情快照（可选），默认从 snapshot_source 获取
+
+        Returns:
+            pd.DataFrame: 本次新确认的信号
+        """
+        if self.date is None:
+            raise ValueError("请先调用 prepare 计算触发区间")
+        if snapshot is None:
+            snapshot = self.snapshot_source()
+        quotes = snapshot.drop_duplicates('stock_code').set_index('stock_code')
+        candidates = self.bands.crossed(quotes['price'])
+        frames = []
+        for stock_code, group in candidates.groupby('stock_code', sort=False):
+            strategies = [name for name in group['strategy_name'] if (stock_code, name) not in self._emitted]
+            if not strategies:
+                continue
+            try:
+                daily, dividends = self._history(stock_code, self.date)
+                daily = pd.concat([daily, self._live_bar(quotes.loc[stock_code])], ignore_index=True)
+                signals = evaluate_signals(stock_code, daily, dividends, strategies, self.engine.evaluators,
+                                           self.engine.strategies_config, None, self.date)
+            except Exception as e:
+                self.logger.error(f"盘中评估{stock_code}失败: {str(e)}")
+                continue
+            self._emitted.update(zip(signals['stock_code'], signals['strategy_name']))
+            frames.append(signals)
+        frames = [frame for frame in frames if not frame.empty]
+        signals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SIGNAL_COLUMNS)
+        self.logger.info(f"行情快照 {len(quotes)} 只股票，重新评估 {len(candidates)} 个触发区间，确认 {len(signals)} 个信号")
+        return signals
+
+    def _live_bar(self, quote: pd.Series) -> pd.DataFrame:
+        """
+        把实时报价转换为当日的日K线
+
+        Args:
+            quote: 单只股票的报价
+
+        Returns:
+            pd.DataFrame: 一行日K线
+        """
+        price = float(quote['price'])
+        return pd.DataFrame([{
+            'date': self.date,
+            'open': float(quote.get('open', price)),
+            'high': float(quote.get('high', price)),
+            'low': float(quote.get('low', price)),
+            'close': price,
+            'volume': quote.get('volume', 0),
+            'amount': quote.get('amount', 0.0),
+            'raw_close': price,
+        }])
+
+    def run(self,
+            interval_seconds: float = 60,
+            on_signals: Optional[Callable[[pd.DataFrame], None]] = None,
+            max_ticks: Optional[int] = None) -> int:
+        """
+        在交易时段内按间隔轮询行情快照，收盘后返回
+
+        Args:
+            interval_seconds: 轮询间隔（秒）
+            on_signals: 有新信号时的回调（可选）
+            max_ticks: 最多轮询次数（可选）
+
+        Returns:
+            int: 当日确认的信号数量
+        """
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            now = datetime.now().strftime('%H:%M')
+            if now >= TRADING_SESSIONS[-1][1]:
+                break
+            if any(start <= now < end for start, end in TRADING_SESSIONS):
+                try:
+                    signals = self.tick()
+                    if not signals.empty and on_signals:
+                        on_signals(signals)
+                except Exception as e:
+                    self.logger.error(f"获取行情快照失败: {str(e)}")
+                ticks += 1
+            time.sleep(interval_seconds)
+        return len(self._emitted)
@@ -0,0 +1,284 @@
+"""
+多进程分片评估模块 - 把价格和分红数组放入共享内存，按股票分片交给进程池评估
+
+子进程通过 multiprocessing.shared_memory 直接映射父进程准备好的数组，
+只接收共享内存的名称和分片的股票序号，不需要序列化传输 DataFrame。
+每个分片返回自己的信号，由父进程按股票顺序合并。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..data.kline_series import PRICE_FIELDS, KlineSeries, as_kline_series, day_numbers, day_strings
+from ..utils.logger import setup_logger
+from .strategy_engine import SIGNAL_COLUMNS, evaluate_signals, get_strategy_evaluators
+
+# 每个进程分到的分片数，分片越多负载越均衡
+SHARDS_PER_PROCESS = 4
+
+
+class SharedPanel:
+    """共享内存中的多只股票日K线和分红数据，按 offsets 切分每只股票的行"""
+
+    def __init__(self,
+                 descriptor: Dict[str, Any],
+                 blocks: List[shared_memory.SharedMemory],
+                 owner: bool):
+        """
+        初始化共享面板，请使用 create 或 attach 创建
+
+        Args:
+            descriptor: 共享内存的名称、类型和形状，以及股票代码列表
+            blocks: 共享内存块
+            owner: 是否由当前进程创建（关闭时负责释放）
+        """
+        self.descriptor = descriptor
+        self.stock_codes: List[str] = descriptor['stock_codes']
+        self._blocks = blocks
+        self._owner = owner
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=block.buf)
+            for (name, spec), block in zip(descriptor['arrays'].items(), blocks)
+        }
+
+    @classmethod
+    def create(cls, inputs: Dict[str, Tuple[Union[KlineSeries, pd.DataFrame], pd.DataFrame]]) -> 'SharedPanel':
+        """
+        把多只股票的数据复制到新建的共享内存中
+
+        价格按字段存放为 (字段数, 行数) 的矩阵，每只股票每个字段都是连续的一段内存。
+
+        Args:
+            inputs: 股票代码 -> (日K线序列或日K线, 分红数据)
+
+        Returns:
+            SharedPanel: 当前进程拥有的共享面板
+        """
+        stock_codes = list(inputs)
+        dailies = [as_kline_series(inputs[code][0]) for code in stock_codes]
+        dividends = [inputs[code][1] for code in stock_codes]
+        row_counts = [len(daily) for daily in dailies]
+        dividend_counts = [len(frame) if not frame.empty else 0 for frame in dividends]
+
+        def stack(field: str, dtype) -> np.ndarray:
+            return np.concatenate([getattr(d, field) for d in dailies]).astype(dtype, copy=False) if dailies \
+                else np.empty(0, dtype=dtype)
+
+        arrays = {
+            'dates': stack('dates', np.int64),
+            'prices': np.stack([stack(field, np.float64) for field in PRICE_FIELDS]),
+            'volume': stack('volume', np.int64),
+            'offsets': np.concatenate([[0], np.cumsum(row_counts)]).astype(np.int64),
+            'dividend_dates': np.concatenate(
+                [day_numbers(f['ex_dividend_date']) for f in dividends if not f.empty] or [np.empty(0, dtype=np.int64)]
+            ),
+            'dividend_values': np.concatenate(
+                [f['dividend_per_share_pre_tax'].astype(float).to_numpy() for f in dividends if not f.empty]
+                or [np.empty(0)]
+            ),
+            'dividend_offsets': np.concatenate([[0], np.cumsum(dividend_counts)]).astype(np.int64),
+        }
+
+        blocks = []
+        specs = {}
+        try:
+            for name, array in arrays.items():
+                # 共享内存块不能为空
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                specs[name] = {'name': block.name, 'dtype': array.dtype.str, 'shape': array.shape}
+        except Exception:
+            for block in blocks:
+                block.close()
+                block.unlink()
+            raise
+        return cls({'stock_codes': stock_codes, 'arrays': specs}, blocks, owner=True)
+
+    @classmethod
+    def attach(cls, descriptor: Dict[str, Any]) -> 'SharedPanel':
+        """
+        在子进程中映射父进程创建的共享内存
+
+        Args:
+            descriptor: 父进程面板的 descriptor
+
+        Returns:
+            SharedPanel: 只读使用的共享面板
+        """
+        # track=False: 子进程退出时不由 resource_tracker 释放父进程拥有的共享内存
+        blocks = [
+            shared_memory.SharedMemory(name=spec['name'], track=False)
+            for spec in descriptor['arrays'].values()
+        ]
+        return cls(descriptor, blocks, owner=False)
+
+    def stock_series(self, index: int) -> Tuple[KlineSeries, pd.DataFrame]:
+        """
+        获取单只股票的日K线序列（共享内存的视图，不复制）和分红数据
+
+        Args:
+            index: 股票序号
+
+        Returns:
+            Tuple[KlineSeries, pd.DataFrame]: (日K线序列, 分红数据)
+        """
+        start, end = self.arrays['offsets'][index], self.arrays['offsets'][index + 1]
+        prices = {field: self.arrays['prices'][i, start:end] for i, field in enumerate(PRICE_FIELDS)}
+        series = KlineSeries(self.stock_codes[index], self.arrays['dates'][start:end], prices['open'],
+                             prices['high'], prices['low'], prices['close'], self.arrays['volume'][start:end],
+                             amount=prices['amount'], raw_close=prices['raw_close'])
+
+        start, end = self.arrays['dividend_offsets'][index], self.arrays['dividend_offsets'][index + 1]
+        if end > start:
+            dividends = pd.DataFrame({
+                'ex_dividend_date': day_strings(self.arrays['dividend_dates'][start:end]),
+                'dividend_per_share_pre_tax': self.arrays['dividend_values'][start:end].copy(),
+            })
+        else:
+            dividends = pd.DataFrame()
+        return series, dividends
+
+    def stock_inputs(self, index: int) -> Tuple[str, pd.DataFrame, pd.DataFrame]:
+        """
+        重建单只股票的日K线 DataFrame 和分红数据
+
+        Args:
+            index: 股票序号
+
+        Returns:
+            Tuple[str, pd.DataFrame, pd.DataFrame]: (股票代码, 日K线, 分红数据)
+        """
+        series, dividends = self.stock_series(index)
+        return self.stock_codes[index], series.to_frame(), dividends
+
+    def close(self) -> None:
+        """关闭共享内存映射；由当前进程创建时同时释放共享内存"""
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> 'SharedPanel':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _evaluate_shard(descriptor: Dict[str, Any],
+                    indices: List[int],
+                    strategies: List[str],
+                    strategies_config: Dict[str, Dict[str, Any]],
+                    start_date: Optional[str],
+                    end_date: str) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    子进程中评估一个分片的股票
+
+    Args:
+        descriptor: 共享面板的 descriptor
+        indices: 分片内的股票序号
+        strategies: 策略名称列表
+        strategies_config: 策略参数配置
+        start_date: 开始日期，为 None 时只评估最新一根K线
+        end_date: 结束日期
+
+    Returns:
+        Tuple[pd.DataFrame, List[str]]: (信号数据, 成功评估的股票代码)
+    """
+    logger = setup_logger(__name__)
+    evaluators = get_strategy_evaluators(strategies_config)
+    panel = SharedPanel.attach(descriptor)
+    frames, evaluated = [], []
+    try:
+        for index in indices:
+            daily, dividends = panel.stock_series(index)
+            stock_code = daily.stock_code
+            try:
+                frames.append(evaluate_signals(stock_code, daily, dividends, strategies, evaluators,
+                                               strategies_config, start_date, end_date))
+                evaluated.append(stock_code)
+            except Exception as e:
+                logger.error(f"评估{stock_code}失败: {str(e)}")
+    finally:
+        panel.close()
+    frames = [frame for frame in frames if not frame.empty]
+    signals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SIGNAL_COLUMNS)
+    return signals, evaluated
+
+
+# 复用的进程池，常驻服务等反复评估的场景只在第一次支付子进程启动和导入 pandas 的开销
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_processes = 0
+
+
+def get_executor(processes: int) -> ProcessPoolExecutor:
+    """
+    获取指定进程数的进程池，进程数变化时重建
+
+    子进程使用 spawn 方式启动，避免在常驻服务等多线程进程中 fork。
+
+    Args:
+        processes: 进程数
+
+    Returns:
+        ProcessPoolExecutor: 进程池
+    """
+    global _executor, _executor_processes
+    if _executor is None or _executor_processes != processes:
+        shutdown_executor()
+        _executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        _executor_processes = processes
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """关闭复用的进程池"""
+    global _executor, _executor_processes
+    if _executor is not None:
+        _executor.shutdown()
+    _executor, _executor_processes = None, 0
+
+
+def evaluate_sharded(inputs: Dict[str, Tuple[KlineSeries, pd.DataFrame]],
+                     strategies: List[str],
+                     strategies_config: Dict[str, Dict[str, Any]],
+                     start_date: Optional[str],
+                     end_date: str,
+                     processes: int) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    把股票分片后用进程池评估，结果按股票顺序合并
+
+    Args:
+        inputs: 股票代码 -> (日K线序列, 分红数据)
+        strategies: 策略名称列表
+        strategies_config: 策略参数配置
+        start_date: 开始日期，为 None 时只评估每只股票的最新一根K线
+        end_date: 结束日期
+        processes: 进程数
+
+    Returns:
+        Tuple[pd.DataFrame, List[str]]: (信号数据, 成功评估的股票代码)
+    """
+    logger = setup_logger(__name__)
+    shard_count = min(len(inputs), processes * SHARDS_PER_PROCESS)
+    shards = [shard.tolist() for shard in np.array_split(np.arange(len(inputs)), shard_count)]
+    with SharedPanel.create(inputs) as panel:
+        logger.info(f"使用 {processes} 个进程评估 {len(inputs)} 只股票，共 {len(shards)} 个分片")
+        pool = get_executor(processes)
+        futures = [
+            pool.submit(_evaluate_shard, panel.descriptor, shard, strategies, strategies_config,
+                        start_date, end_date)
+            for shard in shards
+        ]
+        results = [future.result() for future in futures]
+    frames = [signals for signals, _ in results if not signals.empty]
+    evaluated = [code for _, codes in results for code in codes]
+    signals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SIGNAL_COLUMNS)
+    return signals, evaluated
@@ -0,0 +1,530 @@
+"""
+策略引擎模块 - 按日期向量化评估选股策略，生成并存储历史信号
+"""
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from ..data.adjustment import apply_adjust_factors
+from ..data.data_manager import DataManager
+from ..data.kline_series import KlineSeries, as_kline_series
+from ..data.signal_store import SignalStore
+from ..utils.logger import setup_logger
+from ..utils.plugins import STRATEGY_ENTRY_POINT_GROUP, load_plugins
+from .expressions import ExpressionStrategy
+
+# 计算指标所需的额外历史数据（自然日），保证回溯区间起点的指标已经稳定
+LOOKBACK_DAYS = 400
+
+
+def resample_to_weekly(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    将日K线合成为周K线，日期取每周最后一个交易日
+
+    Args:
+        daily: 按日期升序排列的日K线数据
+
+    Returns:
+        pd.DataFrame: 周K线数据
+    """
+    dates = pd.to_datetime(daily['date'])
+    week = dates.dt.to_period('W-FRI')
+    weekly = daily.groupby(week.to_numpy(), sort=True).agg(
+        date=('date', 'last'),
+        open=('open', 'first'),
+        high=('high', 'max'),
+        low=('low', 'min'),
+        close=('close', 'last'),
+        volume=('volume', 'sum'),
+        amount=('amount', 'sum'),
+        **({'raw_close': ('raw_close', 'last')} if 'raw_close' in daily.columns else {}),
+    )
+    return weekly.reset_index(drop=True)
+
+
+# 布林下轨走平 + 股息率低吸策略（Strategy 1A / 1B）
+#   1. 收盘价接近或低于布林下轨（不高于下轨的 1 + lower_band_tolerance_percentage%）
+#   2. 布林下轨在过去 bollinger_flat_check_days 个周期内的波动幅度小于阈值
+#   3. 动态股息率不低于 min_dynamic_dividend_yield（有 raw_close 列时按不复权收盘价计算）
+evaluate_bollinger_dividend = ExpressionStrategy(
+    'evaluate_bollinger_dividend',
+    conditions=[
+        "close <= boll_lower(bollinger_period, bollinger_std_dev) * (1 + lower_band_tolerance_percentage / 100)",
+        "band_range(boll_lower(bollinger_period, bollinger_std_dev), bollinger_flat_check_days)"
+        " <= bollinger_flat_threshold_percentage",
+        "dividend_yield() >= min_dynamic_dividend_yield",
+    ],
+    values={
+        'flat_range': "band_range(boll_lower(bollinger_period, bollinger_std_dev), bollinger_flat_check_days)",
+        'dividend_yield': "dividend_yield()",
+    },
+    description="布林下轨走平(波动{flat_range}%), 动态股息率{dividend_yield}%",
+    defaults={
+        'bollinger_period': 20,
+        'bollinger_std_dev': 2.0,
+        'bollinger_flat_check_days': 60,
+        'bollinger_flat_threshold_percentage': 5.0,
+        'lower_band_tolerance_percentage': 1.0,
+        'min_dynamic_dividend_yield': 3.0,
+    },
+)
+
+# MACD金叉 + 布林带向上开口的趋势突破策略（Strategy 2A）
+#   1. DIF 上穿 DEA
+#   2. 布林带上轨和下轨同时向上
+evaluate_macd_bollinger_breakthrough = ExpressionStrategy(
+    'evaluate_macd_bollinger_breakthrough',
+    conditions=[
+        "cross_above(macd_dif(macd_fast_period, macd_slow_period, macd_signal_period), "
+        "macd_dea(macd_fast_period, macd_slow_period, macd_signal_period))",
+        "rising(boll_upper(bollinger_period, bollinger_std_dev))",
+        "rising(boll_lower(bollinger_period, bollinger_std_dev))",
+    ],
+    description="MACD金叉, 布林带向上开口",
+    defaults={
+        'macd_fast_period': 12,
+        'macd_slow_period': 26,
+        'macd_signal_period': 9,
+        'bollinger_period': 20,
+        'bollinger_std_dev': 2.0,
+    },
+)
+
+# 策略名称 -> (K线周期, 评估函数)
+STRATEGY_EVALUATORS: Dict[str, Tuple[str, Callable[..., pd.DataFrame]]] = {
+    'strategy_1a_daily_bollinger_dividend': ('daily', evaluate_bollinger_dividend),
+    'strategy_1b_weekly_bollinger_dividend': ('weekly', evaluate_bollinger_dividend),
+    'strategy_2a_daily_macd_bollinger_breakthrough': ('daily', evaluate_macd_bollinger_breakthrough),
+}
+
+
+def get_strategy_evaluators(strategies_config: Optional[Dict[str, Dict[str, Any]]] = None
+                            ) -> Dict[str, Tuple[str, Callable[..., pd.DataFrame]]]:
+    """
+    获取内置策略、通过 entry points 注册的插件策略和配置中用条件表达式定义的策略
+
+    插件策略可以是评估函数（用 period 属性声明K线周期），也可以是 (周期, 评估函数) 元组。
+    评估函数默认接收K线 DataFrame，设置 kline_series = True 属性后直接接收 KlineSeries。
+    配置中包含 conditions 的策略编译为 ExpressionStrategy。与已有策略同名的插件和配置策略会被忽略。
+
+    Args:
+        strategies_config: 策略参数配置（可选）
+
+    Returns:
+        Dict[str, Tuple[str, Callable[..., pd.DataFrame]]]: 策略名称 -> (K线周期, 评估函数)
+    """
+    evaluators = dict(STRATEGY_EVALUATORS)
+    logger = setup_logger(__name__)
+    for name, plugin in load_plugins(STRATEGY_ENTRY_POINT_GROUP).items():
+        if name in evaluators:
+            logger.warning(f"插件策略{name}与内置策略同名，已忽略")
+            continue
+        period, evaluator = plugin if isinstance(plugin, tuple) else (getattr(plugin, 'period', 'daily'), plugin)
+        if period not in ('daily', 'weekly'):
+            logger.warning(f"插件策略{name}的K线周期{period}无效，已忽略")
+            continue
+        evaluators[name] = (period, evaluator)
+    for name, definition in (strategies_config or {}).items():
+        if 'conditions' not in definition:
+            continue
+        if name in evaluators:
+            logger.warning(f"配置策略{name}与已有策略同名，已忽略")
+            continue
+        try:
+            evaluator = ExpressionStrategy.from_config(name, definition)
+        except ValueError as e:
+            logger.warning(f"配置策略{name}无效，已忽略: {str(e)}")
+            continue
+        evaluators[name] = (evaluator.period, evaluator)
+    return evaluators
+
+
+# 信号数据的列，与 historical_signals 表一致（不含id）
+SIGNAL_COLUMNS = ['stock_code', 'date', 'strategy_name', 'signal_type', 'price', 'description']
+
+
+def evaluate_signals(stock_code: str,
+                     daily: Union[KlineSeries, pd.DataFrame],
+                     dividends: pd.DataFrame,
+                     strategies: List[str],
+                     evaluators: Dict[str, Tuple[str, Callable[..., pd.DataFrame]]],
+                     strategies_config: Dict[str, Dict[str, Any]],
+                     start_date: Optional[str],
+                     end_date: str) -> pd.DataFrame:
+    """
+    在已加载的数据上评估策略，返回区间内触发的信号
+
+    Args:
+        stock_code: 股票代码
+        daily: 日K线序列或日K线数据（含指标预热所需的额外历史）
+        dividends: 分红数据
+        strategies: 策略名称列表
+        evaluators: 策略名称 -> (K线周期, 评估函数)
+        strategies_config: 策略参数配置
+        start_date: 开始日期，为 None 时只评估不晚于 end_date 的最新一根K线（扫描）
+        end_date: 结束日期
+
+    Returns:
+        pd.DataFrame: 信号数据
+    """
+    daily = as_kline_series(daily)
+    if start_date is None:
+        start_date = end_date = daily.date_strings()[-1]
+    klines = {'daily': daily}
+    # K线周期 -> 已计算的表达式节点，同一周期的表达式策略共用相同的指标
+    memos: Dict[str, Dict] = {}
+    frames = []
+    for name in strategies:
+        period, evaluator = evaluators[name]
+        if period not in klines:
+            klines[period] = daily.resample_weekly()
+        kline = klines[period] if getattr(evaluator, 'kline_series', False) else klines[period].to_frame()
+        if getattr(evaluator, 'shares_indicators', False):
+            result = evaluator(kline, dividends, strategies_config.get(name, {}), memo=memos.setdefault(period, {}))
+        else:
+            result = evaluator(kline, dividends, strategies_config.get(name, {}))
+        in_range = (result['date'] >= start_date) & (result['date'] <= end_date)
+        hits = result[result['triggered'] & in_range]
+        if hits.empty:
+            continue
+        frames.append(pd.DataFrame({
+            'stock_code': stock_code,
+            'date': hits['date'].to_numpy(),
+            'strategy_name': name,
+            'signal_type': 'buy',
+            'price': hits['close'].to_numpy(),
+            'description': hits['description'].to_numpy(),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=SIGNAL_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+class StrategyEngine:
+    """策略引擎类，负责加载数据、评估策略以及回溯历史信号"""
+
+    def __init__(self, dm: DataManager, strategies_config: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        初始化策略引擎
+
+        Args:
+            dm: DataManager实例
+            strategies_config: 策略参数配置，默认取配置文件中的 strategies 部分
+        """
+        self.dm = dm
+        self.strategies_config = strategies_config if strategies_config is not None \
+            else dm.db.config.get('strategies', {})
+        self.logger = setup_logger(__name__)
+        self.evaluators = get_strategy_evaluators(self.strategies_config)
+        self.signal_store = SignalStore(dm.db)
+        # 股票代码 -> (日K线序列, 分红数据)，为 None 时不缓存
+        self._cache: Optional[Dict[str, Tuple[KlineSeries, pd.DataFrame]]] = None
+
+    def get_enabled_strategies(self, strategy_names: Optional[List[str]] = None) -> List[str]:
+        """
+        获取需要运行的策略列表
+
+        Args:
+            strategy_names: 指定的策略名称（可选），默认为所有 enabled 的策略
+
+        Returns:
+            List[str]: 策略名称列表
+        """
+        if strategy_names:
+            unknown = [name for name in strategy_names if name not in self.evaluators]
+            if unknown:
+                raise ValueError(f"未知的策略: {', '.join(unknown)}")
+            return list(strategy_names)
+        return [
+            name for name, params in self.strategies_config.items()
+            if params.get('enabled', False) and name in self.evaluators
+        ]
+
+    def enable_cache(self) -> None:
+        """
+        开启输入数据缓存
+
+        开启后每只股票的完整K线、复权因子和分红数据只从数据库读取一次，
+        供常驻服务反复扫描使用。数据更新后需要调用 invalidate 使缓存失效。
+        """
+        if self._cache is None:
+            self._cache = {}
+
+    def invalidate(self, stock_codes: Optional[List[str]] = None) -> None:
+        """
+        使缓存的输入数据失效
+
+        Args:
+            stock_codes: 股票代码列表（可选），默认清空全部缓存
+        """
+        if self._cache is None:
+            return
+        if stock_codes is None:
+            self._cache.clear()
+        else:
+            for stock_code in stock_codes:
+                self._cache.pop(stock_code, None)
+
+    def load_series(self,
+                    stock_code: str,
+                    start_date: str,
+                    end_date: str) -> Tuple[KlineSeries, pd.DataFrame]:
+        """
+        加载策略评估所需的日K线序列和分红数据
+
+        日K线的技术指标使用前复权价格，raw_close 保留实际成交的不复权收盘价用于计算股息率。
+        缓存的序列按日期切片时返回视图，不复制数组。
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期（已包含指标预热所需的额外历史）
+            end_date: 结束日期
+
+        Returns:
+            Tuple[KlineSeries, pd.DataFrame]: (日K线序列, 分红数据)，没有K线时序列为空
+        """
+        if self._cache is not None and stock_code in self._cache:
+            series, dividends = self._cache[stock_code]
+        else:
+            series, dividends = self._load_daily(stock_code, start_date, end_date)
+            if self._cache is not None and len(series):
+                self._cache[stock_code] = (series, dividends)
+        return series.slice_dates(start_date, end_date), dividends
+
+    def load_inputs(self,
+                    stock_code: str,
+                    start_date: str,
+                    end_date: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        加载日K线和分红数据，日K线转换为 DataFrame，供查询和导出等边界使用
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: (日K线, 分红数据)，没有K线时日K线为空
+        """
+        series, dividends = self.load_series(stock_code, start_date, end_date)
+        if not len(series):
+            return pd.DataFrame(), dividends
+        return series.to_frame(), dividends
+
+    def _load_daily(self,
+                    stock_code: str,
+                    start_date: str,
+                    end_date: str) -> Tuple[KlineSeries, pd.DataFrame]:
+        """
+        从数据管理器读取日K线和分红数据
+
+        开启缓存时读取数据库中该股票的全部K线，数据库中没有时再按区间获取。
+        日K线仍为旧版本前复权价格的股票经由数据管理器读取，先重新获取为不复权价格。
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            Tuple[KlineSeries, pd.DataFrame]: (日K线序列, 分红数据)
+        """
+        raw = None
+        if self._cache is not None and not self.dm.db.legacy_qfq_stocks([stock_code]):
+            raw = self.dm.db.query_kline('daily_kline', "stock_code = ?", (stock_code,), order_by="date")
+        if raw is None or raw.empty:
+            raw = self.dm.get_stock_daily_kline(stock_code, start_date, end_date, adjust="")
+        dividends = self.dm.get_stock_dividend_data(stock_code)
+        if dividends is None:
+            dividends = pd.DataFrame()
+        if raw is None or raw.empty:
+            return KlineSeries.empty(stock_code), dividends
+        raw = raw.sort_values('date').reset_index(drop=True)
+        daily = apply_adjust_factors(raw, self.dm.get_adjust_factors(stock_code), "qfq")
+        daily['raw_close'] = raw['close'].astype(float)
+        return KlineSeries.from_frame(daily, stock_code), dividends
+
+    def evaluate_stock(self,
+                       stock_code: str,
+                       start_date: str,
+                       end_date: str,
+                       strategy_names: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        评估单只股票在日期区间内每个交易日的策略信号
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            strategy_names: 指定的策略名称（可选）
+
+        Returns:
+            pd.DataFrame: 信号数据，列与 historical_signals 表一致（不含id）
+        """
+        strategies = self.get_enabled_strategies(strategy_names)
+        lookback_start = (pd.to_datetime(start_date) - timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        daily, dividends = self.load_series(stock_code, lookback_start, end_date)
+        if not len(daily):
+            self.logger.warning(f"{stock_code}没有日K线数据，跳过策略评估")
+            return self._empty_signals()
+        return evaluate_signals(stock_code, daily, dividends, strategies, self.evaluators,
+                                self.strategies_config, start_date, end_date)
+
+    def _evaluate_many(self,
+                       stock_codes: List[str],
+                       start_date: Optional[str],
+                       end_date: str,
+                       strategies: List[str],
+                       processes: int = 1) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        评估多只股票的策略信号
+
+        输入数据在当前进程中加载；processes 大于1时按股票分片交给进程池评估，
+        价格和分红数组通过共享内存传递给子进程。
+
+        Args:
+            stock_codes: 股票代码列表
+            start_date: 开始日期，为 None 时只评估每只股票不晚于 end_date 的最新一根K线
+            end_date: 结束日期
+            strategies: 策略名称列表
+            processes: 评估使用的进程数
+
+        Returns:
+            Tuple[pd.DataFrame, List[str]]: (信号数据, 成功评估的股票代码)
+        """
+        lookback_start = (pd.to_datetime(start_date or end_date) - timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        inputs = {}
+        for stock_code in stock_codes:
+            try:
+                daily, dividends = self.load_series(stock_code, lookback_start, end_date)
+            except Exception as e:
+                self.logger.error(f"加载{stock_code}的数据失败: {str(e)}")
+                continue
+            if not len(daily):
+                self.logger.warning(f"{stock_code}没有日K线数据，跳过策略评估")
+                continue
+            inputs[stock_code] = (daily, dividends)
+
+        if processes > 1 and len(inputs) > 1:
+            # 在方法内导入以避免与 parallel 模块循环导入
+            from .parallel import evaluate_sharded
+            return evaluate_sharded(inputs, strategies, self.strategies_config, start_date, end_date, processes)
+
+        frames, evaluated = [], []
+        for stock_code, (daily, dividends) in inputs.items():
+            try:
+                frames.append(evaluate_signals(stock_code, daily, dividends, strategies, self.evaluators,
+                                               self.strategies_config, start_date, end_date))
+                evaluated.append(stock_code)
+            except Exception as e:
+                self.logger.error(f"评估{stock_code}失败: {str(e)}")
+        frames = [frame for frame in frames if not frame.empty]
+        signals = pd.concat(frames, ignore_index=True) if frames else self._empty_signals()
+        return signals, evaluated
+
+    def scan(self,
+             stock_codes: List[str],
+             date: Optional[str] = None,
+             strategy_names: Optional[List[str]] = None,
+             processes: int = 1) -> pd.DataFrame:
+        """
+        选股扫描：评估每只股票在指定日期（或之前最近一个交易日）的策略信号
+
+        Args:
+            stock_codes: 股票代码列表
+            date: 扫描日期（可选），默认为每只股票的最新数据日期
+            strategy_names: 指定的策略名称（可选）
+            processes: 评估使用的进程数
+
+        Returns:
+            pd.DataFrame: 触发的信号数据
+        """
+        strategies = self.get_enabled_strategies(strategy_names)
+        end_date = date or datetime.now().strftime('%Y-%m-%d')
+        signals, _ = self._evaluate_many(stock_codes, None, end_date, strategies, processes)
+        return signals
+
+    def backfill(self,
+                 stock_code: str,
+                 start_date: str,
+                 end_date: str,
+                 strategy_names: Optional[List[str]] = None) -> int:
+        """
+        对单只股票执行历史回溯，结果存入 historical_signals 表
+
+        重复回溯同一区间时先删除该区间内已有的信号，避免产生重复记录。
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            strategy_names: 指定的策略名称（可选）
+
+        Returns:
+            int: 写入的信号数量
+        """
+        strategies = self.get_enabled_strategies(strategy_names)
+        signals = self.evaluate_stock(stock_code, start_date, end_date, strategies)
+        self._store_signals(stock_code, start_date, end_date, strategies, signals)
+        self.logger.info(f"{stock_code} 回溯完成，产生 {len(signals)} 个信号")
+        return len(signals)
+
+    def backfill_many(self,
+                      stock_codes: List[str],
+                      start_date: str,
+                      end_date: str,
+                      strategy_names: Optional[List[str]] = None,
+                      processes: int = 1) -> Dict[str, int]:
+        """
+        对多只股票执行历史回溯，processes 大于1时多进程分片评估
+
+        子进程只负责计算，信号由当前进程统一写入数据库；评估失败的股票保留原有信号。
+
+        Args:
+            stock_codes: 股票代码列表
+            start_date: 开始日期
+            end_date: 结束日期
+            strategy_names: 指定的策略名称（可选）
+            processes: 评估使用的进程数
+
+        Returns:
+            Dict[str, int]: 成功回溯的股票代码 -> 写入的信号数量
+        """
+        strategies = self.get_enabled_strategies(strategy_names)
+        signals, evaluated = self._evaluate_many(stock_codes, start_date, end_date, strategies, processes)
+        by_stock = dict(tuple(signals.groupby('stock_code'))) if not signals.empty else {}
+        counts = {}
+        for stock_code in evaluated:
+            stock_signals = by_stock.get(stock_code, self._empty_signals())
+            self._store_signals(stock_code, start_date, end_date, strategies, stock_signals)
+            counts[stock_code] = len(stock_signals)
+        self.logger.info(f"回溯完成，{len(evaluated)} 只股票共产生 {len(signals)} 个信号")
+        return counts
+
+    def _store_signals(self,
+                       stock_code: str,
+                       start_date: str,
+                       end_date: str,
+                       strategies: List[str],
+                       signals: pd.DataFrame) -> None:
+        """
+        替换单只股票在区间内的信号：删除和写入在同一个事务中完成
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            strategies: 策略名称列表
+            signals: 新的信号数据
+        """
+        self.signal_store.replace(stock_code, start_date, end_date, strategies, signals)
+
+    def _empty_signals(self) -> pd.DataFrame:
+        """
+        生成空的信号数据
+
+        Returns:
+            pd.DataFrame: 只有列名的空DataFrame
+        """
+        return pd.DataFrame(columns=SIGNAL_COLUMNS)
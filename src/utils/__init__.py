@@ -3,5 +3,6 @@
 """
 
 from .logger import setup_logger
+from .plugins import load_plugins
 
-__all__ = ['setup_logger'] 
\ No newline at end of file
+__all__ = ['load_plugins', 'setup_logger']
@@ -0,0 +1,53 @@
+"""
+插件注册模块 - 通过 entry points 发现第三方提供的策略和数据获取插件
+
+第三方包在自己的 pyproject.toml 中声明即可被发现，例如：
+
+    [project.entry-points."highgividend.strategies"]
+    my_strategy = "my_package.strategies:evaluate_my_strategy"
+
+    [project.entry-points."highgividend.fetchers"]
+    northbound = "my_package.fetchers:fetch_northbound"
+
+策略插件是与内置策略签名一致的评估函数 (kline, dividends, params) -> DataFrame，
+可以用 period 属性声明K线周期（daily 或 weekly，默认 daily），
+设置 kline_series = True 属性后 kline 参数为 KlineSeries 而不是 DataFrame。
+数据获取插件是 (data_manager, stock_code) -> None 的函数，负责获取并存储数据，失败时抛出异常。
+"""
+from importlib.metadata import entry_points
+from typing import Any, Dict
+
+from .logger import setup_logger
+
+STRATEGY_ENTRY_POINT_GROUP = "highgividend.strategies"
+FETCHER_ENTRY_POINT_GROUP = "highgividend.fetchers"
+
+logger = setup_logger(__name__)
+
+# entry point 组名 -> {插件名称: 插件对象}，每个进程只扫描一次
+_loaded_plugins: Dict[str, Dict[str, Any]] = {}
+
+
+def load_plugins(group: str, reload: bool = False) -> Dict[str, Any]:
+    """
+    加载指定 entry point 组中的所有插件
+
+    加载失败的插件只记录日志并跳过，不影响其他插件和内置功能。
+
+    Args:
+        group: entry point 组名
+        reload: 是否重新扫描已安装的包
+
+    Returns:
+        Dict[str, Any]: 插件名称 -> 插件对象
+    """
+    if group in _loaded_plugins and not reload:
+        return _loaded_plugins[group]
+    plugins = {}
+    for entry_point in entry_points(group=group):
+        try:
+            plugins[entry_point.name] = entry_point.load()
+        except Exception as e:
+            logger.error(f"加载插件{entry_point.name}失败: {str(e)}")
+    _loaded_plugins[group] = plugins
+    return plugins
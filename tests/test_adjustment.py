@@ -0,0 +1,171 @@
+"""
+测试读取时复权计算的功能
+"""
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from src.backtest.engine import BacktestEngine
+from src.data.adjustment import apply_adjust_factors, factors_on_dates
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+
+@pytest.fixture
+def data_manager():
+    """创建测试用的数据管理器"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    return DataManager(db)
+
+@pytest.fixture
+def raw_kline():
+    """两只股票的不复权K线，SH600036 在 2023-01-04 除息"""
+    return pd.DataFrame({
+        'stock_code': ['SH600036'] * 3 + ['SZ000001'] * 2,
+        'date': ['2023-01-03', '2023-01-04', '2023-01-05', '2023-01-03', '2023-01-04'],
+        'open': [10.0, 9.0, 9.0, 5.0, 5.0],
+        'high': [10.0, 9.0, 9.0, 5.0, 5.0],
+        'low': [10.0, 9.0, 9.0, 5.0, 5.0],
+        'close': [10.0, 9.0, 9.0, 5.0, 5.0],
+        'volume': [100, 100, 100, 100, 100],
+        'amount': [1000.0] * 5,
+        'adj_factor': [None] * 5
+    })
+
+@pytest.fixture
+def factors():
+    """后复权因子变化点"""
+    return pd.DataFrame({
+        'stock_code': ['SH600036', 'SH600036', 'SZ000001'],
+        'date': ['1900-01-01', '2023-01-04', '2020-01-01'],
+        'hfq_factor': [1.0, 10.0 / 9.0, 2.0]
+    })
+
+def test_factors_on_dates(raw_kline, factors):
+    """测试每根K线取当日生效的因子"""
+    result = factors_on_dates(raw_kline, factors)
+    assert np.allclose(result, [1.0, 10.0 / 9.0, 10.0 / 9.0, 2.0, 2.0])
+
+def test_factors_missing_stock(raw_kline, factors):
+    """测试没有因子记录的股票因子为1"""
+    result = factors_on_dates(raw_kline, factors[factors['stock_code'] == 'SZ000001'])
+    assert np.allclose(result, [1.0, 1.0, 1.0, 2.0, 2.0])
+
+def test_apply_adjust_factors(raw_kline, factors):
+    """测试前复权、后复权和不复权"""
+    qfq = apply_adjust_factors(raw_kline, factors, "qfq")
+    # 前复权：除息前价格按比例下调，最新价格不变
+    assert np.allclose(qfq['close'], [9.0, 9.0, 9.0, 5.0, 5.0])
+    hfq = apply_adjust_factors(raw_kline, factors, "hfq")
+    assert np.allclose(hfq['close'], [10.0, 10.0, 10.0, 10.0, 10.0])
+    raw = apply_adjust_factors(raw_kline, factors, "")
+    assert np.allclose(raw['close'], raw_kline['close'])
+    assert np.allclose(raw['adj_factor'], [1.0, 10.0 / 9.0, 10.0 / 9.0, 2.0, 2.0])
+    # 成交量不参与复权
+    assert list(qfq['volume']) == list(raw_kline['volume'])
+
+def test_apply_adjust_factors_unknown_type(raw_kline, factors):
+    """测试未知复权类型报错"""
+    with pytest.raises(ValueError):
+        apply_adjust_factors(raw_kline, factors, "xfq")
+
+def test_new_dividend_only_updates_factor_table(data_manager, raw_kline, mocker):
+    """测试新增除息只需要更新因子表，读取的前复权价格随之变化"""
+    data_manager.db.insert_dataframe('daily_kline', raw_kline[raw_kline['stock_code'] == 'SH600036'])
+    df = data_manager.get_stock_daily_kline('SH600036', '2023-01-03', '2023-01-05')
+    assert np.allclose(df['close'], [10.0, 9.0, 9.0])
+
+    mocker.patch('akshare.stock_zh_a_daily', return_value=pd.DataFrame({
+        'date': pd.to_datetime(['2023-01-04', '1900-01-01']),
+        'hfq_factor': [10.0 / 9.0, 1.0]
+    }))
+    data_manager.refresh_adjust_factors('SH600036')
+    qfq = data_manager.get_stock_daily_kline('SH600036', '2023-01-03', '2023-01-05')
+    assert np.allclose(qfq['close'], [9.0, 9.0, 9.0])
+    hfq = data_manager.get_stock_daily_kline('SH600036', '2023-01-03', '2023-01-05', adjust="hfq")
+    assert np.allclose(hfq['close'], [10.0, 10.0, 10.0])
+    raw = data_manager.db.execute_query("SELECT close FROM daily_kline ORDER BY date")
+    assert np.allclose(raw['close'], [10.0, 9.0, 9.0])
+
+def test_fetch_stores_unadjusted_prices(data_manager, mocker):
+    """测试从akshare获取的是不复权价格"""
+    mock_hist = mocker.patch('akshare.stock_zh_a_hist', return_value=pd.DataFrame({
+        '日期': ['2023-01-03'], '开盘': [10.0], '最高': [10.0], '最低': [10.0],
+        '收盘': [10.0], '成交量': [100], '成交额': [1000.0]
+    }))
+    mocker.patch('akshare.stock_zh_a_daily', return_value=pd.DataFrame({
+        'date': pd.to_datetime(['2023-01-01']), 'hfq_factor': [3.0]
+    }))
+    df = data_manager.get_stock_daily_kline('SH600036', '2023-01-03', '2023-01-03', adjust="hfq")
+    assert mock_hist.call_args.kwargs['adjust'] == ""
+    assert df.iloc[0]['close'] == 30.0
+    stored = data_manager.db.execute_query("SELECT close FROM daily_kline")
+    assert stored.iloc[0]['close'] == 10.0
+
+def test_legacy_qfq_kline_is_refetched_before_adjusting(tmp_path, mocker):
+    """没有复权因子表的旧数据库按前复权保存K线，读取时先重新获取为不复权价格，不会复权两次"""
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE daily_kline (stock_code TEXT NOT NULL, date TEXT NOT NULL, open REAL, high REAL, low REAL,
+                                  close REAL, volume INTEGER, amount REAL, adj_factor REAL,
+                                  PRIMARY KEY (stock_code, date))
+    """)
+    # 旧版本保存的前复权价格：除息前的 10.0 已调整为 9.0
+    conn.executemany("INSERT INTO daily_kline VALUES (?, ?, ?, ?, ?, ?, 100, 1000.0, 1.0)",
+                     [('SH600036', date, close, close, close, close)
+                      for date, close in [('2023-01-03', 9.0), ('2023-01-04', 9.0), ('2023-01-05', 9.0)]])
+    conn.commit()
+    conn.close()
+
+    db = DatabaseHandler({"database_path": path, "data_source": {"akshare_max_retries": 1}})
+    db.initialize_tables()
+    data_manager = DataManager(db)
+    assert db.legacy_qfq_stocks() == ['SH600036']
+    # 已经迁移的数据库再次初始化不会重新标记
+    db.initialize_tables()
+
+    mocker.patch('akshare.stock_zh_a_hist', side_effect=RuntimeError("网络错误"))
+    assert data_manager.get_stock_daily_kline('SH600036', '2023-01-03', '2023-01-05').empty
+    with pytest.raises(ValueError):
+        BacktestEngine(db).load_price_panel(['SH600036'], '2023-01-03')
+
+    mock_hist = mocker.patch('akshare.stock_zh_a_hist', return_value=pd.DataFrame({
+        '日期': ['2023-01-03', '2023-01-04', '2023-01-05'], '开盘': [10.0, 9.0, 9.0], '最高': [10.0, 9.0, 9.0],
+        '最低': [10.0, 9.0, 9.0], '收盘': [10.0, 9.0, 9.0], '成交量': [100] * 3, '成交额': [1000.0] * 3
+    }))
+    mocker.patch('akshare.stock_zh_a_daily', return_value=pd.DataFrame({
+        'date': pd.to_datetime(['1900-01-01', '2023-01-04']), 'hfq_factor': [1.0, 10.0 / 9.0]
+    }))
+    qfq = data_manager.get_stock_daily_kline('SH600036', '2023-01-03', '2023-01-05')
+    assert np.allclose(qfq['close'], [9.0, 9.0, 9.0])
+    assert mock_hist.call_args.kwargs['start_date'] == '20230103'
+    assert db.legacy_qfq_stocks() == []
+    stored = db.execute_query("SELECT close, adj_factor FROM daily_kline ORDER BY date")
+    assert stored['close'].tolist() == [10.0, 9.0, 9.0] and stored['adj_factor'].isna().all()
+    db.initialize_tables()
+    assert db.legacy_qfq_stocks() == []
+    db.close()
+
+def test_weekly_kline_adjusts_within_week(data_manager, raw_kline, factors, mocker):
+    """周内除息时先把日K线换算到周末的价格基准再聚合，周K线保存不复权价格和周末的因子"""
+    db = data_manager.db
+    db.insert_dataframe('daily_kline', raw_kline[raw_kline['stock_code'] == 'SH600036'])
+    db.insert_dataframe('adjust_factors', factors)
+    weekly = db.aggregate_kline('SH600036', 'weekly', '2023-01-01', '2023-01-08')
+    assert weekly['date'].tolist() == ['2023-01-08']
+    # 除息前的 10.0 换算为 9.0，不会把除息当作周内下跌
+    row = weekly.iloc[0]
+    assert np.allclose([row['open'], row['high'], row['low'], row['close']], 9.0)
+    assert row['adj_factor'] == pytest.approx(10.0 / 9.0)
+    # 与先前复权再按周重采样的结果一致，并可以像日K线一样在读取时复权
+    qfq = apply_adjust_factors(db.execute_query("SELECT * FROM daily_kline"), factors, "qfq")
+    assert row['open'] == pytest.approx(qfq['open'].iloc[0]) and row['high'] == pytest.approx(qfq['high'].max())
+    assert apply_adjust_factors(weekly, factors, "hfq")['close'].iloc[0] == pytest.approx(10.0)
+
+    # 仍为前复权价格且迁移失败的股票不计算周K线
+    db.insert_dataframe('legacy_qfq_kline', pd.DataFrame({'stock_code': ['SH600036']}))
+    migrate = mocker.patch.object(data_manager, 'migrate_qfq_kline')
+    data_manager.calculate_and_store_derived_kline('SH600036', 'weekly')
+    migrate.assert_called_once_with(['SH600036'])
+    assert db.execute_query("SELECT * FROM weekly_kline").empty
@@ -0,0 +1,23 @@
+"""
+测试按 (股票, 日期) 整数键的 as-of 查找和滚动求和
+"""
+import numpy as np
+import pandas as pd
+from src.data.asof import TTM_WINDOW_DAYS, asof_positions, composite_keys, trailing_sums
+
+def test_asof_positions_stay_within_stock():
+    """as-of 只取同一只股票当天或之前的行"""
+    data_keys = composite_keys(np.array([0, 0, 1]), pd.Series(['2024-01-02', '2024-03-01', '2024-02-01']))
+    query_keys = composite_keys(np.array([0, 0, 1, 1]),
+                                pd.Series(['2024-01-01', '2024-03-01', '2024-01-15', '2024-12-31']))
+    index, matched = asof_positions(data_keys, query_keys)
+    assert matched.tolist() == [False, True, False, True]
+    assert index[matched].tolist() == [1, 2]
+
+def test_trailing_sums_use_fixed_window_across_leap_years():
+    """近一年窗口为 (日期-365天, 日期]，闰年也不多算一天"""
+    dividend_keys = composite_keys(np.array([0, 0, 1]), pd.Series(['2023-03-01', '2023-03-02', '2023-03-02']))
+    query_keys = composite_keys(np.array([0, 1]), pd.Series(['2024-02-29', '2024-02-29']))
+    # 2024-02-29 往前365天是 2023-03-01（不含）
+    assert trailing_sums(dividend_keys, np.array([0.3, 0.5, 0.7]), query_keys).tolist() == [0.5, 0.7]
+    assert trailing_sums(dividend_keys, np.array([0.3, 0.5, 0.7]), query_keys, TTM_WINDOW_DAYS + 1).tolist() == [0.8, 0.7]
@@ -0,0 +1,147 @@
+"""
+测试回测引擎的功能
+"""
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from src.backtest.engine import BacktestEngine
+from src.data.db_handler import DatabaseHandler
+
+@pytest.fixture
+def db_handler():
+    """创建测试用的数据库处理器"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    return db
+
+@pytest.fixture
+def backtest_engine(db_handler):
+    """创建测试用的回测引擎（不收手续费）"""
+    return BacktestEngine(db_handler, {"commission_rate": 0.0})
+
+def insert_kline(db, stock_code, closes, start='2024-01-01'):
+    """插入开盘价等于收盘价的日K线数据"""
+    dates = pd.bdate_range(start=start, periods=len(closes)).strftime('%Y-%m-%d')
+    db.insert_dataframe('daily_kline', pd.DataFrame({
+        'stock_code': stock_code,
+        'date': dates,
+        'open': closes,
+        'high': closes,
+        'low': closes,
+        'close': closes,
+        'volume': 1000,
+        'amount': 10000.0,
+        'adj_factor': 1.0
+    }))
+    return list(dates)
+
+def insert_signals(db, strategy_name, stock_codes, dates):
+    """插入买入信号"""
+    db.insert_dataframe('historical_signals', pd.DataFrame({
+        'stock_code': stock_codes,
+        'date': dates,
+        'strategy_name': strategy_name,
+        'signal_type': 'buy',
+        'price': 0.0,
+        'description': ''
+    }))
+
+def test_holding_period_exit(backtest_engine, db_handler):
+    """测试持有期满后卖出"""
+    dates = insert_kline(db_handler, 'SH600036', [10.0, 10.0, 11.0, 12.0, 13.0, 14.0])
+    insert_signals(db_handler, 'test_strategy', ['SH600036'], [dates[0]])
+
+    result = backtest_engine.run('test_strategy', holding_days=3)
+    trade = result['trades'].iloc[0]
+    # 次日开盘10.0买入，持有3天后以12.0卖出
+    assert trade['entry_date'] == dates[1]
+    assert trade['exit_date'] == dates[3]
+    assert trade['exit_reason'] == 'holding_period'
+    assert abs(trade['return'] - 0.2) < 1e-9
+    assert result['metrics']['total_trades'] == 1
+    assert result['metrics']['win_rate'] == 1.0
+    assert result['metrics']['max_drawdown'] == 0.0
+
+def test_stop_loss_and_take_profit(backtest_engine, db_handler):
+    """测试止损和止盈"""
+    dates_a = insert_kline(db_handler, 'SH600036', [10.0, 10.0, 9.5, 8.5, 12.0, 12.0])
+    insert_kline(db_handler, 'SZ000001', [10.0, 10.0, 10.5, 12.5, 8.0, 8.0])
+    insert_signals(db_handler, 'test_strategy', ['SH600036', 'SZ000001'], [dates_a[0]] * 2)
+
+    result = backtest_engine.run(
+        'test_strategy', holding_days=4,
+        stop_loss_percentage=10, take_profit_percentage=20
+    )
+    trades = result['trades'].set_index('stock_code')
+    assert trades.loc['SH600036', 'exit_reason'] == 'stop_loss'
+    assert abs(trades.loc['SH600036', 'return'] + 0.15) < 1e-9
+    assert trades.loc['SZ000001', 'exit_reason'] == 'take_profit'
+    assert abs(trades.loc['SZ000001', 'return'] - 0.25) < 1e-9
+    assert result['metrics']['win_rate'] == 0.5
+
+def test_close_entry_and_commission(db_handler):
+    """测试信号日收盘买入并计入手续费"""
+    engine = BacktestEngine(db_handler, {"entry_price": "close", "commission_rate": 0.001})
+    dates = insert_kline(db_handler, 'SH600036', [10.0, 11.0, 12.0])
+    insert_signals(db_handler, 'test_strategy', ['SH600036'], [dates[0]])
+
+    result = engine.run('test_strategy', holding_days=2)
+    trade = result['trades'].iloc[0]
+    expected = 12.0 * (1 - 0.001) / (10.0 * (1 + 0.001)) - 1
+    assert trade['entry_date'] == dates[0]
+    assert abs(trade['return'] - expected) < 1e-9
+    # 组合净值的累计收益应与唯一一笔交易一致
+    assert abs(result['metrics']['total_return'] - expected) < 1e-9
+
+def test_end_of_data_and_drawdown(backtest_engine, db_handler):
+    """测试数据不足持有期时按最后一天卖出，并计算最大回撤"""
+    dates = insert_kline(db_handler, 'SH600036', [10.0, 10.0, 12.0, 9.0])
+    insert_signals(db_handler, 'test_strategy', ['SH600036'], [dates[0]])
+
+    result = backtest_engine.run('test_strategy', holding_days=10)
+    trade = result['trades'].iloc[0]
+    assert trade['exit_reason'] == 'end_of_data'
+    assert trade['holding_days'] == 3
+    assert abs(result['metrics']['max_drawdown'] - (9.0 / 12.0 - 1)) < 1e-9
+
+def test_trades_carry_point_in_time_financials(backtest_engine, db_handler):
+    """逐笔交易附加信号日当天或之前最新的 PE/PB，之后发布的数据不被使用"""
+    dates = insert_kline(db_handler, 'SH600036', [10.0] * 8)
+    insert_signals(db_handler, 'test_strategy', ['SH600036', 'SH600036'], [dates[0], dates[3]])
+    db_handler.insert_dataframe('financial_summary', pd.DataFrame({
+        'stock_code': 'SH600036', 'date': [dates[1], dates[3]], 'pe_ttm': [6.0, 7.0], 'pb_mrq': [0.9, 1.1],
+        'market_cap': None, 'circulating_market_cap': None
+    }))
+
+    trades = backtest_engine.run('test_strategy', holding_days=2)['trades']
+    assert np.isnan(trades['signal_pe_ttm'].iloc[0])
+    assert (trades['signal_pe_ttm'].iloc[1], trades['signal_pb_mrq'].iloc[1]) == (7.0, 1.1)
+
+def test_no_signals(backtest_engine):
+    """测试没有信号时返回空结果"""
+    result = backtest_engine.run('missing_strategy')
+    assert result['metrics']['total_trades'] == 0
+    assert result['trades'].empty
+
+def test_simulate_many_signals(backtest_engine):
+    """测试数万个信号的向量化回测性能"""
+    rng = np.random.default_rng(0)
+    n_dates, n_stocks, n_signals = 2000, 500, 50000
+    dates = pd.bdate_range('2015-01-01', periods=n_dates).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    codes = np.asarray([f"SH{600000 + i}" for i in range(n_stocks)], dtype=object)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_dates, n_stocks)), axis=0))
+    panel = {"dates": dates, "codes": codes, "open": close, "close": close}
+    signals = pd.DataFrame({
+        'stock_code': codes[rng.integers(0, n_stocks, n_signals)],
+        'date': dates[rng.integers(0, n_dates - 1, n_signals)]
+    })
+
+    started = time.perf_counter()
+    result = backtest_engine.simulate(
+        signals, panel,
+        {**backtest_engine.params, "holding_days": 20, "stop_loss_percentage": 8}
+    )
+    elapsed = time.perf_counter() - started
+    assert result['metrics']['total_trades'] == n_signals
+    assert elapsed < 10
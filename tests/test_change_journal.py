@@ -0,0 +1,65 @@
+"""
+测试变更日志和下游增量重算
+"""
+import pandas as pd
+import pytest
+from src.data.db_handler import DatabaseHandler
+from src.data.signal_store import SignalStore
+
+def make_kline(stock_code, dates):
+    """生成指定日期的日K线"""
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': 10.0, 'high': 10.0, 'low': 10.0,
+        'close': 10.0, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+@pytest.fixture
+def db():
+    """创建测试用的数据库"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    yield db
+    db.close()
+
+def test_writes_append_journal(db):
+    """写入按 (表, 股票) 记录日期区间，版本号递增"""
+    journal = db.journal
+    assert journal.current_version() == 0
+    db.insert_dataframe('daily_kline', pd.concat([
+        make_kline('SH600036', ['2024-01-02', '2024-01-03']), make_kline('SZ000001', ['2024-01-03'])
+    ]))
+    version = journal.current_version()
+    assert version == 2
+    db.upsert_dataframe('daily_kline', make_kline('SH600036', ['2024-01-04']))
+    db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH601398'], 'report_date': ['2024-03-01'], 'ex_dividend_date': ['2024-06-10'],
+        'dividend_per_share_pre_tax': [0.3], 'dividend_yield': [None]
+    }))
+
+    dirty = journal.dirty_since(0, ['daily_kline'])
+    assert dirty[['stock_code', 'min_date', 'max_date']].values.tolist() == [
+        ['SH600036', '2024-01-02', '2024-01-04'], ['SZ000001', '2024-01-03', '2024-01-03']
+    ]
+    assert journal.dirty_stocks(version) == ['SH600036', 'SH601398']
+    dividend = journal.dirty_since(version, ['dividend_data'])
+    assert dividend[['min_date', 'max_date']].values.tolist() == [['2024-06-10', '2024-06-10']]
+    assert journal.dirty_stocks(journal.current_version()) == []
+
+    # 清理后版本号不回退
+    assert journal.prune(journal.current_version()) == 4
+    assert journal.current_version() == 4
+
+def test_signal_replace_records_whole_range(db):
+    """替换信号时删除的区间也记为变更"""
+    store = SignalStore(db)
+    store.replace('SH600036', '2024-01-01', '2024-06-30', ['strategy_1a_daily_bollinger_dividend'], pd.DataFrame())
+    dirty = db.journal.dirty_since(0, ['historical_signals'])
+    assert dirty[['stock_code', 'min_date', 'max_date']].values.tolist() == [['SH600036', '2024-01-01', '2024-06-30']]
+
+def test_failed_write_leaves_no_journal(db):
+    """写入失败时变更日志随事务回滚"""
+    db.upsert_dataframe('daily_kline', make_kline('SH600036', ['2024-01-02']))
+    version = db.journal.current_version()
+    with pytest.raises(Exception):
+        db.upsert_dataframe('daily_kline', make_kline('SH600036', ['2024-01-03']).assign(no_such_column=1))
+    assert db.journal.dirty_stocks(version) == []
@@ -0,0 +1,108 @@
+"""
+测试命令注册、延迟导入和插件注册
+"""
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from src.cli.registry import COMMANDS, build_parser, load_command
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.strategies.strategy_engine import StrategyEngine, get_strategy_evaluators
+from src.utils import plugins
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_heavy_modules(tmp_path, argv):
+    """在独立进程中执行命令，返回导入的重依赖"""
+    code = (
+        "import sys\n"
+        "from src.cli import main\n"
+        f"main({argv!r})\n"
+        "print(','.join(m for m in ('akshare', 'pandas', 'numpy') if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": ROOT}, check=True
+    )
+    return result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+
+@pytest.fixture
+def fake_plugins(mocker):
+    """模拟通过 entry points 安装的插件"""
+    def entry_point(name, obj):
+        return SimpleNamespace(name=name, load=lambda: obj)
+
+    def evaluate_always(kline, dividends, params):
+        return pd.DataFrame({
+            'date': kline['date'].to_numpy(),
+            'close': kline['close'].to_numpy(),
+            'triggered': True,
+            'description': "插件策略"
+        })
+    evaluate_always.period = 'weekly'
+
+    fetched = []
+    groups = {
+        plugins.STRATEGY_ENTRY_POINT_GROUP: [
+            entry_point('plugin_always', evaluate_always),
+            entry_point('strategy_1a_daily_bollinger_dividend', evaluate_always),
+        ],
+        plugins.FETCHER_ENTRY_POINT_GROUP: [
+            entry_point('northbound', lambda dm, stock_code: fetched.append(stock_code)),
+        ],
+    }
+    mocker.patch.object(plugins, 'entry_points', side_effect=lambda group: groups[group])
+    mocker.patch.dict(plugins._loaded_plugins, clear=True)
+    return fetched
+
+def test_every_command_is_registered():
+    """测试解析器中的每个命令都能加载到处理函数"""
+    parser = build_parser()
+    choices = parser._subparsers._group_actions[0].choices
+    assert set(choices) == set(COMMANDS)
+    for name in COMMANDS:
+        assert callable(load_command(name))
+    with pytest.raises(ValueError):
+        load_command("no_such_command")
+
+def test_light_commands_do_not_import_heavy_modules(tmp_path):
+    """测试 init-config 和队列模式的 update-data 不导入 pandas/akshare"""
+    assert imported_heavy_modules(tmp_path, ['init-config']) == ""
+    assert (tmp_path / "config.json").exists()
+    argv = ['update-data', '--stock', 'SH600036', '--queue', str(tmp_path / 'queue.db')]
+    assert imported_heavy_modules(tmp_path, argv) == ""
+
+def test_data_manager_imports_akshare_lazily(tmp_path):
+    """测试只读取数据库时不导入 akshare"""
+    code = (
+        "import sys\n"
+        "from src.data.data_manager import DataManager\n"
+        "dm = DataManager({'database_path': ':memory:'})\n"
+        "dm.initialize_database()\n"
+        "print('akshare' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": ROOT}, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
+
+def test_strategy_plugins(fake_plugins):
+    """测试插件策略被注册，与内置策略同名的插件被忽略"""
+    evaluators = get_strategy_evaluators()
+    assert evaluators['plugin_always'][0] == 'weekly'
+    assert evaluators['strategy_1a_daily_bollinger_dividend'][1].__name__ == 'evaluate_bollinger_dividend'
+
+    db = DatabaseHandler({"database_path": ":memory:", "strategies": {"plugin_always": {"enabled": True}}})
+    db.initialize_tables()
+    engine = StrategyEngine(DataManager(db))
+    assert engine.get_enabled_strategies() == ['plugin_always']
+
+def test_fetcher_plugins(fake_plugins):
+    """测试插件提供的数据类型由插件获取"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    results = DataManager(db).update_single_stock_data('SH600036', ['northbound', 'unknown'])
+    assert results == {'northbound': True, 'unknown': False}
+    assert fake_plugins == ['SH600036']
@@ -0,0 +1,107 @@
+"""
+测试紧凑表结构和表结构迁移
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.compact_schema import get_object_type, get_schema_version, migrate_schema
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.strategies.strategy_engine import StrategyEngine
+
+def make_kline(stock_code, periods=300):
+    """生成测试用的日K线"""
+    dates = pd.bdate_range(start='2022-01-03', periods=periods).strftime('%Y-%m-%d')
+    closes = 10 + np.sin(np.arange(periods) / 10)
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes + 0.1,
+        'low': closes - 0.1, 'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+def populate(db):
+    """写入K线、复权因子、分红和历史信号"""
+    for stock_code in ['SH600036', 'SZ000001']:
+        db.insert_dataframe('daily_kline', make_kline(stock_code))
+    db.conn.execute("INSERT OR REPLACE INTO adjust_factors VALUES ('SH600036', '2022-06-01', 1.5)")
+    db.conn.commit()
+    db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036'], 'report_date': ['2022-04-30'], 'ex_dividend_date': ['2022-06-01'],
+        'dividend_per_share_pre_tax': [0.5], 'dividend_yield': [None]
+    }))
+    db.insert_dataframe('historical_signals', pd.DataFrame({
+        'stock_code': ['SH600036'], 'date': ['2022-06-01'], 'strategy_name': ['strategy_1a_daily_bollinger_dividend'],
+        'signal_type': ['BUY'], 'price': [10.0], 'description': ['测试']
+    }))
+
+QUERIES = [
+    "SELECT * FROM daily_kline WHERE stock_code = 'SH600036' AND date >= '2022-05-01' ORDER BY date",
+    "SELECT stock_code, COUNT(*) AS n, MAX(date) AS last FROM daily_kline GROUP BY stock_code ORDER BY stock_code",
+    "SELECT * FROM adjust_factors",
+    "SELECT * FROM dividend_data",
+    "SELECT * FROM historical_signals",
+]
+
+def test_compact_schema_read_write():
+    """测试紧凑表结构下现有的读写代码不需要修改"""
+    db = DatabaseHandler({
+        "database_path": ":memory:",
+        "compact_schema": True,
+        "strategies": {"strategy_1a_daily_bollinger_dividend": {"enabled": True, "bollinger_flat_check_days": 20}}
+    })
+    db.initialize_tables()
+    assert get_schema_version(db.conn) == 1
+    assert get_object_type(db.conn, 'daily_kline') == 'view'
+    populate(db)
+
+    stocks = db.execute_query("SELECT stock_code FROM stocks ORDER BY stock_id")
+    assert list(stocks['stock_code']) == ['SH600036', 'SZ000001']
+    stored = db.execute_query("SELECT stock_id, date FROM daily_kline_compact ORDER BY stock_id, date LIMIT 1")
+    assert stored.iloc[0]['date'] == (pd.Timestamp('2022-01-03') - pd.Timestamp('1970-01-01')).days
+
+    # 主键冲突仍然报错，INSERT OR REPLACE 仍然覆盖且不改变股票ID
+    with pytest.raises(Exception):
+        db.insert_dataframe('daily_kline', make_kline('SH600036', periods=1))
+    db.conn.execute("INSERT OR REPLACE INTO adjust_factors VALUES ('SH600036', '2022-06-01', 2.0)")
+    factors = db.execute_query("SELECT * FROM adjust_factors")
+    assert len(factors) == 1 and factors.iloc[0]['hfq_factor'] == 2.0
+    assert len(db.execute_query("SELECT * FROM stocks")) == 2
+
+    db.execute_update("DELETE FROM daily_kline WHERE stock_code = ? AND date > ?", ('SZ000001', '2022-02-01'))
+    remaining = db.execute_query("SELECT MAX(date) AS last FROM daily_kline WHERE stock_code = 'SZ000001'")
+    assert remaining.iloc[0]['last'] == '2022-02-01'
+
+    # 策略引擎通过视图回溯：先删除区间内的旧信号再写入新信号
+    engine = StrategyEngine(DataManager(db))
+    count = engine.backfill('SH600036', '2022-03-01', '2022-12-31')
+    signals = db.execute_query("SELECT * FROM historical_signals WHERE stock_code = 'SH600036'")
+    assert len(signals) == count
+
+def test_migrate_roundtrip(tmp_path):
+    """测试原始表结构迁移到紧凑表结构再迁移回来，查询结果不变且文件变小"""
+    path = str(tmp_path / "stock_data.db")
+    db = DatabaseHandler({"database_path": path})
+    db.initialize_tables()
+    populate(db)
+    expected = [db.execute_query(query) for query in QUERIES]
+
+    sizes = migrate_schema(db, "compact")
+    assert sizes['size_after'] < sizes['size_before']
+    assert get_object_type(db.conn, 'daily_kline') == 'view'
+    for query, frame in zip(QUERIES, expected):
+        pd.testing.assert_frame_equal(db.execute_query(query), frame)
+
+    # 重新打开数据库时按 user_version 识别紧凑表结构
+    db.close()
+    db = DatabaseHandler({"database_path": path})
+    db.initialize_tables()
+    assert get_object_type(db.conn, 'daily_kline') == 'view'
+
+    migrate_schema(db, "legacy")
+    assert get_schema_version(db.conn) == 0
+    assert get_object_type(db.conn, 'daily_kline') == 'table'
+    assert get_object_type(db.conn, 'stocks') is None
+    for query, frame in zip(QUERIES, expected):
+        pd.testing.assert_frame_equal(db.execute_query(query), frame)
+    db.close()
+    assert os.path.exists(path)
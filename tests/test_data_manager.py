@@ -32,7 +32,7 @@ def test_initialize_database(data_manager):
     tables = data_manager.db.execute_query("SELECT name FROM sqlite_master WHERE type='table'")
     # 排除sqlite_sequence表
     tables = tables[~tables['name'].isin(['sqlite_sequence'])]
-    assert len(tables) == 7
+    assert len(tables) == 17
     assert 'daily_kline' in tables['name'].values
     assert 'weekly_kline' in tables['name'].values
     assert 'monthly_kline' in tables['name'].values
@@ -40,6 +40,10 @@ def test_initialize_database(data_manager):
     assert 'financial_summary' in tables['name'].values
     assert 'historical_signals' in tables['name'].values
     assert 'data_update_log' in tables['name'].values
+    assert 'update_jobs' in tables['name'].values
+    assert 'adjust_factors' in tables['name'].values
+    assert 'trading_calendar' in tables['name'].values
+    assert 'confirmed_gaps' in tables['name'].values
 
 def test_get_stock_daily_kline_from_db(data_manager):
     """测试从数据库获取日K线数据"""
@@ -126,6 +130,35 @@ def test_get_stock_financial_summary_from_akshare(data_manager, mocker):
     assert 'pe_ttm' in df.columns
     assert 'pb_mrq' in df.columns
 
+def test_financial_summary_history_is_append_only(data_manager, mocker):
+    """增量更新只追加新的日期，接口修订的历史值不覆盖已存储的数据，as-of 查询不取未来数据"""
+    data_manager.db.insert_dataframe('financial_summary', pd.DataFrame({
+        'stock_code': 'SH600036', 'date': ['2024-01-02', '2024-01-03'], 'pe_ttm': [6.0, 6.1], 'pb_mrq': [0.9, 0.9],
+        'market_cap': None, 'circulating_market_cap': None
+    }))
+    history = pd.DataFrame({
+        'trade_date': ['2024-01-02', '2024-01-03', '2024-01-04'], 'pe_ttm': [5.0, 5.1, 6.2], 'pb': [0.8, 0.8, 1.0],
+        'total_mv': [1e6, 1e6, 1e6], 'circ_mv': [8e5, 8e5, 8e5]
+    })
+    fetch = mocker.patch.object(data_manager, '_fetch_from_akshare', return_value=history)
+
+    # 不要求增量更新时直接读取数据库
+    assert data_manager.get_stock_financial_summary('SH600036').iloc[0]['date'] == '2024-01-03'
+    fetch.assert_not_called()
+
+    latest = data_manager.get_stock_financial_summary('SH600036', refresh=True)
+    fetch.assert_called_once()
+    assert (latest.iloc[0]['date'], latest.iloc[0]['pe_ttm']) == ('2024-01-04', 6.2)
+    stored = data_manager.db.execute_query("SELECT date, pe_ttm FROM financial_summary ORDER BY date")
+    assert stored.values.tolist() == [['2024-01-02', 6.0], ['2024-01-03', 6.1], ['2024-01-04', 6.2]]
+
+    keys = pd.DataFrame({'stock_code': ['SH600036', 'SH600036', 'SZ000001', 'SH600036'],
+                         'date': ['2024-01-03', '2023-12-29', '2024-01-03', '2024-01-10']})
+    asof = data_manager.get_financial_asof(keys)
+    assert asof['asof_date'].tolist()[::3] == ['2024-01-03', '2024-01-04']
+    assert asof['pe_ttm'].tolist()[::3] == [6.1, 6.2]
+    assert asof['asof_date'].iloc[1:3].isna().all()
+
 def test_get_stock_dividend_data_from_db(data_manager):
     """测试从数据库获取分红数据"""
     # 插入测试数据
@@ -0,0 +1,107 @@
+"""
+测试下推到 SQLite 的 as-of 查询、区间求和、滚动分红和K线聚合
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.asof import TTM_WINDOW_DAYS
+from src.data.db_handler import DatabaseHandler
+from src.strategies.indicators import trailing_dividend_per_share
+
+def make_kline(stock_code, start, periods):
+    """生成测试用的日K线，价格逐日变化"""
+    dates = pd.bdate_range(start=start, periods=periods).strftime('%Y-%m-%d')
+    closes = 10 + np.sin(np.arange(periods))
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes - 0.1, 'high': closes + 0.5,
+        'low': closes - 0.5, 'close': closes, 'volume': np.arange(periods) + 1000,
+        'amount': 10000.0, 'adj_factor': 1.0
+    })
+
+DIVIDENDS = pd.DataFrame({
+    'stock_code': 'SH600036', 'report_date': ['2022-04-01', '2023-04-01', '2023-09-01'],
+    'ex_dividend_date': ['2022-07-04', '2023-07-03', '2023-10-09'],
+    'dividend_per_share_pre_tax': [0.8, 1.0, 0.3], 'dividend_yield': None
+})
+
+@pytest.fixture
+def db(tmp_path):
+    """创建有两只股票日K线和分红数据的文件数据库"""
+    handler = DatabaseHandler({
+        "database_path": str(tmp_path / "stock_data.db"),
+        "partition_dir": str(tmp_path / "partitions"),
+    })
+    handler.initialize_tables()
+    handler.insert_dataframe('daily_kline', make_kline('SH600036', '2022-01-03', 600))
+    handler.insert_dataframe('daily_kline', make_kline('SZ000001', '2022-01-03', 200))
+    handler.insert_dataframe('dividend_data', DIVIDENDS)
+    yield handler
+    handler.close()
+
+def test_query_asof_reads_partitions(db):
+    """每只股票取指定日期当天或之前的最新一行，主库中没有时查已冻结的分区"""
+    result = db.query_asof('daily_kline', ['SZ000001', 'SH600036', 'SH601398'], '2023-06-03', ['close'])
+    daily = db.execute_query("SELECT stock_code, date, close FROM daily_kline WHERE date <= '2023-06-03'")
+    expected = daily.sort_values('date').groupby('stock_code').tail(1).sort_values('stock_code')
+    assert result.values.tolist() == expected.values.tolist()
+    assert result['date'].tolist() == ['2023-06-02', '2022-10-07']
+
+    # SZ000001 只有2022年的K线，冻结后从分区中查到
+    db.partitions.freeze(2023)
+    frozen = db.query_asof('daily_kline', ['SH600036', 'SZ000001'], '2023-06-03', ['close'])
+    assert frozen.values.tolist() == expected.values.tolist()
+    assert db.query_asof('daily_kline', [], '2023-06-03', ['close']).empty
+
+def test_range_sum_matches_trailing_dividends(db):
+    """按 (日期-365天, 日期] 的区间求和与向量化的近一年分红一致"""
+    assert db.range_sum('dividend_data', 'dividend_per_share_pre_tax', 'SH600036', '2022-10-09', '2023-10-09',
+                        date_column='ex_dividend_date') == pytest.approx(1.3)
+
+    dates = pd.Series(['2023-06-30', '2023-07-03', '2023-07-04', '2023-10-09', '2024-03-01'])
+    expected = trailing_dividend_per_share(
+        pd.to_datetime(dates).to_numpy(), pd.to_datetime(DIVIDENDS['ex_dividend_date']).to_numpy(),
+        DIVIDENDS['dividend_per_share_pre_tax'].to_numpy()
+    )
+    sums = [db.range_sum('dividend_data', 'dividend_per_share_pre_tax', 'SH600036',
+                         (pd.Timestamp(date) - pd.Timedelta(days=TTM_WINDOW_DAYS)).strftime('%Y-%m-%d'), date,
+                         date_column='ex_dividend_date') for date in dates]
+    assert np.allclose(sums, expected)
+    # 窗口边界：除息日当天计入，2022-07-04 的分红在满365天的当天移出窗口
+    assert expected.tolist() == pytest.approx([0.8, 1.8, 1.0, 1.3, 1.3])
+
+@pytest.mark.parametrize("period, frequency", [('weekly', 'W'), ('monthly', 'ME')])
+def test_aggregate_kline_matches_resample(db, period, frequency):
+    """周/月K线聚合与 pandas resample 的结果一致，没有K线的周期不返回"""
+    result = db.aggregate_kline('SH600036', period, '2022-03-01', '2023-02-28')
+    daily = db.execute_query("""
+        SELECT * FROM daily_kline WHERE stock_code = 'SH600036' AND date BETWEEN '2022-03-01' AND '2023-02-28'
+    """)
+    daily['date'] = pd.to_datetime(daily['date'])
+    expected = daily.set_index('date').resample(frequency).agg({
+        'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+        'volume': 'sum', 'amount': 'sum', 'adj_factor': 'last'
+    }).dropna(subset=['open']).reset_index()
+    assert result['date'].tolist() == expected['date'].dt.strftime('%Y-%m-%d').tolist()
+    for column in ['open', 'high', 'low', 'close', 'volume', 'amount', 'adj_factor']:
+        assert np.allclose(result[column], expected[column]), column
+    with pytest.raises(ValueError):
+        db.aggregate_kline('SH600036', 'daily', '2022-03-01', '2023-02-28')
+
+def test_join_asof_keeps_key_order(db, monkeypatch):
+    """as-of 关联与逐个 query_asof 的结果一致，分批查询保持查询键的顺序"""
+    monkeypatch.setattr('src.data.db_handler.ASOF_CHUNK_SIZE', 2)
+    keys = pd.DataFrame({'stock_code': ['SH600036', 'SH600036', 'SH601398', 'SH600036', 'SH600036'],
+                         'date': ['2023-10-09', '2022-07-03', '2023-10-09', '2023-07-03 00:00:00', '2023-12-31']})
+    result = db.join_asof('dividend_data', keys, ['dividend_per_share_pre_tax'], date_column='ex_dividend_date')
+    assert result['date'].tolist() == ['2023-10-09', '2022-07-03', '2023-10-09', '2023-07-03', '2023-12-31']
+    assert result['asof_date'].tolist()[3:] == ['2023-07-03', '2023-10-09']
+    for row in result.itertuples():
+        expected = db.query_asof('dividend_data', [row.stock_code], row.date, ['dividend_per_share_pre_tax'],
+                                 date_column='ex_dividend_date')
+        if expected.empty:
+            assert pd.isna(row.asof_date) and pd.isna(row.dividend_per_share_pre_tax)
+        else:
+            assert row.dividend_per_share_pre_tax == expected['dividend_per_share_pre_tax'].iloc[0]
+    assert db.join_asof('dividend_data', keys.head(0), ['dividend_per_share_pre_tax']).empty
+    with pytest.raises(ValueError):
+        db.join_asof('daily_kline', keys, ['close'])
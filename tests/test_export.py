@@ -0,0 +1,109 @@
+"""
+测试快照导出和增量发布
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.export.snapshots import SnapshotExporter, decode_snapshot, safety_score
+from src.strategies.strategy_engine import StrategyEngine
+
+DATE = '2023-06-30'
+
+def make_kline(stock_code, periods=200):
+    """生成测试用的日K线"""
+    dates = pd.bdate_range(end=DATE, periods=periods).strftime('%Y-%m-%d')
+    closes = 10 + np.sin(np.arange(periods) / 7)
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes + 0.1,
+        'low': closes - 0.1, 'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+@pytest.fixture
+def exporter(tmp_path):
+    """创建有两只股票数据的导出器"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    for stock_code in ['SH600036', 'SZ000001']:
+        db.insert_dataframe('daily_kline', make_kline(stock_code))
+        db.insert_dataframe('dividend_data', pd.DataFrame({
+            'stock_code': [stock_code], 'report_date': ['2023-04-01'], 'ex_dividend_date': ['2023-05-10'],
+            'dividend_per_share_pre_tax': [0.5], 'dividend_yield': [None]
+        }))
+        db.insert_dataframe('financial_summary', pd.DataFrame({
+            'stock_code': stock_code, 'date': ['2022-12-31', '2023-03-31', '2023-06-30'],
+            'pe_ttm': [8.0, 6.0, 7.0], 'pb_mrq': [1.0, 0.9, 0.8],
+            'market_cap': None, 'circulating_market_cap': None
+        }))
+    return SnapshotExporter(StrategyEngine(DataManager(db)), {"output_dir": str(tmp_path / "export")})
+
+def test_safety_score():
+    """测试安全分：估值处于历史低位、股息率处于历史高位时得分高"""
+    financials = pd.DataFrame({'pe_ttm': [10.0, 8.0, 6.0], 'pb_mrq': [1.2, 1.0, None]})
+    result = safety_score(financials, pd.Series([3.0, 4.0, 5.0]), {
+        "pe_percentile": 0.4, "pb_percentile": 0.4, "dividend_yield_percentile": 0.2
+    })
+    assert result["pe_percentile"] == pytest.approx(1 / 3)
+    assert result["pb_percentile"] == pytest.approx(1 / 2)
+    assert result["dividend_yield_percentile"] == 1.0
+    assert result["score"] == pytest.approx((0.4 * 2 / 3 + 0.4 * 0.5 + 0.2 * 1.0) * 100)
+    assert safety_score(pd.DataFrame(), pd.Series(dtype=float), {})["score"] is None
+
+def test_export_publishes_only_changed_files(exporter):
+    """测试快照内容不变时不重写文件，数据变化时只发布变化的文件"""
+    pools = {"default_pool": ["SH600036", "SZ000001"], "banks": ["SH600036"]}
+    first = exporter.export(pools, DATE)
+    assert first["version"] == 1
+    assert sorted(first["changed"]) == sorted([
+        "stocks/SH600036.json.gz", "stocks/SZ000001.json.gz", "pools/default_pool.json.gz", "pools/banks.json.gz"
+    ])
+    with open(os.path.join(exporter.output_dir, "stocks/SH600036.json.gz"), "rb") as f:
+        snapshot = decode_snapshot(f.read())
+    assert snapshot["date"] == DATE
+    assert len(snapshot["bars"]["close"]) == 60
+    assert snapshot["dividend"]["dynamic_dividend_yield"] > 0
+    assert 0 <= snapshot["safety"]["score"] <= 100
+
+    # 没有变化时版本号不变
+    assert exporter.export(pools, DATE) == {"version": 1, "changed": [], "unchanged": 4, "removed": []}
+
+    # 新增一条信号只影响该股票和包含它的股票池
+    exporter.db.insert_dataframe('historical_signals', pd.DataFrame({
+        'stock_code': ['SZ000001'], 'date': [DATE], 'strategy_name': ['strategy_1a_daily_bollinger_dividend'],
+        'signal_type': ['buy'], 'price': [10.0], 'description': ['测试']
+    }))
+    third = exporter.export(pools, DATE)
+    assert third["version"] == 2
+    assert sorted(third["changed"]) == ["pools/default_pool.json.gz", "stocks/SZ000001.json.gz"]
+
+    # 股票池移除股票后删除对应文件
+    fourth = exporter.export({"banks": ["SH600036"]}, DATE)
+    assert sorted(fourth["removed"]) == ["pools/default_pool.json.gz", "stocks/SZ000001.json.gz"]
+    assert not os.path.exists(os.path.join(exporter.output_dir, "stocks/SZ000001.json.gz"))
+    with open(os.path.join(exporter.output_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["version"] == 3
+    assert manifest["files"]["stocks/SH600036.json.gz"]["version"] == 1
+
+def test_export_rebuilds_only_dirty_stocks(exporter, mocker):
+    """测试按变更日志只重新生成数据有变化的股票，日期变化时全部重新生成"""
+    pools = {"default_pool": ["SH600036", "SZ000001"]}
+    exporter.export(pools, DATE)
+    build = mocker.spy(exporter, 'build_stock_snapshot')
+    exporter.export(pools, DATE)
+    assert build.call_count == 0
+
+    exporter.db.insert_dataframe('financial_summary', pd.DataFrame({
+        'stock_code': ['SZ000001'], 'date': ['2023-06-29'], 'pe_ttm': [5.0], 'pb_mrq': [0.7],
+        'market_cap': [None], 'circulating_market_cap': [None]
+    }))
+    result = exporter.export(pools, DATE)
+    assert [call.args[0] for call in build.call_args_list] == ['SZ000001']
+    assert "stocks/SZ000001.json.gz" in result["changed"]
+
+    build.reset_mock()
+    exporter.export(pools, '2023-07-03')
+    assert build.call_count == 2
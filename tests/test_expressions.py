@@ -0,0 +1,87 @@
+"""
+测试策略表达式的编译、公共子表达式复用和配置定义的策略
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.kline_series import KlineSeries
+from src.strategies import expressions
+from src.strategies.expressions import ExpressionStrategy, compile_expression
+from src.strategies.strategy_engine import evaluate_signals, get_strategy_evaluators
+
+def make_series(closes, start='2023-01-02'):
+    """根据收盘价序列生成日K线序列"""
+    dates = pd.bdate_range(start=start, periods=len(closes)).strftime('%Y-%m-%d')
+    return KlineSeries.from_frame(pd.DataFrame({
+        'date': dates, 'open': closes, 'high': closes, 'low': closes, 'close': closes,
+        'volume': np.arange(len(closes)) + 1000, 'amount': 10000.0,
+    }), 'SH600036')
+
+def test_compile_substitutes_params_and_shares_nodes():
+    """参数替换为常量，常量子表达式折叠，相同的子表达式得到相等的节点"""
+    params = {'period': 20, 'std': 2.0, 'tolerance': 1.0}
+    left = compile_expression("close <= boll_lower(period, std) * (1 + tolerance / 100)", params)
+    right = compile_expression("boll_lower(20, 2.0)")
+    assert left == ('op', '<=', ('series', 'close'), ('op', '*', right, ('const', 1.01)))
+    # 省略的参数使用默认值
+    assert compile_expression("boll_lower()") == right
+
+    with pytest.raises(ValueError, match="未知的名称"):
+        compile_expression("close > missing")
+    with pytest.raises(ValueError, match="未知的函数"):
+        compile_expression("unknown(close)")
+    with pytest.raises(ValueError, match="必须是常数"):
+        compile_expression("sma(close, volume)")
+    with pytest.raises(ValueError, match="不支持"):
+        compile_expression("close.__class__")
+
+def test_shared_indicators_computed_once(mocker):
+    """同一周期的策略共用布林带，每个唯一的 (指标, 参数) 只计算一次"""
+    spy = mocker.spy(expressions, 'bollinger_bands')
+    closes = 10 + 0.1 * np.sin(np.arange(300))
+    dividends = pd.DataFrame({'ex_dividend_date': ['2023-06-01'], 'dividend_per_share_pre_tax': [0.5]})
+    evaluate_signals('SH600036', make_series(closes), dividends,
+                     ['strategy_1a_daily_bollinger_dividend', 'strategy_2a_daily_macd_bollinger_breakthrough'],
+                     get_strategy_evaluators(), {}, '2023-06-01', '2024-01-31')
+    assert spy.call_count == 1
+
+    # 周线是另一个周期，参数不同的布林带也单独计算
+    spy.reset_mock()
+    evaluate_signals('SH600036', make_series(closes), dividends,
+                     ['strategy_1a_daily_bollinger_dividend', 'strategy_1b_weekly_bollinger_dividend',
+                      'strategy_2a_daily_macd_bollinger_breakthrough'],
+                     get_strategy_evaluators(),
+                     {'strategy_2a_daily_macd_bollinger_breakthrough': {'bollinger_period': 10}},
+                     '2023-06-01', '2024-01-31')
+    assert spy.call_count == 3
+
+def test_config_defined_strategy():
+    """配置中用条件定义的策略被注册并按模板生成描述，无效的定义被忽略"""
+    config = {
+        'strategy_ma_cross': {
+            'enabled': True,
+            'fast': 5,
+            'slow': 20,
+            'conditions': ["cross_above(sma(close, fast), sma(close, slow))", "volume > 0"],
+            'values': {'gap': "sma(close, fast) - sma(close, slow)"},
+            'description': "均线金叉(差值{gap})",
+        },
+        'strategy_broken': {'enabled': True, 'conditions': ["close >"]},
+        'strategy_1a_daily_bollinger_dividend': {'enabled': True, 'conditions': ["close > 0"]},
+    }
+    evaluators = get_strategy_evaluators(config)
+    assert 'strategy_broken' not in evaluators
+    assert evaluators['strategy_1a_daily_bollinger_dividend'][1].__name__ == 'evaluate_bollinger_dividend'
+    period, evaluator = evaluators['strategy_ma_cross']
+    assert period == 'daily' and isinstance(evaluator, ExpressionStrategy)
+
+    closes = np.concatenate([np.linspace(12, 10, 30), np.linspace(10, 13, 30)])
+    signals = evaluate_signals('SH600036', make_series(closes), pd.DataFrame(), ['strategy_ma_cross'],
+                               evaluators, config, '2023-01-02', '2023-12-31')
+    assert len(signals) == 1
+    assert signals.iloc[0]['description'].startswith("均线金叉(差值")
+
+    with pytest.raises(ValueError, match="未定义的值"):
+        ExpressionStrategy('bad', ["close > 0"], description="{missing}")
+    with pytest.raises(ValueError, match="K线周期"):
+        ExpressionStrategy.from_config('bad', {'conditions': "close > 0", 'period': 'monthly'})
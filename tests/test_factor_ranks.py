@@ -0,0 +1,90 @@
+"""
+测试每日横截面因子排名
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.db_handler import DatabaseHandler
+from src.data.factor_ranks import MARKET_UNIVERSE, grouped_percentile_rank
+
+DATES = ['2024-06-26', '2024-06-27', '2024-06-28']
+
+def make_kline(stock_code, dates, closes):
+    """生成指定日期和收盘价的日K线"""
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes, 'low': closes,
+        'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+@pytest.fixture
+def db():
+    """创建有三只股票K线、分红和财务数据的数据库"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    db.insert_dataframe('daily_kline', pd.concat([
+        make_kline('SH600036', DATES, [10.0, 10.0, 20.0]),
+        make_kline('SH601398', DATES, [5.0, 5.0, 5.0]),
+        make_kline('SZ000001', DATES[1:], [8.0, 8.0]),
+    ]))
+    db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036', 'SH600036', 'SH601398'],
+        'report_date': ['2023-04-01', '2024-04-01', '2024-04-01'],
+        'ex_dividend_date': ['2023-06-28', '2024-06-27', '2024-06-20'],
+        'dividend_per_share_pre_tax': [0.3, 0.5, 0.25], 'dividend_yield': None
+    }))
+    db.insert_dataframe('financial_summary', pd.DataFrame({
+        'stock_code': ['SH600036', 'SH600036', 'SH601398', 'SZ000001'],
+        'date': ['2024-03-31', '2024-06-27', '2023-12-31', '2024-06-28'],
+        'pe_ttm': [6.0, 7.0, 5.0, -3.0], 'pb_mrq': [0.9, 1.0, 0.6, 0.8],
+        'market_cap': None, 'circulating_market_cap': None
+    }))
+    yield db
+    db.close()
+
+def test_grouped_percentile_rank_matches_pandas():
+    """分组百分位与 pandas 的 groupby rank(pct=True) 一致，包括并列值和 NaN"""
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 5, 300)
+    values = rng.integers(0, 10, 300).astype(float)
+    values[rng.random(300) < 0.2] = np.nan
+    expected = pd.Series(values).groupby(groups).rank(pct=True).to_numpy()
+    assert np.allclose(grouped_percentile_rank(groups, values), expected, equal_nan=True)
+    assert np.isnan(grouped_percentile_rank(groups[:3], [np.nan] * 3)).all()
+
+def test_panel_matches_latest_snapshot(db):
+    """面板的近一年分红股息率和 as-of 财务数据与最新快照一致，非正的PE不参与排名"""
+    panel = db.factor_ranks.build_panel(DATES[0], DATES[-1])
+    latest = panel[panel['date'] == DATES[-1]].set_index('stock_code')
+    snapshot = db.latest_snapshot.query().set_index('stock_code')
+    assert np.allclose(latest['dividend_yield'], snapshot['dividend_yield'])
+    assert latest.loc['SH600036', 'pe_ttm'] == 7.0 and latest.loc['SH601398', 'pb_mrq'] == 0.6
+    assert np.isnan(latest.loc['SZ000001', 'pe_ttm'])
+
+    # 2024-06-26 时 2023-06-28 的分红仍在窗口内，2024-06-27 的财务数据尚未发布
+    first = panel[panel['date'] == DATES[0]].set_index('stock_code')
+    assert first.loc['SH600036', 'dividend_yield'] == pytest.approx(3.0)
+    assert first.loc['SH600036', 'pe_ttm'] == 6.0
+    assert 'SZ000001' not in first.index
+
+def test_update_ranks_newest_date_per_universe(db):
+    """首次更新只计算最新日期，之后从已存储的最新日期增量更新，股票池只在池内排名"""
+    written = db.factor_ranks.update({MARKET_UNIVERSE: None, 'bank': ['SH600036', 'SH601398']})
+    assert written == {MARKET_UNIVERSE: 3, 'bank': 2}
+
+    market = db.factor_ranks.query()
+    assert market['date'].unique().tolist() == [DATES[-1]]
+    # 股息率 SH600036 2.5%，SH601398 5%，SZ000001 0%
+    assert market['dividend_yield_pct'].tolist() == pytest.approx([2 / 3, 1.0, 1 / 3])
+    assert market['pe_ttm_pct'].tolist()[:2] == pytest.approx([1.0, 0.5])
+    assert pd.isna(market['pe_ttm_pct'].iloc[2])
+    bank = db.factor_ranks.query('bank', stock_codes=['SH601398'])
+    assert bank[['stock_code', 'dividend_yield_pct', 'pb_mrq_pct']].values.tolist() == [['SH601398', 1.0, 0.5]]
+
+    # 新的交易日只重算已存储的最新日期和之后的日期
+    db.insert_dataframe('daily_kline', make_kline('SH600036', ['2024-07-01'], [10.0]))
+    assert db.factor_ranks.update({MARKET_UNIVERSE: None}) == {MARKET_UNIVERSE: 4}
+    assert db.factor_ranks.query(date='2024-07-01')['stock_code'].tolist() == ['SH600036']
+
+    # 指定区间重算历史排名
+    assert db.factor_ranks.compute({MARKET_UNIVERSE: None}, DATES[0], DATES[1]) == {MARKET_UNIVERSE: 5}
+    assert db.factor_ranks.query(date=DATES[0])['dividend_yield_pct'].tolist() == pytest.approx([0.5, 1.0])
@@ -0,0 +1,132 @@
+"""
+测试空结果缓存和并发请求合并
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.data.fetch_cache import SingleFlight
+
+@pytest.fixture
+def data_manager():
+    """创建测试用的数据管理器"""
+    db = DatabaseHandler({"database_path": ":memory:", "negative_cache_ttl_hours": {"dividend": 24}})
+    db.initialize_tables()
+    yield DataManager(db)
+    db.close()
+
+def test_empty_dividend_result_cached(data_manager, mocker):
+    """没有分红的股票在有效期内不再请求，计算股息率也不触发请求"""
+    mock_fetch = mocker.patch('akshare.stock_history_dividend_detail', return_value=pd.DataFrame())
+    assert data_manager.get_stock_dividend_data('SH600036').empty
+    assert data_manager.get_stock_dividend_data('SH600036').empty
+    assert data_manager.calculate_dynamic_dividend_yield('SH600036', 10.0, '2024-06-30') == 0.0
+    assert mock_fetch.call_count == 1
+
+    cache = data_manager.negative_cache
+    assert cache.is_fresh('dividend', 'SH600036')
+    assert not cache.is_fresh('dividend', 'SH600036', now=datetime.now() + timedelta(hours=25))
+    # 未配置有效期的数据类型不缓存
+    cache.record('financial', 'SH600036')
+    assert not cache.is_fresh('financial', 'SH600036')
+
+    assert cache.clear('dividend') == 1
+    data_manager.get_stock_dividend_data('SH600036')
+    assert mock_fetch.call_count == 2
+
+def test_fetch_errors_not_cached(data_manager, mocker):
+    """请求失败不记录为空结果"""
+    data_manager.retry.max_attempts = 1
+    mock_fetch = mocker.patch('akshare.stock_history_dividend_detail', side_effect=RuntimeError("超时"))
+    data_manager.get_stock_dividend_data('SH600036')
+    data_manager.get_stock_dividend_data('SH600036')
+    assert mock_fetch.call_count == 2
+    assert not data_manager.negative_cache.is_fresh('dividend', 'SH600036')
+
+def test_single_flight_coalesces_concurrent_calls():
+    """相同键的并发请求只执行一次，所有调用方得到同一结果"""
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch(symbol):
+        calls.append(symbol)
+        release.wait(5)
+        return symbol.upper()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(('hist', 'sh600036'), fetch, 'sh600036')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['sh600036']
+    assert [result for result, _ in results] == ['SH600036'] * 5
+    assert all(shared for _, shared in results)
+    # 请求结束后同一键再次执行
+    assert flight.do(('hist', 'sh600036'), fetch, 'sh600036') == ('SH600036', False)
+    assert len(calls) == 2
+
+def test_single_flight_shares_errors():
+    """进行中的请求失败时，等待的调用方得到同一个异常"""
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("连接被重置")
+
+    errors = []
+
+    def follower():
+        started.wait(5)
+        try:
+            flight.do('spot', failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(RuntimeError):
+        flight.do('spot', failing)
+    thread.join()
+    assert len(errors) == 1
+
+def test_data_managers_share_single_flight(tmp_path, mocker):
+    """共用 SingleFlight 的两个数据管理器（如常驻服务的请求和更新连接）同时获取相同数据时只请求一次"""
+    config = {"database_path": str(tmp_path / "stock_data.db")}
+    managers = []
+    for _ in range(2):
+        db = DatabaseHandler(config)
+        db.initialize_tables()
+        managers.append(DataManager(db))
+    managers[1].single_flight = managers[0].single_flight
+    release = threading.Event()
+
+    def fetch(symbol):
+        release.wait(5)
+        return pd.DataFrame({'公告日期': ['2024-04-01'], '除权除息日': ['2024-06-10'], '每股股利(税前)': [0.5]})
+
+    mock_fetch = mocker.patch('akshare.stock_history_dividend_detail', side_effect=fetch)
+    results = []
+    threads = [threading.Thread(target=lambda dm=dm: results.append(
+        dm._fetch_from_akshare('stock_history_dividend_detail', symbol='600036'))) for dm in managers]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert mock_fetch.call_count == 1
+    assert len(results) == 2 and results[0] is not results[1]
+    for dm in managers:
+        dm.db.close()
@@ -0,0 +1,73 @@
+"""
+测试进程隔离的数据获取
+"""
+import datetime
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.fetch_pool import FetchTimeoutError, ProcessFetchPool, decode_frame, encode_frame
+
+# 以下函数在 worker 进程中通过模块名调用
+
+def quote(symbol):
+    """返回一行行情"""
+    return pd.DataFrame({'代码': [symbol], '最新价': [10.5], '成交量': [1000]})
+
+def hang(seconds):
+    """模拟卡住的调用"""
+    time.sleep(seconds)
+    return pd.DataFrame()
+
+def broken():
+    """模拟解析失败"""
+    raise KeyError('日期')
+
+@pytest.fixture
+def pool():
+    """使用本测试模块作为数据源的进程池"""
+    pool = ProcessFetchPool(processes=1, call_timeout=1.0, module_name='tests.test_fetch_pool')
+    yield pool
+    pool.close()
+
+def test_frame_buffers_roundtrip():
+    """数值、日期、字符串和空值按缓冲区编码后还原"""
+    df = pd.DataFrame({
+        '日期': [datetime.date(2024, 1, 2), datetime.date(2024, 1, 3), None],
+        '名称': ['招商银行', None, 'ST股票'],
+        '收盘': [10.0, np.nan, 11.5],
+        '成交量': np.array([1, 2, 3], dtype=np.int64),
+        '每股股利': [0.5, 1, None],
+    })
+    header, buffers = encode_frame(df)
+    assert all(isinstance(buffer, bytes) for buffer in buffers)
+    restored = decode_frame(header, buffers)
+    assert restored['名称'].isna().tolist() == [False, True, False]
+    assert restored['名称'].dropna().tolist() == ['招商银行', 'ST股票']
+    assert restored['成交量'].tolist() == [1, 2, 3]
+    assert np.allclose(restored['收盘'], df['收盘'], equal_nan=True)
+    assert pd.to_datetime(restored['日期']).dt.strftime('%Y-%m-%d').tolist()[:2] == ['2024-01-02', '2024-01-03']
+    assert restored['每股股利'].tolist()[:2] == [0.5, 1.0]
+
+def test_hung_call_killed_and_worker_replaced(pool):
+    """超时的调用终止 worker 进程，之后的调用由新进程执行"""
+    assert pool.call('quote', '600036')['代码'].tolist() == ['600036']
+    first_pid = pool._workers[0].process.pid
+
+    started = time.monotonic()
+    with pytest.raises(FetchTimeoutError):
+        pool.call('hang', 30)
+    assert time.monotonic() - started < 5
+    assert pool._workers == []
+
+    assert pool.call('quote', '000001')['最新价'].tolist() == [10.5]
+    assert pool._workers[0].process.pid != first_pid
+
+def test_remote_error_keeps_worker(pool):
+    """调用抛出异常时返回错误，worker 进程继续使用"""
+    pool.call('quote', '600036')
+    pid = pool._workers[0].process.pid
+    with pytest.raises(Exception, match="KeyError"):
+        pool.call('broken')
+    pool.call('quote', '600036')
+    assert pool._workers[0].process.pid == pid
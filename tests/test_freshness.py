@@ -0,0 +1,159 @@
+"""
+测试按数据类型的新鲜度策略
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.data.freshness import FreshnessPolicy, in_season
+from src.data.update_jobs import UpdateJobRunner
+
+TYPES = ['kline', 'financial', 'dividend']
+
+@pytest.fixture
+def db():
+    """创建测试用的数据库"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    yield db
+    db.close()
+
+def due_types(policy, now, stock_code='SH600036', data_types=TYPES):
+    """返回到期的数据类型"""
+    return [data_type for _, data_type in policy.due_units([stock_code], data_types, now)]
+
+def record(policy, now, data_types=TYPES, stock_code='SH600036'):
+    """记录一次没有带来变化的成功请求"""
+    version = policy.db.journal.current_version()
+    policy.record_results(stock_code, {data_type: True for data_type in data_types}, version, now)
+
+def test_in_season_handles_year_wrap():
+    """报告季窗口包含两端，开始晚于结束时跨年"""
+    seasons = [["03-15", "04-30"], ["12-20", "01-10"]]
+    assert in_season(datetime(2024, 4, 30), seasons)
+    assert not in_season(datetime(2024, 5, 1), seasons)
+    assert in_season(datetime(2024, 1, 5), seasons) and in_season(datetime(2024, 12, 31), seasons)
+
+def test_policies_skip_fetches_without_new_data(db):
+    """没有请求记录时全部到期；非交易日不请求K线，分红在季内按较短间隔请求，财务在季外按周请求"""
+    policy = FreshnessPolicy(db)
+    friday = datetime(2024, 6, 14, 16, 0)
+    assert due_types(policy, friday) == TYPES
+    record(policy, friday)
+
+    assert due_types(policy, datetime(2024, 6, 15, 10, 0)) == []
+    # 周一收盘后有新的交易日；6月处于分红季，72小时后重新请求分红；6月不在报告季，财务每周请求
+    assert due_types(policy, datetime(2024, 6, 17, 16, 0)) == ['kline', 'dividend']
+    assert due_types(policy, datetime(2024, 6, 21, 16, 0)) == ['kline', 'financial', 'dividend']
+    # 未配置策略的数据类型（如插件）总是请求
+    assert due_types(policy, datetime(2024, 6, 15, 10, 0), data_types=['plugin_type']) == ['plugin_type']
+    # 关闭策略后全部请求
+    assert due_types(FreshnessPolicy(db, {"enabled": False}), datetime(2024, 6, 15, 10, 0)) == TYPES
+
+def test_trading_calendar_and_idle_backoff(db):
+    """按交易日历跳过节假日，长时间没有变化的K线（停牌）放宽请求间隔，配置覆盖默认策略"""
+    db.conn.executemany("INSERT INTO trading_calendar (date) VALUES (?)",
+                        [(day,) for day in ['2024-06-06', '2024-06-07', '2024-06-11', '2024-06-12', '2024-06-13']])
+    db.conn.commit()
+    policy = FreshnessPolicy(db, {"kline": {"idle_days": 3}})
+    record(policy, datetime(2024, 6, 7, 16, 0), ['kline'])
+    # 2024-06-10 端午节休市
+    assert due_types(policy, datetime(2024, 6, 10, 16, 0), data_types=['kline']) == []
+    assert due_types(policy, datetime(2024, 6, 11, 16, 0), data_types=['kline']) == ['kline']
+
+    # K线三天没有变化后，72小时内不再请求
+    record(policy, datetime(2024, 6, 11, 16, 0), ['kline'])
+    assert due_types(policy, datetime(2024, 6, 12, 16, 0), data_types=['kline']) == []
+    assert due_types(policy, datetime(2024, 6, 14, 16, 0), data_types=['kline']) == ['kline']
+
+    # 请求写入了新数据时更新 changed_at，恢复每个交易日请求
+    version = db.journal.current_version()
+    db.insert_dataframe('daily_kline', pd.DataFrame({
+        'stock_code': ['SH600036'], 'date': ['2024-06-12'], 'open': [10.0], 'high': [10.0], 'low': [10.0],
+        'close': [10.0], 'volume': [1000], 'amount': [10000.0], 'adj_factor': [None]
+    }))
+    policy.record_results('SH600036', {'kline': True, 'financial': False}, version, datetime(2024, 6, 12, 16, 0))
+    assert due_types(policy, datetime(2024, 6, 13, 16, 0), data_types=['kline', 'financial']) == ['kline', 'financial']
+
+def test_adjust_factors_due_after_ex_dividend(db):
+    """复权因子在经过已知的除权除息日后立即重新获取，否则按月请求"""
+    policy = FreshnessPolicy(db)
+    record(policy, datetime(2024, 6, 1, 16, 0), ['adjust_factors'])
+    assert due_types(policy, datetime(2024, 6, 12, 16, 0), data_types=['adjust_factors']) == []
+    db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036'], 'report_date': ['2024-04-01'], 'ex_dividend_date': ['2024-06-10'],
+        'dividend_per_share_pre_tax': [0.5], 'dividend_yield': [None]
+    }))
+    assert due_types(policy, datetime(2024, 6, 9, 16, 0), data_types=['adjust_factors']) == []
+    assert due_types(policy, datetime(2024, 6, 12, 16, 0), data_types=['adjust_factors']) == ['adjust_factors']
+
+def mock_sources(mocker):
+    """模拟各数据类型的 akshare 接口，返回最近一天的数据"""
+    day = datetime.now().strftime('%Y-%m-%d')
+    return {
+        'kline': mocker.patch('akshare.stock_zh_a_hist', return_value=pd.DataFrame({
+            '日期': [day], '开盘': 10.0, '收盘': 10.0, '最高': 10.0, '最低': 10.0, '成交量': 1000, '成交额': 10000.0
+        })),
+        'adjust_factors': mocker.patch('akshare.stock_zh_a_daily', return_value=pd.DataFrame()),
+        'financial': mocker.patch('akshare.stock_a_indicator_lg', create=True, return_value=pd.DataFrame({
+            'trade_date': [day], 'pe_ttm': [10.0], 'pb': [1.5], 'total_mv': [1e6], 'circ_mv': [8e5]
+        })),
+        'dividend': mocker.patch('akshare.stock_history_dividend_detail', return_value=pd.DataFrame({
+            '公告日期': ['2024-04-01'], '除权除息日': ['2024-06-10'], '每股股利(税前)': [0.5]
+        })),
+    }
+
+def fetch_state(db, data_type, stock_code='SH600036'):
+    """返回 (最近请求时间, 最近变化时间)，没有记录时为 None"""
+    return db.conn.execute("SELECT checked_at, changed_at FROM fetch_state WHERE stock_code = ? AND data_type = ?",
+                           (stock_code, data_type)).fetchone()
+
+def test_runner_skips_units_that_are_not_due(db, mocker):
+    """再次更新时跳过刚请求过的单元，force 时全部请求"""
+    sources = mock_sources(mocker)
+    runner = UpdateJobRunner(DataManager(db))
+    first = runner.run(['SH600036', 'SZ000001'], TYPES)
+    assert (first['done'], first['skipped']) == (6, 0)
+
+    second = runner.run(['SH600036', 'SZ000001'], TYPES)
+    assert (second['done'], second['skipped']) == (0, 6)
+    assert sources['dividend'].call_count == 2
+
+    forced = runner.run(['SH600036', 'SZ000001'], ['dividend'], force=True)
+    assert (forced['done'], forced['skipped']) == (2, 0)
+    assert sources['dividend'].call_count == 4
+
+def test_due_dividend_unit_fetches_despite_stored_rows(db, mocker):
+    """数据库中已有分红时，到期的分红单元仍请求数据源并写入新的分红；没有变化时不更新变化时间"""
+    sources = mock_sources(mocker)
+    dm = DataManager(db)
+    db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036'], 'report_date': ['2023-04-01'], 'ex_dividend_date': ['2023-06-10'],
+        'dividend_per_share_pre_tax': [0.4], 'dividend_yield': [0.004]
+    }))
+    assert dm.update_single_stock_data('SH600036', ['dividend']) == {'dividend': True}
+    assert sources['dividend'].call_count == 1
+    dividends = dm.get_stock_dividend_data('SH600036')
+    assert dividends['ex_dividend_date'].tolist() == ['2024-06-10', '2023-06-10']
+    fetched_at, changed_at = fetch_state(db, 'dividend')
+
+    # 数据源返回的分红没有变化：不写入数据库，只更新请求时间
+    db.conn.execute("UPDATE fetch_state SET checked_at = '2000-01-01 00:00:00', changed_at = '2000-01-01 00:00:00'")
+    version = db.journal.current_version()
+    dm.update_single_stock_data('SH600036', ['dividend'])
+    assert sources['dividend'].call_count == 2
+    assert db.journal.current_version() == version
+    assert fetch_state(db, 'dividend')[1] == '2000-01-01 00:00:00'
+    assert fetch_state(db, 'dividend')[0] > '2000-01-01 00:00:00'
+
+def test_update_without_fetch_is_not_recorded(db, mocker):
+    """只读取了数据库、没有请求数据源的更新不记录请求状态，下次更新仍然到期"""
+    sources = mock_sources(mocker)
+    dm = DataManager(db)
+    dm.negative_cache.record('dividend', 'SH600036')
+    assert dm.update_single_stock_data('SH600036', ['dividend']) == {'dividend': True}
+    assert sources['dividend'].call_count == 0
+    assert fetch_state(db, 'dividend') is None
+    assert due_types(dm.freshness, datetime.now(), data_types=['dividend']) == ['dividend']
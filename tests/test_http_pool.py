@@ -0,0 +1,82 @@
+"""
+测试akshare请求使用的HTTP连接池
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from src.data.http_pool import HttpSessionPool, get_session_pool, install_session_pool, uninstall_session_pool
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """记录连接数和请求路径的 HTTP/1.1 处理器"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if "slow" in self.path:
+            time.sleep(0.5)
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def servers():
+    """启动两个本地HTTP服务器，前后都恢复 requests 的默认行为"""
+    uninstall_session_pool()
+    started = []
+    for _ in range(2):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+        server.daemon_threads = True
+        server.connections, server.paths, server.lock = 0, [], threading.Lock()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(server)
+    yield started
+    uninstall_session_pool()
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+def url(server, path="/"):
+    """服务器的请求地址"""
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+def test_requests_reuse_pooled_connection(servers):
+    """安装连接池后 requests.get 复用同一个连接"""
+    server = servers[0]
+    for _ in range(5):
+        assert requests.get(url(server)).text == "ok"
+    assert server.connections == 5
+
+    install_session_pool({"http_pool_size": 2})
+    for _ in range(5):
+        assert requests.get(url(server)).text == "ok"
+    assert server.connections == 6
+    # 配置不变时复用已安装的连接池
+    pool = get_session_pool()
+    assert install_session_pool({"http_pool_size": 2}) is pool
+
+def test_proxies_rotate(servers):
+    """配置多个代理时按请求轮换"""
+    install_session_pool({"proxies": [url(servers[0]), {"http": url(servers[1])}]})
+    for _ in range(4):
+        requests.get("http://data.example.invalid/quote")
+    assert servers[0].paths == servers[1].paths == ["http://data.example.invalid/quote"] * 2
+
+def test_default_timeout_applied(servers):
+    """调用方没有指定超时时使用配置的读取超时"""
+    pool = HttpSessionPool(read_timeout=0.1)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        pool.request("get", url(servers[0], "/slow"), timeout=None)
+    assert pool.request("get", url(servers[0], "/slow"), timeout=2).text == "ok"
+    pool.close()
@@ -0,0 +1,117 @@
+"""
+测试盘中扫描的触发价计算和按行情快照重新评估
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.strategies.intraday import (IntradayScanner, bollinger_dividend_trigger_price,
+                                     macd_cross_trigger_price)
+from src.strategies.strategy_engine import (StrategyEngine, evaluate_bollinger_dividend,
+                                            evaluate_macd_bollinger_breakthrough)
+
+PARAMS_1A = {
+    "enabled": True,
+    "bollinger_period": 20,
+    "bollinger_std_dev": 2.0,
+    "bollinger_flat_check_days": 20,
+    "bollinger_flat_threshold_percentage": 5.0,
+    "lower_band_tolerance_percentage": 0.0,
+    "min_dynamic_dividend_yield": 3.0
+}
+
+TODAY = '2023-05-01'
+
+def make_daily(closes):
+    """生成截至前一交易日的日K线"""
+    dates = pd.bdate_range(end='2023-04-28', periods=len(closes)).strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'stock_code': 'SH600036', 'date': dates, 'open': closes, 'high': closes, 'low': closes,
+        'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None, 'raw_close': closes
+    })
+
+def with_bar(daily, price):
+    """追加当日K线"""
+    bar = daily.iloc[[-1]].assign(date=TODAY, open=price, high=price, low=price, close=price, raw_close=price)
+    return pd.concat([daily, bar], ignore_index=True)
+
+@pytest.fixture
+def flat_daily():
+    """窄幅横盘的日K线"""
+    return make_daily(10 + 0.05 * np.sin(np.arange(80)))
+
+@pytest.fixture
+def dividends():
+    """近一年每股分红0.5元"""
+    return pd.DataFrame({'ex_dividend_date': ['2022-07-01'], 'dividend_per_share_pre_tax': [0.5]})
+
+def test_bollinger_trigger_price_is_boundary(flat_daily, dividends):
+    """测试 1A 触发价两侧的评估结果不同"""
+    price = bollinger_dividend_trigger_price(flat_daily, dividends, PARAMS_1A, TODAY)
+    assert price is not None and 9 < price < 10
+    below = evaluate_bollinger_dividend(with_bar(flat_daily, price * 0.9999), dividends, PARAMS_1A)
+    above = evaluate_bollinger_dividend(with_bar(flat_daily, price * 1.0001), dividends, PARAMS_1A)
+    assert below['triggered'].iloc[-1]
+    assert not above['triggered'].iloc[-1]
+
+def test_bollinger_trigger_price_dividend_ceiling(flat_daily):
+    """测试股息率不足时触发价受股息率上限约束，没有分红时不生成触发价"""
+    small = pd.DataFrame({'ex_dividend_date': ['2022-07-01'], 'dividend_per_share_pre_tax': [0.2]})
+    assert bollinger_dividend_trigger_price(flat_daily, small, PARAMS_1A, TODAY) == pytest.approx(0.2 / 0.03)
+    assert bollinger_dividend_trigger_price(flat_daily, pd.DataFrame(), PARAMS_1A, TODAY) is None
+
+def test_macd_trigger_price_is_boundary():
+    """测试 2A 的触发价恰好是 DIF 上穿 DEA 的价格"""
+    # 加速下跌，DIF 持续低于 DEA
+    closes = 12 - 0.0005 * np.arange(65) ** 2
+    daily = make_daily(closes)
+    price = macd_cross_trigger_price(daily, pd.DataFrame(), {}, TODAY)
+    assert price is not None
+
+    def crossed(value):
+        kline = with_bar(daily, value)
+        close = kline['close']
+        dif = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+        dea = dif.ewm(span=9, adjust=False).mean()
+        return dif.iloc[-1] > dea.iloc[-1]
+
+    assert crossed(price + 1e-6)
+    assert not crossed(price - 1e-6)
+    # 前一日已经金叉时不生成触发价
+    rising = make_daily(np.linspace(10, 12, 60))
+    assert macd_cross_trigger_price(rising, pd.DataFrame(), {}, TODAY) is None
+    assert not evaluate_macd_bollinger_breakthrough(with_bar(daily, price - 1e-6), pd.DataFrame(), {})[
+        'triggered'].iloc[-1]
+
+def test_scanner_reevaluates_only_crossed_stocks(flat_daily, dividends, mocker):
+    """测试盘中扫描只重新评估进入触发区间的股票，且与收盘后扫描结果一致"""
+    db = DatabaseHandler({"database_path": ":memory:",
+                          "strategies": {"strategy_1a_daily_bollinger_dividend": PARAMS_1A}})
+    db.initialize_tables()
+    for stock_code in ['SH600036', 'SH601398']:
+        db.insert_dataframe('daily_kline', flat_daily.drop(columns=['raw_close']).assign(stock_code=stock_code))
+        db.insert_dataframe('dividend_data', dividends.assign(stock_code=stock_code, report_date='2022-06-01'))
+    engine = StrategyEngine(DataManager(db))
+    scanner = IntradayScanner(engine, snapshot_source=lambda: pd.DataFrame())
+    assert scanner.prepare(['SH600036', 'SH601398'], TODAY) == 2
+    trigger = scanner.bands.trigger_prices[0]
+    evaluate = mocker.spy(scanner, '_history')
+
+    # 两只股票都在触发价之上，不需要重新评估
+    signals = scanner.tick(pd.DataFrame({'stock_code': ['SH600036', 'SH601398'], 'price': [10.0, 10.0]}))
+    assert signals.empty and evaluate.call_count == 0
+
+    # 一只股票跌破触发价，只重新评估这一只
+    snapshot = pd.DataFrame({'stock_code': ['SH600036', 'SH601398'], 'price': [trigger * 0.999, 10.0]})
+    signals = scanner.tick(snapshot)
+    assert evaluate.call_count == 1
+    assert list(signals['stock_code']) == ['SH600036']
+    expected = evaluate_bollinger_dividend(with_bar(flat_daily, trigger * 0.999), dividends, PARAMS_1A)
+    assert signals.iloc[0]['description'] == expected['description'].iloc[-1]
+
+    # 价格不变时不再重新评估，已确认的信号不重复发出
+    assert scanner.tick(snapshot).empty
+    assert evaluate.call_count == 1
+    nearest = scanner.bands.nearest(snapshot.set_index('stock_code')['price'], limit=1)
+    assert nearest.iloc[0]['stock_code'] == 'SH600036' and nearest.iloc[0]['distance_percentage'] < 0
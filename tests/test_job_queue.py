@@ -0,0 +1,223 @@
+"""
+测试基于租约的多进程工作队列
+"""
+import json
+import multiprocessing
+import sqlite3
+import time
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from src.cli.data_commands import build_queue_handlers
+from src.cli.scan_commands import backfill
+from src.data.db_handler import DatabaseHandler
+from src.data.job_queue import JobQueue, QueueWorker, UnitDeferred
+
+@pytest.fixture
+def queue(tmp_path):
+    """创建测试用的队列"""
+    return JobQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2)
+
+def record_unit(results_path, worker_id, stock_code):
+    """把处理过的单元写入结果库，用于检查是否被重复处理"""
+    conn = sqlite3.connect(results_path, timeout=30)
+    with conn:
+        conn.execute("INSERT INTO handled (stock_code, worker_id) VALUES (?, ?)", (stock_code, worker_id))
+    conn.close()
+
+def run_worker_process(queue_path, results_path, worker_id):
+    """在子进程中运行一个 worker"""
+    queue = JobQueue(queue_path, lease_seconds=60, max_attempts=2)
+    handlers = {
+        "update": lambda stock_code, payload: record_unit(results_path, worker_id, stock_code)
+    }
+    QueueWorker(queue, handlers, worker_id=worker_id).run("test", poll_interval_seconds=0.1)
+
+def test_enqueue_and_claim(queue):
+    """测试入队和领取"""
+    assert queue.enqueue("test", "update", ["SH600036", "SZ000001"], {"data_types": ["kline"]}) == 2
+    units = queue.claim("test", "worker-a", limit=1)
+    assert len(units) == 1
+    assert units[0]['stock_code'] == "SH600036"
+    assert units[0]['payload'] == {"data_types": ["kline"]}
+    assert queue.stats("test") == {'pending': 1, 'leased': 1, 'done': 0, 'failed': 0}
+
+    # 已领取的单元不会再被其他 worker 领取
+    units_b = queue.claim("test", "worker-b", limit=5)
+    assert [u['stock_code'] for u in units_b] == ["SZ000001"]
+    assert queue.claim("test", "worker-c") == []
+
+def test_enqueue_does_not_reset_leased_units(queue):
+    """测试重复入队不会打断正在执行的单元"""
+    queue.enqueue("test", "update", ["SH600036"])
+    unit = queue.claim("test", "worker-a")[0]
+    assert queue.enqueue("test", "update", ["SH600036"]) == 0
+    assert queue.complete("worker-a", unit['unit_id'])
+    # 完成后重新入队会被重置为待处理
+    assert queue.enqueue("test", "update", ["SH600036"]) == 1
+
+def test_expired_lease_is_requeued(queue, mocker):
+    """测试租约过期的单元被其他 worker 重新领取，原 worker 无法再提交"""
+    queue.enqueue("test", "update", ["SH600036"])
+    unit = queue.claim("test", "worker-a")[0]
+
+    now = time.time()
+    mocker.patch('src.data.job_queue.time.time', return_value=now + 120)
+    reclaimed = queue.claim("test", "worker-b")
+    assert reclaimed[0]['unit_id'] == unit['unit_id']
+    assert reclaimed[0]['attempts'] == 2
+    assert not queue.complete("worker-a", unit['unit_id'])
+    assert queue.complete("worker-b", unit['unit_id'])
+
+def test_heartbeat_extends_lease(queue, mocker):
+    """测试续约后租约不会过期"""
+    queue.enqueue("test", "update", ["SH600036"])
+    unit = queue.claim("test", "worker-a")[0]
+
+    now = time.time()
+    mocker.patch('src.data.job_queue.time.time', return_value=now + 50)
+    assert queue.heartbeat("worker-a", [unit['unit_id']]) == 1
+    mocker.patch('src.data.job_queue.time.time', return_value=now + 100)
+    assert queue.claim("test", "worker-b") == []
+    # 非持有者不能续约
+    assert queue.heartbeat("worker-b", [unit['unit_id']]) == 0
+
+def test_failed_unit_retried_until_max_attempts(queue):
+    """测试失败的单元在达到最大领取次数前被重新放回队列"""
+    queue.enqueue("test", "update", ["SH600036"])
+    unit = queue.claim("test", "worker-a")[0]
+    assert queue.fail("worker-a", unit['unit_id'], "网络错误") == 'pending'
+    assert queue.stats("test")['pending'] == 1
+
+    unit = queue.claim("test", "worker-a")[0]
+    assert queue.fail("worker-a", unit['unit_id'], "网络错误") == 'failed'
+    assert queue.stats("test")['failed'] == 1
+    # 租约已丢失时不记录失败
+    assert queue.fail("worker-a", unit['unit_id'], "网络错误") is None
+    assert queue.claim("test", "worker-a") == []
+
+def test_worker_handles_failures(queue):
+    """测试 worker 处理函数抛出异常时记录失败"""
+    queue.enqueue("test", "update", ["SH600036", "SZ000001"])
+
+    def handler(stock_code, payload):
+        if stock_code == "SZ000001":
+            raise RuntimeError("被限流")
+
+    counts = QueueWorker(queue, {"update": handler}, worker_id="w").run("test", poll_interval_seconds=0.01)
+    # 第一次失败放回队列重试，第二次达到最大领取次数后才计为失败
+    assert counts == {'done': 1, 'retried': 1, 'failed': 1, 'deferred': 0}
+    assert queue.stats("test") == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 1}
+
+def test_deferred_unit_does_not_spend_attempts(queue, mocker):
+    """处理函数推迟的单元放回队列且不消耗领取次数，worker 等待后重新领取"""
+    queue.enqueue("test", "update", ["SH600036"])
+    sleeps = mocker.patch('src.data.job_queue.time.sleep')
+    outcomes = [UnitDeferred("接口熔断", 30.0), UnitDeferred("接口熔断", 30.0), UnitDeferred("接口熔断", 30.0), None]
+
+    def handler(stock_code, payload):
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+
+    counts = QueueWorker(queue, {"update": handler}, worker_id="w").run("test", poll_interval_seconds=0.01)
+    # 推迟次数超过最大领取次数，单元仍然完成
+    assert counts == {'done': 1, 'retried': 0, 'failed': 0, 'deferred': 3}
+    assert [call.args[0] for call in sleeps.call_args_list] == [30.0, 30.0, 30.0]
+    assert queue.stats("test")['done'] == 1
+
+def test_queued_update_resets_budget_and_defers_open_circuit(tmp_path, mocker):
+    """队列的 update 处理函数每个单元重置错误预算，接口熔断时推迟单元而不是失败"""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({
+        "database_path": str(tmp_path / "stock_data.db"),
+        "data_source": {"akshare_max_retries": 2, "akshare_retry_delay_seconds": 0,
+                        "circuit_failure_threshold": 4, "error_budget": 2}
+    }))
+    mock_fetch = mocker.patch('akshare.stock_history_dividend_detail', side_effect=RuntimeError("服务不可用"))
+    handle_update = build_queue_handlers(str(config_path))["update"]
+    payload = {"data_types": ["dividend"], "force": True}
+
+    # 每个单元都有完整的错误预算：两个单元各重试一次，第4次失败时熔断
+    for stock_code in ["SH600036", "SZ000001"]:
+        with pytest.raises(Exception, match="更新失败"):
+            handle_update(stock_code, payload)
+    assert mock_fetch.call_count == 4
+
+    with pytest.raises(UnitDeferred) as deferred:
+        handle_update("SH601398", payload)
+    assert deferred.value.retry_after > 0
+    assert mock_fetch.call_count == 4
+
+def test_multiple_worker_processes(tmp_path):
+    """测试多个本地 worker 进程共同处理队列，每个单元只被处理一次"""
+    queue_path = str(tmp_path / "queue.db")
+    results_path = str(tmp_path / "results.db")
+    conn = sqlite3.connect(results_path)
+    conn.execute("CREATE TABLE handled (stock_code TEXT, worker_id TEXT)")
+    conn.commit()
+    conn.close()
+
+    stock_codes = [f"SH{600000 + i}" for i in range(60)]
+    JobQueue(queue_path).enqueue("test", "update", stock_codes)
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker_process, args=(queue_path, results_path, f"worker-{i}"))
+        for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    conn = sqlite3.connect(results_path)
+    handled = conn.execute("SELECT stock_code FROM handled").fetchall()
+    conn.close()
+    assert sorted(code for (code,) in handled) == sorted(stock_codes)
+    assert JobQueue(queue_path).stats("test")['done'] == len(stock_codes)
+
+def test_queued_backfill_writes_signals_once(tmp_path, queue):
+    """backfill --queue 按股票入队，worker 执行回溯写入信号，重新执行的单元不会产生重复信号"""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({
+        "database_path": str(tmp_path / "stock_data.db"),
+        "strategies": {"strategy_1a_daily_bollinger_dividend": {
+            "enabled": True, "bollinger_period": 20, "bollinger_std_dev": 2.0,
+            "bollinger_flat_check_days": 20, "bollinger_flat_threshold_percentage": 5.0,
+            "lower_band_tolerance_percentage": 0.0, "min_dynamic_dividend_yield": 3.0
+        }}
+    }))
+    # 横盘震荡后最后一天跌破下轨
+    closes = 10 + 0.1 * np.sin(np.arange(80))
+    closes[-1] = 9.7
+    dates = pd.bdate_range(start='2023-01-02', periods=len(closes)).strftime('%Y-%m-%d')
+    db = DatabaseHandler(str(config_path))
+    db.initialize_tables()
+    db.insert_dataframe('daily_kline', pd.DataFrame({
+        'stock_code': 'SH600036', 'date': dates, 'open': closes, 'high': closes, 'low': closes,
+        'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    }))
+    db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036'], 'report_date': [dates[-40]], 'ex_dividend_date': [dates[-30]],
+        'dividend_per_share_pre_tax': [0.5], 'dividend_yield': [None]
+    }))
+
+    args = SimpleNamespace(pool=None, stock='SH600036', strategy=None, start_date=dates[0], end_date=dates[-1],
+                           queue=queue.path, queue_name="test")
+    backfill(args)
+    unit = queue.claim("test", "inspect")[0]
+    assert unit['kind'] == "backfill"
+    assert unit['payload'] == {"start_date": dates[0], "end_date": dates[-1], "strategies": None}
+    queue.fail("inspect", unit['unit_id'], "模拟 worker 中断")
+
+    handlers = build_queue_handlers(str(config_path))
+    assert QueueWorker(queue, handlers, worker_id="w").run("test", poll_interval_seconds=0.01)['done'] == 1
+    # 完成后再次入队并执行，相当于租约过期后重新领取
+    backfill(args)
+    QueueWorker(queue, handlers, worker_id="w").run("test", poll_interval_seconds=0.01)
+    signals = db.execute_query("SELECT stock_code, date, strategy_name FROM historical_signals")
+    assert signals.values.tolist() == [['SH600036', dates[-1], 'strategy_1a_daily_bollinger_dividend']]
+    db.close()
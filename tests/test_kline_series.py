@@ -0,0 +1,65 @@
+"""
+测试K线序列容器
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.kline_series import KlineBatch, KlineSeries
+from src.strategies.strategy_engine import STRATEGY_EVALUATORS, evaluate_signals, resample_to_weekly
+
+def make_kline(stock_code='SH600036', periods=120, seed=0):
+    """生成随机游走的日K线"""
+    rng = np.random.default_rng(seed)
+    closes = 10 + np.cumsum(rng.normal(0, 0.1, periods))
+    return pd.DataFrame({
+        'stock_code': stock_code,
+        'date': pd.bdate_range('2024-01-01', periods=periods).strftime('%Y-%m-%d'),
+        'open': closes, 'high': closes + 0.1, 'low': closes - 0.1, 'close': closes,
+        'volume': 1000, 'amount': 10000.0, 'raw_close': closes * 2,
+    })
+
+def test_frame_roundtrip_and_dtypes():
+    """与 DataFrame 互相转换，数组类型紧凑"""
+    frame = make_kline()
+    series = KlineSeries.from_frame(frame)
+    assert series.stock_code == 'SH600036'
+    assert series.dates.dtype == np.int64 and series.volume.dtype == np.int64
+    assert series.close.dtype == np.float64
+    assert not hasattr(series, '__dict__')
+    restored = series.to_frame()
+    assert restored['date'].tolist() == frame['date'].tolist()
+    assert np.allclose(restored['raw_close'], frame['raw_close'])
+
+def test_slices_are_views():
+    """按日期切片和从批量数组取单只股票都不复制数据"""
+    series = KlineSeries.from_frame(make_kline())
+    window = series.slice_dates('2024-01-06', '2024-01-12')
+    assert window.date_strings().tolist() == ['2024-01-08', '2024-01-09', '2024-01-10', '2024-01-11', '2024-01-12']
+    assert np.shares_memory(window.close, series.close)
+
+    batch = KlineBatch.concat([series, KlineSeries.from_frame(make_kline('SZ000001', 30, seed=1))])
+    second = batch[1]
+    assert second.stock_code == 'SZ000001' and len(second) == 30
+    assert np.shares_memory(second.close, batch.series.close)
+
+def test_resample_weekly_matches_dataframe():
+    """周K线合成与 DataFrame 版本一致"""
+    frame = make_kline()
+    weekly = KlineSeries.from_frame(frame).resample_weekly().to_frame()
+    expected = resample_to_weekly(frame)
+    assert weekly['date'].tolist() == expected['date'].tolist()
+    for column in ['open', 'high', 'low', 'close', 'volume', 'raw_close']:
+        assert np.allclose(weekly[column], expected[column])
+
+@pytest.mark.parametrize("strategy_name", list(STRATEGY_EVALUATORS))
+def test_evaluate_signals_same_for_series_and_frame(strategy_name):
+    """策略在 KlineSeries 和 DataFrame 输入上结果一致"""
+    frame = make_kline(periods=300, seed=3)
+    dividends = pd.DataFrame({'ex_dividend_date': ['2024-06-03'], 'dividend_per_share_pre_tax': [2.0]})
+    params = {strategy_name: {'min_dynamic_dividend_yield': 0.0, 'bollinger_flat_threshold_percentage': 100.0,
+                              'lower_band_tolerance_percentage': 5.0, 'bollinger_flat_check_days': 10}}
+    args = ([strategy_name], STRATEGY_EVALUATORS, params, '2024-01-01', '2025-12-31')
+    from_series = evaluate_signals('SH600036', KlineSeries.from_frame(frame), dividends, *args)
+    from_frame = evaluate_signals('SH600036', frame, dividends, *args)
+    assert not from_series.empty
+    pd.testing.assert_frame_equal(from_series, from_frame)
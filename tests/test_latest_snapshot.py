@@ -0,0 +1,139 @@
+"""
+测试每只股票一行的最新快照表
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.data.signal_store import SignalStore
+from src.strategies.indicators import trailing_dividend_per_share
+
+def make_kline(stock_code, dates, close):
+    """生成指定日期和收盘价的日K线"""
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': close, 'high': close, 'low': close,
+        'close': close, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+def make_dividends(stock_code, ex_dates, amounts):
+    """生成分红数据"""
+    return pd.DataFrame({
+        'stock_code': stock_code, 'report_date': ex_dates, 'ex_dividend_date': ex_dates,
+        'dividend_per_share_pre_tax': amounts, 'dividend_yield': None
+    })
+
+def make_signal(stock_code, date, strategy_name, price):
+    """生成一条信号"""
+    return pd.DataFrame({'stock_code': [stock_code], 'date': [date], 'strategy_name': [strategy_name],
+                         'signal_type': ['buy'], 'price': [price], 'description': ['测试']})
+
+@pytest.fixture
+def db():
+    """创建测试用的数据库"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    yield db
+    db.close()
+
+def snapshot_row(db, stock_code):
+    """读取一只股票的快照"""
+    return db.latest_snapshot.query([stock_code]).iloc[0]
+
+def test_writes_maintain_snapshot(db):
+    """新K线、分红、财务和信号写入时在同一事务中更新快照"""
+    db.insert_dataframe('daily_kline', make_kline('SH600036', ['2024-06-27', '2024-06-28'], 10.0))
+    db.insert_dataframe('dividend_data', make_dividends('SH600036', ['2023-07-01', '2024-06-20'], [0.4, 0.5]))
+    db.upsert_dataframe('financial_summary', pd.DataFrame({
+        'stock_code': ['SH600036'], 'date': ['2024-06-28'], 'pe_ttm': [6.5], 'pb_mrq': [0.9],
+        'market_cap': [None], 'circulating_market_cap': [None]
+    }))
+    SignalStore(db).upsert(make_signal('SH600036', '2024-06-28', 'strategy_1a_daily_bollinger_dividend', 10.0))
+
+    row = snapshot_row(db, 'SH600036')
+    assert (row['date'], row['close']) == ('2024-06-28', 10.0)
+    assert row['ttm_dividend'] == pytest.approx(0.9)
+    assert row['dividend_yield'] == pytest.approx(9.0)
+    assert (row['pe_ttm'], row['pb_mrq']) == (6.5, 0.9)
+    assert row['signal_strategy'] == 'strategy_1a_daily_bollinger_dividend'
+
+    # 回填更早的K线不改变快照
+    db.upsert_dataframe('daily_kline', make_kline('SH600036', ['2024-01-02'], 8.0))
+    assert snapshot_row(db, 'SH600036')['close'] == 10.0
+
+    # 新K线移动近一年分红的窗口，2023-07-01 的分红移出窗口
+    db.upsert_dataframe('daily_kline', make_kline('SH600036', ['2024-07-02'], 12.5))
+    row = snapshot_row(db, 'SH600036')
+    assert (row['date'], row['close']) == ('2024-07-02', 12.5)
+    assert row['ttm_dividend'] == pytest.approx(0.5)
+    assert row['dividend_yield'] == pytest.approx(4.0)
+
+def test_signal_replace_clears_removed_signal(db):
+    """替换区间删除了最新信号时，快照回退到之前的信号"""
+    store = SignalStore(db)
+    store.upsert(make_signal('SH600036', '2024-01-05', 'strategy_2a_daily_macd_bollinger_breakthrough', 9.0))
+    store.upsert(make_signal('SH600036', '2024-06-28', 'strategy_1a_daily_bollinger_dividend', 10.0))
+    assert snapshot_row(db, 'SH600036')['signal_date'] == '2024-06-28'
+
+    store.replace('SH600036', '2024-06-01', '2024-06-30', ['strategy_1a_daily_bollinger_dividend'], pd.DataFrame())
+    row = snapshot_row(db, 'SH600036')
+    assert (row['signal_date'], row['signal_price']) == ('2024-01-05', 9.0)
+    # 没有K线的股票收盘价和股息率为空
+    assert pd.isna(row['close']) and pd.isna(row['dividend_yield'])
+
+def test_rebuild_for_existing_database(tmp_path):
+    """已有数据库首次创建快照表时从数据表重建"""
+    db = DatabaseHandler({"database_path": str(tmp_path / "stock_data.db")})
+    db.initialize_tables()
+    db.insert_dataframe('daily_kline', pd.concat([
+        make_kline('SH600036', ['2024-06-28'], 10.0), make_kline('SZ000001', ['2024-06-27'], 11.0)
+    ]))
+    db.conn.execute("DROP TABLE latest_snapshot")
+    db.initialize_tables()
+    snapshot = db.latest_snapshot.query()
+    assert snapshot[['stock_code', 'date', 'close']].values.tolist() == [
+        ['SH600036', '2024-06-28', 10.0], ['SZ000001', '2024-06-27', 11.0]
+    ]
+    assert db.latest_snapshot.query(['SZ000001'])['stock_code'].tolist() == ['SZ000001']
+    db.close()
+
+def test_ttm_dividend_window_consistent_across_leap_year(db):
+    """闰年中快照、因子排名、动态股息率和策略指标使用同一个近一年窗口"""
+    db.insert_dataframe('daily_kline', make_kline('SH600036', ['2024-02-29'], 10.0))
+    # 2024-02-29 的窗口为 (2023-03-01, 2024-02-29]，2023-03-01 的分红不计入
+    db.insert_dataframe('dividend_data', make_dividends('SH600036', ['2023-03-01', '2023-03-02'], [0.3, 0.5]))
+
+    snapshot = snapshot_row(db, 'SH600036')
+    assert snapshot['ttm_dividend'] == pytest.approx(0.5)
+    panel = db.factor_ranks.build_panel('2024-02-29', '2024-02-29')
+    assert panel['dividend_yield'].tolist() == pytest.approx([snapshot['dividend_yield']])
+    dm = DataManager(db)
+    assert dm.calculate_dynamic_dividend_yield('SH600036', 10.0, '2024-02-29') == pytest.approx(5.0)
+    indicator = trailing_dividend_per_share(np.array(['2024-02-29'], dtype='datetime64[D]'),
+                                            np.array(['2023-03-01', '2023-03-02'], dtype='datetime64[D]'),
+                                            np.array([0.3, 0.5]))
+    assert indicator.tolist() == pytest.approx([0.5])
+
+def test_rebuild_reads_frozen_partitions(tmp_path):
+    """K线已全部冻结到年份分区的股票重建快照时从分区取最新收盘价"""
+    db = DatabaseHandler({"database_path": str(tmp_path / "stock_data.db"),
+                          "partition_dir": str(tmp_path / "partitions")})
+    db.initialize_tables()
+    db.insert_dataframe('daily_kline', make_kline('SZ000001', ['2022-12-29', '2022-12-30'], [9.0, 10.0]))
+    db.insert_dataframe('daily_kline', make_kline('SH600036', ['2022-12-30', '2024-06-28'], [30.0, 32.0]))
+    db.insert_dataframe('dividend_data', make_dividends('SZ000001', ['2022-07-01'], [0.5]))
+    db.partitions.freeze(2023)
+    db.conn.execute("DELETE FROM latest_snapshot")
+    db.conn.commit()
+
+    assert db.latest_snapshot.rebuild() == 2
+    row = snapshot_row(db, 'SZ000001')
+    assert (row['date'], row['close']) == ('2022-12-30', 10.0)
+    assert row['dividend_yield'] == pytest.approx(5.0)
+    assert snapshot_row(db, 'SH600036')['close'] == 32.0
+
+    # 只写入分红时不改变已从分区取到的收盘价
+    db.insert_dataframe('dividend_data', make_dividends('SZ000001', ['2022-12-01'], [0.3]))
+    row = snapshot_row(db, 'SZ000001')
+    assert (row['close'], row['ttm_dividend']) == (10.0, pytest.approx(0.8))
+    db.close()
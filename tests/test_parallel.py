@@ -0,0 +1,95 @@
+"""
+测试多进程分片评估和共享内存面板
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.strategies.parallel import SharedPanel
+from src.strategies.strategy_engine import StrategyEngine
+
+STRATEGIES_CONFIG = {
+    "strategy_1a_daily_bollinger_dividend": {
+        "enabled": True,
+        "bollinger_period": 20,
+        "bollinger_std_dev": 2.0,
+        "bollinger_flat_check_days": 20,
+        "bollinger_flat_threshold_percentage": 5.0,
+        "lower_band_tolerance_percentage": 0.0,
+        "min_dynamic_dividend_yield": 3.0
+    },
+    "strategy_2a_daily_macd_bollinger_breakthrough": {
+        "enabled": True
+    }
+}
+
+STOCK_CODES = [f"SH{600000 + i}" for i in range(6)]
+
+def make_kline(stock_code, seed):
+    """生成横盘后回落或反弹的日K线，不同股票的走势不同"""
+    rng = np.random.default_rng(seed)
+    closes = 10 + 0.1 * np.sin(np.arange(120) + seed) + np.cumsum(rng.normal(0, 0.05, 120))
+    closes[-1] = closes[-2] * (0.97 if seed % 2 == 0 else 1.03)
+    dates = pd.bdate_range(start='2023-01-02', periods=len(closes)).strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes, 'low': closes,
+        'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+@pytest.fixture
+def engine():
+    """创建测试用的策略引擎，数据库中有多只股票的K线和分红数据"""
+    db = DatabaseHandler({"database_path": ":memory:", "strategies": STRATEGIES_CONFIG})
+    db.initialize_tables()
+    for seed, stock_code in enumerate(STOCK_CODES):
+        kline = make_kline(stock_code, seed)
+        db.insert_dataframe('daily_kline', kline)
+        db.insert_dataframe('dividend_data', pd.DataFrame({
+            'stock_code': [stock_code],
+            'report_date': [kline['date'].iloc[-40]],
+            'ex_dividend_date': [kline['date'].iloc[-30]],
+            'dividend_per_share_pre_tax': [0.5],
+            'dividend_yield': [None]
+        }))
+    return StrategyEngine(DataManager(db))
+
+def test_shared_panel_roundtrip():
+    """测试数据放入共享内存后在另一个映射中还原"""
+    daily = make_kline('SH600000', 0).assign(raw_close=lambda df: df['close'])
+    dividends = pd.DataFrame({'ex_dividend_date': ['2023-03-01'], 'dividend_per_share_pre_tax': [0.5]})
+    inputs = {'SH600000': (daily, dividends), 'SH600001': (daily.iloc[:10], pd.DataFrame())}
+    with SharedPanel.create(inputs) as panel:
+        attached = SharedPanel.attach(panel.descriptor)
+        code, restored, restored_dividends = attached.stock_inputs(0)
+        assert code == 'SH600000'
+        assert list(restored['date']) == list(daily['date'])
+        assert np.allclose(restored['close'], daily['close'])
+        assert restored_dividends.iloc[0]['ex_dividend_date'] == '2023-03-01'
+        code, restored, restored_dividends = attached.stock_inputs(1)
+        assert len(restored) == 10
+        assert restored_dividends.empty
+        attached.close()
+
+def test_sharded_backfill_matches_serial(engine):
+    """测试多进程分片回溯与单进程结果一致，并由父进程写入数据库"""
+    start, end = '2023-03-01', '2023-06-30'
+    strategies = engine.get_enabled_strategies()
+    serial, serial_codes = engine._evaluate_many(STOCK_CODES, start, end, strategies, processes=1)
+    sharded, sharded_codes = engine._evaluate_many(STOCK_CODES, start, end, strategies, processes=2)
+    assert serial_codes == sharded_codes == STOCK_CODES
+    assert not serial.empty
+    pd.testing.assert_frame_equal(serial, sharded)
+
+    counts = engine.backfill_many(STOCK_CODES, start, end, processes=2)
+    assert sum(counts.values()) == len(serial)
+    engine.backfill_many(STOCK_CODES, start, end, processes=2)
+    stored = engine.dm.db.execute_query("SELECT * FROM historical_signals")
+    assert len(stored) == len(serial)
+
+def test_sharded_scan_matches_serial(engine):
+    """测试多进程扫描只评估每只股票的最新一根K线"""
+    serial = engine.scan(STOCK_CODES, '2023-12-31')
+    sharded = engine.scan(STOCK_CODES, '2023-12-31', processes=2)
+    pd.testing.assert_frame_equal(serial, sharded)
+    assert (sharded['date'] == make_kline('SH600000', 0)['date'].iloc[-1]).all()
@@ -0,0 +1,79 @@
+"""
+测试K线按年分区、跨分区查询和冻结
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.db_handler import DatabaseHandler
+
+def make_kline(stock_code, start, periods):
+    """生成测试用的日K线"""
+    dates = pd.bdate_range(start=start, periods=periods).strftime('%Y-%m-%d')
+    closes = 10 + np.arange(periods) * 0.01
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes,
+        'low': closes, 'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+@pytest.fixture
+def db(tmp_path):
+    """创建带有五年日K线的文件数据库"""
+    handler = DatabaseHandler({
+        "database_path": str(tmp_path / "stock_data.db"),
+        "partition_dir": str(tmp_path / "partitions"),
+        "max_attached_partitions": 2,
+    })
+    handler.initialize_tables()
+    for stock_code in ['SH600036', 'SZ000001']:
+        handler.insert_dataframe('daily_kline', make_kline(stock_code, '2019-01-01', 1300))
+    yield handler
+    handler.close()
+
+def test_freeze_moves_cold_years(db, tmp_path):
+    """测试冻结后主库只保留近期数据，查询结果与冻结前一致"""
+    where = "stock_code = ? AND date BETWEEN ? AND ?"
+    params = ('SH600036', '2019-06-01', '2023-12-31')
+    expected = db.query_kline('daily_kline', where, params, '2019-06-01', '2023-12-31', order_by="date")
+
+    moved = db.partitions.freeze(2022)
+    assert sorted(moved) == [2019, 2020, 2021]
+    assert db.partitions.available_years() == [2019, 2020, 2021]
+    remaining = db.execute_query("SELECT MIN(date) AS first FROM daily_kline")
+    assert remaining.iloc[0]['first'] >= '2022-01-01'
+    path = db.partitions.partition_path(2019)
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o444)
+
+    # 跨越全部分区的查询超过 ATTACH 上限时分批执行
+    result = db.query_kline('daily_kline', where, params, '2019-06-01', '2023-12-31', order_by="date")
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(db.partitions._attached) <= 2
+
+    # 只查询近期数据时不 ATTACH 冷分区
+    db.partitions._detach(2020)
+    db.partitions._detach(2021)
+    db.query_kline('daily_kline', where, ('SH600036', '2023-01-01', '2023-06-30'), '2023-01-01', '2023-06-30')
+    assert set(db.partitions._attached) <= {2019}
+
+def test_freeze_merges_late_rows(db):
+    """测试冻结后写入的旧数据再次冻结时合并到已有分区"""
+    db.partitions.freeze(2021)
+    late = make_kline('SH601398', '2019-03-01', 5)
+    db.insert_dataframe('daily_kline', late)
+    moved = db.partitions.freeze(2021)
+    assert moved == {2019: 5}
+    result = db.query_kline('daily_kline', "stock_code = ?", ('SH601398',), '2019-01-01', '2019-12-31')
+    assert len(result) == 5
+    # 重新连接后 ATTACH 状态失效，查询时重新 ATTACH
+    db.connect()
+    result = db.query_kline('daily_kline', "stock_code = ?", ('SH601398',), '2019-01-01', '2019-12-31')
+    assert len(result) == 5
+
+def test_freeze_requires_partition_dir():
+    """测试未配置分区目录时冻结报错，查询不受影响"""
+    handler = DatabaseHandler({"database_path": ":memory:"})
+    handler.initialize_tables()
+    handler.insert_dataframe('daily_kline', make_kline('SH600036', '2019-01-01', 10))
+    assert len(handler.query_kline('daily_kline', "stock_code = ?", ('SH600036',))) == 10
+    with pytest.raises(ValueError):
+        handler.partitions.freeze(2020)
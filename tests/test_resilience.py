@@ -0,0 +1,132 @@
+"""
+测试数据源请求的退避重试、熔断和错误预算
+"""
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.data.resilience import (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker,
+                                 CircuitOpenError, RetryController)
+from src.data.update_jobs import DEFERRED_ERROR, UpdateJobRunner
+
+class FakeClock:
+    """可手动推进的时钟"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_controller(clock, sleeps, **kwargs):
+    """创建使用假时钟、记录等待时间的重试控制器"""
+    params = dict(max_attempts=3, base_delay=1.0, max_delay=4.0, failure_threshold=3, reset_seconds=60.0)
+    params.update(kwargs)
+    return RetryController(clock=clock, sleep=sleeps.append, **params)
+
+def test_circuit_breaker_states():
+    """连续失败后熔断，冷却后只放行一个试探请求"""
+    clock = FakeClock()
+    breaker = CircuitBreaker('stock_zh_a_hist', failure_threshold=2, reset_seconds=60, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    clock.now = 60
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    breaker.acquire()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    # 试探请求失败，重新熔断
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN and breaker.retry_after() == 60
+
+    clock.now = 120
+    breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+
+def test_retry_with_jittered_backoff():
+    """失败后按指数退避重试，等待时间不超过上限"""
+    clock, sleeps = FakeClock(), []
+    controller = make_controller(clock, sleeps, max_attempts=4, failure_threshold=10)
+    outcomes = [RuntimeError("超时"), RuntimeError("超时"), RuntimeError("超时"), 'ok']
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert controller.call('stock_zh_a_hist', flaky) == 'ok'
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= min(4.0, 2 ** attempt)
+    assert controller.budget.spent == 3
+
+def test_open_circuit_and_error_budget_stop_retries():
+    """熔断后不再发出请求，错误预算用完后不再重试"""
+    clock, sleeps = FakeClock(), []
+    controller = make_controller(clock, sleeps, failure_threshold=2)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError("连接被拒绝")
+
+    with pytest.raises(RuntimeError):
+        controller.call('stock_zh_a_hist', failing)
+    # 第2次失败时熔断，不再等待第3次
+    assert len(calls) == 2 and len(sleeps) == 1
+    with pytest.raises(CircuitOpenError):
+        controller.call('stock_zh_a_hist', failing)
+    assert len(calls) == 2
+    assert set(controller.open_endpoints()) == {'stock_zh_a_hist'}
+
+    budget_controller = make_controller(FakeClock(), [], failure_threshold=100, error_budget=2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            budget_controller.call('stock_history_dividend_detail', failing)
+    # 第一次调用用完预算，第二次调用只尝试一次
+    assert len(calls) == 2 + 2 + 1
+
+def test_update_run_defers_work_for_open_endpoint(mocker):
+    """接口熔断后剩余股票推迟执行，不消耗尝试次数，可以续传"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    dm = DataManager(db)
+    dm.retry = make_controller(FakeClock(), [], max_attempts=2, failure_threshold=2)
+    mock_fetch = mocker.patch('akshare.stock_history_dividend_detail', side_effect=RuntimeError("服务不可用"))
+
+    runner = UpdateJobRunner(dm, max_attempts=1)
+    summary = runner.run(['SH600036', 'SZ000001', 'SH601398', 'SH600000'], ['dividend'])
+
+    assert mock_fetch.call_count == 2
+    assert summary['failed'] == 1
+    assert summary['pending'] == 3
+    errors = db.execute_query("SELECT last_error, attempts FROM update_jobs WHERE status = 'pending'")
+    assert set(errors['last_error']) == {DEFERRED_ERROR}
+    assert set(errors['attempts']) == {0}
+    assert runner.store.find_resumable_job(max_attempts=1) == summary['job_id']
+
+def test_interrupted_trial_releases_half_open_circuit():
+    """半开状态下的试探请求被 BaseException 中断时释放试探，之后的请求可以重新试探"""
+    clock, sleeps = FakeClock(), []
+    controller = make_controller(clock, sleeps, failure_threshold=1)
+
+    def failing():
+        raise RuntimeError("连接被拒绝")
+
+    def interrupted():
+        raise KeyboardInterrupt()
+
+    with pytest.raises(RuntimeError):
+        controller.call('stock_zh_a_hist', failing)
+    clock.now = 60
+
+    with pytest.raises(KeyboardInterrupt):
+        controller.call('stock_zh_a_hist', interrupted)
+    assert controller.breaker('stock_zh_a_hist').state == CIRCUIT_HALF_OPEN
+    assert controller.call('stock_zh_a_hist', lambda: 'ok') == 'ok'
+    assert controller.breaker('stock_zh_a_hist').state == CIRCUIT_CLOSED
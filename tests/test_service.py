@@ -0,0 +1,189 @@
+"""
+测试常驻服务和瘦客户端
+"""
+import json
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from src.service.client import ServiceClient, parse_address
+from src.data.data_manager import DataManager
+from src.service.server import ScanService
+
+STRATEGIES_CONFIG = {
+    "strategy_1a_daily_bollinger_dividend": {
+        "enabled": True,
+        "bollinger_period": 20,
+        "bollinger_std_dev": 2.0,
+        "bollinger_flat_check_days": 20,
+        "bollinger_flat_threshold_percentage": 5.0,
+        "lower_band_tolerance_percentage": 0.0,
+        "min_dynamic_dividend_yield": 3.0
+    }
+}
+
+def make_kline(stock_code='SH600036'):
+    """横盘震荡后最后一天跌破下轨的日K线"""
+    closes = 10 + 0.1 * np.sin(np.arange(80))
+    closes[-1] = 9.7
+    dates = pd.bdate_range(start='2023-01-02', periods=len(closes)).strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': closes, 'high': closes, 'low': closes,
+        'close': closes, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+@pytest.fixture
+def service(tmp_path):
+    """创建测试用的服务，数据库中有一只触发信号的股票"""
+    pool_path = tmp_path / "stock_pool.json"
+    pool_path.write_text(json.dumps({"default_pool": ["SH600036"]}), encoding="utf-8")
+    service = ScanService({
+        "database_path": str(tmp_path / "stock_data.db"),
+        "scan_output_dir": str(tmp_path / "scan_results"),
+        "strategies": STRATEGIES_CONFIG,
+        "service": {"scheduled_update": False}
+    }, stock_pool_path=str(pool_path))
+    kline = make_kline()
+    service.dm.db.insert_dataframe('daily_kline', kline)
+    service.dm.db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036'],
+        'report_date': [kline['date'].iloc[-40]],
+        'ex_dividend_date': [kline['date'].iloc[-30]],
+        'dividend_per_share_pre_tax': [0.5],
+        'dividend_yield': [None]
+    }))
+    return service
+
+@pytest.fixture
+def running_service(service, tmp_path):
+    """在后台线程中通过 Unix 套接字运行服务"""
+    address = f"unix:{tmp_path / 'service.sock'}"
+    thread = threading.Thread(target=service.serve_forever, args=(address,), daemon=True)
+    thread.start()
+    client = ServiceClient(address, timeout=10)
+    for _ in range(100):
+        if client.is_available():
+            break
+        threading.Event().wait(0.05)
+    yield client
+    service.shutdown()
+    thread.join(timeout=10)
+
+def test_parse_address():
+    """测试服务地址解析"""
+    assert parse_address("unix:/tmp/a.sock")[1] == "/tmp/a.sock"
+    assert parse_address("127.0.0.1:8765")[1] == ("127.0.0.1", 8765)
+    with pytest.raises(ValueError):
+        parse_address("localhost")
+
+def test_scan_through_socket(running_service, service):
+    """测试通过套接字扫描，输入数据在第一次请求后常驻缓存"""
+    result = running_service.call("scan", date="2023-04-30")
+    assert [s['stock_code'] for s in result['signals']] == ['SH600036']
+    assert result['signals'][0]['date'] == make_kline()['date'].iloc[-1]
+    with open(result['output_path'], encoding="utf-8") as f:
+        assert len(json.load(f)['signals']) == 1
+    assert running_service.call("ping")['cached_stocks'] == 1
+
+    # 缓存命中时不再读取数据库
+    service.dm.db.execute_update("DELETE FROM daily_kline")
+    assert len(running_service.call("scan", date="2023-04-30", save=False)['signals']) == 1
+
+def test_lookup_and_backfill(running_service):
+    """测试查询和回溯请求"""
+    kline = make_kline()
+    result = running_service.call("backfill", stock_codes=["SH600036"],
+                                  start_date=kline['date'].iloc[0], end_date=kline['date'].iloc[-1])
+    assert result == {"SH600036": 1}
+    lookup = running_service.call("lookup", stock_code="SH600036", date="2023-04-30")
+    assert lookup['latest']['close'] == pytest.approx(9.7)
+    assert len(lookup['signals']) == 1
+    signals = running_service.call("signals", pool="default_pool", latest=5)
+    assert [signal['stock_code'] for signal in signals] == ["SH600036"]
+    # 重复回溯不产生重复信号
+    running_service.call("backfill", stock_codes=["SH600036"],
+                         start_date=kline['date'].iloc[0], end_date=kline['date'].iloc[-1])
+    assert len(running_service.call("signals", strategies=list(STRATEGIES_CONFIG))) == 1
+    # 股票池的当前状态从最新快照表读取，包含回溯写入的信号
+    overview = running_service.call("overview")
+    assert [row['stock_code'] for row in overview] == ["SH600036"]
+    assert overview[0]['close'] == pytest.approx(9.7)
+    assert overview[0]['dividend_yield'] == pytest.approx(0.5 / 9.7 * 100)
+    assert overview[0]['signal_date'] == kline['date'].iloc[-1]
+
+def test_errors_are_returned_to_client(running_service):
+    """测试服务端异常以错误响应返回，服务继续运行"""
+    with pytest.raises(Exception, match="未知的命令"):
+        running_service.call("no_such_command")
+    with pytest.raises(Exception, match="未知的策略"):
+        running_service.call("scan", strategies=["no_such_strategy"])
+    assert running_service.call("ping")['status'] == "ok"
+
+def test_update_invalidates_cache(service, mocker):
+    """测试更新数据后相应股票的缓存失效"""
+    service.call("scan", date="2023-04-30", save=False)
+    assert service.ping()['cached_stocks'] == 1
+
+    def write_kline(dm, stock_code, data_types):
+        dm.db.upsert_dataframe('daily_kline', make_kline(stock_code).tail(1))
+        return {'kline': True}
+
+    # 更新在独立连接上写入，服务按变更日志使写入的股票缓存失效
+    mocker.patch.object(DataManager, 'update_single_stock_data', autospec=True, side_effect=write_kline)
+    result = service.call("update", data_types=['kline'])
+    assert result['done'] == 1
+    assert service.ping()['cached_stocks'] == 0
+    # 更新后增量计算全市场和股票池的最新因子排名
+    assert result['factor_ranks'] == {'market': 1, 'default_pool': 1}
+    ranks = service.call("factor_ranks", universe="default_pool")
+    assert ranks[0]['stock_code'] == 'SH600036' and ranks[0]['dividend_yield_pct'] == 1.0
+    assert ranks[0]['pe_ttm_pct'] is None
+
+def test_update_does_not_block_requests(service, mocker):
+    """测试更新在独立连接上执行，更新期间其他请求照常响应"""
+    responses = []
+
+    def slow_update(dm, stock_code, data_types):
+        assert dm is not service.dm
+        request = threading.Thread(target=lambda: responses.append(service.call("ping")))
+        request.start()
+        request.join(timeout=5)
+        return {data_type: True for data_type in data_types}
+
+    mocker.patch.object(DataManager, 'update_single_stock_data', autospec=True, side_effect=slow_update)
+    assert service.call("update", data_types=['kline'])['done'] == 1
+    assert [response['status'] for response in responses] == ["ok"]
+
+def test_next_update_time(service):
+    """测试收盘后更新时间跳过交易日历中的非交易日，日历没有覆盖的日期跳过周末"""
+    # 2024-01-05 是星期五
+    assert service.next_update_time(datetime(2024, 1, 5, 10, 0)) == datetime(2024, 1, 5, 15, 30)
+    assert service.next_update_time(datetime(2024, 1, 5, 16, 0)) == datetime(2024, 1, 8, 15, 30)
+    # 2024-02-09 至 2024-02-18 春节休市
+    service.dm.calendar.store(['2024-02-07', '2024-02-08', '2024-02-19'])
+    assert service.next_update_time(datetime(2024, 2, 8, 16, 0)) == datetime(2024, 2, 19, 15, 30)
+    # 日历之后的日期按周末跳过
+    assert service.next_update_time(datetime(2024, 2, 23, 16, 0)) == datetime(2024, 2, 26, 15, 30)
+
+def test_update_exports_snapshots(service, mocker, tmp_path):
+    """测试开启 export_after_update 后更新数据会导出快照"""
+    service.dm.db.config["export"] = {"output_dir": str(tmp_path / "export")}
+    service.service_config["export_after_update"] = True
+    mocker.patch.object(DataManager, 'update_single_stock_data', return_value={'kline': True})
+    service.call("update", data_types=['kline'])
+    assert (tmp_path / "export" / "stocks" / "SH600036.json.gz").exists()
+    assert service.call("export", date="2023-04-30")["changed"] == []
+
+def test_external_writes_invalidate_cache(service):
+    """测试其他进程写入的股票在下一个请求前按变更日志失效"""
+    service.call("scan", date="2023-04-30", save=False)
+    assert service.call("ping")['cached_stocks'] == 1
+    # 只写入分红以外的表不影响缓存
+    service.dm.db.insert_dataframe('financial_summary', pd.DataFrame({
+        'stock_code': ['SH600036'], 'date': ['2023-03-31'], 'pe_ttm': [6.0], 'pb_mrq': [0.8],
+        'market_cap': [None], 'circulating_market_cap': [None]
+    }))
+    assert service.call("ping")['cached_stocks'] == 1
+    service.dm.db.upsert_dataframe('daily_kline', make_kline().tail(1))
+    assert service.call("ping")['cached_stocks'] == 0
@@ -0,0 +1,93 @@
+"""
+测试信号存储模块
+"""
+import pandas as pd
+import pytest
+from src.data.compact_schema import migrate_schema
+from src.data.db_handler import DatabaseHandler
+from src.data.signal_store import SignalStore
+
+def make_signals(stock_codes, dates, strategy_name='strategy_a', price=10.0):
+    """生成每只股票每天一个信号的测试数据"""
+    return pd.DataFrame([
+        {'stock_code': code, 'date': date, 'strategy_name': strategy_name,
+         'signal_type': 'BUY', 'price': price, 'description': f'{code} {date}'}
+        for code in stock_codes for date in dates
+    ])
+
+@pytest.fixture
+def store():
+    """创建内存数据库上的信号存储"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    yield SignalStore(db)
+    db.close()
+
+def test_upsert_is_idempotent(store):
+    """重复写入同一信号覆盖原记录，不产生重复行"""
+    dates = ['2024-01-02', '2024-01-03']
+    store.upsert(make_signals(['SH600036', 'SZ000001'], dates))
+    store.upsert(make_signals(['SH600036'], dates, price=11.0))
+
+    result = store.query()
+    assert len(result) == 4
+    assert result.loc[result['stock_code'] == 'SH600036', 'price'].tolist() == [11.0, 11.0]
+
+    # 唯一键之外的策略是不同的信号
+    store.upsert(make_signals(['SH600036'], dates, strategy_name='strategy_b'))
+    assert len(store.query()) == 6
+    assert len(store.query(strategies=['strategy_b'])) == 2
+
+def test_query_and_latest(store):
+    """按策略、日期区间和股票查询，以及每只股票最近N个信号"""
+    dates = pd.bdate_range('2024-01-01', periods=10).strftime('%Y-%m-%d').tolist()
+    store.upsert(make_signals(['SH600036', 'SZ000001', 'SH601398'], dates))
+
+    result = store.query(start_date=dates[2], end_date=dates[4], stock_codes=['SH600036', 'SH601398'])
+    assert len(result) == 6
+    assert result['date'].tolist() == sorted(result['date'].tolist())
+
+    latest = store.latest(['SZ000001', 'SH600036', 'SH999999'], limit=2, end_date=dates[5])
+    assert latest['stock_code'].tolist() == ['SZ000001', 'SZ000001', 'SH600036', 'SH600036']
+    assert latest['date'].tolist() == [dates[5], dates[4], dates[5], dates[4]]
+
+    # 替换区间内的信号：不再触发的信号被删除
+    store.replace('SH600036', dates[0], dates[-1], ['strategy_a'], make_signals(['SH600036'], dates[:1]))
+    assert store.query(stock_codes=['SH600036'])['date'].tolist() == [dates[0]]
+
+def test_legacy_duplicates_removed_on_initialize(tmp_path):
+    """旧数据库中的重复信号在初始化时去重，只保留最后写入的一条"""
+    db = DatabaseHandler({"database_path": str(tmp_path / "test.db")})
+    db.connect()
+    db.conn.execute("""
+        CREATE TABLE historical_signals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, stock_code TEXT NOT NULL, date TEXT NOT NULL,
+            strategy_name TEXT NOT NULL, signal_type TEXT NOT NULL, price REAL, description TEXT
+        )
+    """)
+    db.conn.executemany(
+        "INSERT INTO historical_signals (stock_code, date, strategy_name, signal_type, price) VALUES (?, ?, ?, ?, ?)",
+        [('SH600036', '2024-01-02', 'strategy_a', 'BUY', price) for price in (1.0, 2.0, 3.0)]
+    )
+    db.conn.commit()
+    db.initialize_tables()
+
+    result = SignalStore(db).query()
+    assert result['price'].tolist() == [3.0]
+    db.close()
+
+def test_compact_schema_upsert(tmp_path):
+    """紧凑表结构下写入同样是幂等的"""
+    db = DatabaseHandler({"database_path": str(tmp_path / "test.db")})
+    db.initialize_tables()
+    migrate_schema(db, "compact", vacuum=False)
+    store = SignalStore(db)
+
+    dates = ['2024-01-02', '2024-01-03']
+    store.upsert(make_signals(['SH600036'], dates))
+    store.upsert(make_signals(['SH600036'], dates, price=12.0))
+
+    result = store.latest(['SH600036'], limit=5)
+    assert result['price'].tolist() == [12.0, 12.0]
+    assert result['date'].tolist() == ['2024-01-03', '2024-01-02']
+    db.close()
@@ -0,0 +1,141 @@
+"""
+测试技术指标和策略引擎的功能
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.strategies.indicators import bollinger_bands, macd, trailing_dividend_per_share
+from src.strategies.strategy_engine import (
+    StrategyEngine,
+    evaluate_bollinger_dividend,
+    evaluate_macd_bollinger_breakthrough,
+    resample_to_weekly,
+)
+
+STRATEGIES_CONFIG = {
+    "strategy_1a_daily_bollinger_dividend": {
+        "enabled": True,
+        "bollinger_period": 20,
+        "bollinger_std_dev": 2.0,
+        "bollinger_flat_check_days": 20,
+        "bollinger_flat_threshold_percentage": 5.0,
+        "lower_band_tolerance_percentage": 0.0,
+        "min_dynamic_dividend_yield": 3.0
+    },
+    "strategy_2a_daily_macd_bollinger_breakthrough": {
+        "enabled": False
+    }
+}
+
+@pytest.fixture
+def data_manager():
+    """创建测试用的数据管理器"""
+    db = DatabaseHandler({"database_path": ":memory:", "strategies": STRATEGIES_CONFIG})
+    db.initialize_tables()
+    return DataManager(db)
+
+def make_kline(closes, start='2023-01-02', stock_code='SH600036'):
+    """根据收盘价序列生成日K线数据"""
+    dates = pd.bdate_range(start=start, periods=len(closes)).strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'stock_code': stock_code,
+        'date': dates,
+        'open': closes,
+        'high': closes,
+        'low': closes,
+        'close': closes,
+        'volume': 1000,
+        'amount': 10000.0,
+        'adj_factor': 1.0
+    })
+
+def sideways_then_dip():
+    """横盘震荡后最后一天跌破下轨的价格序列"""
+    closes = 10 + 0.1 * np.sin(np.arange(80))
+    closes[-1] = 9.7
+    return closes
+
+def test_bollinger_bands():
+    """测试布林带计算"""
+    close = pd.Series([10.0] * 25)
+    mid, upper, lower = bollinger_bands(close, 20, 2.0)
+    assert np.isnan(mid.iloc[18])
+    assert mid.iloc[-1] == 10.0
+    assert upper.iloc[-1] == 10.0
+    assert lower.iloc[-1] == 10.0
+
+def test_macd_golden_cross():
+    """测试下跌后反弹时出现DIF上穿DEA"""
+    close = pd.Series(np.concatenate([np.linspace(20, 10, 40), np.linspace(10, 14, 20)]))
+    dif, dea, hist = macd(close)
+    cross = (dif > dea) & (dif.shift(1) <= dea.shift(1))
+    assert cross.iloc[40:].any()
+    assert np.allclose(hist, 2 * (dif - dea))
+
+def test_trailing_dividend_per_share():
+    """测试近12个月分红总额"""
+    dates = np.array(['2023-01-15', '2023-06-30', '2024-01-15', '2024-02-01'], dtype='datetime64[D]')
+    ex_dates = np.array(['2023-01-15', '2023-06-30'], dtype='datetime64[D]')
+    result = trailing_dividend_per_share(dates, ex_dates, np.array([0.5, 0.3]))
+    assert np.allclose(result, [0.5, 0.8, 0.3, 0.3])
+
+def test_resample_to_weekly():
+    """测试周K线的日期取每周最后一个交易日"""
+    weekly = resample_to_weekly(make_kline([10.0, 11.0, 12.0, 13.0, 14.0, 15.0], start='2024-01-01'))
+    assert list(weekly['date']) == ['2024-01-05', '2024-01-08']
+    assert weekly.iloc[0]['open'] == 10.0
+    assert weekly.iloc[0]['close'] == 14.0
+
+def test_evaluate_bollinger_dividend():
+    """测试布林下轨走平 + 股息率策略"""
+    kline = make_kline(sideways_then_dip())
+    dividends = pd.DataFrame({
+        'ex_dividend_date': [kline['date'].iloc[-30]],
+        'dividend_per_share_pre_tax': [0.5]
+    })
+    result = evaluate_bollinger_dividend(kline, dividends, STRATEGIES_CONFIG['strategy_1a_daily_bollinger_dividend'])
+    assert result['triggered'].iloc[-1]
+    assert result['triggered'].sum() == 1
+    assert "动态股息率" in result['description'].iloc[-1]
+
+    # 股息率不足时不触发
+    low_dividends = dividends.assign(dividend_per_share_pre_tax=0.1)
+    result = evaluate_bollinger_dividend(kline, low_dividends, STRATEGIES_CONFIG['strategy_1a_daily_bollinger_dividend'])
+    assert not result['triggered'].any()
+
+def test_evaluate_macd_bollinger_breakthrough():
+    """测试MACD金叉策略只在金叉当天触发"""
+    closes = np.concatenate([np.linspace(20, 10, 60), np.linspace(10, 16, 30)])
+    result = evaluate_macd_bollinger_breakthrough(make_kline(closes), pd.DataFrame(), {})
+    triggered_days = np.flatnonzero(result['triggered'].to_numpy())
+    assert len(triggered_days) <= 2
+    assert all(day >= 60 for day in triggered_days)
+
+def test_backfill_is_repeatable(data_manager):
+    """测试回溯写入信号，重复回溯不会产生重复记录"""
+    kline = make_kline(sideways_then_dip())
+    data_manager.db.insert_dataframe('daily_kline', kline)
+    data_manager.db.insert_dataframe('dividend_data', pd.DataFrame({
+        'stock_code': ['SH600036'],
+        'report_date': [kline['date'].iloc[-40]],
+        'ex_dividend_date': [kline['date'].iloc[-30]],
+        'dividend_per_share_pre_tax': [0.5],
+        'dividend_yield': [None]
+    }))
+    engine = StrategyEngine(data_manager)
+    assert engine.get_enabled_strategies() == ['strategy_1a_daily_bollinger_dividend']
+
+    start, end = kline['date'].iloc[0], kline['date'].iloc[-1]
+    assert engine.backfill('SH600036', start, end) == 1
+    assert engine.backfill('SH600036', start, end) == 1
+    signals = data_manager.db.execute_query("SELECT * FROM historical_signals")
+    assert len(signals) == 1
+    assert signals.iloc[0]['date'] == end
+    assert signals.iloc[0]['signal_type'] == 'buy'
+
+def test_unknown_strategy(data_manager):
+    """测试指定未知策略时报错"""
+    with pytest.raises(ValueError):
+        StrategyEngine(data_manager).get_enabled_strategies(['no_such_strategy'])
@@ -0,0 +1,121 @@
+"""
+测试交易日历和K线缺口检测
+"""
+from datetime import datetime
+import pandas as pd
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.data.trading_calendar import GAP_MISSING, GAP_SUSPENDED
+
+TRADING_DAYS = pd.bdate_range('2024-03-01', periods=10).strftime('%Y-%m-%d').tolist()
+
+def make_kline(stock_code, dates):
+    """生成指定日期的日K线"""
+    return pd.DataFrame({
+        'stock_code': stock_code, 'date': dates, 'open': 10.0, 'high': 10.0, 'low': 10.0,
+        'close': 10.0, 'volume': 1000, 'amount': 10000.0, 'adj_factor': None
+    })
+
+def make_hist(dates):
+    """生成 stock_zh_a_hist 格式的返回数据"""
+    return pd.DataFrame({
+        '日期': dates, '开盘': 11.0, '收盘': 11.0, '最高': 11.0, '最低': 11.0, '成交量': 2000, '成交额': 22000.0
+    })
+
+@pytest.fixture
+def data_manager():
+    """创建有交易日历和部分K线的数据管理器"""
+    db = DatabaseHandler({"database_path": ":memory:", "data_source": {"akshare_max_retries": 1}})
+    db.initialize_tables()
+    dm = DataManager(db)
+    dm.calendar.store(TRADING_DAYS)
+    days = TRADING_DAYS
+    db.insert_dataframe('daily_kline', make_kline('SH600036', days[:2] + days[3:5] + days[7:]))
+    db.insert_dataframe('daily_kline', make_kline('SZ000001', days[:8]))
+    yield dm
+    db.close()
+
+def test_find_gaps_all_stocks(data_manager):
+    """一次检测所有股票的缺口，已确认的区间标记为停牌"""
+    days = TRADING_DAYS
+    data_manager.calendar.confirm_empty('SZ000001', [(days[8], days[9])])
+    gaps = data_manager.calendar.find_gaps(days[0], days[-1], ['SH600036', 'SZ000001', 'SH601398'])
+
+    assert gaps[['stock_code', 'start_date', 'end_date', 'status']].values.tolist() == [
+        ['SH600036', days[2], days[2], GAP_MISSING],
+        ['SH600036', days[5], days[6], GAP_MISSING],
+        ['SH601398', days[0], days[9], GAP_MISSING],
+        ['SZ000001', days[8], days[9], GAP_SUSPENDED],
+    ]
+    assert gaps['trading_days'].tolist() == [1, 2, 10, 2]
+    # 默认检测表中的所有股票
+    assert set(data_manager.calendar.find_gaps(days[0], days[-1])['stock_code']) == {'SH600036', 'SZ000001'}
+
+def test_plan_refetch_bridges_close_gaps(data_manager):
+    """相距较近的缺口合并为一个请求"""
+    days = TRADING_DAYS
+    gaps = data_manager.calendar.find_gaps(days[0], days[-1], ['SH600036'])
+    merged = data_manager.calendar.plan_refetch(gaps, max_bridge_days=2)
+    assert merged.values.tolist() == [['SH600036', days[2], days[6]]]
+    separate = data_manager.calendar.plan_refetch(gaps, max_bridge_days=1)
+    assert separate.values.tolist() == [['SH600036', days[2], days[2]], ['SH600036', days[5], days[6]]]
+
+def test_settled_end_date(data_manager):
+    """收盘前不检测当天"""
+    calendar = data_manager.calendar
+    assert calendar.settled_end_date('2024-03-05', datetime(2024, 3, 5, 10, 0)) == '2024-03-04'
+    assert calendar.settled_end_date('2024-03-05', datetime(2024, 3, 5, 15, 30)) == '2024-03-05'
+    assert calendar.settled_end_date('2024-03-01', datetime(2024, 3, 5, 10, 0)) == '2024-03-01'
+
+def test_repair_fetches_only_missing_ranges(data_manager, mocker):
+    """修复只请求缺失的区间，数据源没有的交易日记录为停牌，再次修复不再请求"""
+    days = TRADING_DAYS
+    # 数据源只返回 days[2] 和 days[5]，days[6] 是停牌日
+    mock_hist = mocker.patch('akshare.stock_zh_a_hist', return_value=make_hist([days[2], days[5]]))
+    summary = data_manager.repair_daily_kline(['SH600036'], days[0], days[-1], max_bridge_days=2)
+
+    assert summary['requests'] == 1
+    assert summary['rows'] == 2
+    assert mock_hist.call_count == 1
+    assert mock_hist.call_args.kwargs['start_date'] == days[2].replace('-', '')
+    gaps = data_manager.calendar.find_gaps(days[0], days[-1], ['SH600036'])
+    assert gaps[['start_date', 'end_date', 'status']].values.tolist() == [[days[6], days[6], GAP_SUSPENDED]]
+
+    summary = data_manager.repair_daily_kline(['SH600036'], days[0], days[-1])
+    assert summary['requests'] == 0
+    assert mock_hist.call_count == 1
+
+def test_daily_kline_read_fills_gaps(data_manager, mocker):
+    """读取日K线时补齐数据库中缺失的交易日"""
+    days = TRADING_DAYS
+    mocker.patch('akshare.stock_zh_a_hist', return_value=make_hist([days[2]]))
+    mocker.patch('akshare.stock_zh_a_daily', return_value=pd.DataFrame())
+    df = data_manager.get_stock_daily_kline('SH600036', days[0], days[4], adjust="")
+    assert df['date'].tolist() == days[:5]
+
+def test_stale_kline_without_calendar_fetches_tail(mocker):
+    """本地没有交易日历时，更新落后一个月的日K线会获取最后一根K线之后的数据"""
+    db = DatabaseHandler({"database_path": ":memory:", "data_source": {"akshare_max_retries": 1}})
+    db.initialize_tables()
+    dm = DataManager(db)
+    today = pd.Timestamp(datetime.now().date())
+    stored = pd.bdate_range(end=today - pd.Timedelta(days=30), periods=5).strftime('%Y-%m-%d').tolist()
+    db.insert_dataframe('daily_kline', make_kline('SH600036', stored))
+    missing = pd.bdate_range(pd.Timestamp(stored[-1]) + pd.Timedelta(days=1),
+                             today - pd.Timedelta(days=1)).strftime('%Y-%m-%d').tolist()
+    mock_hist = mocker.patch('akshare.stock_zh_a_hist', return_value=make_hist(missing))
+    mocker.patch('akshare.stock_zh_a_daily', return_value=pd.DataFrame())
+
+    assert dm.update_single_stock_data('SH600036', ['kline']) == {'kline': True}
+    assert mock_hist.call_args.kwargs['start_date'] == (pd.Timestamp(stored[-1]) + pd.Timedelta(days=1)).strftime('%Y%m%d')
+    latest = db.conn.execute("SELECT MAX(date) FROM daily_kline WHERE stock_code = 'SH600036'").fetchone()[0]
+    assert latest == missing[-1]
+
+    # 数据源没有返回K线的区间（如停牌）记为已确认缺口，之后不再重复请求
+    db.insert_dataframe('daily_kline', make_kline('SZ000001', stored))
+    mock_hist = mocker.patch('akshare.stock_zh_a_hist', return_value=pd.DataFrame())
+    dm.update_single_stock_data('SZ000001', ['kline'])
+    dm.update_single_stock_data('SZ000001', ['kline'])
+    assert mock_hist.call_count == 1
+    db.close()
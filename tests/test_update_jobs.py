@@ -0,0 +1,87 @@
+"""
+测试可续传更新任务的功能
+"""
+import pytest
+from src.data.data_manager import DataManager
+from src.data.db_handler import DatabaseHandler
+from src.data.update_jobs import ProgressTracker, UpdateJobRunner, UpdateJobStore
+
+@pytest.fixture
+def data_manager():
+    """创建测试用的数据管理器"""
+    db = DatabaseHandler({"database_path": ":memory:"})
+    db.initialize_tables()
+    return DataManager(db)
+
+def test_create_job_and_pending_units(data_manager):
+    """测试创建任务后所有工作单元均为待处理"""
+    store = UpdateJobStore(data_manager.db)
+    job_id = store.create_job(['SH600036', 'SZ000001'], ['kline', 'dividend'])
+    units = store.get_pending_units(job_id, max_attempts=3)
+    assert len(units) == 4
+    assert ('SH600036', 'kline') in units
+    assert store.get_job_summary(job_id)['pending'] == 4
+
+def test_run_marks_units_done(data_manager, mocker):
+    """测试执行任务后工作单元被标记为完成"""
+    mock_update = mocker.patch.object(
+        data_manager, 'update_single_stock_data',
+        side_effect=lambda code, types: {t: True for t in types}
+    )
+    runner = UpdateJobRunner(data_manager)
+    summary = runner.run(['SH600036', 'SZ000001'], ['kline', 'financial'])
+    assert summary['done'] == 4
+    assert summary['failed'] == 0
+    # 同一只股票的数据类型合并为一次调用
+    assert mock_update.call_count == 2
+
+def test_resume_skips_finished_units(data_manager, mocker):
+    """测试续传时跳过已完成的单元，只执行中断的单元"""
+    store = UpdateJobStore(data_manager.db)
+    job_id = store.create_job(['SH600036', 'SZ000001'], ['kline'])
+    store.mark_units(job_id, 'SH600036', {'kline': True})
+    # 模拟进程在执行 SZ000001 时崩溃
+    store.mark_running(job_id, 'SZ000001', ['kline'])
+
+    mock_update = mocker.patch.object(
+        data_manager, 'update_single_stock_data',
+        side_effect=lambda code, types: {t: True for t in types}
+    )
+    summary = UpdateJobRunner(data_manager).run([], [], resume=True)
+    assert summary['job_id'] == job_id
+    assert summary['done'] == 2
+    mock_update.assert_called_once_with('SZ000001', ['kline'])
+
+def test_failed_units_retried_up_to_limit(data_manager, mocker):
+    """测试失败单元的重试次数受限"""
+    mock_update = mocker.patch.object(
+        data_manager, 'update_single_stock_data',
+        side_effect=lambda code, types: {t: code != 'SZ000001' for t in types}
+    )
+    runner = UpdateJobRunner(data_manager, max_attempts=2)
+    summary = runner.run(['SH600036', 'SZ000001'], ['kline'])
+    assert summary['done'] == 1
+    assert summary['failed'] == 1
+    # SH600036 一次成功，SZ000001 共尝试2次
+    assert mock_update.call_count == 3
+
+    # 达到上限的失败单元不再被续传
+    assert runner.store.find_resumable_job(max_attempts=2) is None
+    assert runner.store.find_resumable_job(max_attempts=3) == summary['job_id']
+
+def test_exception_marks_unit_failed(data_manager, mocker):
+    """测试更新过程抛出异常时记录失败原因"""
+    mocker.patch.object(data_manager, 'update_single_stock_data', side_effect=RuntimeError("被限流"))
+    summary = UpdateJobRunner(data_manager, max_attempts=1).run(['SH600036'], ['kline'])
+    assert summary['failed'] == 1
+    errors = data_manager.db.execute_query("SELECT last_error FROM update_jobs")
+    assert errors.iloc[0]['last_error'] == "被限流"
+
+def test_progress_tracker_eta(mocker):
+    """测试进度跟踪器按吞吐量估算剩余时间"""
+    logger = mocker.Mock()
+    mocker.patch('src.data.update_jobs.time.monotonic', side_effect=[0.0, 10.0, 10.0, 10.0, 10.0])
+    tracker = ProgressTracker(100, logger)
+    tracker.update(20)
+    assert tracker.throughput() == 2.0
+    assert tracker.eta_seconds() == 40.0